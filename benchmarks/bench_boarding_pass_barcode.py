@@ -0,0 +1,153 @@
+'''
+Benchmark of the on-device boarding pass barcode decoding (src/get_custom_text/decode_boarding_pass.py)
+against the custom model analysis on the local Azure emulator, whose analyses take --analyze-seconds.
+
+For --passengers passengers of the sample manifest, it renders a boarding pass page with the IATA BCBP
+barcode of the passenger as a PDF417, saved as a print-at-home PNG and as a kiosk scanner capture
+(a tilted, noisy, EXIF-rotated 12 MP JPEG, see bench_preprocessing), plus the page without a barcode
+and the page whose barcode has a destination airport missing from doc_intelligence.barcode.airports.
+Each input goes through the boarding pass analysis (analyze_custom_doc_main.main) with the barcode
+decoding enabled and disabled, and the benchmark reports the latency, the documents decoded on the
+device and the Document Intelligence requests. Checks that every barcode decodes without a request,
+that the decoded fields pass validate_boarding_pass against the manifest row, that the pages without
+a barcode or with an unmapped airport fall back to the custom model, and that decoding is at least
+--min-speedup times faster.
+
+Requires zxing-cpp (pip install zxing-cpp), which also generates the barcodes.
+
+Usage:
+    python benchmarks/bench_boarding_pass_barcode.py --passengers 5 --analyze-seconds 1.0
+'''
+import os
+import sys
+import time
+import logging
+import importlib.util
+import argparse
+import tempfile
+import contextlib
+from io import StringIO
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from PIL import Image
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(ROOT_DIR, 'src'))
+sys.path.append(ROOT_DIR)
+
+from benchmarks.stubs.emulator import AzureEmulator
+from benchmarks.bench_emulated_checkin import write_config
+from benchmarks.bench_preprocessing import boarding_pass_page, scanner_capture
+
+SAMPLE_MANIFEST = os.path.join(ROOT_DIR, 'data', 'flight_manifest', 'flight-manifest.csv')
+
+# BCBP compartment code of the manifest classes
+COMPARTMENTS = {'Economy': 'Y', 'Business': 'J', 'First': 'F'}
+
+# Airport code missing from the airports map of the config
+UNMAPPED_AIRPORT = 'JFK'
+
+def encode_bcbp(passenger:dict, airports:dict, sequence:int) -> str:
+    '''
+    Mandatory items of the one-leg BCBP barcode of a manifest row, UNMAPPED_AIRPORT for cities missing from airports
+    '''
+    codes = {city: code for code, city in airports.items()}
+    codes = {city: codes.get(city, UNMAPPED_AIRPORT) for city in (passenger['From'], passenger['To'])}
+    name = f"{passenger['Last Name']}/{passenger['First Name']}".upper()[:20]
+    day = datetime.strptime(passenger['Date'], '%d-%b-%y').timetuple().tm_yday
+    leg = (f"{passenger['Ticket No.'][-6:]:<7}{codes[passenger['From']]:<3}{codes[passenger['To']]:<3}{passenger['Carrier']:<3}"
+           f"{passenger['Flight No.'].zfill(4):<5}{day:03d}{COMPARTMENTS.get(passenger['Class'], 'Y')}"
+           f"{passenger['Seat'].zfill(4)}{sequence:04d} 1")
+    return f"M1{name:<20}E{leg}00"
+
+def barcoded_page(passenger:dict, text:str) -> Image.Image:
+    import zxingcpp
+    page = boarding_pass_page(passenger)
+    barcode = np.asarray(zxingcpp.create_barcode(text, zxingcpp.BarcodeFormat.PDF417).to_image(scale=3))
+    page.paste(Image.fromarray(barcode), (1100, 560))
+    return page
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--passengers', type=int, default=5, help='Passengers of the sample manifest')
+    arg_parser.add_argument('--analyze-seconds', type=float, default=1.0, help='Emulator custom model analysis time, in seconds')
+    arg_parser.add_argument('--latency', type=float, default=0.02, help='Emulator latency per request, in seconds')
+    arg_parser.add_argument('--min-speedup', type=float, default=5.0, help='Required speedup of the barcode decoding over the analysis')
+    args = arg_parser.parse_args()
+    if importlib.util.find_spec('zxingcpp') is None:
+        sys.exit("FAIL: zxing-cpp is required to generate and decode the barcodes (pip install zxing-cpp)")
+
+    manifest = pd.read_csv(SAMPLE_MANIFEST, dtype=str)
+    passengers = [row.to_dict() for _, row in manifest.head(args.passengers).iterrows()]
+    with tempfile.TemporaryDirectory() as tmp_dir, \
+            AzureEmulator(passenger=passengers[0], latency=args.latency, analyze_seconds=args.analyze_seconds) as emulator:
+        os.environ['CONFIG_PATH'] = write_config(tmp_dir, emulator.url, SAMPLE_MANIFEST)
+        from utility.settings import get_settings
+        from get_custom_text.analyze_custom_doc_main import main as analyze_custom
+        from get_documents.preprocess_documents import start_preprocessing_pool
+        from validation.validation import validate_boarding_pass
+        logging.getLogger().setLevel(logging.WARNING)
+        config = get_settings().config['doc_intelligence']
+        model_id = config['custom_models']['boarding_pass_1']
+        start_preprocessing_pool()
+
+        # The inputs: (kind, passenger index, path)
+        inputs = []
+        for index, passenger in enumerate(passengers):
+            page = barcoded_page(passenger, encode_bcbp(passenger, config['barcode']['airports'], index + 1))
+            path = os.path.join(tmp_dir, f'boarding-pass-{index}.png')
+            page.save(path)
+            inputs.append(('png', index, path))
+            path = os.path.join(tmp_dir, f'boarding-pass-scan-{index}.jpg')
+            with open(path, 'wb') as capture:
+                capture.write(scanner_capture(page, (4032, 3024), seed=index))
+            inputs.append(('scan', index, path))
+            path = os.path.join(tmp_dir, f'boarding-pass-no-barcode-{index}.png')
+            boarding_pass_page(passenger).save(path)
+            inputs.append(('no barcode', index, path))
+            path = os.path.join(tmp_dir, f'boarding-pass-unmapped-{index}.png')
+            barcoded_page(passenger, encode_bcbp({**passenger, 'To': 'New York'}, config['barcode']['airports'], index + 1)).save(path)
+            inputs.append(('unmapped', index, path))
+
+        rows, failures = [], []
+        for enabled in (False, True):
+            config['barcode']['enabled'] = enabled
+            for kind, index, path in inputs:
+                requests = emulator.counters['document_intelligence']
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(StringIO()):
+                    bp_info = analyze_custom(path, model_id, None)
+                seconds = time.perf_counter() - start
+                decoded = bp_info[0]['model_id'] != model_id
+                rows.append({'mode': 'barcode' if enabled else 'custom model', 'kind': kind, 'seconds': seconds, 'decoded': decoded,
+                             'requests': emulator.counters['document_intelligence'] - requests})
+                if enabled and kind in ('png', 'scan'):
+                    if not decoded:
+                        failures.append(f"the barcode of {os.path.basename(path)} did not decode")
+                    elif not validate_boarding_pass(bp_info, pd.Series(passengers[index])):
+                        failures.append(f"the fields decoded from {os.path.basename(path)} do not match the manifest: {bp_info[0]['fields']}")
+                elif decoded:
+                    failures.append(f"{os.path.basename(path)} was not analyzed by the custom model")
+
+    results = pd.DataFrame(rows)
+    print(f"emulator, analysis {args.analyze_seconds:g} s, latency {args.latency * 1000:.0f} ms, {args.passengers} passengers\n")
+    print(f"{'mode':<14}{'input':<12}{'mean (ms)':>11}{'max (ms)':>10}{'decoded':>9}{'requests':>10}")
+    for (mode, kind), group in results.groupby(['mode', 'kind'], sort=False):
+        print(f"{mode:<14}{kind:<12}{group['seconds'].mean() * 1000:>11.1f}{group['seconds'].max() * 1000:>10.1f}"
+              f"{int(group['decoded'].sum()):>9}{int(group['requests'].sum()):>10}")
+
+    barcode = results[(results['mode'] == 'barcode') & results['kind'].isin(['png', 'scan'])]
+    cloud = results[(results['mode'] == 'custom model') & results['kind'].isin(['png', 'scan'])]
+    speedup = cloud['seconds'].mean() / barcode['seconds'].mean()
+    print(f"\nBarcode decoding is {speedup:.0f}x faster than the custom model analysis")
+    if barcode['requests'].sum():
+        failures.append(f"the decoded boarding passes made {int(barcode['requests'].sum())} Document Intelligence requests")
+    if speedup < args.min_speedup:
+        failures.append(f"barcode decoding is only {speedup:.1f}x faster")
+    if failures:
+        sys.exit("FAIL: " + "; ".join(failures))
+    print("\nPASS: the boarding pass barcodes decode on the device and the other boarding passes fall back to the custom model")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+'''
+Benchmark of the combined ID and boarding pass analysis (src/get_documents/analyze_combined_documents.py).
+
+Each passenger has an ID image, a boarding pass and a two-page document holding both. Against the
+local Azure emulator, reports the Document Intelligence requests and the mean latency per passenger of:
+- separate: the ID and the boarding pass files analyzed one after the other
+- combined: the two-page document, its pages dispatched to both models concurrently (id_pages, boarding_pass_pages)
+- classifier: the two-page document with its pages in reverse order, assigned by the classifier endpoint
+then runs kiosk_main.main end to end in the combined mode. Checks that the combined runs return the
+results of the separate run, that the combined run is faster than it (the classifier run pays for one
+more analysis before the two models) and that the combined check-ins validate the passenger.
+
+Usage:
+    python benchmarks/bench_combined_documents.py --passengers 10 --analyze-seconds 0.3
+'''
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+import contextlib
+from io import StringIO
+import yaml
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(ROOT_DIR, 'src'))
+sys.path.append(ROOT_DIR)
+
+from benchmarks.stubs.emulator import AzureEmulator
+from benchmarks.stubs.video_indexer import make_jpeg
+from benchmarks.stubs.document_intelligence import passenger_tag, make_document, select_pages, BOARDING_PASS_MARK
+from benchmarks.bench_manifest_index import generate_manifest
+from benchmarks.bench_emulated_checkin import write_config, VALIDATED_MESSAGE
+
+def write_documents(tmp_dir:str, passengers:int) -> list:
+    documents = []
+    for index in range(passengers):
+        id_page = passenger_tag(index) + make_jpeg(128)
+        boarding_pass_page = passenger_tag(index) + BOARDING_PASS_MARK + b'\n%PDF-1.4 stub'
+        paths = {}
+        for name, data in (('id', id_page), ('boarding_pass', boarding_pass_page),
+                           ('combined', make_document([id_page, boarding_pass_page])),
+                           ('reversed', make_document([boarding_pass_page, id_page]))):
+            paths[name] = os.path.join(tmp_dir, f'{name}_{index}.pdf')
+            with open(paths[name], 'wb') as document_file:
+                document_file.write(data)
+        documents.append(paths)
+    return documents
+
+def run(analyze, documents:list, emulator) -> tuple:
+    emulator.reset_counters()
+    latencies, results = [], []
+    for paths in documents:
+        start = time.perf_counter()
+        results.append(analyze(paths))
+        latencies.append(time.perf_counter() - start)
+    return emulator.counters['document_intelligence'], sum(latencies) / len(latencies), results
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--passengers', type=int, default=10, help='Passengers, each with their own documents')
+    arg_parser.add_argument('--checkins', type=int, default=3, help='End-to-end check-ins in the combined mode')
+    arg_parser.add_argument('--latency', type=float, default=0.02, help='Emulator latency per request, in seconds')
+    arg_parser.add_argument('--analyze-seconds', type=float, default=0.3, help='Document analysis time of the emulator')
+    args = arg_parser.parse_args()
+
+    manifest = generate_manifest(max(args.passengers, 100), 100)
+    passengers = [row.to_dict() for _, row in manifest.head(args.passengers).iterrows()]
+    with tempfile.TemporaryDirectory() as tmp_dir, \
+            AzureEmulator(passengers=passengers, latency=args.latency, analyze_seconds=args.analyze_seconds) as emulator:
+        manifest_path = os.path.join(tmp_dir, 'flight-manifest.csv')
+        manifest.to_csv(manifest_path, index=False)
+        config_path = write_config(tmp_dir, emulator.url, manifest_path)
+        with open(config_path) as yaml_file:
+            config = yaml.safe_load(yaml_file)
+        config['doc_intelligence']['id_cache'] = {'enabled': False}  # every run analyzes its documents
+        with open(config_path, 'w') as yaml_file:
+            yaml.safe_dump(config, yaml_file)
+        os.environ['CONFIG_PATH'] = config_path
+        import kiosk_main
+        from utility.settings import get_settings
+        from get_ID.analyzeID_prebuilt import analyze_id_document_bytes
+        from get_custom_text.extract_custom_doc import analyze_custom_document_bytes
+        from get_documents import analyze_combined_documents as combined_module
+        from get_documents.analyze_combined_documents import analyze_combined_documents
+        # The synthetic documents are no PDFs: the ID image is the ID page as the stub reads it
+        combined_module.render_page = lambda data, page, *args: select_pages(data, str(page))[0]
+        logging.getLogger().setLevel(logging.WARNING)
+        model_id = get_settings().config['doc_intelligence']['custom_models']['boarding_pass_1']
+        documents = write_documents(tmp_dir, args.passengers)
+
+        def read(path):
+            with open(path, 'rb') as document_file:
+                return document_file.read()
+
+        def analyze_separate(paths):
+            return analyze_id_document_bytes(read(paths['id'])), analyze_custom_document_bytes(model_id, read(paths['boarding_pass']))
+
+        runs = {'separate': run(analyze_separate, documents, emulator),
+                'combined': run(lambda paths: analyze_combined_documents(paths['combined'], model_id)[:2], documents, emulator)}
+        combined_config = get_settings().config['doc_intelligence'].setdefault('combined', {})
+        combined_config['classifier_id'] = 'kiosk-documents'
+        runs['classifier'] = run(lambda paths: analyze_combined_documents(paths['reversed'], model_id)[:2], documents, emulator)
+        combined_config['classifier_id'] = None
+
+        video_path = os.path.join(tmp_dir, 'video.mp4')
+        with open(video_path, 'wb') as video_file:
+            video_file.write(b'\x00' * 1024)
+        messages, errors = [], []
+        for index in range(args.checkins):
+            try:
+                with contextlib.redirect_stdout(StringIO()):
+                    messages.append(kiosk_main.main(documents[index % len(documents)]['combined'], None, video_path))
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+
+    print(f"{args.passengers} passengers, analysis {args.analyze_seconds * 1000:.0f} ms, latency {args.latency * 1000:.0f} ms")
+    print(f"\n{'run':<12}{'DI requests':>12}{'mean per passenger (ms)':>25}")
+    for label, (requests, latency, _) in runs.items():
+        print(f"{label:<12}{requests:>12}{latency * 1000:>25.1f}")
+    validated = sum(VALIDATED_MESSAGE in message for message in messages)
+    print(f"\ncombined check-ins: {validated} of {args.checkins} validated")
+
+    failures = []
+    for label in ('combined', 'classifier'):
+        if runs[label][2] != runs['separate'][2]:
+            failures.append(f"the {label} results differ from the separate results")
+    if runs['combined'][1] >= runs['separate'][1]:
+        failures.append("the combined run is not faster than the separate run")
+    if validated != args.checkins:
+        failures.append(f"{validated} of {args.checkins} combined check-ins validated the passenger ({errors[:1] or messages[:1]})")
+    if failures:
+        sys.exit("FAIL: " + "; ".join(failures))
+    print("\nPASS: one upload returns the ID and boarding pass results, analyzed concurrently")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+'''
+Benchmark of the shared Document Intelligence clients (src/utility/document_intelligence_clients.py).
+
+Runs --analyses prebuilt-idDocument analyses against the local Azure emulator, sequentially and from
+--workers threads, once with a new DocumentIntelligenceClient per analysis (as analyze_identity_documents
+and analyze_custom_documents used to create) and once with the shared client of the endpoint.
+Reports the TCP connections the emulator accepted and the mean latency per analysis, and checks that
+the shared client opens at most doc_intelligence.pool_size connections and returns the same results.
+
+Usage:
+    python benchmarks/bench_doc_intelligence_clients.py --analyses 40 --workers 8 --latency 0.02
+'''
+import io
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(ROOT_DIR, 'src'))
+sys.path.append(ROOT_DIR)
+
+from benchmarks.stubs.emulator import AzureEmulator
+from benchmarks.stubs.video_indexer import make_jpeg
+from benchmarks.stubs.document_intelligence import passenger_tag
+from benchmarks.bench_manifest_index import generate_manifest
+from benchmarks.bench_emulated_checkin import write_config
+
+def run(analyze, documents:list, workers:int, emulator) -> tuple:
+    emulator.reset_counters()
+
+    def timed(data):
+        start = time.perf_counter()
+        result = analyze(data)
+        return time.perf_counter() - start, result
+
+    start = time.perf_counter()
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            runs = list(executor.map(timed, documents))
+    else:
+        runs = [timed(data) for data in documents]
+    elapsed = time.perf_counter() - start
+    latencies = [latency for latency, _ in runs]
+    return emulator.counters['connections'], sum(latencies) / len(latencies), elapsed, [result for _, result in runs]
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--analyses', type=int, default=40, help='ID analyses per run')
+    arg_parser.add_argument('--workers', type=int, default=8, help='Threads of the concurrent runs')
+    arg_parser.add_argument('--latency', type=float, default=0.02, help='Emulator latency per request, in seconds')
+    arg_parser.add_argument('--analyze-seconds', type=float, default=0.0, help='Document analysis time of the emulator')
+    args = arg_parser.parse_args()
+
+    manifest = generate_manifest(100, 100)
+    passengers = [row.to_dict() for _, row in manifest.head(10).iterrows()]
+    documents = [passenger_tag(index % len(passengers)) + make_jpeg(128) for index in range(args.analyses)]
+    with tempfile.TemporaryDirectory() as tmp_dir, \
+            AzureEmulator(passengers=passengers, latency=args.latency, analyze_seconds=args.analyze_seconds) as emulator:
+        manifest_path = os.path.join(tmp_dir, 'flight-manifest.csv')
+        manifest.to_csv(manifest_path, index=False)
+        os.environ['CONFIG_PATH'] = write_config(tmp_dir, emulator.url, manifest_path)
+        from azure.core.credentials import AzureKeyCredential
+        from azure.ai.documentintelligence import DocumentIntelligenceClient
+        from utility.settings import get_settings
+        from utility.document_intelligence_clients import close_document_intelligence_clients
+        from get_ID import analyzeID_prebuilt
+        logging.getLogger().setLevel(logging.WARNING)
+        settings = get_settings()
+        endpoint = settings.get("DOCUMENTINTELLIGENCE_ENDPOINT")
+        key = settings.get("DOCUMENTINTELLIGENCE_API_KEY")
+        pool_size = (settings.config.get('doc_intelligence') or {}).get('pool_size', 10)
+
+        def analyze_per_call(data):
+            with DocumentIntelligenceClient(endpoint=endpoint, credential=AzureKeyCredential(key)) as client:
+                poller = client.begin_analyze_document(analyzeID_prebuilt.ID_MODEL_ID, analyze_request=io.BytesIO(data),
+                                                       content_type="application/octet-stream")
+                return analyzeID_prebuilt.extract_id_fields(poller.result())
+
+        runs = {}
+        for workers in (1, args.workers):
+            mode = 'sequential' if workers == 1 else f'{workers} threads'
+            runs[('per-call', mode)] = run(analyze_per_call, documents, workers, emulator)
+            runs[('shared', mode)] = run(analyzeID_prebuilt.analyze_id_document_bytes, documents, workers, emulator)
+            close_document_intelligence_clients()  # the next shared run starts without open connections
+
+    print(f"{args.analyses} analyses, latency {args.latency * 1000:.0f} ms, pool size {pool_size}")
+    print(f"\n{'client':<10}{'run':<14}{'connections':>12}{'mean per analysis (ms)':>24}{'total (s)':>11}")
+    for (client, mode), (connections, latency, elapsed, _) in runs.items():
+        print(f"{client:<10}{mode:<14}{connections:>12}{latency * 1000:>24.1f}{elapsed:>11.2f}")
+
+    failures = []
+    for (client, mode), (connections, _, _, results) in runs.items():
+        if client == 'shared' and connections > pool_size:
+            failures.append(f"the shared client opened {connections} connections in the {mode} run (pool size {pool_size})")
+        if results != runs[('per-call', 'sequential')][3]:
+            failures.append(f"the {client} {mode} results differ from the per-call sequential results")
+    if failures:
+        sys.exit("FAIL: " + "; ".join(failures))
+    print("\nPASS: the shared client reused its keep-alive connections")
+
+if __name__ == "__main__":
+    main()
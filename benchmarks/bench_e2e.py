@@ -0,0 +1,230 @@
+'''
+End-to-end benchmark of the boarding pipeline against the local Azure emulator.
+
+Starts benchmarks/stubs/emulator.py in a separate process (so its CPU and memory are not counted
+here) with the given per-service latencies, writes a temporary config.yaml pointing the kiosk at it,
+and checks in synthetic passengers of a generated manifest; the emulator answers each passenger's
+documents with that passenger's manifest row. Two runs:
+- stages: each stage function (get_id, get_boarding_pass, identify_faces_from_video, validate_all)
+  is called on its own for every passenger, recording latency, CPU time and peak Python memory
+- end-to-end: kiosk_main.main for every passenger at each concurrency level, recording check-in
+  latency, throughput and CPU time per check-in
+and reports p50/p95/p99 latencies. --json writes the report; --baseline compares it with an earlier
+report and fails on a p95 latency or throughput regression beyond --tolerance.
+
+Usage:
+    python benchmarks/bench_e2e.py --passengers 20 --concurrency 1 2 4 8 --json e2e.json
+    python benchmarks/bench_e2e.py --passengers 20 --baseline e2e.json --tolerance 0.25
+'''
+import os
+import sys
+import json
+import time
+import socket
+import logging
+import argparse
+import resource
+import tempfile
+import contextlib
+import subprocess
+import tracemalloc
+from io import StringIO
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(ROOT_DIR, 'src'))
+sys.path.append(ROOT_DIR)
+
+from benchmarks.stubs.emulator import SERVICES
+from benchmarks.stubs.video_indexer import make_jpeg
+from benchmarks.stubs.document_intelligence import passenger_tag
+from benchmarks.bench_manifest_index import generate_manifest
+from benchmarks.bench_emulated_checkin import write_config, VALIDATED_MESSAGE
+
+# Stage functions measured on their own
+STAGES = ['get_id', 'get_boarding_pass', 'identify_faces_from_video', 'validate_all']
+
+def latency_summary(latencies:list) -> dict:
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if latencies else (0.0, 0.0, 0.0)
+    return {'count': len(latencies), 'mean': float(np.mean(latencies)) if latencies else 0.0,
+            'p50': float(p50), 'p95': float(p95), 'p99': float(p99)}
+
+def max_rss_mib() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+@contextlib.contextmanager
+def emulator_process(args):
+    # The emulator runs in its own interpreter, on a free local port
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    command = [sys.executable, '-m', 'benchmarks.stubs.emulator', '--port', str(port), '--latency', str(args.latency),
+               '--jitter', str(args.jitter), '--thumbnails', str(args.thumbnails), '--passengers-csv', args.manifest_path]
+    for service in SERVICES:
+        latency = getattr(args, f'{service}_latency')
+        if latency is not None:
+            command += [f"--{service.replace('_', '-')}-latency", str(latency)]
+    process = subprocess.Popen(command, cwd=ROOT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                break
+            except OSError:
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("The emulator did not start")
+                time.sleep(0.1)
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        process.terminate()
+        process.wait()
+
+def write_passenger_inputs(tmp_dir:str, passengers:int) -> list:
+    # One ID image and boarding pass per passenger, tagged so the emulator returns that passenger's fields
+    video_path = os.path.join(tmp_dir, 'video.mp4')
+    with open(video_path, 'wb') as video_file:
+        video_file.write(b'\x00' * 1024)
+    inputs = []
+    for index in range(passengers):
+        id_path = os.path.join(tmp_dir, f'id_{index}.jpg')
+        bp_path = os.path.join(tmp_dir, f'boarding_pass_{index}.pdf')
+        with open(id_path, 'wb') as id_file:
+            id_file.write(passenger_tag(index) + make_jpeg(128))
+        with open(bp_path, 'wb') as bp_file:
+            bp_file.write(passenger_tag(index) + b'%PDF-1.4 stub')
+        inputs.append((id_path, bp_path, video_path))
+    return inputs
+
+def measure_stages(kiosk_main, inputs:list) -> dict:
+    manifest_df, manifest_index = kiosk_main.load_manifest_and_index()
+    samples = {stage: {'latency': [], 'cpu': [], 'peak_kib': []} for stage in STAGES}
+
+    def measure(stage:str, func, *args):
+        tracemalloc.reset_peak()
+        cpu_start, start = time.process_time(), time.perf_counter()
+        result = func(*args)
+        samples[stage]['latency'].append(time.perf_counter() - start)
+        samples[stage]['cpu'].append(time.process_time() - cpu_start)
+        samples[stage]['peak_kib'].append(tracemalloc.get_traced_memory()[1] / 1024)
+        return result
+
+    tracemalloc.start()
+    try:
+        for id_path, bp_path, video_path in inputs:
+            id_data = measure('get_id', kiosk_main.get_id, id_path)
+            bp_data = measure('get_boarding_pass', kiosk_main.get_boarding_pass, bp_path)
+            face_results = measure('identify_faces_from_video', kiosk_main.identify_faces_from_video, video_path, id_path)
+            measure('validate_all', kiosk_main.validate_all, id_data, bp_data, face_results, manifest_df, manifest_index)
+    finally:
+        tracemalloc.stop()
+
+    report = {}
+    for stage, values in samples.items():
+        report[stage] = {**latency_summary(values['latency']),
+                         'cpu_ms_mean': float(np.mean(values['cpu'])) * 1000,
+                         'peak_python_kib_max': float(max(values['peak_kib']))}
+    return report
+
+def measure_end_to_end(kiosk_main, inputs:list, concurrency:int) -> dict:
+    latencies, validated = [], []
+
+    def check_in(paths):
+        start = time.perf_counter()
+        message = kiosk_main.main(*paths)
+        latencies.append(time.perf_counter() - start)
+        validated.append(VALIDATED_MESSAGE in message)
+
+    cpu_start, start = time.process_time(), time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(check_in, inputs))
+    elapsed = time.perf_counter() - start
+    return {'concurrency': concurrency, **latency_summary(latencies), 'elapsed': elapsed,
+            'throughput': len(inputs) / elapsed, 'validated': sum(validated),
+            'cpu_ms_per_checkin': (time.process_time() - cpu_start) / len(inputs) * 1000,
+            'max_rss_mib': max_rss_mib()}
+
+def compare(report:dict, baseline:dict, tolerance:float) -> list:
+    '''
+    p95 latency and throughput regressions of report against baseline, beyond tolerance
+    '''
+    regressions = []
+    for stage, values in report['stages'].items():
+        old = baseline.get('stages', {}).get(stage)
+        if old and values['p95'] > old['p95'] * (1 + tolerance):
+            regressions.append(f"{stage} p95 {old['p95'] * 1000:.0f} -> {values['p95'] * 1000:.0f} ms")
+    old_runs = {run['concurrency']: run for run in baseline.get('end_to_end', [])}
+    for run in report['end_to_end']:
+        old = old_runs.get(run['concurrency'])
+        if not old:
+            continue
+        if run['p95'] > old['p95'] * (1 + tolerance):
+            regressions.append(f"end-to-end x{run['concurrency']} p95 {old['p95']:.2f} -> {run['p95']:.2f} s")
+        if run['throughput'] < old['throughput'] * (1 - tolerance):
+            regressions.append(f"end-to-end x{run['concurrency']} throughput {old['throughput']:.2f} -> {run['throughput']:.2f}/s")
+    return regressions
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--passengers', type=int, default=20, help='Synthetic passengers per run')
+    arg_parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8], help='Concurrent check-ins of the end-to-end runs')
+    arg_parser.add_argument('--latency', type=float, default=0.05, help='Emulator latency per request, in seconds')
+    for service in SERVICES:
+        arg_parser.add_argument(f"--{service.replace('_', '-')}-latency", type=float, help=f'Emulator latency per {service} request')
+    arg_parser.add_argument('--jitter', type=float, default=0.01, help='Emulator jitter per request, in seconds')
+    arg_parser.add_argument('--thumbnails', type=int, default=10, help='Face thumbnails per video')
+    arg_parser.add_argument('--json', help='Write the report to this JSON file')
+    arg_parser.add_argument('--baseline', help='Earlier JSON report to compare with')
+    arg_parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed relative regression against the baseline')
+    args = arg_parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        args.manifest_path = os.path.join(tmp_dir, 'flight-manifest.csv')
+        generate_manifest(max(args.passengers, 100), 100).to_csv(args.manifest_path, index=False)
+        inputs = write_passenger_inputs(tmp_dir, args.passengers)
+
+        with emulator_process(args) as emulator_url:
+            os.environ['CONFIG_PATH'] = write_config(tmp_dir, emulator_url, args.manifest_path)
+            import kiosk_main
+            logging.getLogger().setLevel(logging.WARNING)
+
+            with contextlib.redirect_stdout(StringIO()):
+                kiosk_main.main(*inputs[0])  # warm up connections and caches
+                stages = measure_stages(kiosk_main, inputs)
+                end_to_end = [measure_end_to_end(kiosk_main, inputs, concurrency) for concurrency in args.concurrency]
+
+    report = {'config': {key: value for key, value in vars(args).items() if key not in ('json', 'baseline', 'manifest_path')},
+              'stages': stages, 'end_to_end': end_to_end}
+
+    print(f"passengers={args.passengers}  latency={args.latency * 1000:.0f} ms  jitter={args.jitter * 1000:.0f} ms  thumbnails={args.thumbnails}")
+    print(f"\n{'stage':<26}{'p50 (ms)':>9}{'p95 (ms)':>9}{'p99 (ms)':>9}{'CPU (ms)':>9}{'peak (KiB)':>11}")
+    for stage, values in stages.items():
+        print(f"{stage:<26}{values['p50'] * 1000:>9.0f}{values['p95'] * 1000:>9.0f}{values['p99'] * 1000:>9.0f}"
+              f"{values['cpu_ms_mean']:>9.1f}{values['peak_python_kib_max']:>11.0f}")
+    print(f"\n{'concurrency':>11}{'p50 (s)':>9}{'p95 (s)':>9}{'p99 (s)':>9}{'check-ins/s':>12}{'CPU/check-in (ms)':>18}{'RSS (MiB)':>10}")
+    for run in end_to_end:
+        print(f"{run['concurrency']:>11}{run['p50']:>9.2f}{run['p95']:>9.2f}{run['p99']:>9.2f}{run['throughput']:>12.2f}"
+              f"{run['cpu_ms_per_checkin']:>18.1f}{run['max_rss_mib']:>10.0f}")
+        if run['validated'] != args.passengers:
+            failures.append(f"{run['validated']} of {args.passengers} passengers validated at concurrency {run['concurrency']}")
+
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump(report, json_file, indent=2)
+        print(f"\nReport written to {args.json}")
+    if args.baseline:
+        with open(args.baseline) as json_file:
+            regressions = compare(report, json.load(json_file), args.tolerance)
+        for regression in regressions:
+            print(f"regression: {regression}")
+        if regressions:
+            failures.append(f"{len(regressions)} regressions against {args.baseline}")
+
+    if failures:
+        sys.exit("FAIL: " + "; ".join(failures))
+    print("PASS")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+'''
+Check the early exit of the check-in pipeline when the documents already fail.
+
+Runs kiosk_main.run_pipeline with its stages replaced by sleeps of the given latencies, for a passenger
+whose documents match the manifest and one whose documents do not, with the video started alongside
+the documents (validation_plan.start_video: overlap) and after them (after_documents). The simulated
+video stage goes through the Video Indexer operations of get_video_insights and stops at the next one
+once cancelled. Prints the stage timelines and the remote calls avoided, and checks that a failing
+passenger never reaches the Face API, skips Video Indexer work and is decided sooner.
+
+Usage:
+    python benchmarks/bench_early_exit.py --documents 0.9 --video 2.0 --faces 0.5
+'''
+import os
+import sys
+import time
+import logging
+import argparse
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(ROOT_DIR, 'src'))
+sys.path.append(ROOT_DIR)
+
+import kiosk_main
+from utility.pipeline import StageCancelled
+from benchmarks.stubs.stages import sleeper
+
+def video_stage(seconds:float, thumbnails:int):
+    # One sleep per Video Indexer operation, checking for cancellation before each like get_video_insights
+    steps = kiosk_main.VIDEO_INDEXER_STEPS
+    def stage(video_file_path, cancel_event=None):
+        for step in range(len(steps)):
+            if cancel_event is not None and cancel_event.is_set():
+                raise StageCancelled(steps[step:])
+            time.sleep(seconds / len(steps))
+        return [b''] * thumbnails
+    return stage
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--documents', type=float, default=0.9, help='ID and boarding pass analysis latency, in seconds')
+    arg_parser.add_argument('--video', type=float, default=2.0, help='Video upload, indexing and thumbnail latency, in seconds')
+    arg_parser.add_argument('--faces', type=float, default=0.5, help='Face identification latency, in seconds')
+    arg_parser.add_argument('--thumbnails', type=int, default=20, help='Face thumbnails extracted from the video')
+    args = arg_parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    kiosk_main.load_manifest_and_index = sleeper(0.05, (None, None))
+    kiosk_main.get_id = sleeper(args.documents, {})
+    kiosk_main.get_boarding_pass = sleeper(args.documents, {})
+    kiosk_main.get_video_thumbnails = video_stage(args.video, args.thumbnails)
+    kiosk_main.identify_faces_in_thumbnails = sleeper(args.faces, [])
+    kiosk_main.validate_passenger = sleeper(0.01, None)
+
+    failures = []
+    for start_video in ('overlap', 'after_documents'):
+        kiosk_main.validation_plan_config = lambda: {'early_exit': True, 'start_video': start_video}
+        elapsed = {}
+        for documents_ok in (True, False):
+            kiosk_main.check_documents = sleeper(0.0, documents_ok)
+            before = kiosk_main.get_avoided_call_metrics()
+            result = kiosk_main.run_pipeline('id.jpg', 'boarding_pass.pdf', 'video.mp4')
+            after = kiosk_main.get_avoided_call_metrics()
+            avoided = {name: count - before.get(name, 0) for name, count in after.items() if count != before.get(name, 0)}
+            label = f"start_video={start_video}, documents {'pass' if documents_ok else 'fail'}"
+            elapsed[documents_ok] = result.elapsed
+            print(f"{label}:\n{result.report()}\navoided calls: {avoided or 'none'}\n")
+
+            statuses = {name: timing.status for name, timing in result.timings.items()}
+            if documents_ok and (avoided or statuses['faces'] != 'done'):
+                failures.append(f"{label}: face stages did not run")
+            if not documents_ok:
+                if statuses['faces'] != 'skipped' or not any(name.startswith('face_api.') for name in avoided):
+                    failures.append(f"{label}: face identification was not skipped")
+                if not any(name.startswith('video_indexer.') for name in avoided):
+                    failures.append(f"{label}: no Video Indexer operation was skipped")
+        if elapsed[False] >= elapsed[True]:
+            failures.append(f"start_video={start_video}: failing passenger was not decided sooner")
+        print(f"start_video={start_video}: documents pass {elapsed[True]:.2f} s, documents fail {elapsed[False]:.2f} s\n")
+
+    print(f"avoided calls in total: {kiosk_main.get_avoided_call_metrics()}")
+    if failures:
+        sys.exit("FAIL: " + "; ".join(failures))
+    print("PASS: failing documents skip the video and face work")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+'''
+Run the whole kiosk check-in (kiosk_main.main) offline against the local Azure emulator.
+
+Starts benchmarks/stubs/emulator.py with the given latencies and writes a temporary config.yaml with
+emulator.enabled set, a synthetic flight manifest and an in-memory person group store, so the ID and
+boarding pass analysis, video indexing, face checks and validation all run against the emulator.
+Reports the per-check-in latency and the requests served per service, then repeats the check-ins with
+throttling and server errors injected and reports how many still complete. Checks that the passenger
+is validated in the clean run.
+
+Usage:
+    python benchmarks/bench_emulated_checkin.py --checkins 5 --latency 0.02 --throttle-rate 0.05 --error-rate 0.02
+'''
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+import contextlib
+import statistics
+from io import StringIO
+import yaml
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(ROOT_DIR, 'src'))
+sys.path.append(ROOT_DIR)
+
+from benchmarks.stubs.emulator import AzureEmulator, SERVICES
+from benchmarks.stubs.video_indexer import make_jpeg
+from benchmarks.bench_manifest_index import generate_manifest
+
+# Part of the validation message of a validated passenger
+VALIDATED_MESSAGE = "Your identity is verified"
+
+def write_inputs(tmp_dir:str) -> tuple:
+    paths = []
+    for name, data in (('id.jpg', make_jpeg(256)), ('boarding_pass.pdf', b'%PDF-1.4 stub'), ('video.mp4', b'\x00' * 1024)):
+        paths.append(os.path.join(tmp_dir, name))
+        with open(paths[-1], 'wb') as input_file:
+            input_file.write(data)
+    return tuple(paths)
+
+def write_config(tmp_dir:str, emulator_url:str, manifest_path:str) -> str:
+    with open(os.path.join(ROOT_DIR, 'config.yaml')) as yaml_file:
+        config = yaml.safe_load(yaml_file)
+    config['emulator'] = {'enabled': True, 'url': emulator_url}
+    config['manifest_file']['file_path'] = manifest_path
+    config['person_groups']['store_path'] = ':memory:'
+    config_path = os.path.join(tmp_dir, 'config.yaml')
+    with open(config_path, 'w') as yaml_file:
+        yaml.safe_dump(config, yaml_file)
+    return config_path
+
+def run_checkins(kiosk_main, inputs:tuple, checkins:int) -> tuple:
+    latencies, messages, errors = [], [], []
+    for _ in range(checkins):
+        start = time.perf_counter()
+        try:
+            with contextlib.redirect_stdout(StringIO()):
+                messages.append(kiosk_main.main(*inputs))
+            latencies.append(time.perf_counter() - start)
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+    return latencies, messages, errors
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--checkins', type=int, default=5, help='Check-ins per run')
+    arg_parser.add_argument('--latency', type=float, default=0.02, help='Emulator latency per request, in seconds')
+    arg_parser.add_argument('--jitter', type=float, default=0.01, help='Emulator jitter per request, in seconds')
+    arg_parser.add_argument('--throttle-rate', type=float, default=0.05, help='Share of requests throttled in the fault run')
+    arg_parser.add_argument('--error-rate', type=float, default=0.02, help='Share of requests failed in the fault run')
+    arg_parser.add_argument('--thumbnails', type=int, default=10, help='Face thumbnails per video')
+    args = arg_parser.parse_args()
+
+    manifest = generate_manifest(200, 100)
+    passenger = manifest.iloc[0].to_dict()
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp_dir, \
+            AzureEmulator(passenger=passenger, thumbnails=args.thumbnails, latency=args.latency, jitter=args.jitter,
+                          retry_after=0.1, seed=7) as emulator:
+        manifest_path = os.path.join(tmp_dir, 'flight-manifest.csv')
+        manifest.to_csv(manifest_path, index=False)
+        os.environ['CONFIG_PATH'] = write_config(tmp_dir, emulator.url, manifest_path)
+        import kiosk_main
+        logging.getLogger().setLevel(logging.WARNING)
+        inputs = write_inputs(tmp_dir)
+
+        print(f"emulator {emulator.url}  latency={args.latency * 1000:.0f} ms  jitter={args.jitter * 1000:.0f} ms  thumbnails={args.thumbnails}")
+        for label, throttle_rate, error_rate in (('clean', 0.0, 0.0), ('faults', args.throttle_rate, args.error_rate)):
+            emulator.throttle_rate, emulator.error_rate = throttle_rate, error_rate
+            emulator.reset_counters()
+            latencies, messages, errors = run_checkins(kiosk_main, inputs, args.checkins)
+            validated = sum(VALIDATED_MESSAGE in message for message in messages)
+            per_service = ', '.join(f"{service} {emulator.counters[service] / args.checkins:.1f}" for service in SERVICES)
+            mean = statistics.mean(latencies) if latencies else 0.0
+            print(f"\n{label}: throttle_rate={throttle_rate:g} error_rate={error_rate:g}")
+            print(f"  completed {len(latencies)}/{args.checkins}, validated {validated}, mean latency {mean:.2f} s")
+            print(f"  requests per check-in: {per_service}")
+            print(f"  injected: {emulator.counters['throttled']} throttled, {emulator.counters['errors']} errors")
+            for error in sorted(set(errors)):
+                print(f"  error: {error[:160]}")
+            if label == 'clean' and validated != args.checkins:
+                failures.append(f"{validated} of {args.checkins} clean check-ins validated the passenger ({errors[:1] or messages[:1]})")
+
+    if failures:
+        sys.exit("FAIL: " + "; ".join(failures))
+    print("\nPASS: the check-in runs end to end against the emulator")
+
+if __name__ == "__main__":
+    main()
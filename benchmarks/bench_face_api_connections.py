@@ -0,0 +1,94 @@
+'''
+Count the TCP connections the Face API client opens per passenger.
+
+Runs the per-passenger Face API flow (create person group, add person, add the face thumbnails, train,
+check training, detect + identify the ID face, verify, delete the group) against a local Face API
+stub, once with the pooled FaceApiClient and once with one connection per request (the behaviour of
+the module-level requests.post/get calls the client replaced). Exits non-zero if the pooled client
+opens more connections than its pool size.
+
+Usage:
+    python benchmarks/bench_face_api_connections.py --passengers 5 --thumbnails 10
+'''
+import os
+import sys
+import time
+import uuid
+import logging
+import argparse
+import tempfile
+import contextlib
+from io import StringIO
+import requests
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(ROOT_DIR, 'src'))
+sys.path.append(ROOT_DIR)
+
+from get_faces.face_api_client import FaceApiClient
+from benchmarks.stubs.face_api import FaceApiStub
+
+class UnpooledSession:
+    '''
+    Session stand-in that opens a new connection for every request, like module-level requests calls
+    '''
+    def request(self, method, url, **kwargs):
+        return requests.request(method, url, **kwargs)
+
+    def close(self):
+        pass
+
+def passenger_flow(client:FaceApiClient, image_paths:list) -> None:
+    person_group_id = str(uuid.uuid4())
+    client.create_person_group(person_group_id, person_group_id)
+    person_id = client.add_person_to_group(person_group_id, person_group_id)
+    for image_path in image_paths:
+        client.add_face_to_person(person_group_id, person_id, image_path)
+    client.train_person_group(person_group_id)
+    client.get_training_status(person_group_id)
+    results = client.identify_faces_in_person_group(image_paths[0], person_group_id)
+    detected = client.detect_faces(image_paths[0])
+    client.verify_faces(results[0]['faceId'], detected[0]['faceId'])
+    client.delete_person_group(person_group_id)
+
+def run(label:str, stub:FaceApiStub, client:FaceApiClient, passengers:int, image_paths:list) -> dict:
+    stub.reset_counters()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(StringIO()):
+        for _ in range(passengers):
+            passenger_flow(client, image_paths)
+    elapsed = time.perf_counter() - start
+    client.close()
+    connections, requests_served = stub.counters['connections'], stub.counters['requests']
+    print(f"{label:<10} connections/passenger={connections / passengers:6.1f}  requests/passenger={requests_served / passengers:6.1f}  "
+          f"time/passenger={elapsed * 1000 / passengers:8.1f} ms")
+    return {'connections': connections, 'requests': requests_served, 'seconds': elapsed}
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--passengers', type=int, default=5, help='Passengers to run through the Face API flow')
+    arg_parser.add_argument('--thumbnails', type=int, default=10, help='Face thumbnails added per passenger')
+    arg_parser.add_argument('--pool-size', type=int, default=10, help='Connection pool size of the pooled client')
+    arg_parser.add_argument('--latency', type=float, default=0.0, help='Injected stub latency per request, in seconds')
+    args = arg_parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp_dir, FaceApiStub(latency=args.latency) as stub:
+        image_paths = []
+        for idx in range(args.thumbnails):
+            image_path = os.path.join(tmp_dir, f'thumbnail_{idx}.jpg')
+            with open(image_path, 'wb') as image_file:
+                image_file.write(os.urandom(4096))
+            image_paths.append(image_path)
+
+        client_args = {'endpoint': stub.url, 'subscription_key': 'stub-key', 'api_version': 'v1.0'}
+        pooled = run('pooled', stub, FaceApiClient(pool_size=args.pool_size, **client_args), args.passengers, image_paths)
+        unpooled = run('unpooled', stub, FaceApiClient(session=UnpooledSession(), **client_args), args.passengers, image_paths)
+
+    print(f"Connections saved per passenger: {(unpooled['connections'] - pooled['connections']) / args.passengers:.1f}")
+    if pooled['connections'] > args.pool_size:
+        sys.exit(f"FAIL: pooled client opened {pooled['connections']} connections (pool size {args.pool_size})")
+    print("PASS: pooled client reused its keep-alive connections")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+'''
+Time person-model enrollment against thumbnail count, sequential vs concurrent.
+
+Builds a person model (create group, add person, add N face thumbnails, train, check training) against a
+local Face API stub with injected per-request latency, once with the sequential FaceApiClient and once
+with the AsyncFaceApiClient adding the faces concurrently under its concurrency and TPS limits. Like
+face_api_async.build_person_model_concurrent, the async client is created once and runs on the
+process-wide event loop, so its connections and TPS budget carry over between enrollments.
+
+Usage:
+    python benchmarks/bench_face_enrollment.py --latency 0.1 --thumbnails 1 5 10 20 40 --tps 10
+'''
+import os
+import sys
+import time
+import uuid
+import logging
+import argparse
+import tempfile
+import contextlib
+from io import StringIO
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(ROOT_DIR, 'src'))
+sys.path.append(ROOT_DIR)
+
+from get_faces.face_api_client import FaceApiClient
+from get_faces.face_api_async import AsyncFaceApiClient, run_coroutine
+from benchmarks.stubs.face_api import FaceApiStub
+
+def enroll_sequential(client:FaceApiClient, thumbnails:list) -> None:
+    person_group_id = str(uuid.uuid4())
+    client.create_person_group(person_group_id, person_group_id)
+    person_id = client.add_person_to_group(person_group_id, person_group_id)
+    for thumbnail in thumbnails:
+        client.add_face_to_person(person_group_id, person_id, thumbnail)
+    client.train_person_group(person_group_id)
+    client.get_training_status(person_group_id)
+    client.delete_person_group(person_group_id)
+
+async def enroll_concurrent(client:AsyncFaceApiClient, thumbnails:list) -> None:
+    person_group_id = str(uuid.uuid4())
+    await client.create_person_group(person_group_id, person_group_id)
+    person_id = await client.add_person_to_group(person_group_id, person_group_id)
+    await client.add_faces_to_person(person_group_id, person_id, thumbnails)
+    await client.train_person_group(person_group_id)
+    await client.get_training_status(person_group_id)
+    await client.delete_person_group(person_group_id)
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--thumbnails', type=int, nargs='+', default=[1, 5, 10, 20, 40], help='Thumbnail counts to enroll')
+    arg_parser.add_argument('--latency', type=float, default=0.1, help='Injected stub latency per request, in seconds')
+    arg_parser.add_argument('--concurrency', type=int, default=8, help='Maximum requests in flight for the async client')
+    arg_parser.add_argument('--tps', type=float, default=10.0, help='Request rate limit of the async client')
+    args = arg_parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp_dir, FaceApiStub(latency=args.latency) as stub:
+        client_args = {'endpoint': stub.url, 'subscription_key': 'stub-key', 'api_version': 'v1.0'}
+        sequential_client = FaceApiClient(**client_args)
+        concurrent_client = AsyncFaceApiClient(**client_args, max_concurrency=args.concurrency, tps=args.tps)
+
+        print(f"latency={args.latency * 1000:.0f} ms/request  concurrency={args.concurrency}  tps={args.tps:g}")
+        print(f"{'thumbnails':>10}  {'sequential (s)':>14}  {'concurrent (s)':>14}  {'speedup':>7}")
+        for count in args.thumbnails:
+            thumbnails = []
+            for idx in range(count):
+                thumbnail = os.path.join(tmp_dir, f'thumbnail_{count}_{idx}.jpg')
+                with open(thumbnail, 'wb') as image_file:
+                    image_file.write(os.urandom(4096))
+                thumbnails.append(thumbnail)
+
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(StringIO()):
+                enroll_sequential(sequential_client, thumbnails)
+            sequential = time.perf_counter() - start
+
+            start = time.perf_counter()
+            run_coroutine(enroll_concurrent(concurrent_client, thumbnails))
+            concurrent = time.perf_counter() - start
+
+            print(f"{count:>10}  {sequential:>14.2f}  {concurrent:>14.2f}  {sequential / concurrent:>6.1f}x")
+        sequential_client.close()
+        run_coroutine(concurrent_client.aclose())
+
+if __name__ == "__main__":
+    main()
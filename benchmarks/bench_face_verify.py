@@ -0,0 +1,88 @@
+'''
+Compare per-passenger face check latency: person group identify vs direct 1:1 verify.
+
+Runs both face identification modes of get_faces/face_identification_main.py against a local Face API
+stub with injected per-request latency and a simulated training time:
+- identify: build a person model from every thumbnail in a pooled person group (add person, add faces,
+  train, wait for training), identify the ID face in the group, release the group to the pool
+- verify: detect the ID face and the best-ranked thumbnails in parallel, then verify the ID face
+  against each thumbnail face in parallel
+and reports the latency and the number of Face API requests per passenger.
+
+Usage:
+    python benchmarks/bench_face_verify.py --passengers 3 --thumbnails 20 --latency 0.1 --training 1.0
+'''
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+import tempfile
+import contextlib
+import yaml
+from io import StringIO
+from PIL import Image
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(ROOT_DIR, 'src'))
+sys.path.append(ROOT_DIR)
+
+from benchmarks.stubs.face_api import FaceApiStub
+
+def write_thumbnails(tmp_dir:str, count:int) -> list:
+    # Random-noise thumbnails of varied size, so the quality ranking has something to rank
+    paths = []
+    for idx in range(count):
+        side = random.choice([32, 64, 96, 128])
+        path = os.path.join(tmp_dir, f'thumbnail_{idx}.png')
+        Image.frombytes('L', (side, side), os.urandom(side * side)).save(path)
+        paths.append(path)
+    return paths
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--passengers', type=int, default=3, help='Passengers to check per mode')
+    arg_parser.add_argument('--thumbnails', type=int, default=20, help='Face thumbnails extracted from the video')
+    arg_parser.add_argument('--latency', type=float, default=0.1, help='Injected stub latency per request, in seconds')
+    arg_parser.add_argument('--training', type=float, default=1.0, help='Simulated person group training time, in seconds')
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir, FaceApiStub(latency=args.latency, training_seconds=args.training) as stub:
+        # Point the Face API clients at the stub before they are created, with an in-memory person group store
+        with open(os.path.join(ROOT_DIR, 'config.yaml')) as yaml_file:
+            config = yaml.safe_load(yaml_file)
+        config['person_groups']['store_path'] = ':memory:'
+        config_path = os.path.join(tmp_dir, 'config.yaml')
+        with open(config_path, 'w') as yaml_file:
+            yaml.safe_dump(config, yaml_file)
+        os.environ.update({'FACE_ENDPOINT_URL': stub.url, 'FACE_API_KEY': 'stub-key', 'face_api_version': 'v1.0', 'CONFIG_PATH': config_path})
+        import get_faces.face_identification_main as face_identification
+        logging.getLogger().setLevel(logging.WARNING)
+
+        id_image = write_thumbnails(tmp_dir, 1)[0]
+        thumbnails = write_thumbnails(tmp_dir, args.thumbnails)
+
+        def identify():
+            person_group_id = face_identification.build_person_model(thumbnails, 'bench-passenger')
+            results = face_identification.indentify_faces(id_image, person_group_id)
+            face_identification.release_person_model(person_group_id, 'bench-passenger')
+            return results
+
+        def verify():
+            return face_identification.verify_identity(id_image, thumbnails)
+
+        print(f"thumbnails={args.thumbnails}  latency={args.latency * 1000:.0f} ms/request  training={args.training:g} s")
+        print(f"{'mode':>8}  {'latency (s)':>11}  {'requests':>8}  {'person validated':>16}")
+        for mode, check in (('identify', identify), ('verify', verify)):
+            stub.reset_counters()
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(StringIO()):
+                for _ in range(args.passengers):
+                    results = check()
+            elapsed = (time.perf_counter() - start) / args.passengers
+            validated = any(candidate['confidence'] >= 0.65 for face in results or [] for candidate in face['candidates'])
+            print(f"{mode:>8}  {elapsed:>11.2f}  {stub.counters['requests'] / args.passengers:>8.1f}  {str(validated):>16}")
+
+if __name__ == "__main__":
+    main()
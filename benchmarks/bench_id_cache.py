@@ -0,0 +1,112 @@
+'''
+Benchmark of the ID analysis cache (doc_intelligence.id_cache, src/utility/result_cache.py).
+
+Passengers check in against the local Azure emulator and each retries --retries times with the same ID
+image. Reports the Document Intelligence requests and mean ID analysis latency per attempt for:
+- uncached: every attempt analyzed (analyze_id_document_bytes)
+- cached: analyze_identity_documents with the memory cache and a SQLite store
+- restart: a new process-wide cache on the same SQLite store, as after a kiosk restart
+and checks that retries and restarts send no analysis requests and return the uncached results.
+
+Usage:
+    python benchmarks/bench_id_cache.py --passengers 10 --retries 2 --analyze-seconds 0.3
+'''
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+import yaml
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(ROOT_DIR, 'src'))
+sys.path.append(ROOT_DIR)
+
+from benchmarks.stubs.emulator import AzureEmulator
+from benchmarks.stubs.video_indexer import make_jpeg
+from benchmarks.stubs.document_intelligence import passenger_tag
+from benchmarks.bench_manifest_index import generate_manifest
+from benchmarks.bench_emulated_checkin import write_config
+
+def write_id_images(tmp_dir:str, passengers:int) -> list:
+    paths = []
+    for index in range(passengers):
+        paths.append(os.path.join(tmp_dir, f'id_{index}.jpg'))
+        with open(paths[-1], 'wb') as id_file:
+            id_file.write(passenger_tag(index) + make_jpeg(128))
+    return paths
+
+def run_attempts(analyze, paths:list, attempts:int, emulator) -> tuple:
+    emulator.reset_counters()
+    latencies, results = [], {}
+    for path in paths:
+        for _ in range(attempts):
+            start = time.perf_counter()
+            results[path] = analyze(path)
+            latencies.append(time.perf_counter() - start)
+    return emulator.counters['document_intelligence'], sum(latencies) / len(latencies), results
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--passengers', type=int, default=10, help='Passengers, each with their own ID image')
+    arg_parser.add_argument('--retries', type=int, default=2, help='Retries per passenger with the same ID image')
+    arg_parser.add_argument('--latency', type=float, default=0.02, help='Emulator latency per request, in seconds')
+    arg_parser.add_argument('--analyze-seconds', type=float, default=0.3, help='Document analysis time of the emulator')
+    args = arg_parser.parse_args()
+
+    manifest = generate_manifest(max(args.passengers, 100), 100)
+    passengers = [row.to_dict() for _, row in manifest.head(args.passengers).iterrows()]
+    attempts = 1 + args.retries
+    with tempfile.TemporaryDirectory() as tmp_dir, \
+            AzureEmulator(passengers=passengers, latency=args.latency, analyze_seconds=args.analyze_seconds) as emulator:
+        manifest_path = os.path.join(tmp_dir, 'flight-manifest.csv')
+        manifest.to_csv(manifest_path, index=False)
+        config_path = write_config(tmp_dir, emulator.url, manifest_path)
+        with open(config_path) as yaml_file:
+            config = yaml.safe_load(yaml_file)
+        config['doc_intelligence']['id_cache'] = {'enabled': True, 'max_entries': 256, 'ttl': 900,
+                                                  'store_path': os.path.join(tmp_dir, 'id_cache.sqlite')}
+        with open(config_path, 'w') as yaml_file:
+            yaml.safe_dump(config, yaml_file)
+        os.environ['CONFIG_PATH'] = config_path
+        from get_ID import analyzeID_prebuilt
+        logging.getLogger().setLevel(logging.WARNING)
+        paths = write_id_images(tmp_dir, args.passengers)
+
+        def analyze_uncached(path):
+            with open(path, 'rb') as id_file:
+                return analyzeID_prebuilt.analyze_id_document_bytes(id_file.read())
+
+        runs = {'uncached': run_attempts(analyze_uncached, paths, attempts, emulator),
+                'cached': run_attempts(analyzeID_prebuilt.analyze_identity_documents, paths, attempts, emulator)}
+        cached_stats = analyzeID_prebuilt.get_id_analysis_cache().stats()
+        analyzeID_prebuilt.get_id_analysis_cache.cache_clear()  # a new process-wide cache on the same store
+        runs['restart'] = run_attempts(analyzeID_prebuilt.analyze_identity_documents, paths, attempts, emulator)
+        restart_stats = analyzeID_prebuilt.get_id_analysis_cache().stats()
+
+    print(f"{args.passengers} passengers x {attempts} attempts, analysis {args.analyze_seconds * 1000:.0f} ms, latency {args.latency * 1000:.0f} ms")
+    print(f"\n{'run':<10}{'DI requests':>12}{'mean per attempt (ms)':>23}")
+    for label, (requests, latency, _) in runs.items():
+        print(f"{label:<10}{requests:>12}{latency * 1000:>23.1f}")
+    print(f"\ncached:  {cached_stats}")
+    print(f"restart: {restart_stats}")
+
+    failures = []
+    uncached_requests, _, uncached_results = runs['uncached']
+    per_analysis = uncached_requests / (args.passengers * attempts)
+    if runs['cached'][0] > per_analysis * args.passengers:
+        failures.append(f"the cached run sent {runs['cached'][0]} requests, more than one analysis per passenger")
+    if runs['restart'][0] != 0:
+        failures.append(f"the restarted cache sent {runs['restart'][0]} requests")
+    if cached_stats['misses'] != args.passengers or cached_stats['hits'] != args.passengers * args.retries:
+        failures.append(f"expected {args.passengers} misses and {args.passengers * args.retries} hits, got {cached_stats}")
+    for label in ('cached', 'restart'):
+        if runs[label][2] != uncached_results:
+            failures.append(f"the {label} results differ from the uncached results")
+    if failures:
+        sys.exit("FAIL: " + "; ".join(failures))
+    print("\nPASS: retries and restarts reuse the cached ID analysis")
+
+if __name__ == "__main__":
+    main()
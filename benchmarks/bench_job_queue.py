@@ -0,0 +1,100 @@
+'''
+Check the kiosk check-in queue under concurrent sessions.
+
+Starts the given number of kiosk sessions at once, each submitting a check-in (kiosk_main.main with its
+stages replaced by sleeps of the given latencies) to a utility/job_queue.py JobQueue and following its
+stage progress the way the Gradio webapp streams it. Reports the admitted and rejected check-ins, the
+progress updates seen per session and the time to serve everyone, with one worker and with --workers
+workers, and checks that the queue admits exactly workers + max_queued check-ins and that every
+admitted session saw each pipeline stage finish.
+
+Usage:
+    python benchmarks/bench_job_queue.py --sessions 12 --workers 4 --max-queued 6 --stage 0.2
+'''
+import os
+import sys
+import time
+import logging
+import argparse
+import threading
+import contextlib
+from io import StringIO
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(ROOT_DIR, 'src'))
+sys.path.append(ROOT_DIR)
+
+import kiosk_main
+from utility.job_queue import JobQueue, QueueFullError
+from benchmarks.stubs.stages import sleeper
+
+def run_sessions(job_queue:JobQueue, sessions:int) -> tuple:
+    # Start every session at once; each follows its check-in until it finishes
+    barrier = threading.Barrier(sessions)
+    outcomes = [None] * sessions
+
+    def session(idx:int):
+        barrier.wait()
+        try:
+            job = job_queue.submit(lambda job: kiosk_main.main('id.jpg', 'boarding_pass.pdf', 'video.mp4', on_stage=job.update_stage))
+        except QueueFullError:
+            outcomes[idx] = ('rejected', 0, {})
+            return
+        updates, version = 0, -1
+        while not job.done:
+            version = job.wait_for_update(version, timeout=1.0)
+            updates += 1
+        outcomes[idx] = (job.status, updates, job.as_dict()['stages'])
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=session, args=(idx,)) for idx in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outcomes, time.perf_counter() - start
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--sessions', type=int, default=12, help='Kiosk sessions checking in at once')
+    arg_parser.add_argument('--workers', type=int, default=4, help='Check-ins run concurrently')
+    arg_parser.add_argument('--max-queued', type=int, default=6, help='Check-ins waiting for a worker before new ones are rejected')
+    arg_parser.add_argument('--stage', type=float, default=0.2, help='Latency of each remote stage, in seconds')
+    args = arg_parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    kiosk_main.load_manifest_and_index = sleeper(0.01, (None, None))
+    kiosk_main.get_id = sleeper(args.stage, {})
+    kiosk_main.get_boarding_pass = sleeper(args.stage, {})
+    kiosk_main.check_documents = sleeper(0.0, True)
+    kiosk_main.get_video_thumbnails = sleeper(args.stage * 2, [])
+    kiosk_main.identify_faces_in_thumbnails = sleeper(args.stage, [])
+    kiosk_main.validate_passenger = sleeper(0.01, None)
+    stages = {'manifest', 'id', 'boarding_pass', 'documents', 'video', 'faces', 'validation'}
+
+    failures = []
+    print(f"{'workers':>7}  {'admitted':>8}  {'rejected':>8}  {'updates/session':>15}  {'elapsed (s)':>11}")
+    for workers in sorted({1, args.workers}):
+        job_queue = JobQueue(workers=workers, max_queued=args.max_queued)
+        with contextlib.redirect_stdout(StringIO()):
+            outcomes, elapsed = run_sessions(job_queue, args.sessions)
+        job_queue.shutdown()
+        admitted = [outcome for outcome in outcomes if outcome[0] != 'rejected']
+        rejected = len(outcomes) - len(admitted)
+        updates = sum(outcome[1] for outcome in admitted) / max(1, len(admitted))
+        print(f"{workers:>7}  {len(admitted):>8}  {rejected:>8}  {updates:>15.1f}  {elapsed:>11.2f}")
+
+        expected = min(args.sessions, workers + args.max_queued)
+        if len(admitted) != expected:
+            failures.append(f"{workers} workers admitted {len(admitted)} check-ins, expected {expected}")
+        for status, _, stage_statuses in admitted:
+            if status != 'done' or set(stage_statuses) != stages or any(value != 'done' for value in stage_statuses.values()):
+                failures.append(f"{workers} workers: a session did not see every stage finish ({status}, {stage_statuses})")
+                break
+
+    if failures:
+        sys.exit("FAIL: " + "; ".join(failures))
+    print("PASS: admission control and per-stage progress")
+
+if __name__ == "__main__":
+    main()
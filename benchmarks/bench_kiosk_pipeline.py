@@ -0,0 +1,61 @@
+'''
+Compare the check-in pipeline of kiosk_main run in sequence and as a dependency graph.
+
+Runs kiosk_main.run_pipeline with its stages replaced by sleeps of the given latencies (the service
+stubs for Document Intelligence and Video Indexer live elsewhere; this measures the orchestration),
+once with one worker (the former sequential main) and once with the stages overlapped. Prints the
+per-stage timeline of both runs and checks that the overlapped run takes about as long as the longest
+branch (video -> faces -> validation) rather than the sum of the stages.
+
+Usage:
+    python benchmarks/bench_kiosk_pipeline.py --id 0.8 --boarding-pass 0.9 --video 2.0 --faces 0.5
+'''
+import os
+import sys
+import logging
+import argparse
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(ROOT_DIR, 'src'))
+sys.path.append(ROOT_DIR)
+
+import kiosk_main
+from benchmarks.stubs.stages import sleeper
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--manifest', type=float, default=0.05, help='Manifest load latency, in seconds')
+    arg_parser.add_argument('--id', type=float, default=0.8, help='ID analysis latency, in seconds')
+    arg_parser.add_argument('--boarding-pass', type=float, default=0.9, help='Boarding pass analysis latency, in seconds')
+    arg_parser.add_argument('--video', type=float, default=2.0, help='Video upload, indexing and thumbnail latency, in seconds')
+    arg_parser.add_argument('--faces', type=float, default=0.5, help='Face identification latency, in seconds')
+    arg_parser.add_argument('--validation', type=float, default=0.01, help='Validation latency, in seconds')
+    args = arg_parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    kiosk_main.load_manifest_and_index = sleeper(args.manifest, (None, None))
+    kiosk_main.get_id = sleeper(args.id, {})
+    kiosk_main.get_boarding_pass = sleeper(args.boarding_pass, {})
+    kiosk_main.check_documents = sleeper(0.0, True)
+    kiosk_main.get_video_thumbnails = sleeper(args.video, [])
+    kiosk_main.identify_faces_in_thumbnails = sleeper(args.faces, [])
+    kiosk_main.validate_passenger = sleeper(args.validation, {})
+
+    stages_sum = args.manifest + args.id + args.boarding_pass + args.video + args.faces + args.validation
+    longest_branch = max(args.manifest, args.id, args.boarding_pass, args.video + args.faces) + args.validation
+
+    elapsed = {}
+    for label, max_workers in (('sequential', 1), ('overlapped', None)):
+        result = kiosk_main.run_pipeline('id.jpg', 'boarding_pass.pdf', 'video.mp4', max_workers=max_workers)
+        elapsed[label] = result.elapsed
+        print(f"{label}:\n{result.report()}\n")
+
+    print(f"sum of stages {stages_sum:.2f} s, longest branch {longest_branch:.2f} s")
+    print(f"sequential {elapsed['sequential']:.2f} s, overlapped {elapsed['overlapped']:.2f} s "
+          f"({elapsed['sequential'] / elapsed['overlapped']:.1f}x)")
+    if elapsed['overlapped'] > longest_branch * 1.1 + 0.05:
+        sys.exit("FAIL: the overlapped pipeline took longer than its longest branch")
+    print("PASS: end-to-end time is the longest branch")
+
+if __name__ == "__main__":
+    main()
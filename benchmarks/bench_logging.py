@@ -0,0 +1,137 @@
+'''
+Benchmark of the check-in logging (src/utility/logs.py) against a slow log sink.
+
+Each simulated check-in logs what the hot path used to print in full: the video index and the video
+insights (a synthetic Video Indexer payload of --payload-kib KiB), the detected faces and the per-row
+validation lines for --rows candidate manifest rows. The sink sleeps --sink-latency seconds per write.
+Reports the time spent on the check-in thread per check-in for:
+- before: full payloads formatted with f-strings, printed and logged synchronously
+- after (INFO): log_payload and lazy %-formatting, records written by the QueueListener thread
+- after (DEBUG): the same with debug enabled, so payload summaries are sampled in
+and checks that the after runs are at least --min-speedup times faster than before and that every
+payload summary is at most logging.payload_max_chars long.
+
+Usage:
+    python benchmarks/bench_logging.py --checkins 50 --payload-kib 300 --sink-latency 0.002
+'''
+import os
+import sys
+import time
+import logging
+import argparse
+import contextlib
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(ROOT_DIR, 'src'))
+
+from utility.logs import log_payload, configure_logging, logging_config, summarize_payload
+
+class SlowSink:
+    '''
+    Text stream taking latency seconds per write, like a log shipper under back-pressure
+    '''
+    def __init__(self, latency:float) -> None:
+        self.latency = latency
+        self.writes = 0
+        self.chars = 0
+
+    def write(self, text:str) -> int:
+        time.sleep(self.latency)
+        self.writes += 1
+        self.chars += len(text)
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+def video_index_payload(kib:int) -> dict:
+    # Shaped like a Video Indexer index: faces with their thumbnails and appearances
+    faces, size = [], 0
+    while size < kib * 1024:
+        face = {'id': len(faces), 'name': f'Unknown #{len(faces)}', 'confidence': 0.0, 'thumbnailId': os.urandom(16).hex(),
+                'thumbnails': [{'id': os.urandom(16).hex(), 'fileName': f'FaceInstanceThumbnail_{i}.jpg',
+                                'instances': [{'start': f'0:00:{i:02d}', 'end': f'0:00:{i + 1:02d}'}]} for i in range(10)]}
+        faces.append(face)
+        size += len(repr(face))
+    return {'state': 'Processed', 'videos': [{'id': 'video', 'insights': {'faces': faces, 'emotions': [], 'sentiments': []}}],
+            'summarizedInsights': {'faces': [], 'sentiments': []}}
+
+def check_in_before(logger, index:dict, faces:list, rows:int) -> None:
+    print(f'The video index has completed. Here is the full JSON of the index for video ID video: \n{index}')
+    print(f'Here are the search results: \n{index}')
+    logger.info(f'detected_faces: {faces}')
+    for row in range(rows):
+        logger.info(f"Name Matched: ID(JOHN DOE), BP(JOHN DOE), Manifest (JOHN DOE) row {row}")
+        logger.info(f"DoB Matched. id_dob(1990-01-01), manifest_dob(1990-01-01) row {row}")
+
+def check_in_after(logger, index:dict, faces:list, rows:int) -> None:
+    logger.info('The video index has completed for video ID %s', 'video')
+    log_payload(logger, 'Video index of video', index)
+    log_payload(logger, 'Video insights of video', index)
+    log_payload(logger, 'Detected faces', faces)
+    for row in range(rows):
+        logger.debug("Name Matched: ID(%s %s), BP(%s %s), Manifest (%s %s) row %d", 'JOHN', 'DOE', 'JOHN', 'DOE', 'JOHN', 'DOE', row)
+        logger.debug("DoB Matched. id_dob(%s), manifest_dob(%s) row %d", '1990-01-01', '1990-01-01', row)
+
+def time_check_ins(check_in, logger, index:dict, faces:list, args) -> float:
+    start = time.perf_counter()
+    for _ in range(args.checkins):
+        check_in(logger, index, faces, args.rows)
+    return (time.perf_counter() - start) / args.checkins
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--checkins', type=int, default=50, help='Simulated check-ins per run')
+    arg_parser.add_argument('--payload-kib', type=int, default=300, help='Size of the video index payload, in KiB')
+    arg_parser.add_argument('--rows', type=int, default=5, help='Candidate manifest rows validated per check-in')
+    arg_parser.add_argument('--sink-latency', type=float, default=0.002, help='Seconds per write of the log sink')
+    arg_parser.add_argument('--min-speedup', type=float, default=10.0, help='Required speedup of the after runs')
+    args = arg_parser.parse_args()
+
+    index = video_index_payload(args.payload_kib)
+    faces = [{'faceId': os.urandom(16).hex(), 'faceRectangle': {'top': 10, 'left': 10, 'width': 90, 'height': 90}} for _ in range(10)]
+    sink = SlowSink(args.sink_latency)
+    logger = logging.getLogger()
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    handler = logging.StreamHandler(sink)
+    handler.setFormatter(logging.Formatter("%(asctime)-15s %(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+    with contextlib.redirect_stdout(sink):
+        before = time_check_ins(check_in_before, logger, index, faces, args)
+    before_chars = sink.chars / args.checkins
+
+    listener = configure_logging(level='INFO', use_queue=True)
+    runs = {}
+    for level in ('INFO', 'DEBUG'):
+        logger.setLevel(level)
+        sink.chars = 0
+        runs[level] = time_check_ins(check_in_after, logger, index, faces, args)
+        listener.stop()  # write out the queue, so the characters written are complete
+        runs[level + ' chars'] = sink.chars / args.checkins
+        listener.start()
+
+    config = logging_config()
+    max_chars = config.get('payload_max_chars', 1000)
+    print(f"payload {len(repr(index)) / 1024:.0f} KiB, {args.rows} rows, sink {args.sink_latency * 1000:.1f} ms per write, "
+          f"payload_sample_rate {config.get('payload_sample_rate', 1.0)}")
+    print(f"\n{'run':<14}{'check-in thread (ms)':>21}{'logged (KiB)':>14}")
+    print(f"{'before':<14}{before * 1000:>21.2f}{before_chars / 1024:>14.1f}")
+    for level in ('INFO', 'DEBUG'):
+        print(f"{'after ' + level:<14}{runs[level] * 1000:>21.2f}{runs[level + ' chars'] / 1024:>14.1f}")
+
+    failures = []
+    for level in ('INFO', 'DEBUG'):
+        if runs[level] * args.min_speedup > before:
+            failures.append(f"after {level} is only {before / runs[level]:.1f}x faster than before")
+    for payload in (index, faces):
+        if len(summarize_payload(payload, max_chars)) > max_chars:
+            failures.append(f"a payload summary is longer than {max_chars} characters")
+    if failures:
+        sys.exit("FAIL: " + "; ".join(failures))
+    print("\nPASS: payloads are summarized and log writes are off the check-in thread")
+
+if __name__ == "__main__":
+    main()
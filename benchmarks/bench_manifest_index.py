@@ -0,0 +1,177 @@
+'''
+Benchmark manifest validation on a synthetic multi-flight manifest.
+
+Validates every passenger of the manifest with validate_all and reports the per-passenger latency
+of the indexed lookup, next to the vectorized validate_batch reconciliation of the whole manifest and
+the legacy full-manifest iterrows scan on a small sample of passengers.
+
+Usage:
+    python benchmarks/bench_manifest_index.py --rows 10000 --seats 400 --legacy-sample 5
+'''
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+import contextlib
+import statistics
+from io import StringIO
+import pandas as pd
+
+# Make the kiosk modules importable (they are imported relative to src/)
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(SRC_DIR)
+
+import validation.validation as validation
+from validation.manifest_index import ManifestIndex
+
+FIRST_NAMES = ['James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda', 'David', 'Elizabeth',
+               'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah', 'Sameer', 'Radha',
+               'Libby', 'Avkash', 'Priya', 'Wei', 'Yuki', 'Omar', 'Fatima', 'Carlos', 'Lucia', 'Ivan']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez', 'Martinez',
+              'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin',
+              'Kumar', 'Webb', 'Herold', 'Chauhan', 'Chen', 'Tanaka', 'Haddad', 'Ali', 'Silva', 'Petrov']
+CITIES = ['San Francisco', 'Chicago', 'New York', 'Seattle', 'Boston', 'Denver', 'Austin', 'Miami']
+
+def generate_manifest(rows:int, seats_per_flight:int, seed:int=42) -> pd.DataFrame:
+    """
+    Generate a synthetic manifest with the same columns as data/flight_manifest/flight-manifest.csv.
+    """
+    rng = random.Random(seed)
+    records = []
+    for row in range(rows):
+        flight_no = 100 + row // seats_per_flight
+        seat_no = row % seats_per_flight
+        origin, destination = rng.sample(CITIES, 2)
+        records.append({
+            'Carrier': 'UA',
+            'Flight No.': flight_no,
+            'Class': rng.choice(['Economy', 'Business']),
+            'From': origin,
+            'To': destination,
+            'Date': '20-Apr-22',
+            'Baggage': rng.choice(['YES', 'No']),
+            'Seat': f"{seat_no // 6 + 1}{'ABCDEF'[seat_no % 6]}",
+            'Gate': f"G{flight_no % 20}",
+            'Boarding Time': '10:00 AM PST',
+            'Ticket No.': 34000000 + row,
+            'First Name': rng.choice(FIRST_NAMES),
+            'Last Name': rng.choice(LAST_NAMES),
+            'Date of Birth': f"{rng.randint(1, 12)}/{rng.randint(1, 28)}/{rng.randint(1940, 2010)}",
+            'Sex': rng.choice(['M', 'F']),
+            'NameValidation': False,
+            'DoBValidation': False,
+            'PersonValidation': False,
+            'BoardingPassValidation': False,
+            'LuggageValidation': False,
+        })
+    return pd.DataFrame.from_records(records)
+
+def passenger_documents(passenger:pd.Series) -> tuple:
+    """
+    Build the id_data / boarding pass data a passenger would present at the kiosk.
+    """
+    id_data = [{
+        'document_index': 1,
+        'FirstName': {'value': passenger['First Name'], 'confidence': 0.99},
+        'LastName': {'value': passenger['Last Name'], 'confidence': 0.99},
+        'DateOfBirth': {'value': passenger['Date of Birth'], 'confidence': 0.99},
+    }]
+    bp_data = [{
+        'document_index': 1,
+        'fields': {
+            'Flight_No': {'value': str(passenger['Flight No.']), 'confidence': 0.99},
+            'Seat': {'value': passenger['Seat'], 'confidence': 0.99},
+            'Origin': {'value': passenger['From'], 'confidence': 0.99},
+            'Destination': {'value': passenger['To'], 'confidence': 0.99},
+            'First Name': {'value': passenger['First Name'], 'confidence': 0.99},
+            'Last Name': {'value': passenger['Last Name'], 'confidence': 0.99},
+        }
+    }]
+    return id_data, bp_data
+
+def legacy_validate_all(id_data, bp_data, face_results, manifest_df):
+    """
+    The pre-index validate_all: run every validator against every manifest row.
+    """
+    for index, passenger in manifest_df.iterrows():
+        validation_results = {
+            "NameValidation": validation.validate_name(id_data, bp_data, passenger),
+            "DoBValidation": validation.validate_dob(id_data, passenger),
+            "BoardingPassValidation": validation.validate_boarding_pass(bp_data, passenger),
+            "PersonValidation": validation.validate_person_identity(face_results),
+            "LuggageValidation": validation.validate_luggage()
+        }
+        validation.update_manifest_table(manifest_df, index, validation_results)
+        if manifest_df.at[index, 'ValidationStatus']:
+            return index
+    return None
+
+def summarize(label:str, latencies:list) -> None:
+    latencies_ms = sorted(latency * 1000 for latency in latencies)
+    def percentile(p):
+        return latencies_ms[min(len(latencies_ms) - 1, int(round(p / 100 * (len(latencies_ms) - 1))))]
+    print(f"{label:<22} n={len(latencies_ms):<6} mean={statistics.fmean(latencies_ms):9.3f} ms  "
+          f"p50={percentile(50):9.3f} ms  p95={percentile(95):9.3f} ms  p99={percentile(99):9.3f} ms")
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--rows', type=int, default=10000, help='Number of manifest rows')
+    arg_parser.add_argument('--seats', type=int, default=400, help='Seats per flight')
+    arg_parser.add_argument('--legacy-sample', type=int, default=5, help='Passengers to validate with the legacy full scan (0 to skip)')
+    arg_parser.add_argument('--log', action='store_true', help='Keep INFO logging from the validators enabled')
+    args = arg_parser.parse_args()
+
+    manifest_df = generate_manifest(args.rows, args.seats)
+
+    # validate_all logs and prints per passenger; keep that I/O out of the timings by default
+    quiet = contextlib.nullcontext() if args.log else contextlib.redirect_stdout(StringIO())
+    if not args.log:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    face_results = [{'faceId': 'bench', 'candidates': [{'personId': 'bench', 'confidence': 0.95}]}]
+    passengers = [passenger for _, passenger in manifest_df.iterrows()]
+    documents = [passenger_documents(passenger) for passenger in passengers]
+
+    # Prepare and index the manifest the way kiosk_main loads it
+    start = time.perf_counter()
+    validation.prepare_manifest(manifest_df)
+    manifest_index = ManifestIndex(manifest_df)
+    build_time = time.perf_counter() - start
+    flights = manifest_df['Flight No.'].nunique()
+    print(f"Manifest: {len(manifest_df)} rows, {flights} flights; prepared and indexed in {build_time * 1000:.1f} ms")
+
+    latencies = []
+    failures = 0
+    with quiet:
+        for id_data, bp_data in documents:
+            start = time.perf_counter()
+            passenger_info = validation.validate_all(id_data, bp_data, face_results, manifest_df, manifest_index)
+            latencies.append(time.perf_counter() - start)
+            if not passenger_info:
+                failures += 1
+    summarize('indexed validate_all', latencies)
+    print(f"Passengers not validated: {failures}")
+
+    # Reconcile the whole manifest as one gate-close batch
+    with quiet:
+        records_df = validation.build_batch_records([(id_data, bp_data, face_results) for id_data, bp_data in documents])
+    start = time.perf_counter()
+    results_df = validation.validate_batch(records_df, manifest_df)
+    batch_time = time.perf_counter() - start
+    print(f"{'batch validate_batch':<22} n={len(records_df):<6} total={batch_time * 1000:9.1f} ms  "
+          f"per passenger={batch_time * 1000 / len(records_df):9.3f} ms  validated={int(results_df['ValidationStatus'].sum())}")
+
+    if args.legacy_sample > 0:
+        legacy_latencies = []
+        sample = random.Random(7).sample(documents, min(args.legacy_sample, len(documents)))
+        for id_data, bp_data in sample:
+            start = time.perf_counter()
+            legacy_validate_all(id_data, bp_data, face_results, manifest_df)
+            legacy_latencies.append(time.perf_counter() - start)
+        summarize('legacy iterrows scan', legacy_latencies)
+        print(f"Speed-up (mean): {statistics.fmean(legacy_latencies) / statistics.fmean(latencies):.0f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+'''
+Benchmark of the custom boarding pass model registry (src/get_custom_text/model_registry.py) against the
+local Azure emulator, whose model builds take --build-seconds.
+
+The training set is a blob container of the emulator holding the sample boarding passes. Without a
+configured model id the kiosk used to build a new model on every start; the registry instead:
+- builds the first model once and waits for it (cold start)
+- reuses it on the next calls, and after a restart from its SQLite store
+- finds it by its fingerprint tag in the service's model listing on another kiosk with an empty store
+- serves the previous model at once when the training set changes, while the new one builds in the background
+and get_model_info serves repeated model queries from its cached listing.
+Checks the build and listing counts of the emulator and that only the cold start waits for a build.
+
+Usage:
+    python benchmarks/bench_model_registry.py --build-seconds 1.0 --queries 50
+'''
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+import contextlib
+from io import StringIO
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(ROOT_DIR, 'src'))
+sys.path.append(ROOT_DIR)
+
+from benchmarks.stubs.emulator import AzureEmulator
+from benchmarks.stubs.blob_storage import STORAGE_ACCOUNT
+from benchmarks.bench_emulated_checkin import write_config
+
+SAMPLE_BOARDING_PASSES = os.path.join(ROOT_DIR, 'data', 'boarding_passes')
+SAMPLE_MANIFEST = os.path.join(ROOT_DIR, 'data', 'flight_manifest', 'flight-manifest.csv')
+
+def timed(function, *args, **kwargs) -> tuple:
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(StringIO()):
+        result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--build-seconds', type=float, default=1.0, help='Emulator model build time, in seconds')
+    arg_parser.add_argument('--latency', type=float, default=0.02, help='Emulator latency per request, in seconds')
+    arg_parser.add_argument('--queries', type=int, default=50, help='Model queries served from the cached listing')
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir, AzureEmulator(latency=args.latency, build_seconds=args.build_seconds) as emulator:
+        os.environ['CONFIG_PATH'] = write_config(tmp_dir, emulator.url, SAMPLE_MANIFEST)
+        from azure.storage.blob import ContainerClient
+        from utility.settings import get_settings
+        from get_custom_text.analyze_custom_doc_main import main as analyze_custom
+        from get_custom_text.get_model_info import find_models, get_model
+        from get_custom_text.model_registry import ModelRegistry, ModelRegistryStore, get_model_registry
+        logging.getLogger().setLevel(logging.WARNING)
+        config = get_settings().config['doc_intelligence']
+        config['custom_models']['boarding_pass_1'] = None
+        store_path = os.path.join(tmp_dir, 'model_registry.sqlite')
+        config.setdefault('model_registry', {})['store_path'] = store_path
+
+        # The training set: the sample boarding passes in a blob container of the emulator
+        training_url = f"{emulator.url}/{STORAGE_ACCOUNT}/training"
+        container = ContainerClient.from_container_url(training_url)
+        container.create_container()
+        for name in sorted(os.listdir(SAMPLE_BOARDING_PASSES)):
+            with open(os.path.join(SAMPLE_BOARDING_PASSES, name), 'rb') as sample:
+                container.upload_blob(name, sample.read())
+        di = emulator.document_intelligence
+
+        rows, failures = [], []
+        def record(scenario, model_id, seconds, builds, listings):
+            rows.append((scenario, model_id, seconds, di.counters['builds'] - builds, di.counters['listings'] - listings))
+
+        # Cold start: the process registry builds the first model through the boarding pass analysis
+        builds, listings = di.counters['builds'], di.counters['listings']
+        bp_info, seconds = timed(analyze_custom, os.path.join(SAMPLE_BOARDING_PASSES, 'boarding-libby.pdf'), None, training_url)
+        first_model = get_model_registry().store.latest(training_url)
+        record('cold start (build)', first_model, seconds, builds, listings)
+        if not bp_info or 'Flight_No' not in bp_info[0]['fields']:
+            failures.append(f"the boarding pass analysis with the built model returned {bp_info}")
+
+        # Same process: reused from the store
+        builds, listings = di.counters['builds'], di.counters['listings']
+        model_id, seconds = timed(get_model_registry().get_model_id, training_url)
+        record('same process', model_id, seconds, builds, listings)
+
+        # Restart: a new registry on the same store
+        builds, listings = di.counters['builds'], di.counters['listings']
+        restarted = ModelRegistry(ModelRegistryStore(store_path), fingerprint_ttl=0)
+        model_id, seconds = timed(restarted.get_model_id, training_url)
+        record('restart (store)', model_id, seconds, builds, listings)
+
+        # Another kiosk: an empty store, the model is found by its fingerprint tag
+        builds, listings = di.counters['builds'], di.counters['listings']
+        other_kiosk = ModelRegistry(ModelRegistryStore(':memory:'), fingerprint_ttl=0)
+        model_id, seconds = timed(other_kiosk.get_model_id, training_url)
+        record('other kiosk (tags)', model_id, seconds, builds, listings)
+
+        # Changed training set: the previous model serves while the new one builds
+        container.upload_blob('boarding-extra.pdf', b'%PDF-1.4 extra training sample')
+        builds, listings = di.counters['builds'], di.counters['listings']
+        model_id, seconds = timed(restarted.get_model_id, training_url)
+        # The build runs in the background; wait for it (printing its model) before counting it
+        with contextlib.redirect_stdout(StringIO()):
+            new_model = restarted.rebuild(training_url).result()
+        record('training set changed', model_id, seconds, builds, listings)
+        builds, listings = di.counters['builds'], di.counters['listings']
+        model_id, seconds = timed(restarted.get_model_id, training_url)
+        record('after the rebuild', model_id, seconds, builds, listings)
+
+        # Model queries from the cached listing
+        listings = di.counters['listings']
+        start = time.perf_counter()
+        for _ in range(args.queries):
+            get_model(new_model)
+            find_models(prefix='prebuilt-')
+        query_seconds = time.perf_counter() - start
+        query_listings = di.counters['listings'] - listings
+        get_model_registry().close()
+        restarted.close()
+        other_kiosk.close()
+
+    print(f"emulator, build {args.build_seconds:g} s, latency {args.latency * 1000:.0f} ms\n")
+    print(f"{'scenario':<24}{'model':<40}{'time (s)':>10}{'builds':>8}{'listings':>10}")
+    for scenario, model_id, seconds, builds, listings in rows:
+        print(f"{scenario:<24}{model_id or '-':<40}{seconds:>10.3f}{builds:>8}{listings:>10}")
+    print(f"\n{2 * args.queries} model queries in {query_seconds * 1000:.0f} ms, {query_listings} listing requests")
+    print(f"Without the registry every start without a model id builds: {len(rows) - 1} builds of {args.build_seconds:g} s")
+
+    times = {scenario: seconds for scenario, _, seconds, _, _ in rows}
+    models = {scenario: model_id for scenario, model_id, _, _, _ in rows}
+    builds = {scenario: count for scenario, _, _, count, _ in rows}
+    if builds['cold start (build)'] != 1 or times['cold start (build)'] < args.build_seconds:
+        failures.append("the cold start did not build and wait for one model")
+    for scenario in ('same process', 'restart (store)', 'other kiosk (tags)', 'after the rebuild'):
+        if builds[scenario]:
+            failures.append(f"{scenario} built a model")
+        if times[scenario] >= args.build_seconds / 2:
+            failures.append(f"{scenario} took {times[scenario]:.3f} s")
+    for scenario in ('same process', 'restart (store)', 'other kiosk (tags)', 'training set changed'):
+        if models[scenario] != first_model:
+            failures.append(f"{scenario} got model {models[scenario]} instead of {first_model}")
+    if builds['training set changed'] != 1 or times['training set changed'] >= args.build_seconds / 2:
+        failures.append("the changed training set did not rebuild in the background")
+    if models['after the rebuild'] != new_model or new_model == first_model:
+        failures.append("the rebuilt model is not served after its build")
+    if query_listings > 1:
+        failures.append(f"the model queries made {query_listings} listing requests")
+    if failures:
+        sys.exit("FAIL: " + "; ".join(failures))
+    print("\nPASS: the registry builds once per training set and serves the previous model while rebuilding")
+
+if __name__ == "__main__":
+    main()
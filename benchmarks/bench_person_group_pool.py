@@ -0,0 +1,120 @@
+'''
+Exercise the person group pool and sweeper against the local Face API stub.
+
+Seeds the stub with orphaned person groups (legacy per-passenger uuid groups and groups of this kiosk
+instance unknown to the store), the groups of another kiosk instance and a group of another application,
+runs passengers concurrently through the identify flow with groups leased from a PersonGroupManager
+(legacy sweep enabled), then sweeps. Checks that:
+- the number of groups never exceeds the pool size plus the seeded groups
+- released groups are empty and reused
+- an expired lease is reclaimed, and its owner's late release is a no-op
+- the sweep deletes the orphans and keeps the pool, the other instance's and the foreign groups
+and exits non-zero on the first failed check.
+
+Usage:
+    python benchmarks/bench_person_group_pool.py --passengers 20 --workers 6 --pool-size 4
+'''
+import os
+import sys
+import time
+import uuid
+import logging
+import argparse
+import tempfile
+import contextlib
+from io import StringIO
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(ROOT_DIR, 'src'))
+sys.path.append(ROOT_DIR)
+
+from benchmarks.stubs.face_api import FaceApiStub
+
+def check(condition:bool, message:str) -> None:
+    if not condition:
+        sys.exit(f"FAIL: {message}")
+    print(f"ok    {message}")
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--passengers', type=int, default=20, help='Passengers to run through the identify flow')
+    arg_parser.add_argument('--workers', type=int, default=6, help='Passengers checked concurrently')
+    arg_parser.add_argument('--pool-size', type=int, default=4, help='Person group pool size')
+    arg_parser.add_argument('--thumbnails', type=int, default=3, help='Face thumbnails added per passenger')
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir, FaceApiStub() as stub:
+        # Point the Face API client at the stub before it is created
+        os.environ.update({'FACE_ENDPOINT_URL': stub.url, 'FACE_API_KEY': 'stub-key', 'face_api_version': 'v1.0'})
+        import get_faces.face_api_client as faceAPI
+        from get_faces.person_group_manager import PersonGroupManager, PersonGroupStore
+        logging.getLogger().setLevel(logging.WARNING)
+
+        thumbnails = []
+        for idx in range(args.thumbnails):
+            thumbnail = os.path.join(tmp_dir, f'thumbnail_{idx}.jpg')
+            with open(thumbnail, 'wb') as image_file:
+                image_file.write(os.urandom(4096))
+            thumbnails.append(thumbnail)
+
+        client = faceAPI.get_face_api_client()
+        store = PersonGroupStore(os.path.join(tmp_dir, 'person_groups.sqlite'))
+        legacy = [str(uuid.uuid4()) for _ in range(5)]
+        stale_pool = [f"kiosk-{store.instance_id()}-{uuid.uuid4().hex}" for _ in range(2)]
+        # Leased groups of another kiosk host, recorded in that host's store only
+        other_instance = [f"kiosk-{uuid.uuid4().hex[:12]}-{uuid.uuid4().hex}" for _ in range(2)]
+        foreign = 'other-application-group'
+        for group_id in legacy + stale_pool + other_instance + [foreign]:
+            client.create_person_group(group_id, group_id)
+        seeded = len(legacy) + len(stale_pool) + len(other_instance) + 1
+
+        manager = PersonGroupManager(client=client, store=store, pool_size=args.pool_size, lease_ttl=60,
+                                     acquire_timeout=30, sweep_interval=0, sweep_legacy_groups=True)
+        peak = {'groups': 0}
+
+        def passenger(idx):
+            with manager.lease(owner=f'passenger-{idx}') as person_group_id:
+                faceAPI.build_person_model(person_group_id, thumbnails, create_group=False)
+                results = faceAPI.identify_faces_in_person_group(thumbnails[0], person_group_id)
+                peak['groups'] = max(peak['groups'], len(stub.person_groups))
+                return results[0]['candidates'][0]['confidence']
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(StringIO()), ThreadPoolExecutor(max_workers=args.workers) as executor:
+            confidences = list(executor.map(passenger, range(args.passengers)))
+        elapsed = time.perf_counter() - start
+        print(f"{args.passengers} passengers, {args.workers} concurrent, pool size {args.pool_size}: {elapsed:.2f} s")
+
+        check(all(confidence >= 0.65 for confidence in confidences), "every passenger was identified in a leased group")
+        check(peak['groups'] <= args.pool_size + seeded, f"at most {args.pool_size} pool groups existed (peak {peak['groups'] - seeded})")
+        check(store.count() <= args.pool_size, f"the store tracks {store.count()} pool groups")
+        check(all(not stub.person_groups[group_id]['persons'] for group_id in store.group_ids()), "released groups are empty")
+
+        # A lease that is never released is reclaimed once it expires
+        manager.lease_ttl = 0.1
+        with contextlib.redirect_stdout(StringIO()):
+            abandoned = manager.acquire(owner='abandoned-passenger')
+            faceAPI.add_person_to_group(abandoned, 'abandoned-passenger')
+        time.sleep(0.2)
+
+        with contextlib.redirect_stdout(StringIO()):
+            result = manager.sweep()
+        check(result['reclaimed'] == 1 and store.get(abandoned)['state'] == 'free', "the expired lease was reclaimed")
+        check(not stub.person_groups[abandoned]['persons'], "the reclaimed group was cleared")
+        # The abandoned passenger releases late, once the next passenger enrolled in the group
+        faceAPI.add_person_to_group(abandoned, 'next-passenger')
+        with contextlib.redirect_stdout(StringIO()):
+            released = manager.release(abandoned, 'abandoned-passenger')
+        check(not released and stub.person_groups[abandoned]['persons'], "a stale owner's release left the group alone")
+        with contextlib.redirect_stdout(StringIO()):
+            manager._clear(abandoned)
+        check(result['deleted'] == len(legacy) + len(stale_pool), f"the sweep deleted {result['deleted']} orphaned groups")
+        check(all(group_id in stub.person_groups for group_id in other_instance), "the other kiosk instance's groups were kept")
+        check(foreign in stub.person_groups, "the other application's group was kept")
+        check(store.group_ids() <= set(stub.person_groups), "the pool groups were kept")
+        store.close()
+    print("PASS")
+
+if __name__ == "__main__":
+    main()
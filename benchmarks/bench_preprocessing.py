@@ -0,0 +1,163 @@
+'''
+Benchmark of the client-side document preprocessing (src/get_documents/preprocess_documents.py).
+
+Inputs are the sample ID (data/digital_ids) and boarding pass (data/boarding_passes) as they are, plus
+kiosk scanner captures of them: the ID and a boarding pass page rendered from the manifest row of the
+sample passenger, placed at a tilt on a noisy scanner bed of --scan-size pixels, saved as a quality 95
+JPEG with a 90 degree EXIF orientation. Each input is analyzed raw and preprocessed, and the benchmark
+reports per input:
+- the bytes on the wire and the upload time they take on a --uplink-mbps uplink (computed, not measured)
+- the measured analyze time (preprocessing in the pool included) against the local Azure emulator
+- the mean field confidence of the results
+The emulator returns fixed confidences; --live analyzes against the Document Intelligence endpoint of the
+settings instead, so the confidences show what the preprocessing costs in extraction quality.
+Checks that the scanner captures shrink at least --min-reduction times and that the preprocessed
+results and confidences match the raw ones (within --max-confidence-drop).
+
+Usage:
+    python benchmarks/bench_preprocessing.py --uplink-mbps 10 --scan-size 4032x3024
+    python benchmarks/bench_preprocessing.py --live
+'''
+import io
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+from PIL import Image, ImageDraw
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(ROOT_DIR, 'src'))
+sys.path.append(ROOT_DIR)
+
+from benchmarks.stubs.emulator import AzureEmulator
+from benchmarks.bench_emulated_checkin import write_config
+
+SAMPLE_ID = os.path.join(ROOT_DIR, 'data', 'digital_ids', 'libby-herold.png')
+SAMPLE_BOARDING_PASS = os.path.join(ROOT_DIR, 'data', 'boarding_passes', 'boarding-libby.pdf')
+SAMPLE_MANIFEST = os.path.join(ROOT_DIR, 'data', 'flight_manifest', 'flight-manifest.csv')
+
+# EXIF orientation tag and the value of an image to rotate 90 degrees clockwise for display
+EXIF_ORIENTATION, ROTATE_90 = 0x0112, 6
+
+def boarding_pass_page(passenger:dict) -> Image.Image:
+    # A printed boarding pass page: the fields the custom model extracts, on white paper
+    page = Image.new('RGB', (1700, 800), 'white')
+    draw = ImageDraw.Draw(page)
+    draw.rectangle((20, 20, 1680, 780), outline='black', width=6)
+    lines = ['BOARDING PASS', f"{passenger['First Name']} {passenger['Last Name']}",
+             f"Flight {passenger['Flight No.']}  Seat {passenger['Seat']}", f"{passenger['From']} to {passenger['To']}"]
+    for index, line in enumerate(lines):
+        draw.text((80, 80 + index * 160), line, fill='black', font_size=90)
+    return page
+
+def scanner_capture(document:Image.Image, scan_size:tuple, seed:int) -> bytes:
+    '''
+    JPEG of a document lying at a tilt on a scanner bed, with sensor noise and a 90 degree EXIF orientation
+    '''
+    width, height = scan_size
+    rng = np.random.default_rng(seed)
+    bed = rng.normal(200, 6, (height, width, 3)).clip(0, 255).astype(np.uint8)
+    capture = Image.fromarray(bed)
+    document = document.convert('RGB')
+    document.thumbnail((int(width * 0.6), int(height * 0.6)), Image.LANCZOS)
+    document = document.rotate(3, expand=True, fillcolor=(200, 200, 200))
+    capture.paste(document, ((width - document.width) // 2, (height - document.height) // 2))
+    noise = rng.normal(0, 4, (height, width, 3))
+    capture = Image.fromarray((np.asarray(capture, dtype=np.float32) + noise).clip(0, 255).astype(np.uint8))
+    # Stored sideways, as a phone held in portrait: the EXIF orientation turns it upright
+    capture = capture.rotate(90, expand=True)
+    exif = Image.Exif()
+    exif[EXIF_ORIENTATION] = ROTATE_90
+    output = io.BytesIO()
+    capture.save(output, format='JPEG', quality=95, exif=exif)
+    return output.getvalue()
+
+def mean_confidence(results:list) -> float:
+    confidences = []
+    for document in results:
+        fields = document.get('fields', document)
+        confidences.extend(field['confidence'] for field in fields.values()
+                           if isinstance(field, dict) and field.get('confidence') is not None)
+    return sum(confidences) / len(confidences) if confidences else 0.0
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--uplink-mbps', type=float, default=10.0, help='Uplink bandwidth the upload time is computed for, in Mbit/s')
+    arg_parser.add_argument('--scan-size', default='4032x3024', help='Pixel size of the scanner captures')
+    arg_parser.add_argument('--repeats', type=int, default=3, help='Analyses per input and mode')
+    arg_parser.add_argument('--latency', type=float, default=0.02, help='Emulator latency per request, in seconds')
+    arg_parser.add_argument('--min-reduction', type=float, default=5.0, help='Required size reduction of the scanner captures')
+    arg_parser.add_argument('--max-confidence-drop', type=float, default=0.02, help='Largest allowed drop of the mean confidence')
+    arg_parser.add_argument('--live', action='store_true', help='Analyze against the configured Document Intelligence endpoint')
+    args = arg_parser.parse_args()
+    scan_size = tuple(int(side) for side in args.scan_size.split('x'))
+
+    manifest = pd.read_csv(SAMPLE_MANIFEST, dtype=str)
+    passenger = manifest[manifest['Last Name'].str.casefold() == 'herold'].iloc[0].to_dict()
+    with open(SAMPLE_ID, 'rb') as id_file, open(SAMPLE_BOARDING_PASS, 'rb') as boarding_pass_file:
+        sample_id, sample_boarding_pass = id_file.read(), boarding_pass_file.read()
+    with Image.open(SAMPLE_ID) as id_image:
+        id_capture = scanner_capture(id_image.convert('RGBA').resize((1400, 1400), Image.LANCZOS), scan_size, seed=1)
+    boarding_pass_capture = scanner_capture(boarding_pass_page(passenger), scan_size, seed=2)
+    inputs = [('id sample', 'id', sample_id), ('id scan', 'id', id_capture),
+              ('bp sample', 'boarding_pass', sample_boarding_pass), ('bp scan', 'boarding_pass', boarding_pass_capture)]
+
+    with tempfile.TemporaryDirectory() as tmp_dir, AzureEmulator(passenger=passenger, latency=args.latency) as emulator:
+        if not args.live:
+            os.environ['CONFIG_PATH'] = write_config(tmp_dir, emulator.url, SAMPLE_MANIFEST)
+        from utility.settings import get_settings
+        from get_ID.analyzeID_prebuilt import analyze_id_document_bytes
+        from get_custom_text.extract_custom_doc import analyze_custom_document_bytes
+        from get_documents.preprocess_documents import preprocess_document, start_preprocessing_pool, preprocessing_config
+        logging.getLogger().setLevel(logging.WARNING)
+        config = get_settings().config['doc_intelligence']
+        model_id = config['custom_models']['boarding_pass_1']
+        config.setdefault('preprocessing', {})['enabled'] = True
+
+        start = time.perf_counter()
+        start_preprocessing_pool()
+        pool_start = time.perf_counter() - start
+
+        def analyze(kind, data):
+            if kind == 'id':
+                return analyze_id_document_bytes(data)
+            return analyze_custom_document_bytes(model_id, data)
+
+        rows = []
+        for label, kind, data in inputs:
+            for mode in ('raw', 'preprocessed'):
+                seconds, results, uploaded = [], None, len(data)
+                for _ in range(args.repeats):
+                    start = time.perf_counter()
+                    upload = preprocess_document(data) if mode == 'preprocessed' else data
+                    results = analyze(kind, upload)
+                    seconds.append(time.perf_counter() - start)
+                    uploaded = len(upload)
+                rows.append({'input': label, 'mode': mode, 'bytes': uploaded, 'upload_s': uploaded * 8 / (args.uplink_mbps * 1e6),
+                             'analyze_s': sum(seconds) / len(seconds), 'confidence': mean_confidence(results), 'results': results})
+
+    print(f"{'Document Intelligence endpoint' if args.live else 'emulator'}, uplink {args.uplink_mbps:g} Mbit/s, "
+          f"preprocessing {preprocessing_config()}, pool start-up {pool_start * 1000:.0f} ms")
+    print(f"\n{'input':<11}{'mode':<14}{'KiB on wire':>12}{'upload (s)':>12}{'analyze (s)':>13}{'total (s)':>11}{'confidence':>12}")
+    for row in rows:
+        print(f"{row['input']:<11}{row['mode']:<14}{row['bytes'] / 1024:>12.0f}{row['upload_s']:>12.2f}{row['analyze_s']:>13.3f}"
+              f"{row['upload_s'] + row['analyze_s']:>11.2f}{row['confidence']:>12.3f}")
+
+    failures = []
+    for raw, preprocessed in zip(rows[::2], rows[1::2]):
+        if raw['input'].endswith('scan') and raw['bytes'] < args.min_reduction * preprocessed['bytes']:
+            failures.append(f"{raw['input']} only shrank {raw['bytes'] / preprocessed['bytes']:.1f}x")
+        if preprocessed['confidence'] < raw['confidence'] - args.max_confidence_drop:
+            failures.append(f"the {raw['input']} confidence dropped from {raw['confidence']:.3f} to {preprocessed['confidence']:.3f}")
+        if not args.live and preprocessed['results'] != raw['results']:
+            failures.append(f"the preprocessed {raw['input']} results differ from the raw results")
+    if failures:
+        sys.exit("FAIL: " + "; ".join(failures))
+    print("\nPASS: preprocessing shrinks the scanner captures and keeps the extraction confidence")
+
+if __name__ == "__main__":
+    main()
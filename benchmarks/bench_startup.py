@@ -0,0 +1,103 @@
+'''
+Benchmark cold-start (import) time of the kiosk entry points.
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter for kiosk_main and the Gradio
+webapp, and reports the wall time, the cumulative import time of the module and its heaviest imports.
+The imports run with CONFIG_PATH pointing at a missing file, so any module that still reads its
+configuration at import time fails the run.
+
+Usage:
+    python benchmarks/bench_startup.py --runs 5 --top 10 --json startup.json
+'''
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+# Entry points to measure: label -> module imported relative to src/
+TARGETS = {
+    'kiosk_main': 'kiosk_main',
+    'webapp': 'app.gradio.webapp',
+}
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+def run_importtime(module:str) -> tuple:
+    """
+    Import a module in a fresh interpreter with -X importtime.
+
+    :param module: Module to import
+    :return: (wall time in seconds, list of (module, self_us, cumulative_us, depth))
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = SRC_DIR + os.pathsep + env.get('PYTHONPATH', '')
+    env['CONFIG_PATH'] = os.path.join(SRC_DIR, 'missing-config.yaml')
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=SRC_DIR, env=env, capture_output=True, text=True)
+    wall_time = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    imports = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            imports.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return wall_time, imports
+
+def measure(label:str, module:str, runs:int, top:int) -> dict:
+    wall_times = []
+    cumulative_times = []
+    imports = []
+    for _ in range(runs):
+        wall_time, imports = run_importtime(module)
+        wall_times.append(wall_time)
+        cumulative_times.append(next((cumulative for name, _, cumulative, _ in imports if name == module), 0))
+
+    # Heaviest direct imports of the module, from the last run
+    heaviest = sorted(((name, cumulative) for name, _, cumulative, depth in imports if depth == 1),
+                      key=lambda item: item[1], reverse=True)[:top]
+    report = {
+        'module': module,
+        'runs': runs,
+        'wall_ms_median': statistics.median(wall_times) * 1000,
+        'wall_ms_min': min(wall_times) * 1000,
+        'import_ms_median': statistics.median(cumulative_times) / 1000,
+        'modules_imported': len(imports),
+        'heaviest_imports_ms': {name: cumulative / 1000 for name, cumulative in heaviest},
+    }
+
+    print(f"{label}: import {report['import_ms_median']:.1f} ms (median), "
+          f"wall {report['wall_ms_median']:.1f} ms (median) / {report['wall_ms_min']:.1f} ms (min), "
+          f"{report['modules_imported']} modules")
+    for name, cumulative_ms in report['heaviest_imports_ms'].items():
+        print(f"    {cumulative_ms:9.1f} ms  {name}")
+    return report
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--runs', type=int, default=5, help='Fresh interpreter runs per entry point')
+    arg_parser.add_argument('--top', type=int, default=10, help='Number of heaviest imports to report')
+    arg_parser.add_argument('--target', choices=sorted(TARGETS), action='append', help='Entry point(s) to measure (default: all)')
+    arg_parser.add_argument('--json', help='Write the report to this JSON file')
+    args = arg_parser.parse_args()
+
+    reports = {}
+    for label in args.target or TARGETS:
+        reports[label] = measure(label, TARGETS[label], args.runs, args.top)
+
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump(reports, json_file, indent=2)
+        print(f"Report written to {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+'''
+Benchmark of the check-in telemetry (src/utility/telemetry.py).
+
+1. Overhead: time per span and counter increment with telemetry disabled and enabled, against an
+   empty call.
+2. Coverage: kiosk_main.main check-ins against the local Azure emulator with telemetry enabled and
+   throttling injected, then compares the recorded metrics with the emulator's own counters: the HTTP
+   requests per service and the 429s must match exactly, and every check-in and stage that ran must
+   have a span. The metrics are read back from the kiosk API's /metrics endpoint.
+
+Usage:
+    python benchmarks/bench_telemetry.py --iterations 200000 --checkins 5 --throttle-rate 0.05
+'''
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+import contextlib
+from io import StringIO
+import yaml
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(ROOT_DIR, 'src'))
+sys.path.append(ROOT_DIR)
+
+from benchmarks.stubs.emulator import AzureEmulator, SERVICES
+from benchmarks.bench_manifest_index import generate_manifest
+from benchmarks.bench_emulated_checkin import write_config, write_inputs
+
+# Stages of kiosk_main.run_pipeline
+STAGES = ['manifest', 'id', 'boarding_pass', 'documents', 'video', 'faces', 'validation']
+
+def time_per_call(func, iterations:int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e9
+
+def measure_overhead(iterations:int) -> dict:
+    from utility.telemetry import Telemetry
+
+    report = {'bare': {'span': time_per_call(lambda: None, iterations)}}
+    report['bare']['count'] = report['bare']['span']
+    for label, telemetry in (('disabled', Telemetry(enabled=False)), ('enabled', Telemetry(enabled=True))):
+        def span():
+            with telemetry.span('bench', stage='x'):
+                pass
+        report[label] = {'span': time_per_call(span, iterations),
+                         'count': time_per_call(lambda: telemetry.count('bench_total', service='x'), iterations)}
+    return report
+
+def parse_prometheus(text:str) -> dict:
+    # sample name with labels -> value
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith('#'):
+            name, value = line.rsplit(' ', 1)
+            samples[name] = float(value)
+    return samples
+
+def metric_total(samples:dict, name:str, **labels) -> float:
+    wanted = [f'{label}="{value}"' for label, value in labels.items()]
+    return sum(value for sample, value in samples.items()
+               if (sample == name or sample.startswith(name + '{')) and all(label in sample for label in wanted))
+
+def write_telemetry_config(config_path:str) -> None:
+    with open(config_path) as yaml_file:
+        config = yaml.safe_load(yaml_file)
+    config['telemetry'] = {'enabled': True, 'exporter': 'prometheus'}
+    with open(config_path, 'w') as yaml_file:
+        yaml.safe_dump(config, yaml_file)
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--iterations', type=int, default=200000, help='Calls per overhead measurement')
+    arg_parser.add_argument('--checkins', type=int, default=5, help='Check-ins against the emulator')
+    arg_parser.add_argument('--latency', type=float, default=0.01, help='Emulator latency per request, in seconds')
+    arg_parser.add_argument('--throttle-rate', type=float, default=0.05, help='Share of requests throttled by the emulator')
+    arg_parser.add_argument('--thumbnails', type=int, default=10, help='Face thumbnails per video')
+    arg_parser.add_argument('--max-noop-ns', type=float, default=2000, help='Allowed cost of a disabled span, in nanoseconds')
+    args = arg_parser.parse_args()
+
+    failures = []
+    overhead = measure_overhead(args.iterations)
+    print(f"{'':<10}{'span (ns)':>11}{'count (ns)':>12}")
+    for label, values in overhead.items():
+        print(f"{label:<10}{values['span']:>11.0f}{values['count']:>12.0f}")
+    noop_cost = overhead['disabled']['span'] - overhead['bare']['span']
+    if noop_cost > args.max_noop_ns:
+        failures.append(f"a disabled span costs {noop_cost:.0f} ns (limit {args.max_noop_ns:.0f})")
+
+    manifest = generate_manifest(200, 100)
+    with tempfile.TemporaryDirectory() as tmp_dir, \
+            AzureEmulator(passenger=manifest.iloc[0].to_dict(), thumbnails=args.thumbnails, latency=args.latency,
+                          throttle_rate=args.throttle_rate, retry_after=0.05, seed=11) as emulator:
+        manifest_path = os.path.join(tmp_dir, 'flight-manifest.csv')
+        manifest.to_csv(manifest_path, index=False)
+        config_path = write_config(tmp_dir, emulator.url, manifest_path)
+        write_telemetry_config(config_path)
+        os.environ['CONFIG_PATH'] = config_path
+        import kiosk_main
+        from app.api.kiosk_api import create_app
+        logging.getLogger().setLevel(logging.WARNING)
+        inputs = write_inputs(tmp_dir)
+
+        completed = 0
+        for _ in range(args.checkins):
+            try:
+                with contextlib.redirect_stdout(StringIO()):
+                    kiosk_main.main(*inputs)
+                completed += 1
+            except Exception as e:
+                print(f"check-in failed: {type(e).__name__}: {e}")
+        response = create_app().test_client().get('/metrics')
+        if response.status_code != 200:
+            sys.exit(f"FAIL: /metrics answered {response.status_code}")
+        samples = parse_prometheus(response.get_data(as_text=True))
+        served = {service: emulator.counters[service] for service in SERVICES}
+        throttled = emulator.counters['throttled']
+
+    print(f"\n{completed}/{args.checkins} check-ins, throttle_rate={args.throttle_rate:g}")
+    print(f"{'service':<24}{'emulator':>9}{'recorded':>9}{'retries':>8}")
+    for service in SERVICES:
+        recorded = metric_total(samples, 'kiosk_http_requests_total', service=service)
+        retries = metric_total(samples, 'kiosk_retries_total', service=service)
+        print(f"{service:<24}{served[service]:>9}{recorded:>9.0f}{retries:>8.0f}")
+        if recorded != served[service]:
+            failures.append(f"{service}: {recorded:.0f} requests recorded, {served[service]} served")
+    recorded_throttled = metric_total(samples, 'kiosk_http_throttled_total')
+    print(f"throttled: emulator {throttled}, recorded {recorded_throttled:.0f}")
+    if recorded_throttled != throttled:
+        failures.append(f"{recorded_throttled:.0f} throttled responses recorded, {throttled} injected")
+
+    print(f"\n{'stage':<16}{'spans':>6}{'mean (ms)':>11}")
+    for stage in STAGES:
+        spans = metric_total(samples, 'kiosk_span_seconds_count', span='kiosk.stage', stage=stage)
+        seconds = metric_total(samples, 'kiosk_span_seconds_sum', span='kiosk.stage', stage=stage)
+        print(f"{stage:<16}{spans:>6.0f}{seconds / spans * 1000 if spans else 0:>11.1f}")
+        # A check-in failing on an injected fault does not start the stages after the failed one
+        if not completed <= spans <= args.checkins:
+            failures.append(f"{spans:.0f} spans of stage {stage} for {completed} of {args.checkins} check-ins completed")
+    check_in_spans = metric_total(samples, 'kiosk_span_seconds_count', span='kiosk.checkin')
+    if check_in_spans != args.checkins:
+        failures.append(f"{check_in_spans:.0f} check-in spans for {args.checkins} check-ins")
+
+    if failures:
+        sys.exit("FAIL: " + "; ".join(failures))
+    print("\nPASS: disabled spans stay within the limit and enabled telemetry accounts for every request")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+'''
+Time the face thumbnail download of VideoIndexerClient.get_face_images.
+
+Downloads the face thumbnails of a video from a local Video Indexer stub with injected per-request
+latency: serially (one worker, the former loop), concurrently, and concurrently without decoding
+(raw JPEG bytes). Some thumbnails fail their first request to exercise the per-thumbnail retry.
+Checks that every path returns the thumbnails in insight order.
+
+Usage:
+    python benchmarks/bench_thumbnail_download.py --thumbnails 40 --latency 0.05 --workers 8
+'''
+import os
+import sys
+import time
+import logging
+import argparse
+import contextlib
+from io import StringIO
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(ROOT_DIR, 'src'))
+sys.path.append(ROOT_DIR)
+
+from get_faces.video_indexer_client import VideoIndexerClient, Consts
+from benchmarks.stubs.video_indexer import VideoIndexerStub
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--thumbnails', type=int, default=40, help='Face thumbnails in the video insights')
+    arg_parser.add_argument('--latency', type=float, default=0.05, help='Injected stub latency per request, in seconds')
+    arg_parser.add_argument('--workers', type=int, default=8, help='Concurrent downloads')
+    arg_parser.add_argument('--fail-every', type=int, default=10, help='Fail the first request of every n-th thumbnail, 0 to disable')
+    args = arg_parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    with VideoIndexerStub(thumbnails=args.thumbnails, fail_every=args.fail_every, latency=args.latency) as stub:
+        insights = stub.insights()
+        expected = [stub.thumbnails[thumb_id] for thumb_id in stub.thumbnail_ids]
+
+        print(f"thumbnails={args.thumbnails}  latency={args.latency * 1000:.0f} ms/request  workers={args.workers}")
+        print(f"{'path':>20}  {'time (s)':>8}  {'requests':>8}")
+        for label, workers, decode in (('serial, decoded', 1, True), ('concurrent, decoded', args.workers, True),
+                                       ('concurrent, bytes', args.workers, False)):
+            client = VideoIndexerClient(pool_size=args.workers)
+            client.consts = Consts('stub', stub.url, stub.url, 'stub', 'stub', 'stub')
+            client.account = stub.account
+            stub.failed.clear()
+            stub.reset_counters()
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(StringIO()):
+                thumbnails = client.get_face_images(insights, 'stub-video', decode=decode, max_workers=workers)
+            elapsed = time.perf_counter() - start
+            if decode:
+                thumbnails = [thumbnail.fp.getvalue() for thumbnail in thumbnails]
+            if thumbnails != expected:
+                sys.exit(f"FAIL: {label} returned the thumbnails out of order")
+            print(f"{label:>20}  {elapsed:>8.2f}  {stub.counters['requests']:>8}")
+    print("PASS: every path returned the thumbnails in insight order")
+
+if __name__ == "__main__":
+    main()
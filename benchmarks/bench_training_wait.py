@@ -0,0 +1,75 @@
+'''
+Compare the person group training wait with fixed-interval polling against the adaptive backoff wait.
+
+Against a local Face API stub whose training jobs take a given time, trains a person group and waits
+for it, once polling every --fixed-interval seconds (the former time.sleep(5) loop) and once with
+utility.polling.poll_until using the face_api training settings from config.yaml. Reports the wall time,
+the number of polls and the time spent sleeping past the end of training.
+
+Usage:
+    python benchmarks/bench_training_wait.py --training 0.3 1 3 --fixed-interval 5
+'''
+import os
+import sys
+import time
+import uuid
+import logging
+import argparse
+import contextlib
+from io import StringIO
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(ROOT_DIR, 'src'))
+sys.path.append(ROOT_DIR)
+
+from get_faces.face_api_client import FaceApiClient, training_poll_settings, is_training_finished
+from utility.polling import poll_until, get_poll_metrics
+from benchmarks.stubs.face_api import FaceApiStub
+
+def train(client:FaceApiClient) -> str:
+    person_group_id = str(uuid.uuid4())
+    client.create_person_group(person_group_id, person_group_id)
+    client.add_person_to_group(person_group_id, person_group_id)
+    client.train_person_group(person_group_id)
+    return person_group_id
+
+def wait_fixed(client:FaceApiClient, person_group_id:str, interval:float) -> int:
+    polls = 0
+    while True:
+        polls += 1
+        if is_training_finished(client.get_training_status(person_group_id)):
+            return polls
+        time.sleep(interval)
+
+def wait_adaptive(client:FaceApiClient, person_group_id:str) -> int:
+    poll_until(lambda: client.get_training_status(person_group_id), is_training_finished,
+               name='bench.training', **training_poll_settings())
+    return get_poll_metrics('bench.training')[-1].polls
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--training', type=float, nargs='+', default=[0.3, 1.0, 3.0], help='Training durations to simulate, in seconds')
+    arg_parser.add_argument('--fixed-interval', type=float, default=5.0, help='Interval of the fixed polling loop, in seconds')
+    args = arg_parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print(f"{'training (s)':>12}  {'wait':>8}  {'wall (s)':>8}  {'polls':>5}  {'overshoot (s)':>13}")
+    for training_seconds in args.training:
+        with FaceApiStub(training_seconds=training_seconds) as stub, contextlib.redirect_stdout(StringIO()) as output:
+            client = FaceApiClient(endpoint=stub.url, subscription_key='stub-key', api_version='v1.0')
+            rows = []
+            for label, wait in (('fixed', lambda group_id: wait_fixed(client, group_id, args.fixed_interval)),
+                                ('adaptive', lambda group_id: wait_adaptive(client, group_id))):
+                person_group_id = train(client)
+                start = time.perf_counter()
+                polls = wait(person_group_id)
+                elapsed = time.perf_counter() - start
+                rows.append((label, elapsed, polls))
+                client.delete_person_group(person_group_id)
+            client.close()
+        output.close()
+        for label, elapsed, polls in rows:
+            print(f"{training_seconds:>12.2f}  {label:>8}  {elapsed:>8.2f}  {polls:>5}  {elapsed - training_seconds:>13.2f}")
+
+if __name__ == "__main__":
+    main()
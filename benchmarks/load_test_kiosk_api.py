@@ -0,0 +1,119 @@
+'''
+Load-test the headless kiosk API with simulated kiosks.
+
+Starts the API (src/app/api/kiosk_api.py) in-process on a local port with the remote check-in stages of
+kiosk_main (Document Intelligence, Video Indexer, Face API) replaced by local stubs of the given latency,
+then drives N simulated kiosks against it: each kiosk submits its check-ins as multipart requests, backs
+off on 503 as told by Retry-After (capped by --max-backoff) and long-polls the job until it finishes.
+Reports the completed and rejected submissions, throughput and check-in latency percentiles, and checks
+that every check-in completes. Use --url to drive an API that is already running instead.
+
+Usage:
+    python benchmarks/load_test_kiosk_api.py --kiosks 20 --checkins 3 --workers 4 --max-queued 8 --stage 0.2
+'''
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+import threading
+import contextlib
+from io import StringIO
+import numpy as np
+import requests
+from werkzeug.serving import make_server
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(ROOT_DIR, 'src'))
+sys.path.append(ROOT_DIR)
+
+import kiosk_main
+from app.api.kiosk_api import create_app
+from utility.job_queue import JobQueue
+from benchmarks.stubs.stages import sleeper
+
+def stub_remote_stages(latency:float) -> None:
+    # Remote stages of kiosk_main replaced by local stubs; validation runs on the stub results
+    kiosk_main.load_manifest_and_index = sleeper(0.01, (None, None))
+    kiosk_main.get_id = sleeper(latency, {})
+    kiosk_main.get_boarding_pass = sleeper(latency, {})
+    kiosk_main.check_documents = sleeper(0.0, True)
+    kiosk_main.get_video_thumbnails = sleeper(latency * 2, [])
+    kiosk_main.identify_faces_in_thumbnails = sleeper(latency, [])
+    kiosk_main.validate_passenger = sleeper(0.0, None)
+
+def kiosk(url:str, checkins:int, max_backoff:float, latencies:list, counters:dict, lock:threading.Lock) -> None:
+    files = {'id': ('id.jpg', b'id'), 'boarding_pass': ('boarding_pass.pdf', b'bp'), 'video': ('video.mp4', b'video')}
+    with requests.Session() as session:
+        for _ in range(checkins):
+            start = time.perf_counter()
+            while True:
+                response = session.post(f"{url}/checkins", files=files)
+                if response.status_code != 503:
+                    break
+                with lock:
+                    counters['rejected'] += 1
+                time.sleep(min(float(response.headers.get('Retry-After', 1)), max_backoff))
+            response.raise_for_status()
+            job = response.json()
+            while job['status'] not in ('done', 'failed'):
+                job = session.get(f"{url}/checkins/{job['id']}", params={'wait': 10, 'since': job['version']}).json()
+            with lock:
+                counters[job['status']] += 1
+                latencies.append(time.perf_counter() - start)
+
+@contextlib.contextmanager
+def local_api(workers:int, max_queued:int, upload_folder:str):
+    job_queue = JobQueue(workers=workers, max_queued=max_queued)
+    server = make_server('127.0.0.1', 0, create_app(job_queue, upload_folder), threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}"
+    finally:
+        server.shutdown()
+        job_queue.shutdown()
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--kiosks', type=int, default=20, help='Simulated kiosks')
+    arg_parser.add_argument('--checkins', type=int, default=3, help='Check-ins per kiosk')
+    arg_parser.add_argument('--workers', type=int, default=4, help='Check-ins run concurrently by the API')
+    arg_parser.add_argument('--max-queued', type=int, default=8, help='Check-ins waiting for a worker before the API answers 503')
+    arg_parser.add_argument('--stage', type=float, default=0.2, help='Latency of each stubbed remote stage, in seconds')
+    arg_parser.add_argument('--max-backoff', type=float, default=0.2, help='Longest wait after a 503, in seconds')
+    arg_parser.add_argument('--url', help='Drive a running API at this URL instead of a local one')
+    args = arg_parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+    stub_remote_stages(args.stage)
+    latencies, counters, lock = [], {'done': 0, 'failed': 0, 'rejected': 0}, threading.Lock()
+    with tempfile.TemporaryDirectory() as upload_folder, contextlib.ExitStack() as stack:
+        url = args.url or stack.enter_context(local_api(args.workers, args.max_queued, upload_folder))
+        stack.enter_context(contextlib.redirect_stdout(StringIO()))
+        start = time.perf_counter()
+        threads = [threading.Thread(target=kiosk, args=(url, args.checkins, args.max_backoff, latencies, counters, lock))
+                   for _ in range(args.kiosks)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        leftover = os.listdir(upload_folder)
+
+    total = args.kiosks * args.checkins
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if latencies else (0.0, 0.0, 0.0)
+    print(f"kiosks={args.kiosks}  check-ins={total}  workers={args.workers}  max_queued={args.max_queued}  stage={args.stage * 1000:.0f} ms")
+    print(f"done {counters['done']}  failed {counters['failed']}  rejected submissions {counters['rejected']}")
+    print(f"elapsed {elapsed:.2f} s  throughput {counters['done'] / elapsed:.1f} check-ins/s")
+    print(f"check-in latency p50 {p50:.2f} s  p95 {p95:.2f} s  p99 {p99:.2f} s")
+    if counters['done'] != total:
+        sys.exit(f"FAIL: {counters['done']} of {total} check-ins completed")
+    if not args.url and leftover:
+        sys.exit(f"FAIL: {len(leftover)} upload folders were not removed")
+    print("PASS: every check-in completed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+'''Local stub servers standing in for the Azure services in benchmarks.'''
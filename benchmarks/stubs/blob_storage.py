@@ -0,0 +1,67 @@
+'''
+In-memory stub of the Azure Blob Storage operations used by upload_files_to_blob.py: create container,
+upload (put) blob, download blob and list blobs, on path-style URLs (/<account>/<container>/<blob>)
+like the Azurite emulator. Requests are not authenticated.
+'''
+import uuid
+import hashlib
+import threading
+from email.utils import formatdate
+from xml.sax.saxutils import escape
+from benchmarks.stubs.server import StubServer
+
+STORAGE_ACCOUNT = 'devstoreaccount1'
+
+class BlobStorageStub(StubServer):
+    def __init__(self, account:str=STORAGE_ACCOUNT, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.account = account
+        self.containers = {}  # container -> {blob name: bytes}
+        self.state_lock = threading.Lock()
+        container = rf'/{account}/(?P<container>[^/]+)'
+        self.add_route('PUT', container, self.create_container)
+        self.add_route('GET', container, self.list_blobs)
+        self.add_route('PUT', container + r'/(?P<blob>.+)', self.put_blob)
+        self.add_route('GET', container + r'/(?P<blob>.+)', self.get_blob)
+
+    @staticmethod
+    def _headers(data:bytes=b'') -> dict:
+        return {'ETag': f'"0x{hashlib.md5(data).hexdigest()[:15].upper()}"', 'Last-Modified': formatdate(usegmt=True),
+                'x-ms-request-id': str(uuid.uuid4()), 'x-ms-version': '2021-08-06'}
+
+    def create_container(self, request):
+        with self.state_lock:
+            if request.match.group('container') in self.containers:
+                return 409, '', {'x-ms-error-code': 'ContainerAlreadyExists'}
+            self.containers[request.match.group('container')] = {}
+        return 201, '', self._headers()
+
+    def put_blob(self, request):
+        with self.state_lock:
+            blobs = self.containers.setdefault(request.match.group('container'), {})
+            blobs[request.match.group('blob')] = request.body
+        return 201, '', {**self._headers(request.body), 'x-ms-request-server-encrypted': 'true'}
+
+    def get_blob(self, request):
+        data = self.containers.get(request.match.group('container'), {}).get(request.match.group('blob'))
+        if data is None:
+            return 404, '', {'x-ms-error-code': 'BlobNotFound'}
+        headers = {**self._headers(data), 'Content-Type': 'application/octet-stream', 'x-ms-blob-type': 'BlockBlob'}
+        byte_range = request.headers.get('x-ms-range') or request.headers.get('Range')
+        if not byte_range:
+            return 200, data, headers
+        # Ranged download, as the SDK's first request: bytes=<start>-<end>
+        start, _, end = byte_range.split('=', 1)[1].partition('-')
+        start, end = int(start), min(int(end) if end else len(data) - 1, len(data) - 1)
+        headers['Content-Range'] = f'bytes {start}-{end}/{len(data)}'
+        return 206, data[start:end + 1], headers
+
+    def list_blobs(self, request):
+        blobs = self.containers.get(request.match.group('container'))
+        if blobs is None:
+            return 404, '', {'x-ms-error-code': 'ContainerNotFound'}
+        items = ''.join(f'<Blob><Name>{escape(name)}</Name><Properties><Content-Length>{len(data)}</Content-Length>'
+                        f'<Etag>{self._headers(data)["ETag"]}</Etag><BlobType>BlockBlob</BlobType></Properties></Blob>' for name, data in sorted(blobs.items()))
+        body = (f'<?xml version="1.0" encoding="utf-8"?><EnumerationResults ServiceEndpoint="http://{request.headers.get("Host")}/{self.account}" '
+                f'ContainerName="{escape(request.match.group("container"))}"><Blobs>{items}</Blobs><NextMarker /></EnumerationResults>')
+        return 200, body, {**self._headers(), 'Content-Type': 'application/xml'}
@@ -0,0 +1,27 @@
+'''
+Stub of the Azure Custom Vision prediction endpoint used by verify_luggages/detection.py.
+'''
+import uuid
+from datetime import datetime, timezone
+from benchmarks.stubs.server import StubServer
+
+PREDICTION_PREFIX = r'/customvision/v3\.0/Prediction/(?P<project>[^/]+)/detect/iterations/(?P<iteration>[^/]+)'
+
+class CustomVisionStub(StubServer):
+    def __init__(self, tag_name:str='lighter', probability:float=0.05, **kwargs) -> None:
+        '''
+        :param tag_name: Tag of the single object detected in every image
+        :param probability: Probability of that detection
+        '''
+        super().__init__(**kwargs)
+        self.tag_name = tag_name
+        self.probability = probability
+        self.add_route('POST', PREDICTION_PREFIX + r'/image(/nostore)?', self.detect_image)
+        self.add_route('POST', PREDICTION_PREFIX + r'/url(/nostore)?', self.detect_image)
+
+    def detect_image(self, request):
+        prediction = {'probability': self.probability, 'tagId': str(uuid.uuid5(uuid.NAMESPACE_DNS, self.tag_name)),
+                      'tagName': self.tag_name, 'boundingBox': {'left': 0.1, 'top': 0.1, 'width': 0.2, 'height': 0.2}}
+        return 200, {'id': str(uuid.uuid4()), 'project': request.match.group('project'),
+                     'iteration': request.match.group('iteration'),
+                     'created': datetime.now(timezone.utc).isoformat(), 'predictions': [prediction]}
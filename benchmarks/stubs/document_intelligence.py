@@ -0,0 +1,221 @@
+'''
+Stub of the Azure Document Intelligence analyze endpoints used by get_ID/analyzeID_prebuilt.py and
+get_custom_text/extract_custom_doc.py.
+
+An analyze request answers 202 with an Operation-Location; the result stays 'running' for
+analyze_seconds and then returns the fields of the configured passenger: the ID fields for the
+prebuilt-idDocument model and the boarding pass fields for any custom model. With a passengers list,
+a document whose content starts with PASSENGER_TAG and an index (see passenger_tag) describes that
+passenger instead, so many synthetic passengers can check in concurrently.
+
+A synthetic multi-page document is its pages joined by PAGE_BREAK (see make_document). The analyze
+requests only read the pages of their pages parameter, the prebuilt ID model finds no ID on a page
+holding BOARDING_PASS_MARK, and the classifier endpoint types each page as idDocument or boardingPass
+by that mark.
+
+Custom model builds answer 202 with an operation that succeeds after build_seconds with the model
+details; the built models and prebuilt-idDocument are listed and read back by the documentModels
+endpoints, and the stub counts the builds and listings in its counters.
+'''
+import re
+import math
+import time
+import uuid
+import threading
+from datetime import datetime, timezone
+from benchmarks.stubs.server import StubServer
+
+MODEL_PREFIX = r'/documentintelligence/documentModels/(?P<model>[^/:]+)'
+CLASSIFIER_PREFIX = r'/documentintelligence/documentClassifiers/(?P<model>[^/:]+)'
+MODELS_PATH = r'/documentintelligence/documentModels'
+
+# Fields of the custom boarding pass models (see boarding_pass)
+BOARDING_PASS_FIELDS = ['First Name', 'Last Name', 'Flight_No', 'Seat', 'Origin', 'Destination']
+
+# Separator of the pages of a synthetic document, and the content marking a boarding pass page
+PAGE_BREAK = b'\n%%PAGE BREAK%%\n'
+BOARDING_PASS_MARK = b'BOARDING PASS'
+
+# Document content prefix selecting a passenger of the passengers list
+PASSENGER_TAG = re.compile(rb'^PASSENGER (\d+)\n')
+
+def passenger_tag(index:int) -> bytes:
+    '''
+    Prefix of a synthetic document of the passenger at this index of the stub's passengers list
+    '''
+    return f'PASSENGER {index}\n'.encode()
+
+# Manifest row the stub's documents describe (manifest column names)
+DEFAULT_PASSENGER = {
+    'First Name': 'Avkash',
+    'Last Name': 'Chauhan',
+    'Date of Birth': '1/1/1990',
+    'Sex': 'M',
+    'Flight No.': '468',
+    'Seat': '20A',
+    'From': 'Seattle',
+    'To': 'Los Angeles',
+}
+
+def make_document(pages:list) -> bytes:
+    '''
+    Synthetic multi-page document of the given page contents
+    '''
+    return PAGE_BREAK.join(pages)
+
+def select_pages(body:bytes, pages:str) -> list:
+    '''
+    Pages of a synthetic document in the pages syntax of the analyze request, e.g. "1-2,4"
+    '''
+    document_pages = (body or b'').split(PAGE_BREAK)
+    if not pages:
+        return document_pages
+    numbers = []
+    for part in pages.split(','):
+        first, _, last = part.partition('-')
+        numbers.extend(range(int(first), int(last or first) + 1))
+    return [document_pages[number - 1] for number in numbers if 0 < number <= len(document_pages)]
+
+def _string_field(value) -> dict:
+    return {'type': 'string', 'valueString': str(value), 'content': str(value), 'confidence': 0.99}
+
+class DocumentIntelligenceStub(StubServer):
+    def __init__(self, passenger:dict=None, analyze_seconds:float=0.0, passengers:list=None, build_seconds:float=0.0, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.passenger = dict(passenger or DEFAULT_PASSENGER)
+        self.passengers = list(passengers or [])
+        self.analyze_seconds = analyze_seconds
+        self.build_seconds = build_seconds
+        self.operations = {}  # result id -> (model or classifier id, documents, time the result is ready)
+        self.builds = {}  # operation id -> (model details, time the build is done)
+        created = datetime(2024, 7, 31, tzinfo=timezone.utc).isoformat()
+        self.models = {'prebuilt-idDocument': {'modelId': 'prebuilt-idDocument', 'description': 'Extract key information from passports and ID cards.',
+                                               'createdDateTime': created, 'apiVersion': '2024-07-31-preview', 'tags': {}}}
+        self.counters.update({'builds': 0, 'listings': 0})
+        self.state_lock = threading.Lock()
+        self.add_route('POST', MODELS_PATH + r':build', self.build)
+        self.add_route('GET', r'/documentintelligence/operations/(?P<operation>[^/]+)', self.build_operation)
+        self.add_route('GET', MODELS_PATH, self.list_models)
+        self.add_route('GET', MODEL_PREFIX, self.get_model)
+        self.add_route('POST', MODEL_PREFIX + r':analyze', self.analyze)
+        self.add_route('GET', MODEL_PREFIX + r'/analyzeResults/(?P<result>[^/]+)', self.analyze_result)
+        self.add_route('POST', CLASSIFIER_PREFIX + r':analyze', self.classify)
+        self.add_route('GET', CLASSIFIER_PREFIX + r'/analyzeResults/(?P<result>[^/]+)', self.analyze_result)
+
+    def passenger_of(self, body:bytes) -> dict:
+        match = PASSENGER_TAG.match(body or b'')
+        if match and int(match.group(1)) < len(self.passengers):
+            return self.passengers[int(match.group(1))]
+        return self.passenger
+
+    def id_document(self, passenger:dict) -> dict:
+        month, day, year = (int(part) for part in str(passenger['Date of Birth']).split('/'))
+        fields = {
+            'FirstName': _string_field(passenger['First Name']),
+            'LastName': _string_field(passenger['Last Name']),
+            'DateOfBirth': {'type': 'date', 'valueDate': f'{year:04d}-{month:02d}-{day:02d}', 'confidence': 0.99},
+            'Sex': _string_field(passenger.get('Sex', '')),
+            'DocumentNumber': _string_field('D1234567'),
+            'CountryRegion': {'type': 'countryRegion', 'valueCountryRegion': 'USA', 'confidence': 0.99},
+        }
+        return {'docType': 'idDocument.driverLicense', 'fields': fields, 'confidence': 0.99, 'spans': []}
+
+    def boarding_pass(self, model_id:str, passenger:dict) -> dict:
+        fields = {
+            'First Name': _string_field(passenger['First Name']),
+            'Last Name': _string_field(passenger['Last Name']),
+            'Flight_No': _string_field(passenger['Flight No.']),
+            'Seat': _string_field(passenger['Seat']),
+            'Origin': _string_field(passenger['From']),
+            'Destination': _string_field(passenger['To']),
+        }
+        return {'docType': f'{model_id}:{model_id}', 'fields': fields, 'confidence': 0.99, 'spans': []}
+
+    def analyze(self, request):
+        pages = select_pages(request.body, request.query.get('pages'))
+        model_id = request.match.group('model')
+        if model_id == 'prebuilt-idDocument':
+            documents = [self.id_document(self.passenger_of(page)) for page in pages if BOARDING_PASS_MARK not in page]
+        else:
+            documents = [self.boarding_pass(model_id, self.passenger_of(pages[0] if pages else b''))]
+        return self.start_operation(request, 'documentModels', model_id, documents)
+
+    def classify(self, request):
+        documents = []
+        for number, page in enumerate(select_pages(request.body, request.query.get('pages')), start=1):
+            documents.append({'docType': 'boardingPass' if BOARDING_PASS_MARK in page else 'idDocument', 'confidence': 0.99,
+                              'boundingRegions': [{'pageNumber': number, 'polygon': []}], 'spans': []})
+        return self.start_operation(request, 'documentClassifiers', request.match.group('model'), documents)
+
+    def start_operation(self, request, collection:str, model_id:str, documents:list):
+        result_id = str(uuid.uuid4())
+        with self.state_lock:
+            self.operations[result_id] = (model_id, documents, time.monotonic() + self.analyze_seconds)
+        api_version = request.query.get('api-version', '2024-07-31-preview')
+        location = (f"http://{request.headers.get('Host')}/documentintelligence/{collection}/{model_id}"
+                    f"/analyzeResults/{result_id}?api-version={api_version}")
+        # The service sends whole seconds here, and the SDK parses this header as an int
+        return 202, '', {'Operation-Location': location, 'Retry-After': str(math.ceil(self.analyze_seconds))}
+
+    def analyze_result(self, request):
+        operation = self.operations.get(request.match.group('result'))
+        if operation is None:
+            return 404, {'error': {'code': 'NotFound', 'message': 'Analyze result not found.'}}
+        model_id, documents, ready_at = operation
+        now = datetime.now(timezone.utc).isoformat()
+        remaining = ready_at - time.monotonic()
+        if remaining > 0:
+            return 200, {'status': 'running', 'createdDateTime': now, 'lastUpdatedDateTime': now}, {'Retry-After': f'{remaining:.3f}'}
+        analyze_result = {'apiVersion': request.query.get('api-version', '2024-07-31-preview'), 'modelId': model_id,
+                          'stringIndexType': 'textElements', 'content': '', 'pages': [], 'documents': documents}
+        return 200, {'status': 'succeeded', 'createdDateTime': now, 'lastUpdatedDateTime': now, 'analyzeResult': analyze_result}
+
+    def build(self, request):
+        body = request.json()
+        model_id = body['modelId']
+        with self.state_lock:
+            if model_id in self.models or any(model['modelId'] == model_id for model, _ in self.builds.values()):
+                return 409, {'error': {'code': 'Conflict', 'message': f'Model {model_id} already exists.'}}
+        self._count('builds')
+        api_version = request.query.get('api-version', '2024-07-31-preview')
+        model = {'modelId': model_id, 'description': body.get('description'), 'tags': body.get('tags') or {},
+                 'createdDateTime': datetime.now(timezone.utc).isoformat(), 'apiVersion': api_version,
+                 'buildMode': body.get('buildMode', 'template'), 'azureBlobSource': body.get('azureBlobSource'),
+                 'docTypes': {model_id: {'buildMode': body.get('buildMode', 'template'),
+                                         'fieldSchema': {name: {'type': 'string'} for name in BOARDING_PASS_FIELDS},
+                                         'fieldConfidence': {name: 0.99 for name in BOARDING_PASS_FIELDS}}}}
+        operation_id = str(uuid.uuid4())
+        with self.state_lock:
+            self.builds[operation_id] = (model, time.monotonic() + self.build_seconds)
+        location = f"http://{request.headers.get('Host')}/documentintelligence/operations/{operation_id}?api-version={api_version}"
+        return 202, '', {'Operation-Location': location, 'Retry-After': str(math.ceil(self.build_seconds))}
+
+    def build_operation(self, request):
+        with self.state_lock:
+            build = self.builds.get(request.match.group('operation'))
+        if build is None:
+            return 404, {'error': {'code': 'NotFound', 'message': 'Operation not found.'}}
+        model, done_at = build
+        now = datetime.now(timezone.utc).isoformat()
+        operation = {'operationId': request.match.group('operation'), 'kind': 'documentModelBuild', 'createdDateTime': model['createdDateTime'],
+                     'lastUpdatedDateTime': now, 'apiVersion': model['apiVersion'], 'tags': model['tags']}
+        remaining = done_at - time.monotonic()
+        if remaining > 0:
+            return 200, {**operation, 'status': 'running', 'percentCompleted': 50}, {'Retry-After': f'{remaining:.3f}'}
+        with self.state_lock:
+            self.models[model['modelId']] = model
+        # The SDK reads the built model from the resourceLocation
+        location = f"http://{request.headers.get('Host')}/documentintelligence/documentModels/{model['modelId']}?api-version={model['apiVersion']}"
+        return 200, {**operation, 'status': 'succeeded', 'percentCompleted': 100, 'resourceLocation': location, 'result': model}
+
+    def list_models(self, request):
+        self._count('listings')
+        with self.state_lock:
+            models = list(self.models.values())
+        return 200, {'value': [{name: value for name, value in model.items() if name != 'docTypes'} for model in models]}
+
+    def get_model(self, request):
+        model = self.models.get(request.match.group('model'))
+        if model is None:
+            return 404, {'error': {'code': 'ModelNotFound', 'message': 'Model not found.'}}
+        return 200, model
@@ -0,0 +1,108 @@
+'''
+Local emulator of every Azure service the kiosk calls, on one port.
+
+Serves the Face API, Video Indexer (ARM account and access token included), Document Intelligence,
+Custom Vision prediction and Blob Storage stubs of this package behind a single StubServer, with a
+latency per service plus the server-wide jitter, error and 429 throttling injection. Set
+emulator.enabled and emulator.url in config.yaml to point the kiosk at it: utility.settings then
+returns the emulator's endpoints and placeholder credentials (see utility.settings.emulator_settings),
+so kiosk_main.main runs without Azure credentials.
+
+Run standalone with:
+    python -m benchmarks.stubs.emulator --port 8900 --latency 0.05 --throttle-rate 0.02
+'''
+import re
+import time
+import argparse
+import pandas as pd
+from benchmarks.stubs.server import StubServer
+from benchmarks.stubs.face_api import FaceApiStub
+from benchmarks.stubs.video_indexer import VideoIndexerStub
+from benchmarks.stubs.document_intelligence import DocumentIntelligenceStub
+from benchmarks.stubs.custom_vision import CustomVisionStub
+from benchmarks.stubs.blob_storage import BlobStorageStub, STORAGE_ACCOUNT
+
+# Service of a request path, first match wins
+SERVICE_PATHS = [
+    ('face_api', re.compile(r'^/face/')),
+    ('document_intelligence', re.compile(r'^/documentintelligence/')),
+    ('custom_vision', re.compile(r'^/customvision/')),
+    ('blob_storage', re.compile(rf'^/{STORAGE_ACCOUNT}/')),
+    ('video_indexer', re.compile(r'^/subscriptions/|/Accounts/')),
+]
+SERVICES = [service for service, _ in SERVICE_PATHS]
+
+def service_of(path:str) -> str:
+    for service, pattern in SERVICE_PATHS:
+        if pattern.search(path):
+            return service
+    return 'unknown'
+
+class AzureEmulator(StubServer):
+    def __init__(self, latencies:dict=None, passenger:dict=None, passengers:list=None, thumbnails:int=20, training_seconds:float=0.0,
+                 indexing_seconds:float=0.0, analyze_seconds:float=0.0, build_seconds:float=0.0, confidence:float=0.92, **kwargs) -> None:
+        '''
+        :param latencies: Seconds per request by service name (see SERVICES), default the latency argument
+        :param passenger: Manifest row (manifest column names) the document stub describes
+        :param passengers: Manifest rows selected by the documents' passenger tag (see document_intelligence.passenger_tag)
+        :param thumbnails: Face thumbnails in every video index
+        :param training_seconds: Person group training time
+        :param indexing_seconds: Video indexing time
+        :param analyze_seconds: Document analysis time
+        :param build_seconds: Custom document model build time
+        :param confidence: Face identify and verify confidence
+        :param kwargs: StubServer arguments (host, port, latency, jitter, error_rate, throttle_rate, retry_after, seed)
+        '''
+        super().__init__(**kwargs)
+        self.latencies = dict(latencies or {})
+        self.face_api = FaceApiStub(confidence=confidence, training_seconds=training_seconds)
+        self.video_indexer = VideoIndexerStub(thumbnails=thumbnails, indexing_seconds=indexing_seconds)
+        self.document_intelligence = DocumentIntelligenceStub(passenger=passenger, passengers=passengers,
+                                                              analyze_seconds=analyze_seconds, build_seconds=build_seconds)
+        self.custom_vision = CustomVisionStub()
+        self.blob_storage = BlobStorageStub()
+        for stub in (self.face_api, self.video_indexer, self.document_intelligence, self.custom_vision, self.blob_storage):
+            self.routes.extend(stub.routes)
+        for service in SERVICES:
+            self.counters[service] = 0
+
+    def request_delay(self, method:str, path:str) -> float:
+        service = service_of(path)
+        self._count(service)
+        return self.latencies.get(service, self.latency)
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--host', default='127.0.0.1')
+    arg_parser.add_argument('--port', type=int, default=8900)
+    arg_parser.add_argument('--latency', type=float, default=0.0, help='Seconds per request')
+    for service in SERVICES:
+        arg_parser.add_argument(f"--{service.replace('_', '-')}-latency", type=float, help=f'Seconds per {service} request')
+    arg_parser.add_argument('--jitter', type=float, default=0.0, help='Up to this many seconds added to each request')
+    arg_parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests answered with a 500')
+    arg_parser.add_argument('--throttle-rate', type=float, default=0.0, help='Share of requests answered with a 429')
+    arg_parser.add_argument('--retry-after', type=float, default=1.0, help='Retry-After seconds of throttled requests')
+    arg_parser.add_argument('--training', type=float, default=0.0, help='Person group training time, in seconds')
+    arg_parser.add_argument('--indexing', type=float, default=0.0, help='Video indexing time, in seconds')
+    arg_parser.add_argument('--analyze', type=float, default=0.0, help='Document analysis time, in seconds')
+    arg_parser.add_argument('--thumbnails', type=int, default=20, help='Face thumbnails per video')
+    arg_parser.add_argument('--passengers-csv', help='Flight manifest whose rows the tagged documents describe, by row number')
+    args = arg_parser.parse_args()
+
+    passengers = pd.read_csv(args.passengers_csv, dtype=str).to_dict('records') if args.passengers_csv else None
+
+    latencies = {service: getattr(args, f'{service}_latency') for service in SERVICES if getattr(args, f'{service}_latency') is not None}
+    emulator = AzureEmulator(latencies=latencies, passengers=passengers, thumbnails=args.thumbnails, training_seconds=args.training,
+                             indexing_seconds=args.indexing, analyze_seconds=args.analyze, host=args.host, port=args.port,
+                             latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                             throttle_rate=args.throttle_rate, retry_after=args.retry_after)
+    with emulator:
+        print(f"Azure emulator listening on {emulator.url}; set emulator.enabled: true and emulator.url: {emulator.url} in config.yaml")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print(f"Requests served: {emulator.counters}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+'''
+In-memory stub of the Azure Face API endpoints used by get_faces/face_api_client.py.
+'''
+import time
+import uuid
+import threading
+from benchmarks.stubs.server import StubServer
+
+FACE_PREFIX = r'/face/[^/]+'
+
+class FaceApiStub(StubServer):
+    def __init__(self, confidence:float=0.92, training_seconds:float=0.0, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.confidence = confidence
+        # How long a training job stays 'running' before it succeeds
+        self.training_seconds = training_seconds
+        # person_group_id -> {'name': ..., 'persons': {person_id: [persisted_face_id, ...]}, 'training': status, 'trained_at': time}
+        self.person_groups = {}
+        self.state_lock = threading.Lock()
+
+        group = FACE_PREFIX + r'/persongroups/(?P<group>[^/]+)'
+        person = group + r'/persons/(?P<person>[^/]+)'
+        self.add_route('PUT', group, self.create_person_group)
+        self.add_route('GET', FACE_PREFIX + r'/persongroups', self.list_person_groups)
+        self.add_route('DELETE', group, self.delete_person_group)
+        self.add_route('POST', group + r'/persons', self.add_person)
+        self.add_route('GET', group + r'/persons', self.list_persons)
+        self.add_route('DELETE', person, self.delete_person)
+        self.add_route('POST', person + r'/persistedFaces', self.add_face)
+        self.add_route('DELETE', person + r'/persistedFaces/(?P<face>[^/]+)', self.delete_face)
+        self.add_route('POST', group + r'/train', self.train)
+        self.add_route('GET', group + r'/training', self.training_status)
+        self.add_route('POST', FACE_PREFIX + r'/detect', self.detect)
+        self.add_route('POST', FACE_PREFIX + r'/identify', self.identify)
+        self.add_route('POST', FACE_PREFIX + r'/verify', self.verify)
+
+    def _group(self, request):
+        return self.person_groups.get(request.match.group('group'))
+
+    def create_person_group(self, request):
+        with self.state_lock:
+            body = request.json() or {}
+            self.person_groups[request.match.group('group')] = {'name': body.get('name'), 'persons': {}, 'training': None}
+        return 200, ''
+
+    def list_person_groups(self, request):
+        start, top = request.query.get('start'), int(request.query.get('top', 1000))
+        with self.state_lock:
+            group_ids = sorted(group_id for group_id in self.person_groups if start is None or group_id > start)[:top]
+            return 200, [{'personGroupId': group_id, 'name': self.person_groups[group_id]['name']} for group_id in group_ids]
+
+    def delete_person_group(self, request):
+        with self.state_lock:
+            if self.person_groups.pop(request.match.group('group'), None) is None:
+                return 404, {'error': {'code': 'PersonGroupNotFound'}}
+        return 200, ''
+
+    def add_person(self, request):
+        with self.state_lock:
+            group = self._group(request)
+            if group is None:
+                return 404, {'error': {'code': 'PersonGroupNotFound'}}
+            person_id = str(uuid.uuid4())
+            group['persons'][person_id] = []
+        return 200, {'personId': person_id}
+
+    def list_persons(self, request):
+        with self.state_lock:
+            group = self._group(request)
+            if group is None:
+                return 404, {'error': {'code': 'PersonGroupNotFound'}}
+            return 200, [{'personId': person_id, 'persistedFaceIds': list(faces)} for person_id, faces in group['persons'].items()]
+
+    def delete_person(self, request):
+        with self.state_lock:
+            group = self._group(request)
+            if group is None or group['persons'].pop(request.match.group('person'), None) is None:
+                return 404, {'error': {'code': 'PersonNotFound'}}
+        return 200, ''
+
+    def add_face(self, request):
+        with self.state_lock:
+            group = self._group(request)
+            faces = group['persons'].get(request.match.group('person')) if group else None
+            if faces is None:
+                return 404, {'error': {'code': 'PersonNotFound'}}
+            face_id = str(uuid.uuid4())
+            faces.append(face_id)
+        return 200, {'persistedFaceId': face_id}
+
+    def delete_face(self, request):
+        with self.state_lock:
+            group = self._group(request)
+            faces = group['persons'].get(request.match.group('person')) if group else None
+            if not faces or request.match.group('face') not in faces:
+                return 404, {'error': {'code': 'PersistedFaceNotFound'}}
+            faces.remove(request.match.group('face'))
+        return 200, ''
+
+    def train(self, request):
+        with self.state_lock:
+            group = self._group(request)
+            if group is None:
+                return 404, {'error': {'code': 'PersonGroupNotFound'}}
+            group['training'] = 'running'
+            group['trained_at'] = time.monotonic() + self.training_seconds
+        return 202, ''
+
+    def training_status(self, request):
+        group = self._group(request)
+        if group is None or group['training'] is None:
+            return 404, {'error': {'code': 'PersonGroupNotTrained'}}
+        if group['training'] == 'running' and time.monotonic() >= group['trained_at']:
+            group['training'] = 'succeeded'
+        return 200, {'status': group['training']}
+
+    def detect(self, request):
+        face = {'faceId': str(uuid.uuid4()), 'faceRectangle': {'top': 10, 'left': 10, 'width': 100, 'height': 100}}
+        return 200, [face]
+
+    def identify(self, request):
+        body = request.json()
+        group = self.person_groups.get(body.get('personGroupId'))
+        candidates = [{'personId': person_id, 'confidence': self.confidence} for person_id in (group or {}).get('persons', {})]
+        return 200, [{'faceId': face_id, 'candidates': candidates} for face_id in body.get('faceIds', [])]
+
+    def verify(self, request):
+        return 200, {'isIdentical': self.confidence >= 0.5, 'confidence': self.confidence}
@@ -0,0 +1,197 @@
+'''
+Minimal threaded HTTP/1.1 stub server used to benchmark the kiosk clients without Azure.
+
+Routes are (method, regex) pairs mapped to handlers. The server keeps connections alive, counts the
+TCP connections it accepts and the requests it serves, and can inject latency with random jitter,
+server errors and 429 throttling (with Retry-After) into a share of the requests.
+'''
+import re
+import json
+import time
+import random
+import threading
+from typing import Callable, Optional
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class StubRequest:
+    def __init__(self, method:str, path:str, query:dict, headers, body:bytes, match:re.Match) -> None:
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = body
+        self.match = match
+
+    def json(self):
+        return json.loads(self.body or b'null')
+
+class _CountingHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, server_address, handler_class, stub) -> None:
+        self.stub = stub
+        super().__init__(server_address, handler_class)
+
+    def process_request(self, request, client_address):
+        # Called once per accepted TCP connection
+        self.stub._count('connections')
+        super().process_request(request, client_address)
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately; don't let Nagle delay keep-alive responses
+    disable_nagle_algorithm = True
+
+    def _read_body(self) -> bytes:
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().strip() or b'0', 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+            return b''.join(chunks)
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _dispatch(self) -> None:
+        body = self._read_body()
+        status, payload, headers = self.server.stub.dispatch(self.command, self.path, self.headers, body)
+
+        if isinstance(payload, (dict, list)):
+            data = json.dumps(payload).encode()
+            headers.setdefault('Content-Type', 'application/json')
+        elif isinstance(payload, str):
+            data = payload.encode()
+        else:
+            data = payload or b''
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, str(value))
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = do_PUT = do_DELETE = do_PATCH = _dispatch
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+class StubServer:
+    '''
+    Threaded stub HTTP server with a regex route table.
+
+    Handlers receive a StubRequest and return (status, payload) or (status, payload, headers),
+    where payload is a dict/list (sent as JSON), str, bytes or None.
+    '''
+    def __init__(self, host:str='127.0.0.1', port:int=0, latency:float=0.0, jitter:float=0.0,
+                 error_rate:float=0.0, throttle_rate:float=0.0, retry_after:float=1.0, seed:Optional[int]=None) -> None:
+        '''
+        :param latency: Seconds to wait before answering each request
+        :param jitter: Up to this many seconds added to the latency at random
+        :param error_rate: Share of the requests answered with a 500 error
+        :param throttle_rate: Share of the requests answered with a 429 and a Retry-After header
+        :param retry_after: Retry-After seconds of the throttled requests
+        :param seed: Random seed of the jitter and the injected faults
+        '''
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.routes = []
+        self.counters = {'connections': 0, 'requests': 0, 'throttled': 0, 'errors': 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+
+    def add_route(self, method:str, pattern:str, handler:Callable) -> None:
+        self.routes.append((method, re.compile(pattern + '$'), handler))
+
+    def route(self, method:str, pattern:str) -> Callable:
+        def decorator(handler):
+            self.add_route(method, pattern, handler)
+            return handler
+        return decorator
+
+    def _count(self, name:str, amount:int=1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def reset_counters(self) -> None:
+        with self._lock:
+            for name in self.counters:
+                self.counters[name] = 0
+
+    def request_delay(self, method:str, path:str) -> float:
+        '''
+        Seconds to wait before answering a request; override for per-route latency
+        '''
+        return self.latency
+
+    def injected_fault(self) -> Optional[tuple]:
+        '''
+        Throttling or server error response to answer instead of the route's, or None
+        '''
+        with self._lock:
+            draw = self._random.random()
+        if draw < self.throttle_rate:
+            self._count('throttled')
+            return 429, {'error': {'code': '429', 'message': 'Rate limit is exceeded. Try again later.'}}, {'Retry-After': f'{self.retry_after:g}'}
+        if draw < self.throttle_rate + self.error_rate:
+            self._count('errors')
+            return 500, {'error': {'code': 'InternalServerError', 'message': 'Injected stub error.'}}, {}
+        return None
+
+    def dispatch(self, method:str, raw_path:str, headers, body:bytes) -> tuple:
+        self._count('requests')
+        parsed = urlparse(raw_path)
+        delay = self.request_delay(method, parsed.path)
+        if self.jitter:
+            with self._lock:
+                delay += self._random.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+        fault = self.injected_fault() if self.throttle_rate or self.error_rate else None
+        if fault is not None:
+            return fault
+
+        for route_method, pattern, handler in self.routes:
+            match = pattern.match(parsed.path)
+            if route_method == method and match:
+                query = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+                result = handler(StubRequest(method, parsed.path, query, headers, body, match))
+                status, payload = result[0], result[1]
+                response_headers = dict(result[2]) if len(result) > 2 else {}
+                return status, payload, response_headers
+        return 404, {'error': {'code': 'NotFound', 'message': f'No stub route for {method} {parsed.path}'}}, {}
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> 'StubServer':
+        self._httpd = _CountingHTTPServer((self.host, self.port), _StubHandler, self)
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self) -> 'StubServer':
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
@@ -0,0 +1,13 @@
+'''
+Stand-ins for the check-in stages of kiosk_main in the pipeline and queue benchmarks.
+'''
+import time
+
+def sleeper(seconds:float, value=None):
+    '''
+    Stage that sleeps for the given latency and returns value, whatever its arguments
+    '''
+    def stage(*args):
+        time.sleep(seconds)
+        return value
+    return stage
@@ -0,0 +1,89 @@
+'''
+Stub of the Azure Video Indexer endpoints used by get_faces/video_indexer_client.py: the ARM account
+and access token calls, video upload, the index (polled until processed) and face thumbnails.
+'''
+import io
+import os
+import time
+import uuid
+import threading
+from PIL import Image
+from benchmarks.stubs.server import StubServer
+
+ACCOUNT_PREFIX = r'/(?P<location>[^/]+)/Accounts/(?P<account>[^/]+)'
+ARM_ACCOUNT = (r'/subscriptions/(?P<subscription>[^/]+)/resource[Gg]roups/(?P<group>[^/]+)'
+               r'/providers/Microsoft\.VideoIndexer/accounts/(?P<name>[^/]+)')
+
+def make_jpeg(side:int=96) -> bytes:
+    image_bytes = io.BytesIO()
+    Image.frombytes('RGB', (side, side), os.urandom(side * side * 3)).save(image_bytes, format='JPEG')
+    return image_bytes.getvalue()
+
+class VideoIndexerStub(StubServer):
+    '''
+    Serves the account, uploads, indexes and face thumbnails. An uploaded video stays 'Processing'
+    for indexing_seconds before its index is 'Processed'. Every fail_every-th thumbnail answers its
+    first request with a 503, to exercise the client's retries.
+    '''
+    location = 'trial'
+    account_id = 'stub-account'
+
+    def __init__(self, thumbnails:int=20, fail_every:int=0, indexing_seconds:float=0.0, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.thumbnail_ids = [f'thumb-{idx}' for idx in range(thumbnails)]
+        self.thumbnails = {thumb_id: make_jpeg() for thumb_id in self.thumbnail_ids}
+        self.fail_every = fail_every
+        self.failed = set()
+        self.indexing_seconds = indexing_seconds
+        self.videos = {}  # video id -> time the index is processed
+        self.state_lock = threading.Lock()
+        self.add_route('POST', ARM_ACCOUNT + r'/generateAccessToken', self.generate_access_token)
+        self.add_route('GET', ARM_ACCOUNT, self.get_account)
+        self.add_route('POST', ACCOUNT_PREFIX + r'/Videos', self.upload_video)
+        self.add_route('GET', ACCOUNT_PREFIX + r'/Videos/(?P<video>[^/]+)/Index', self.get_index)
+        self.add_route('GET', ACCOUNT_PREFIX + r'/Videos/(?P<video>[^/]+)/Thumbnails/(?P<thumb>[^/]+)', self.get_thumbnail)
+
+    @property
+    def account(self) -> dict:
+        # VideoIndexerClient.account, as returned by the ARM account API
+        return {'location': self.location, 'properties': {'accountId': self.account_id}}
+
+    def insights(self) -> dict:
+        thumbnails = [{'id': thumb_id, 'fileName': f'FaceInstanceThumbnail_{thumb_id}.jpg'} for thumb_id in self.thumbnail_ids]
+        emotions = [{'type': 'Joy', 'instances': [{'confidence': 0.8}]}]
+        return {'state': 'Processed',
+                'videos': [{'state': 'Processed', 'insights': {'faces': [{'thumbnails': thumbnails}], 'emotions': emotions}}],
+                'summarizedInsights': {'sentiments': [{'sentimentKey': 'Neutral'}]}}
+
+    def generate_access_token(self, request):
+        return 200, {'accessToken': 'stub-video-indexer-token'}
+
+    def get_account(self, request):
+        return 200, {'name': request.match.group('name'), **self.account}
+
+    def upload_video(self, request):
+        video_id = uuid.uuid4().hex[:10]
+        with self.state_lock:
+            self.videos[video_id] = time.monotonic() + self.indexing_seconds
+        return 200, {'id': video_id, 'state': 'Uploaded'}
+
+    def get_index(self, request):
+        processed_at = self.videos.get(request.match.group('video'))
+        if processed_at is None:
+            return 404, {'ErrorType': 'VIDEO_NOT_FOUND'}
+        if time.monotonic() < processed_at:
+            return 200, {'state': 'Processing'}
+        return 200, self.insights()
+
+    def get_thumbnail(self, request):
+        thumb_id = request.match.group('thumb')
+        if thumb_id not in self.thumbnails:
+            return 404, {'ErrorType': 'THUMBNAIL_NOT_FOUND'}
+        with self.state_lock:
+            fail = (self.fail_every and self.thumbnail_ids.index(thumb_id) % self.fail_every == 0
+                    and thumb_id not in self.failed)
+            if fail:
+                self.failed.add(thumb_id)
+        if fail:
+            return 503, {'ErrorType': 'SERVER_ERROR'}, {'Retry-After': '0'}
+        return 200, self.thumbnails[thumb_id], {'Content-Type': 'image/jpeg'}
@@ -0,0 +1,149 @@
+'''
+Headless HTTP/JSON API for physical kiosks.
+
+A kiosk posts the ID, boarding pass and video of a passenger as a multipart request and gets a job id
+back at once; the check-in runs kiosk_main.main on the shared check-in queue (utility/job_queue.py) and
+the kiosk polls, or long-polls, the job for per-stage progress and the validation message.
+
+    POST /checkins                 multipart fields id, boarding_pass, video -> 202 {"id", "status", ...}
+                                   without boarding_pass, id is one document holding both
+                                   503 with Retry-After when the queue is full
+    GET  /checkins/<id>?wait=&since=
+                                   job status, stages and result; with wait, block up to wait seconds
+                                   until the job changes after version since (or finishes)
+    GET  /health                   queue statistics
+    GET  /metrics                  check-in metrics in the Prometheus text format (404 unless telemetry is enabled)
+
+Run with: python src/app/api/kiosk_api.py --port 8000
+'''
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import shutil
+import logging
+import argparse
+from typing import Optional
+from flask import Flask, jsonify, request
+from werkzeug.utils import secure_filename
+from kiosk_main import main
+from utility.job_queue import JobQueue, QueueFullError, get_job_queue
+from utility.settings import get_settings
+from utility import telemetry
+from utility.logs import configure_logging
+from get_documents.preprocess_documents import start_preprocessing_pool
+from get_custom_text.decode_boarding_pass import check_barcode_reader
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)-15s %(message)s")
+logger = logging.getLogger()
+
+# Multipart fields of a check-in
+UPLOAD_FIELDS = ('id', 'boarding_pass', 'video')
+
+# Fields a check-in may leave out: without a boarding pass, the ID upload holds both documents
+OPTIONAL_FIELDS = ('boarding_pass',)
+
+# Longest long-poll a kiosk may ask for, in seconds
+MAX_WAIT_SECONDS = 30.0
+
+# Seconds a rejected kiosk is asked to wait before submitting again
+RETRY_AFTER_SECONDS = 5
+
+# Repository root, for upload folders relative to it
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+def upload_folder_path() -> str:
+    folder = (get_settings().config.get('app') or {}).get('upload_folder', 'src/app/uploads')
+    return folder if os.path.isabs(folder) else os.path.join(ROOT_DIR, folder)
+
+def run_check_in(job, paths:dict, job_dir:str) -> str:
+    # Worker-side check-in; the uploaded files are removed once it is done
+    try:
+        return main(paths['id'], paths.get('boarding_pass'), paths['video'], on_stage=job.update_stage)
+    finally:
+        shutil.rmtree(job_dir, ignore_errors=True)
+
+def create_app(job_queue:Optional[JobQueue]=None, upload_folder:Optional[str]=None) -> Flask:
+    '''
+    Create the kiosk API app
+
+    :param job_queue: Check-in queue (default: the process-wide queue configured from the app config section)
+    :param upload_folder: Directory for the uploaded files, one subdirectory per job (default: app.upload_folder)
+    '''
+    app = Flask(__name__)
+
+    def queue() -> JobQueue:
+        return job_queue or get_job_queue()
+
+    @app.post('/checkins')
+    def submit_check_in():
+        missing = [field for field in UPLOAD_FIELDS if not request.files.get(field) and field not in OPTIONAL_FIELDS]
+        if missing:
+            return jsonify({'error': f"Missing files: {', '.join(missing)}"}), 400
+
+        # Admission control before saving the uploads
+        check_in_queue = queue()
+        try:
+            check_in_queue.check_admission()
+        except QueueFullError:
+            return busy_response()
+
+        job_dir = os.path.join(upload_folder or upload_folder_path(), os.urandom(8).hex())
+        os.makedirs(job_dir, exist_ok=True)
+        paths = {}
+        for field in UPLOAD_FIELDS:
+            upload = request.files.get(field)
+            if not upload:
+                continue
+            paths[field] = os.path.join(job_dir, f"{field}_{secure_filename(upload.filename or field)}")
+            upload.save(paths[field])
+
+        try:
+            job = check_in_queue.submit(lambda job: run_check_in(job, paths, job_dir))
+        except QueueFullError:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            return busy_response()
+        logger.info(f"Check-in {job.id} queued")
+        return jsonify(job.as_dict()), 202, {'Location': f"/checkins/{job.id}"}
+
+    @app.get('/checkins/<job_id>')
+    def get_check_in(job_id:str):
+        job = queue().get(job_id)
+        if job is None:
+            return jsonify({'error': f"Unknown check-in {job_id}"}), 404
+        try:
+            wait = min(float(request.args.get('wait', 0)), MAX_WAIT_SECONDS)
+            since = int(request.args.get('since', job.version))
+        except ValueError:
+            return jsonify({'error': "wait and since must be numbers"}), 400
+        if wait > 0:
+            job.wait_for_update(since, timeout=wait)
+        return jsonify(job.as_dict())
+
+    @app.get('/health')
+    def health():
+        return jsonify(queue().stats())
+
+    @app.get('/metrics')
+    def metrics():
+        body = telemetry.render_prometheus()
+        if body is None:
+            return jsonify({'error': "Telemetry is disabled"}), 404
+        return body, 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+    def busy_response():
+        return jsonify({'error': "All kiosk agents are busy, retry later"}), 503, {'Retry-After': str(RETRY_AFTER_SECONDS)}
+
+    return app
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Kiosk check-in API")
+    arg_parser.add_argument('--host', default='127.0.0.1')
+    arg_parser.add_argument('--port', type=int, default=8000)
+    args = arg_parser.parse_args()
+    configure_logging()
+    start_preprocessing_pool()
+    check_barcode_reader()
+    # Threaded, so long-polls do not hold up submissions; the check-in queue bounds the actual work
+    create_app().run(host=args.host, port=args.port, threaded=True)
@@ -1,71 +1,113 @@
+import os
 import sys
-sys.path.append('/home/mnahsan21/Udacity/Azure/automated-boarding-kiosk/src/')
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
 import gradio as gr
 from flask import Flask
 from kiosk_main import main
+from utility.job_queue import Job, QueueFullError, get_job_queue
+from utility.logs import configure_logging
+from get_documents.preprocess_documents import start_preprocessing_pool
+from get_custom_text.decode_boarding_pass import check_barcode_reader
 
 # Flask app to run the backend
 app = Flask(__name__)
 
-# Temporary variables to store uploaded files
-id_file = None
-boarding_pass_file = None
-video_file = None
-
-# Functions to handle file uploads
-def upload_id(id_upload):
-    global id_file
-    id_file = id_upload
-    return "ID uploaded successfully!"
-
-def upload_boarding_pass(bp_upload):
-    global boarding_pass_file
-    boarding_pass_file = bp_upload
-    return "Boarding pass uploaded successfully!"
-
-def upload_video(video_upload):
-    global video_file
-    video_file = video_upload
-    return "Video uploaded successfully!"
-
-# Function to validate all files
-def validate():
-    if id_file and boarding_pass_file and video_file:
-        try:
-            validation_message = main(id_file.name, boarding_pass_file.name, video_file.name)
-            return validation_message
-        except Exception as e:
-            return f"Error during validation: {str(e)}"
+# Message shown when every worker is busy and the queue is full
+BUSY_MESSAGE = "All kiosk agents are busy. Please try again in a moment."
+
+# Seconds between progress refreshes when no stage changed
+PROGRESS_INTERVAL = 1.0
+
+# Stage names shown while a check-in runs
+STAGE_LABELS = {
+    'manifest': 'Flight manifest',
+    'id': 'ID document',
+    'boarding_pass': 'Boarding pass',
+    'documents': 'Document check',
+    'video': 'Video indexing',
+    'faces': 'Face verification',
+    'validation': 'Validation',
+}
+
+# Functions to handle file uploads; each session keeps its own files in a gr.State dictionary
+def upload_id(id_upload, session):
+    return "ID uploaded successfully!", {**session, 'id_file': id_upload}
+
+def upload_boarding_pass(bp_upload, session):
+    return "Boarding pass uploaded successfully!", {**session, 'boarding_pass_file': bp_upload}
+
+def upload_video(video_upload, session):
+    return "Video uploaded successfully!", {**session, 'video_file': video_upload}
+
+# Function to render the progress of a queued check-in
+def render_progress(job:Job) -> str:
+    snapshot = job.as_dict()
+    if snapshot['status'] == 'queued':
+        return "Waiting for a kiosk agent..."
+    lines = [f"{STAGE_LABELS.get(name, name)}: {status}" for name, status in snapshot['stages'].items()]
+    return "Checking your documents...\n" + "\n".join(lines)
+
+# Function to validate the session's files on the check-in queue, streaming progress to the UI
+def validate(session):
+    id_file, boarding_pass_file, video_file = (session.get(key) for key in ('id_file', 'boarding_pass_file', 'video_file'))
+    if not (id_file and boarding_pass_file and video_file):
+        yield "Please upload all files (ID, Boarding Pass, Video) to proceed."
+        return
+
+    try:
+        job = get_job_queue().submit(
+            lambda job: main(id_file.name, boarding_pass_file.name, video_file.name, on_stage=job.update_stage))
+    except QueueFullError:
+        yield BUSY_MESSAGE
+        return
+
+    version = -1
+    while not job.done:
+        version = job.wait_for_update(version, timeout=PROGRESS_INTERVAL)
+        if not job.done:
+            yield render_progress(job)
+    if job.status == 'failed':
+        yield f"Error during validation: {str(job.error)}"
     else:
-        return "Please upload all files (ID, Boarding Pass, Video) to proceed."
+        yield job.result
 
+# Gradio Interface; built by build_app under __main__ only, so the spawned preprocessing workers
+# that re-import this script do not build the UI
+def build_app() -> gr.Blocks:
+    with gr.Blocks() as gradio_app:
+        gr.Markdown("## Flight Verification Kiosk")
 
-# Gradio Interface
-with gr.Blocks() as gradio_app:
-    gr.Markdown("## Flight Verification Kiosk")
+        # Uploaded files of this browser session
+        session_state = gr.State({})
     
-    id_output = gr.Textbox(label="ID Upload Status")
-    boarding_pass_output = gr.Textbox(label="Boarding Pass Upload Status")
-    video_output = gr.Textbox(label="Video Upload Status")
+        id_output = gr.Textbox(label="ID Upload Status")
+        boarding_pass_output = gr.Textbox(label="Boarding Pass Upload Status")
+        video_output = gr.Textbox(label="Video Upload Status")
     
-    validation_output = gr.Textbox(label="Validation Message", placeholder="Validation result will appear here")
+        validation_output = gr.Textbox(label="Validation Message", placeholder="Validation result will appear here")
 
-    # Upload Buttons
-    id_upload_button = gr.File(label="Upload ID", file_types=["image", ".pdf"], file_count="single")
-    bp_upload_button = gr.File(label="Upload Boarding Pass", file_types=["image", ".pdf"], file_count="single")
-    video_upload_button = gr.File(label="Upload Video", file_types=[".mp4", ".avi"], file_count="single")
+        # Upload Buttons
+        id_upload_button = gr.File(label="Upload ID", file_types=["image", ".pdf"], file_count="single")
+        bp_upload_button = gr.File(label="Upload Boarding Pass", file_types=["image", ".pdf"], file_count="single")
+        video_upload_button = gr.File(label="Upload Video", file_types=[".mp4", ".avi"], file_count="single")
     
-    # Action Buttons
-    validate_button = gr.Button("Validate")
+        # Action Buttons
+        validate_button = gr.Button("Validate")
 
-    # Link actions to Gradio functions
-    id_upload_button.upload(upload_id, inputs=id_upload_button, outputs=id_output)
-    bp_upload_button.upload(upload_boarding_pass, inputs=bp_upload_button, outputs=boarding_pass_output)
-    video_upload_button.upload(upload_video, inputs=video_upload_button, outputs=video_output)
+        # Link actions to Gradio functions
+        id_upload_button.upload(upload_id, inputs=[id_upload_button, session_state], outputs=[id_output, session_state])
+        bp_upload_button.upload(upload_boarding_pass, inputs=[bp_upload_button, session_state], outputs=[boarding_pass_output, session_state])
+        video_upload_button.upload(upload_video, inputs=[video_upload_button, session_state], outputs=[video_output, session_state])
     
-    validate_button.click(validate, outputs=validation_output)
+        # The check-in queue (app.workers, app.max_queued) bounds the work and rejects check-ins when full,
+        # so Gradio passes every click through to it instead of serializing them
+        validate_button.click(validate, inputs=session_state, outputs=validation_output, concurrency_limit=None)
+    return gradio_app
 
 # Launch the app
 if __name__ == "__main__":
-    gradio_app.launch()
+    configure_logging()
+    start_preprocessing_pool()
+    check_barcode_reader()
+    build_app().launch()
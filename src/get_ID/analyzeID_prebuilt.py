@@ -1,40 +1,43 @@
+import io
 import os
 import logging
-import yaml
+from functools import lru_cache
+from typing import Optional
 from urllib.parse import urlparse
-from dotenv import load_dotenv
-from azure.core.credentials import AzureKeyCredential
-from azure.ai.documentintelligence import DocumentIntelligenceClient
 from azure.ai.documentintelligence.models import AnalyzeResult, AnalyzeDocumentRequest
+from utility.settings import get_settings
+from utility.result_cache import ResultCache, ResultStore, content_key
+from utility.document_intelligence_clients import get_document_intelligence_client
+from get_documents.preprocess_documents import preprocess_document
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)-15s %(message)s")
 logger = logging.getLogger()
 
-def analyze_identity_documents(path_to_id_document):
-    # Load environment variables
-    endpoint = os.environ.get("DOCUMENTINTELLIGENCE_ENDPOINT")
-    key = os.environ.get("DOCUMENTINTELLIGENCE_API_KEY")
-
-    # Create DocumentIntelligenceClient
-    client = DocumentIntelligenceClient(endpoint=endpoint, credential=AzureKeyCredential(key))
+# Prebuilt model of the ID analysis
+ID_MODEL_ID = "prebuilt-idDocument"
 
-    # Check if path_to_id_document is a URL or a local file path
-    if bool(urlparse(path_to_id_document).scheme):  # If it's a URL
-        poller = client.begin_analyze_document(
-            "prebuilt-idDocument", 
-            AnalyzeDocumentRequest(url_source=path_to_id_document)
-        )
-    else:  # Treat as a local file
-        path_to_sample_documents = os.path.abspath(os.path.join(os.path.abspath(__file__), "..", path_to_id_document))
-        with open(path_to_sample_documents, "rb") as f:
-            poller = client.begin_analyze_document(
-                "prebuilt-idDocument",
-                analyze_request=f,
-                content_type="application/octet-stream"
-            )
+# Repository root, for cache store paths relative to it
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
 
-    id_documents: AnalyzeResult = poller.result()
+@lru_cache(maxsize=None)
+def get_id_analysis_cache() -> Optional[ResultCache]:
+    '''
+    Get the process-wide cache of ID analysis results, configured from the doc_intelligence.id_cache
+    config section (enabled, max_entries, ttl, store_path); None if the cache is disabled
+    '''
+    config = (get_settings().config.get('doc_intelligence') or {}).get('id_cache') or {}
+    if not config.get('enabled', False):
+        return None
+    max_entries = config.get('max_entries', 256)
+    store = None
+    store_path = config.get('store_path')
+    if store_path:
+        if store_path != ':memory:' and not os.path.isabs(store_path):
+            store_path = os.path.join(ROOT_DIR, store_path)
+        store = ResultStore(store_path, max_entries=max_entries)
+    return ResultCache('id_analysis', max_entries=max_entries, ttl=config.get('ttl', 900), store=store)
 
+def extract_id_fields(id_documents: AnalyzeResult) -> list:
     # Initialize the dictionary to store all results
     results = []
 
@@ -59,14 +62,65 @@ def analyze_identity_documents(path_to_id_document):
 
     return results
 
+def analyze_id_document_bytes(document_bytes: bytes, pages: Optional[str] = None) -> list:
+    '''
+    Analyze an ID document with the prebuilt ID model, without the cache
+
+    :param document_bytes: Content of the ID image or PDF
+    :param pages: Pages to analyze, e.g. "1" or "1-2,4" (default: all)
+    :return: One dict of fields (value, confidence) per document found
+    '''
+    poller = get_document_intelligence_client().begin_analyze_document(
+        ID_MODEL_ID,
+        analyze_request=io.BytesIO(document_bytes),
+        pages=pages,
+        content_type="application/octet-stream"
+    )
+    return extract_id_fields(poller.result())
+
+def analyze_id_document_cached(document_bytes: bytes, pages: Optional[str] = None, preprocess: bool = True) -> list:
+    '''
+    Analyze an ID document with the prebuilt ID model, through the cache if it is enabled
+
+    :param document_bytes: Content of the ID image or PDF
+    :param pages: Pages to analyze (default: all), part of the cache key
+    :param preprocess: Preprocess the document before the upload (see preprocess_document); a cache hit skips it
+    '''
+    def analyze():
+        return analyze_id_document_bytes(preprocess_document(document_bytes) if preprocess else document_bytes, pages)
+
+    cache = get_id_analysis_cache()
+    if cache is None:
+        return analyze()
+    model_key = ID_MODEL_ID if pages is None else f"{ID_MODEL_ID}:{pages}"
+    return cache.get_or_compute(content_key(document_bytes, model_key), analyze)
+
+def analyze_identity_documents(path_to_id_document):
+    '''
+    Analyze an ID document given as a URL or a local file path. The results of local files are cached
+    by content (see get_id_analysis_cache), so a passenger retrying with the same ID image does not
+    pay for a second analysis.
+    '''
+    # Check if path_to_id_document is a URL or a local file path
+    if bool(urlparse(path_to_id_document).scheme):  # If it's a URL
+        poller = get_document_intelligence_client().begin_analyze_document(
+            ID_MODEL_ID,
+            AnalyzeDocumentRequest(url_source=path_to_id_document)
+        )
+        return extract_id_fields(poller.result())
+
+    # Treat as a local file
+    path_to_sample_documents = os.path.abspath(os.path.join(os.path.abspath(__file__), "..", path_to_id_document))
+    with open(path_to_sample_documents, "rb") as f:
+        document_bytes = f.read()
+    return analyze_id_document_cached(document_bytes)
+
 if __name__ == "__main__":
     from azure.core.exceptions import HttpResponseError
-    from dotenv import find_dotenv, load_dotenv
 
     # Load environment variables
     try:
-        load_dotenv(find_dotenv())
-        path_to_id_document = os.environ.get("file_path_to_id")
+        path_to_id_document = get_settings().get("file_path_to_id")
         results = analyze_identity_documents(path_to_id_document)
         print(results)  # Display the dictionary with the captured values and confidence scores
     except HttpResponseError as error:
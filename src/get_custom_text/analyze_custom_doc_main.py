@@ -1,26 +1,41 @@
-import os
 import logging
-import yaml
 from urllib.parse import urlparse
 from typing import Optional
-from dotenv import find_dotenv, load_dotenv
-from get_custom_text.buildCustomModel import build_model as build
-from get_custom_text.extract_custom_doc import analyze_custom_documents as analyze
+from get_custom_text.extract_custom_doc import analyze_custom_documents as analyze, local_document_path
+from get_custom_text.decode_boarding_pass import decode_boarding_pass
+from utility.settings import get_settings
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)-15s %(message)s")
 logger = logging.getLogger()
 
+def resolve_model_id(model_id:Optional[str], training_folder_path:Optional[str]) -> str:
+    '''
+    The configured model id, or else the registry's model of the training set: reused if its training
+    set is unchanged, otherwise built (see model_registry)
+    '''
+    if model_id is not None:
+        return model_id
+    if not training_folder_path:
+        logger.info('Training folder path to build custom model is missing.')
+        raise ValueError('Training folder path to build custom model is missing.')
+    from get_custom_text.model_registry import get_model_registry
+    return get_model_registry().get_model_id(training_folder_path)
+
 def main(path_to_id_document:str, model_id:Optional[str], training_folder_path:Optional[str]) -> list:
     from azure.core.exceptions import HttpResponseError
 
+    # Decode the barcode of a local boarding pass on the device; the custom model only reads the
+    # documents without a barcode that decodes
+    if path_to_id_document and not urlparse(path_to_id_document).scheme:
+        with open(local_document_path(path_to_id_document), 'rb') as f:
+            doc_info = decode_boarding_pass(f.read())
+        if doc_info:
+            logger.info('Extracted the boarding pass fields from its barcode')
+            return doc_info
+
     try:
-        logger.info('Build a custom model if no existing model is specified')
-        # Build a custom model if no existing model is specified
-        if model_id is None:
-            if training_folder_path is None:
-                logger.info('Training folder path to build custom model is missing.')
-                raise error
-            model_id = build(training_folder_path)
+        logger.info('Get the custom model from the registry if no existing model is specified')
+        model_id = resolve_model_id(model_id, training_folder_path)
 
         # Analyze documents using the created or provided model
         logger.info('Extract text based on the custom model')
@@ -41,13 +56,10 @@ def main(path_to_id_document:str, model_id:Optional[str], training_folder_path:O
 
 if __name__ == "__main__":
     logger.info('get the env variables and config file')
-    # Load the config file
-    with open('./config.yaml') as yaml_file:
-        config = yaml.safe_load(yaml_file)
-    model_id = config['doc_intelligence']['custom_models']['boarding_pass_1']
-    # Load environment variables 
-    load_dotenv(find_dotenv())
-    training_folder_path = os.getenv('training_folder_path')
-    path_to_id_document = os.getenv("file_path_boarding_pass")  # SAS URL or local path
+    # Load the config file and environment variables
+    settings = get_settings()
+    model_id = settings.config['doc_intelligence']['custom_models']['boarding_pass_1']
+    training_folder_path = settings.get('training_folder_path')
+    path_to_id_document = settings.get("file_path_boarding_pass")  # SAS URL or local path
     main(path_to_id_document, model_id, training_folder_path)
     
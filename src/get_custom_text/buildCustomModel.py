@@ -1,40 +1,33 @@
-import os
 import uuid
-from dotenv import find_dotenv, load_dotenv
-from azure.ai.documentintelligence import DocumentIntelligenceAdministrationClient
+from typing import Optional
 from azure.ai.documentintelligence.models import (
         DocumentBuildMode,
         BuildDocumentModelRequest,
         AzureBlobContentSource,
         DocumentModelDetails,
         )
-from azure.core.credentials import AzureKeyCredential 
+from utility.settings import get_settings
+from utility.document_intelligence_clients import get_document_intelligence_administration_client
 
-load_dotenv(find_dotenv())
-training_folder_path = os.getenv('training_folder_path')
-training_folder_path = training_folder_path.strip()
-if not training_folder_path:
-    raise ValueError("The SAS URI for the training folder path is missing")
+def build_model(training_folder_path, description:str="my model description", tags:Optional[dict]=None):
+    # Validate the SAS URI for the training folder
+    training_folder_path = (training_folder_path or '').strip()
+    if not training_folder_path:
+        raise ValueError("The SAS URI for the training folder path is missing")
 
-# print(f"Training folder path: {training_folder_path}")
-
-def build_model(training_folder_path):
     # [START build_model]
-    # Load environment variables
-    load_dotenv(find_dotenv())
-    endpoint = os.getenv("DOCUMENTINTELLIGENCE_ENDPOINT")
-    key = os.getenv("DOCUMENTINTELLIGENCE_API_KEY")
     # container_sas_url = os.environ.get("CONTAINER_SAS_URL")
 
-    # Create DocumentIntelligenceClient
-    client = DocumentIntelligenceAdministrationClient(endpoint=endpoint, credential=AzureKeyCredential(key))
+    # Get the shared administration client
+    client = get_document_intelligence_administration_client()
     
     poller = client.begin_build_document_model(
     BuildDocumentModelRequest(
         model_id=str(uuid.uuid4()),
         build_mode=DocumentBuildMode.TEMPLATE,
         azure_blob_source=AzureBlobContentSource(container_url=training_folder_path),
-        description="my model description",
+        description=description,
+        tags=tags,
     )
 )
     model: DocumentModelDetails = poller.result()
@@ -59,6 +52,5 @@ def build_model(training_folder_path):
 
 if __name__ == '__main__':
      # Load environment variables 
-    load_dotenv(find_dotenv())
-    training_folder_path = os.getenv('training_folder_path')
+    training_folder_path = get_settings().get('training_folder_path')
     build_model(training_folder_path)
\ No newline at end of file
@@ -0,0 +1,199 @@
+'''
+On-device decoding of the IATA Bar Coded Boarding Pass (BCBP) printed on almost every boarding pass.
+
+The PDF417 (or Aztec, QR, Data Matrix) barcode of a boarding pass holds the passenger name, PNR,
+origin, destination, carrier, flight, date, compartment and seat of each leg (IATA Resolution 792).
+decode_boarding_pass reads it in milliseconds and returns the documents analyze_custom_documents
+returns, one per leg with the fields validate_boarding_pass reads, so the custom Document
+Intelligence model is only called when no barcode decodes. The barcode holds airport codes where
+the manifest holds city names: airports maps them, and a barcode with an airport missing from the map
+counts as not decoded, so the custom model reads the city names from the boarding pass instead.
+
+Reading barcodes requires zxing-cpp, and reading them from PDFs PyMuPDF (both in requirements.txt);
+without them every boarding pass, or every PDF one, goes to the custom model, with a warning logged once.
+
+    doc_intelligence:
+      barcode:
+        enabled: true
+        max_side: 2048        # longest side the image is decoded at, in pixels
+        pdf_dpi: 300          # resolution the PDF pages are rasterized at
+        airports:             # airport code -> manifest city
+          SFO: San Francisco
+'''
+import io
+import logging
+from functools import lru_cache
+from typing import Optional
+from PIL import Image
+from utility.settings import get_settings
+from utility import telemetry
+
+# Setup logging
+logger = logging.getLogger()
+
+# Model id and document type of the documents decoded from a barcode
+BCBP_MODEL_ID = 'bcbp-barcode'
+BCBP_DOC_TYPE = 'boardingPass.bcbp'
+
+# Barcode symbologies the IATA allows for boarding passes
+BCBP_FORMATS = 'PDF417,Aztec,QRCode,DataMatrix'
+
+# Sizes of the mandatory items: the unique part (format code, number of legs, passenger name,
+# electronic ticket indicator) and the part repeated per leg, up to its conditional section size
+BCBP_UNIQUE_SIZE = 23
+BCBP_LEG_SIZE = 37
+
+# Titles printed after the given name
+NAME_TITLES = ('MR', 'MRS', 'MS', 'MISS', 'MSTR', 'DR')
+
+# Function to get the doc_intelligence.barcode config section
+def barcode_config() -> dict:
+    return (get_settings().config.get('doc_intelligence') or {}).get('barcode') or {}
+
+def _field(value:str) -> dict:
+    # The barcode is error-corrected: what decodes is what was printed
+    return {'value': value, 'confidence': 1.0}
+
+def parse_bcbp(text:str, airports:Optional[dict]=None) -> list:
+    '''
+    Parse the mandatory items of a BCBP barcode
+
+    :param text: Barcode content, e.g. "M1HEROLD/LIBBY        EABC123 SFOORDUA 0234 110J003D0001 100"
+    :param airports: Airport code -> city name of the Origin and Destination fields (default: keep the codes)
+    :return: One document per leg, as analyze_custom_documents returns them
+    :raises ValueError: The text is not a BCBP barcode, or an airport is missing from airports
+    '''
+    if len(text) < BCBP_UNIQUE_SIZE + BCBP_LEG_SIZE or text[0] != 'M' or not text[1].isdigit():
+        raise ValueError("Not a BCBP barcode")
+    surname, _, given_name = text[2:22].strip().partition('/')
+    given_name = given_name.strip()
+    for title in NAME_TITLES:
+        if given_name.endswith(' ' + title):
+            given_name = given_name[:-len(title)].strip()
+            break
+
+    documents, offset = [], BCBP_UNIQUE_SIZE
+    for leg in range(int(text[1])):
+        item = text[offset:offset + BCBP_LEG_SIZE]
+        if len(item) < BCBP_LEG_SIZE:
+            raise ValueError(f"BCBP barcode truncated in leg {leg + 1}")
+        origin, destination = item[7:10].strip(), item[10:13].strip()
+        if airports is not None:
+            # A code would never match the manifest city: leave the boarding pass to the custom model
+            missing = [code for code in (origin, destination) if code not in airports]
+            if missing:
+                raise ValueError(f"Airports {', '.join(missing)} of leg {leg + 1} are missing from the airports map")
+            origin, destination = airports[origin], airports[destination]
+        fields = {
+            'First Name': _field(given_name),
+            'Last Name': _field(surname.strip()),
+            'Flight_No': _field(item[16:21].strip().lstrip('0')),
+            'Seat': _field(item[25:29].strip().lstrip('0')),
+            'Origin': _field(origin),
+            'Destination': _field(destination),
+            'Carrier': _field(item[13:16].strip()),
+            'PNR': _field(item[0:7].strip()),
+            'Flight_Date': _field(item[21:24].strip()),  # Day of the year
+            'Class': _field(item[24]),
+        }
+        documents.append({'document_index': leg + 1, 'doc_type': BCBP_DOC_TYPE, 'confidence': 1.0,
+                          'model_id': BCBP_MODEL_ID, 'fields': fields})
+        # The conditional items of the leg follow, their size in hex at the end of the mandatory items
+        try:
+            offset += BCBP_LEG_SIZE + int(item[35:37], 16)
+        except ValueError:
+            raise ValueError(f"Invalid conditional item size in leg {leg + 1} of the BCBP barcode")
+    return documents
+
+@lru_cache(maxsize=None)
+def barcode_reader():
+    '''
+    The zxingcpp module, or None if zxing-cpp is not installed (logged once)
+    '''
+    try:
+        import zxingcpp
+    except ImportError:
+        logger.warning("zxing-cpp is not installed: boarding pass barcodes are not decoded, every boarding pass "
+                       "goes to the custom model (pip install zxing-cpp)")
+        return None
+    return zxingcpp
+
+@lru_cache(maxsize=None)
+def pdf_reader():
+    '''
+    The fitz (PyMuPDF) module, or None if PyMuPDF is not installed (logged once)
+    '''
+    try:
+        import fitz
+    except ImportError:
+        logger.warning("PyMuPDF is not installed: barcodes of PDF boarding passes are not decoded (pip install PyMuPDF)")
+        return None
+    return fitz
+
+def check_barcode_reader() -> None:
+    '''
+    Log at startup if barcode decoding is enabled but zxing-cpp is not installed
+    '''
+    if barcode_config().get('enabled', False):
+        barcode_reader()
+
+def document_images(data:bytes, max_side:int=2048, pdf_dpi:int=300) -> list:
+    '''
+    Grayscale images of a document file content, downscaled to max_side: its pages for a PDF (none if
+    PyMuPDF is not installed). Camera and scanner images decode faster and more reliably downscaled,
+    as the sensor noise averages out.
+    '''
+    if data.startswith(b'%PDF'):
+        fitz = pdf_reader()
+        if fitz is None:
+            return []
+        with fitz.open(stream=data, filetype='pdf') as document:
+            images = [Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples).convert('L')
+                      for pixmap in (page.get_pixmap(dpi=pdf_dpi) for page in document)]
+    else:
+        with Image.open(io.BytesIO(data)) as image:
+            # JPEG: decode at the smallest scale still at least max_side on both sides
+            image.draft('L', (max_side, max_side))
+            images = [image.convert('L')]
+    for image in images:
+        # Bilinear: as reliable as Lanczos for the barcode modules, at two thirds of the time
+        image.thumbnail((max_side, max_side), Image.BILINEAR)
+    return images
+
+def read_barcodes(data:bytes, max_side:int=2048, pdf_dpi:int=300) -> list:
+    '''
+    Contents of the boarding pass barcodes of an image or PDF, in page order (none if zxing-cpp is not installed)
+    '''
+    zxingcpp = barcode_reader()
+    if zxingcpp is None:
+        return []
+    formats = zxingcpp.barcode_formats_from_str(BCBP_FORMATS)
+    return [barcode.text for image in document_images(data, max_side, pdf_dpi) for barcode in zxingcpp.read_barcodes(image, formats=formats)]
+
+def decode_boarding_pass(data:bytes) -> Optional[list]:
+    '''
+    Decode the BCBP barcode of a boarding pass
+
+    :param data: Image or PDF file content
+    :return: The documents of the first BCBP barcode, as analyze_custom_documents returns them, or None
+             if decoding is disabled or no BCBP barcode decodes
+    '''
+    config = barcode_config()
+    if not config.get('enabled', False):
+        return None
+    with telemetry.span('kiosk.barcode'):
+        try:
+            texts = read_barcodes(data, config.get('max_side', 2048), config.get('pdf_dpi', 300))
+        except (OSError, ValueError) as e:
+            # Not an image Pillow reads: leave it to the custom model
+            logger.warning(f"Could not read the boarding pass barcode: {e}")
+            texts = []
+        documents = None
+        for text in texts:
+            try:
+                documents = parse_bcbp(text, config.get('airports') or {})
+                break
+            except ValueError as e:
+                logger.info(f"Skipped a barcode of the boarding pass: {e}")
+    telemetry.count('kiosk_barcode_decodes_total', result='decoded' if documents else 'fallback')
+    return documents
@@ -1,35 +1,53 @@
+import io
 import os
+from typing import Optional
 from urllib.parse import urlparse
-from azure.core.credentials import AzureKeyCredential
-from azure.ai.documentintelligence import DocumentIntelligenceClient
 from azure.ai.documentintelligence.models import AnalyzeResult, AnalyzeDocumentRequest
+from utility.settings import get_settings
+from utility.document_intelligence_clients import get_document_intelligence_client
+from get_documents.preprocess_documents import preprocess_document
+
+# Function to resolve a local document path the way the analysis opens it
+def local_document_path(path_to_document: str) -> str:
+    return os.path.abspath(os.path.join(os.path.abspath(__file__), "..", path_to_document))
 
 def analyze_custom_documents(custom_model_id, path_to_id_document):
-    # Load environment variables
-    endpoint = os.environ["DOCUMENTINTELLIGENCE_ENDPOINT"]
-    key = os.environ["DOCUMENTINTELLIGENCE_API_KEY"]
     # model_id = os.getenv("CUSTOM_BUILT_MODEL_ID", custom_model_id)
 
-    # Create client
-    client = DocumentIntelligenceClient(endpoint=endpoint, credential=AzureKeyCredential(key))
+    # Get the shared client
+    client = get_document_intelligence_client()
 
     # Check if path_to_id_document is a URL or a local file path
     if bool(urlparse(path_to_id_document).scheme):  # If it's a URL
         poller = client.begin_analyze_document(
-            model_id, 
+            custom_model_id, 
             AnalyzeDocumentRequest(url_source=path_to_id_document)
         )
     else:  # Treat as a local file
-        path_to_sample_documents = os.path.abspath(os.path.join(os.path.abspath(__file__), "..", path_to_id_document))
-        with open(path_to_sample_documents, "rb") as f:
-            poller = client.begin_analyze_document(
-                model_id=custom_model_id,
-                analyze_request=f,
-                content_type="application/octet-stream"
-            )
+        with open(local_document_path(path_to_id_document), "rb") as f:
+            document_bytes = f.read()
+        return analyze_custom_document_bytes(custom_model_id, preprocess_document(document_bytes))
+
+    return extract_custom_fields(poller.result())
+
+def analyze_custom_document_bytes(custom_model_id: str, document_bytes: bytes, pages: Optional[str] = None) -> list:
+    '''
+    Analyze a document held in memory with a custom model
 
-    result: AnalyzeResult = poller.result()
+    :param custom_model_id: Custom model id
+    :param document_bytes: Content of the image or PDF
+    :param pages: Pages to analyze, e.g. "2" or "2-3" (default: all)
+    :return: The analyzed documents, as analyze_custom_documents returns them
+    '''
+    poller = get_document_intelligence_client().begin_analyze_document(
+        model_id=custom_model_id,
+        analyze_request=io.BytesIO(document_bytes),
+        pages=pages,
+        content_type="application/octet-stream"
+    )
+    return extract_custom_fields(poller.result())
 
+def extract_custom_fields(result: AnalyzeResult) -> list:
     # Initialize the list to store results
     analyzed_documents = []
 
@@ -61,9 +79,7 @@ def analyze_custom_documents(custom_model_id, path_to_id_document):
 
 if __name__ == "__main__":
     from azure.core.exceptions import HttpResponseError
-    from dotenv import find_dotenv, load_dotenv
     import logging
-    import yaml
 
     logging.basicConfig(level=logging.INFO, format="%(asctime)-15s %(message)s")
     logger = logging.getLogger()
@@ -71,19 +87,16 @@ if __name__ == "__main__":
     # Load environment variables
     try:
         logger.info('get the env variables and config file')
-        # Load the config file
-        with open('./config.yaml') as yaml_file:
-            config = yaml.safe_load(yaml_file)
-        model_id = config['doc_intelligence']['custom_models']['boarding_pass_1']
-        # Load environment variables 
-        load_dotenv(find_dotenv())
+        # Load the config file and environment variables
+        settings = get_settings()
+        model_id = settings.config['doc_intelligence']['custom_models']['boarding_pass_1']
         if model_id is None:
             logger.info('custom_model_id is missing. Either provide the id or build a new model')
             raise
 
         # Analyze documents using the created or provided model
         logger.info('Extract text based on the custom model')
-        path_to_id_document = os.getenv("file_path_boarding_pass")  # SAS URL or local path
+        path_to_id_document = settings.get("file_path_boarding_pass")  # SAS URL or local path
         results = analyze_custom_documents(model_id, path_to_id_document)
         print(results)  # Print the results list with extracted fields and confidence scores
     except HttpResponseError as error:
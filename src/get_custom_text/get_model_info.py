@@ -1,20 +1,84 @@
 '''
-this file will show all the models, including custom builds with their model_id that are stored in the Document Intelligence service
+Cached, queryable listing of the models stored in the Document Intelligence service, including the
+custom builds with their model_id.
+
+list_models reads the listing from the service at most every doc_intelligence.model_registry.listing_ttl
+seconds (default 300) and get_model and find_models query it; refresh_models drops it, e.g. after a build.
+
+Run as a script to print the listing:
+    python src/get_custom_text/get_model_info.py [--prefix <model id prefix>] [--tag name=value] [--refresh]
 '''
-import os
-from dotenv import find_dotenv, load_dotenv
-from azure.ai.documentintelligence import DocumentIntelligenceAdministrationClient
-from azure.core.credentials import AzureKeyCredential
+from functools import lru_cache
+from typing import Optional
+from utility.settings import get_settings
+from utility.result_cache import ResultCache
+from utility.document_intelligence_clients import get_document_intelligence_administration_client
+
+@lru_cache(maxsize=None)
+def get_model_listing_cache() -> ResultCache:
+    '''
+    Get the process-wide cache of the model listing, one entry per endpoint
+    '''
+    config = (get_settings().config.get('doc_intelligence') or {}).get('model_registry') or {}
+    return ResultCache('model_listing', max_entries=8, ttl=config.get('listing_ttl', 300))
+
+def fetch_models() -> list:
+    '''
+    List the models of the service, uncached
+
+    :return: One dict per model: model_id, description, created, expires, api_version and tags
+    '''
+    client = get_document_intelligence_administration_client()
+    return [{'model_id': model.model_id,
+             'description': model.description,
+             'created': model.created_date_time,
+             'expires': model.expiration_date_time,
+             'api_version': model.api_version,
+             'tags': dict(model.tags or {})} for model in client.list_models()]
+
+def list_models(refresh:bool=False) -> list:
+    '''
+    List the models of the service from the cached listing
+
+    :param refresh: Read the listing from the service again
+    '''
+    cache = get_model_listing_cache()
+    key = get_settings().get("DOCUMENTINTELLIGENCE_ENDPOINT") or ''
+    if refresh:
+        cache.clear()
+    return cache.get_or_compute(key, fetch_models)
+
+def refresh_models() -> None:
+    '''
+    Drop the cached listing; the next query reads it from the service
+    '''
+    get_model_listing_cache().clear()
+
+def get_model(model_id:str) -> Optional[dict]:
+    '''
+    Get a model of the listing by its id, None if the service has no such model
+    '''
+    return next((model for model in list_models() if model['model_id'] == model_id), None)
 
-# Load environment variables
-load_dotenv(find_dotenv())
-endpoint = os.environ.get("DOCUMENTINTELLIGENCE_ENDPOINT")
-key = os.environ.get("DOCUMENTINTELLIGENCE_API_KEY")
+def find_models(prefix:Optional[str]=None, tags:Optional[dict]=None) -> list:
+    '''
+    Find the models of the listing whose id starts with prefix and that carry all the given tags, newest first
+    '''
+    models = [model for model in list_models()
+              if (prefix is None or model['model_id'].startswith(prefix))
+              and all(model['tags'].get(name) == value for name, value in (tags or {}).items())]
+    return sorted(models, key=lambda model: model['created'].timestamp() if model['created'] else 0.0, reverse=True)
 
-# Create DocumentIntelligenceClient
-client = DocumentIntelligenceAdministrationClient(endpoint=endpoint, credential=AzureKeyCredential(key))
+if __name__ == "__main__":
+    import argparse
 
-models = client.list_models()
+    arg_parser = argparse.ArgumentParser(description="List the models of the Document Intelligence service")
+    arg_parser.add_argument('--prefix', help='Only the model ids starting with this prefix')
+    arg_parser.add_argument('--tag', action='append', default=[], help='Only the models with this tag, as name=value')
+    arg_parser.add_argument('--refresh', action='store_true', help='Read the listing from the service again')
+    args = arg_parser.parse_args()
 
-for model in models:
-    print(f"Model ID: {model.model_id}")
+    if args.refresh:
+        refresh_models()
+    for model in find_models(args.prefix, dict(tag.split('=', 1) for tag in args.tag)):
+        print(f"Model ID: {model['model_id']}  created {model['created']}  {model['description'] or ''}")
@@ -0,0 +1,225 @@
+'''
+Registry of the custom boarding pass models the kiosk builds.
+
+A model is recorded with the fingerprint of its training set: the SHA-256 of the listing (name, size,
+ETag) of the training blob container. get_model_id returns the model of the current fingerprint:
+- recorded in the local SQLite store, or found in the service's model listing by its fingerprint tag,
+  so a process without a configured model id reuses a model another process or kiosk built
+- otherwise, if a model of an earlier training set exists, it keeps serving while the new model is
+  built in the background, and the calls after the build get the new model
+- otherwise, the first model is built and waited for
+A training set has at most one build in flight. Its listing is re-read every fingerprint_ttl seconds.
+
+    doc_intelligence:
+      model_registry:
+        store_path: data/model_registry.sqlite
+        fingerprint_ttl: 300       # seconds a training set fingerprint is reused
+        listing_ttl: 300           # seconds the service's model listing is reused (get_model_info)
+'''
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, Optional
+from urllib.parse import urlsplit, urlunsplit
+from azure.core.exceptions import HttpResponseError
+from azure.storage.blob import ContainerClient
+from get_custom_text.buildCustomModel import build_model
+from get_custom_text.get_model_info import find_models, refresh_models
+from utility.settings import get_settings
+from utility import telemetry
+
+# Setup logging
+logger = logging.getLogger()
+
+# Model tag holding the training set fingerprint
+FINGERPRINT_TAG = 'kiosk_training_fingerprint'
+
+# Repository root, for store paths relative to it
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+# Function to name a training set by its container URL without the SAS token, which rotates
+def training_set_key(training_folder_path:str) -> str:
+    parts = urlsplit(training_folder_path.strip())
+    return urlunsplit((parts.scheme, parts.netloc, parts.path.rstrip('/'), '', ''))
+
+def training_set_fingerprint(training_folder_path:str) -> str:
+    '''
+    SHA-256 of the training container listing: the name, size and ETag of every blob
+
+    :param training_folder_path: SAS URL of the training container
+    '''
+    digest = hashlib.sha256()
+    with ContainerClient.from_container_url(training_folder_path.strip(), **telemetry.azure_sdk_kwargs('blob_storage')) as container:
+        for blob in sorted(container.list_blobs(), key=lambda blob: blob.name):
+            digest.update(f"{blob.name}\0{blob.size}\0{blob.etag}\n".encode())
+    return digest.hexdigest()
+
+class ModelRegistryStore:
+    '''
+    SQLite record of the built models by training set and fingerprint
+    '''
+    def __init__(self, path:str=':memory:') -> None:
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self.connection.execute('''CREATE TABLE IF NOT EXISTS models (
+                                   training_set TEXT NOT NULL,
+                                   fingerprint TEXT NOT NULL,
+                                   model_id TEXT NOT NULL,
+                                   built_at REAL NOT NULL,
+                                   PRIMARY KEY (training_set, fingerprint))''')
+
+    def _execute(self, sql:str, params:tuple=()) -> list:
+        with self._lock:
+            return self.connection.execute(sql, params).fetchall()
+
+    def get(self, training_set:str, fingerprint:str) -> Optional[str]:
+        rows = self._execute('SELECT model_id FROM models WHERE training_set = ? AND fingerprint = ?', (training_set, fingerprint))
+        return rows[0][0] if rows else None
+
+    def latest(self, training_set:str) -> Optional[str]:
+        '''
+        Most recently built model of the training set, whatever its fingerprint
+        '''
+        rows = self._execute('SELECT model_id FROM models WHERE training_set = ? ORDER BY built_at DESC LIMIT 1', (training_set,))
+        return rows[0][0] if rows else None
+
+    def put(self, training_set:str, fingerprint:str, model_id:str, built_at:Optional[float]=None) -> None:
+        self._execute('INSERT OR REPLACE INTO models VALUES (?, ?, ?, ?)',
+                      (training_set, fingerprint, model_id, time.time() if built_at is None else built_at))
+
+    def models(self) -> list:
+        '''
+        All recorded models, newest first, as (training set, fingerprint, model id, built at)
+        '''
+        return self._execute('SELECT training_set, fingerprint, model_id, built_at FROM models ORDER BY built_at DESC')
+
+    def close(self) -> None:
+        with self._lock:
+            self.connection.close()
+
+class ModelRegistry:
+    def __init__(self, store:ModelRegistryStore, build:Callable[..., str]=build_model,
+                 fingerprint:Callable[[str], str]=training_set_fingerprint, fingerprint_ttl:float=300.0) -> None:
+        '''
+        :param store: Record of the built models
+        :param build: Builds a model from a training folder SAS URL (description and tags keywords), returns its id
+        :param fingerprint: Fingerprints the training set of a training folder SAS URL
+        :param fingerprint_ttl: Seconds a fingerprint is reused before the training set is listed again
+        '''
+        self.store = store
+        self.build = build
+        self.fingerprint = fingerprint
+        self.fingerprint_ttl = fingerprint_ttl
+        self.counters = {'reused': 0, 'found': 0, 'served_previous': 0, 'waited': 0, 'builds': 0}
+        self._fingerprints = {}  # training set -> (fingerprint, read at)
+        self._builds = {}  # (training set, fingerprint) -> Future of the model id
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='model-build')
+        self._lock = threading.Lock()
+
+    def _count(self, name:str) -> None:
+        with self._lock:
+            self.counters[name] += 1
+
+    def current_fingerprint(self, training_folder_path:str) -> str:
+        '''
+        Fingerprint of the training set, listed again once it is older than fingerprint_ttl
+        '''
+        training_set = training_set_key(training_folder_path)
+        with self._lock:
+            cached = self._fingerprints.get(training_set)
+        if cached is not None and time.monotonic() - cached[1] < self.fingerprint_ttl:
+            return cached[0]
+        fingerprint = self.fingerprint(training_folder_path)
+        with self._lock:
+            self._fingerprints[training_set] = (fingerprint, time.monotonic())
+        return fingerprint
+
+    def find_built_model(self, training_set:str, fingerprint:str) -> Optional[str]:
+        '''
+        Model of the fingerprint in the service's model listing, recorded in the store if found
+        '''
+        try:
+            models = find_models(tags={FINGERPRINT_TAG: fingerprint})
+        except HttpResponseError as e:
+            logger.warning(f"Could not list the Document Intelligence models: {e}")
+            return None
+        if not models:
+            return None
+        model = models[0]
+        self.store.put(training_set, fingerprint, model['model_id'], model['created'].timestamp() if model['created'] else None)
+        return model['model_id']
+
+    def rebuild(self, training_folder_path:str, fingerprint:Optional[str]=None) -> Future:
+        '''
+        Build the model of the training set in the background, unless its build is already in flight
+
+        :return: Future of the model id
+        '''
+        training_set = training_set_key(training_folder_path)
+        fingerprint = fingerprint or self.current_fingerprint(training_folder_path)
+        with self._lock:
+            future = self._builds.get((training_set, fingerprint))
+            # A failed build is retried by the next call
+            if future is None or (future.done() and future.exception() is not None):
+                future = self._builds[(training_set, fingerprint)] = self._executor.submit(
+                    self._build, training_folder_path, training_set, fingerprint)
+        return future
+
+    def _build(self, training_folder_path:str, training_set:str, fingerprint:str) -> str:
+        logger.info(f"Build the custom model of training set {training_set} ({fingerprint[:12]})")
+        self._count('builds')
+        model_id = self.build(training_folder_path, description=f"Boarding pass model, training set {fingerprint[:12]}",
+                              tags={FINGERPRINT_TAG: fingerprint})
+        self.store.put(training_set, fingerprint, model_id)
+        refresh_models()
+        logger.info(f"Built the custom model {model_id} of training set {training_set}")
+        return model_id
+
+    def get_model_id(self, training_folder_path:str, wait:bool=False) -> str:
+        '''
+        Model id of the current training set (see the module docstring)
+
+        :param training_folder_path: SAS URL of the training container
+        :param wait: Wait for the build of a changed training set instead of serving the previous model
+        '''
+        training_set = training_set_key(training_folder_path)
+        fingerprint = self.current_fingerprint(training_folder_path)
+        model_id = self.store.get(training_set, fingerprint)
+        if model_id is not None:
+            self._count('reused')
+            return model_id
+        model_id = self.find_built_model(training_set, fingerprint)
+        if model_id is not None:
+            self._count('found')
+            return model_id
+
+        future = self.rebuild(training_folder_path, fingerprint)
+        previous = self.store.latest(training_set)
+        if previous is not None and not wait:
+            self._count('served_previous')
+            logger.info(f"The training set {training_set} changed; serving model {previous} until the new model is built")
+            return previous
+        self._count('waited')
+        return future.result()
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+@lru_cache(maxsize=None)
+def get_model_registry() -> ModelRegistry:
+    '''
+    Get the process-wide model registry, configured from the doc_intelligence.model_registry config section
+    '''
+    config = (get_settings().config.get('doc_intelligence') or {}).get('model_registry') or {}
+    store_path = config.get('store_path', 'data/model_registry.sqlite')
+    if store_path != ':memory:' and not os.path.isabs(store_path):
+        store_path = os.path.join(ROOT_DIR, store_path)
+    return ModelRegistry(ModelRegistryStore(store_path), fingerprint_ttl=config.get('fingerprint_ttl', 300))
@@ -0,0 +1,133 @@
+'''
+Combined analysis of an ID and a boarding pass scanned together as one multi-page document.
+
+The document is read into memory and preprocessed once (see preprocess_document), and its pages are
+assigned to the ID and the boarding pass, either by the page ranges of the config or by a custom
+classifier model. The prebuilt ID model and the custom boarding pass model then analyze their own pages of the same buffer concurrently (the pages
+parameter of the analyze request), and the results come back in the shapes of analyze_identity_documents
+and analyze_custom_documents, so validate_all consumes them unchanged. The first ID page is also
+rendered to a JPEG (see render_page) for face identification, as the Face API reads no PDF or TIFF.
+
+    doc_intelligence:
+      combined:
+        id_pages: "1"                              # pages of the ID, e.g. "1" or "1-2"
+        boarding_pass_pages: "2"                   # pages of the boarding pass
+        classifier_id:                             # optional classifier assigning the pages instead
+        id_doc_types: [idDocument]                 # classifier document types of the ID
+        boarding_pass_doc_types: [boardingPass]    # classifier document types of the boarding pass
+'''
+import io
+import os
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from azure.ai.documentintelligence.models import AnalyzeResult
+from get_ID.analyzeID_prebuilt import analyze_id_document_cached
+from get_custom_text.extract_custom_doc import analyze_custom_document_bytes
+from get_documents.preprocess_documents import preprocess_document, preprocessing_config, render_page
+from utility.document_intelligence_clients import get_document_intelligence_client
+from utility.settings import get_settings
+from utility import telemetry
+
+# Setup logging
+logger = logging.getLogger()
+
+# Function to get the doc_intelligence.combined config section
+def combined_config() -> dict:
+    return (get_settings().config.get('doc_intelligence') or {}).get('combined') or {}
+
+# Function to write page numbers in the pages syntax of the analyze request, e.g. [1, 2, 3, 5] -> "1-3,5"
+def page_ranges(pages) -> str:
+    ranges = []
+    for page in sorted(set(pages)):
+        if ranges and ranges[-1][1] == page - 1:
+            ranges[-1][1] = page
+        else:
+            ranges.append([page, page])
+    return ','.join(str(first) if first == last else f"{first}-{last}" for first, last in ranges)
+
+# Function to get the first page of pages in the pages syntax, e.g. "2-3,5" -> 2
+def first_page(pages:str) -> int:
+    return int(pages.split(',')[0].partition('-')[0])
+
+def classify_pages(document_bytes:bytes, classifier_id:str, config:dict) -> tuple:
+    '''
+    Assign the pages of a document to the ID and the boarding pass with a custom classifier
+
+    :param document_bytes: Content of the document
+    :param classifier_id: Custom classifier splitting the document by page
+    :param config: doc_intelligence.combined config section (id_doc_types, boarding_pass_doc_types)
+    :return: (ID pages, boarding pass pages) in the pages syntax
+    '''
+    poller = get_document_intelligence_client().begin_classify_document(
+        classifier_id,
+        io.BytesIO(document_bytes),
+        split="auto",
+        content_type="application/octet-stream"
+    )
+    result: AnalyzeResult = poller.result()
+
+    id_doc_types = set(config.get('id_doc_types') or ['idDocument'])
+    boarding_pass_doc_types = set(config.get('boarding_pass_doc_types') or ['boardingPass'])
+    id_pages, boarding_pass_pages = [], []
+    for document in result.documents or []:
+        pages = [region.page_number for region in document.bounding_regions or []]
+        if document.doc_type in id_doc_types:
+            id_pages.extend(pages)
+        elif document.doc_type in boarding_pass_doc_types:
+            boarding_pass_pages.extend(pages)
+    if not id_pages or not boarding_pass_pages:
+        raise ValueError(f"The classifier found no {'ID' if not id_pages else 'boarding pass'} pages in the document")
+    return page_ranges(id_pages), page_ranges(boarding_pass_pages)
+
+def analyze_combined_document_bytes(document_bytes:bytes, custom_model_id:str) -> tuple:
+    '''
+    Analyze the ID and the boarding pass pages of a document held in memory, concurrently
+
+    :param document_bytes: Content of the document (PDF or multi-page TIFF)
+    :param custom_model_id: Custom boarding pass model id
+    :return: (id_data, bp_info, id_image): the results as analyze_identity_documents and
+             analyze_custom_documents return them, and a JPEG of the first ID page
+    '''
+    config = combined_config()
+    document_bytes = preprocess_document(document_bytes)
+    classifier_id = config.get('classifier_id')
+    if classifier_id:
+        id_pages, boarding_pass_pages = classify_pages(document_bytes, classifier_id, config)
+    else:
+        id_pages, boarding_pass_pages = str(config.get('id_pages', '1')), str(config.get('boarding_pass_pages', '2'))
+    logger.info(f"Analyze the ID on pages {id_pages} and the boarding pass on pages {boarding_pass_pages}")
+
+    preprocessing = preprocessing_config()
+    # Both analyses read the same buffer, while the ID page is rendered for the Face API; each thread
+    # gets its own copy of the telemetry context
+    with ThreadPoolExecutor(max_workers=3, thread_name_prefix='combined-document') as executor:
+        id_future = executor.submit(contextvars.copy_context().run, analyze_id_document_cached, document_bytes, id_pages, False)
+        boarding_pass_future = executor.submit(contextvars.copy_context().run, analyze_custom_document_bytes,
+                                               custom_model_id, document_bytes, boarding_pass_pages)
+        id_image_future = executor.submit(render_page, document_bytes, first_page(id_pages), preprocessing.get('pdf_dpi', 200),
+                                          preprocessing.get('max_side', 2048), preprocessing.get('jpeg_quality', 85))
+        return id_future.result(), boarding_pass_future.result(), id_image_future.result()
+
+def analyze_combined_documents(path_to_document:str, custom_model_id:str) -> tuple:
+    '''
+    Analyze a local document holding the ID and the boarding pass (see analyze_combined_document_bytes)
+    '''
+    with telemetry.span('kiosk.combined_document'):
+        with open(os.path.abspath(path_to_document), "rb") as f:
+            document_bytes = f.read()
+        return analyze_combined_document_bytes(document_bytes, custom_model_id)
+
+if __name__ == "__main__":
+    from azure.core.exceptions import HttpResponseError
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)-15s %(message)s")
+    try:
+        settings = get_settings()
+        model_id = settings.config['doc_intelligence']['custom_models']['boarding_pass_1']
+        id_data, bp_info, _ = analyze_combined_documents(settings.get("file_path_combined_document"), model_id)
+        print(id_data)
+        print(bp_info)
+    except HttpResponseError as error:
+        print(f"HttpResponseError: {error}")
+        raise
@@ -0,0 +1,264 @@
+'''
+Client-side preprocessing of the document images before they are uploaded for analysis.
+
+Kiosk scanners and phones produce 8-12 MB images, far above the resolution Document Intelligence reads
+text at, so the upload dominates the analysis latency on a slow uplink. preprocess_document:
+- applies the EXIF orientation, so the service gets the document upright
+- crops to the document bounds: the area that differs from the scanner bed color at the image border
+- downscales the longest side to max_side pixels
+- re-encodes as a JPEG of jpeg_quality, or every page of a multi-page TIFF as a JPEG-compressed TIFF
+- rasterizes scanned PDFs to a multi-page JPEG-compressed TIFF (PyMuPDF, in requirements.txt; without
+  it PDFs are uploaded as they are, with a warning logged once)
+and keeps the original whenever the result is not smaller. Decoding and encoding are CPU bound, so
+they run in a process pool of workers processes, off the check-in threads.
+
+    doc_intelligence:
+      preprocessing:
+        enabled: true
+        min_bytes: 524288     # smaller files are uploaded as they are
+        max_side: 2048        # longest side of the uploaded image, in pixels
+        jpeg_quality: 85
+        crop: true
+        pdf_dpi: 200          # resolution of the rasterized PDF pages
+        workers: 2            # processes of the pool, 0 to preprocess on the calling thread
+'''
+import io
+import atexit
+import importlib.util
+import logging
+import multiprocessing
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+from PIL import Image, ImageChops, ImageSequence, ImageStat
+from utility.settings import get_settings
+from utility import telemetry
+
+# Setup logging
+logger = logging.getLogger()
+
+# Smallest share of the image the detected document bounds must cover to be cropped to (an ID card
+# on a scanner bed covers about a tenth of it)
+MIN_CROP_AREA = 0.05
+
+# EXIF tag of the orientation the image is displayed at, and the transpose turning each orientation upright
+ORIENTATION_TAG = 0x0112
+ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+# Gray level difference from the scanner bed counted as document
+CROP_THRESHOLD = 24
+
+# Function to get the doc_intelligence.preprocessing config section
+def preprocessing_config() -> dict:
+    return (get_settings().config.get('doc_intelligence') or {}).get('preprocessing') or {}
+
+def document_bounds(image:Image.Image) -> Optional[tuple]:
+    '''
+    Bounds of the document on the scanner bed: the pixels whose gray level differs from the median
+    color of the image border, measured on a reduced copy
+
+    :return: (left, upper, right, lower) with a small margin, or None if no document stands out
+    '''
+    small = image.convert('L')
+    small.thumbnail((512, 512))
+    width, height = small.size
+    border = [small.crop(box) for box in ((0, 0, width, 2), (0, height - 2, width, height), (0, 0, 2, height), (width - 2, 0, width, height))]
+    background = sorted(int(ImageStat.Stat(strip).median[0]) for strip in border)[len(border) // 2]
+    difference = ImageChops.difference(small, Image.new('L', small.size, background))
+    bounds = difference.point(lambda level: 255 if level > CROP_THRESHOLD else 0).getbbox()
+    if bounds is None:
+        return None
+    left, upper, right, lower = bounds
+    if (right - left) * (lower - upper) < MIN_CROP_AREA * width * height:
+        return None
+    scale_x, scale_y = image.width / width, image.height / height
+    margin_x, margin_y = 0.02 * image.width, 0.02 * image.height
+    return (max(0, int(left * scale_x - margin_x)), max(0, int(upper * scale_y - margin_y)),
+            min(image.width, int(right * scale_x + margin_x)), min(image.height, int(lower * scale_y + margin_y)))
+
+def prepare_page(image:Image.Image, max_side:int=2048, crop:bool=True, orientation:int=1) -> Image.Image:
+    '''
+    Upright, cropped, downscaled RGB (or gray) copy of one image page, ready to be JPEG-encoded
+
+    :param orientation: EXIF orientation the page is displayed at
+    '''
+    if crop:
+        # Bounds do not depend on the orientation: crop first, so the rest works on fewer pixels
+        bounds = document_bounds(image)
+        if bounds is not None:
+            image = image.crop(bounds)
+    transpose = ORIENTATION_TRANSPOSE.get(orientation)
+    if transpose is not None:
+        image = image.transpose(transpose)
+    if image.mode in ('RGBA', 'LA', 'P'):
+        # JPEG has no alpha: flatten onto white paper
+        image = image.convert('RGBA')
+        flattened = Image.new('RGB', image.size, 'white')
+        flattened.paste(image, mask=image.getchannel('A'))
+        image = flattened
+    elif image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    else:
+        image = image.copy()
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+    return image
+
+def preprocess_image(data:bytes, max_side:int=2048, jpeg_quality:int=85, crop:bool=True) -> bytes:
+    '''
+    Upright, cropped, downscaled JPEG of an image, or JPEG-compressed multi-page TIFF of every page of
+    a multi-page image (a combined ID and boarding pass scan); the original if that is not smaller
+
+    :param data: Image file content (any format Pillow reads)
+    :param max_side: Longest side of the result, in pixels
+    :param jpeg_quality: JPEG quality of the result
+    :param crop: Crop to the document bounds
+    '''
+    output = io.BytesIO()
+    with Image.open(io.BytesIO(data)) as original:
+        orientation = original.getexif().get(ORIENTATION_TAG, 1)
+        if getattr(original, 'n_frames', 1) > 1:
+            # Keep every page: the combined analysis reads the boarding pass from the later ones
+            pages = [prepare_page(frame, max_side, crop, orientation) for frame in ImageSequence.Iterator(original)]
+            pages[0].save(output, format='TIFF', save_all=True, append_images=pages[1:], compression='jpeg', quality=jpeg_quality)
+        else:
+            # JPEG: decode at the smallest scale still at least max_side on both sides
+            original.draft('RGB', (max_side, max_side))
+            image = prepare_page(original, max_side, crop, orientation)
+            image.save(output, format='JPEG', quality=jpeg_quality, optimize=True)
+    result = output.getvalue()
+    return result if len(result) < len(data) else data
+
+def rasterize_pdf(data:bytes, dpi:int=200, max_side:int=2048, jpeg_quality:int=85) -> bytes:
+    '''
+    Multi-page TIFF of the PDF pages, JPEG-compressed; the original if PyMuPDF is not installed or the
+    TIFF is not smaller (text PDFs usually are smaller as they are)
+    '''
+    try:
+        import fitz
+    except ImportError:
+        return data
+    pages = []
+    with fitz.open(stream=data, filetype='pdf') as document:
+        for page in document:
+            pixmap = page.get_pixmap(dpi=dpi)
+            image = Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+            image.thumbnail((max_side, max_side), Image.LANCZOS)
+            pages.append(image)
+    if not pages:
+        return data
+    output = io.BytesIO()
+    pages[0].save(output, format='TIFF', save_all=True, append_images=pages[1:], compression='jpeg', quality=jpeg_quality)
+    result = output.getvalue()
+    return result if len(result) < len(data) else data
+
+def render_page(data:bytes, page:int=1, dpi:int=200, max_side:int=2048, jpeg_quality:int=85) -> bytes:
+    '''
+    JPEG of one page of a PDF or multi-page image, for the services that only read single images
+    (the Face API takes JPEG, PNG, GIF and BMP)
+
+    :param page: Page number, from 1
+    :raises ValueError: if the document has no such page, or is neither a PDF nor an image Pillow reads
+    '''
+    if data.startswith(b'%PDF'):
+        try:
+            import fitz
+        except ImportError as e:
+            raise ValueError("PyMuPDF is needed to render PDF pages (pip install PyMuPDF)") from e
+        with fitz.open(stream=data, filetype='pdf') as document:
+            if not 0 < page <= document.page_count:
+                raise ValueError(f"The document has no page {page}")
+            pixmap = document[page - 1].get_pixmap(dpi=dpi)
+            image = Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+    else:
+        try:
+            with Image.open(io.BytesIO(data)) as original:
+                orientation = original.getexif().get(ORIENTATION_TAG, 1)
+                original.seek(page - 1)
+                image = prepare_page(original, max_side, False, orientation)
+        except EOFError as e:
+            raise ValueError(f"The document has no page {page}") from e
+        except OSError as e:
+            raise ValueError(f"Could not read the document as an image: {e}") from e
+    output = io.BytesIO()
+    image.save(output, format='JPEG', quality=jpeg_quality)
+    return output.getvalue()
+
+@lru_cache(maxsize=None)
+def pdf_rasterizer_available() -> bool:
+    '''
+    Whether PyMuPDF is installed to rasterize PDFs; logged once in the kiosk process if not, as the
+    spawned workers do not share its logging
+    '''
+    if importlib.util.find_spec('fitz') is None:
+        logger.warning("PyMuPDF is not installed: PDF documents are uploaded without preprocessing (pip install PyMuPDF)")
+        return False
+    return True
+
+def preprocess_bytes(data:bytes, config:dict) -> bytes:
+    '''
+    Preprocess a document file content with the settings of the preprocessing config section; runs in the pool
+    '''
+    max_side, jpeg_quality = config.get('max_side', 2048), config.get('jpeg_quality', 85)
+    if data.startswith(b'%PDF'):
+        return rasterize_pdf(data, config.get('pdf_dpi', 200), max_side, jpeg_quality)
+    try:
+        return preprocess_image(data, max_side, jpeg_quality, config.get('crop', True))
+    except (OSError, ValueError) as e:
+        # Not an image Pillow reads: upload it as it is
+        logger.warning(f"Could not preprocess the document image: {e}")
+        return data
+
+@lru_cache(maxsize=None)
+def get_preprocessing_pool() -> Optional[ProcessPoolExecutor]:
+    '''
+    Get the process-wide preprocessing pool of doc_intelligence.preprocessing.workers processes; None for 0 workers
+    '''
+    workers = preprocessing_config().get('workers', 2)
+    if not workers:
+        return None
+    # Spawned workers: forking the threaded kiosk process could copy a held lock. Each worker re-imports
+    # the launching script as __mp_main__, so scripts starting the pool build their apps under __main__
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+    atexit.register(pool.shutdown)
+    return pool
+
+def start_preprocessing_pool() -> None:
+    '''
+    Start the worker processes of the preprocessing pool, if preprocessing is enabled, so the first
+    check-in does not wait the second or two they take to spawn
+    '''
+    config = preprocessing_config()
+    if config.get('enabled', False):
+        pdf_rasterizer_available()
+    pool = get_preprocessing_pool() if config.get('enabled', False) else None
+    if pool is not None:
+        list(pool.map(abs, range(config.get('workers', 2))))
+
+def preprocess_document(data:bytes) -> bytes:
+    '''
+    Preprocess a document file content for upload (see the module docstring); the original if
+    preprocessing is disabled, the file is below min_bytes or the result is not smaller
+
+    :param data: Image or PDF file content
+    :return: Content to upload
+    '''
+    config = preprocessing_config()
+    if not config.get('enabled', False) or len(data) < config.get('min_bytes', 512 * 1024):
+        return data
+    if data.startswith(b'%PDF') and not pdf_rasterizer_available():
+        return data
+    with telemetry.span('kiosk.preprocess'):
+        pool = get_preprocessing_pool()
+        result = pool.submit(preprocess_bytes, data, config).result() if pool is not None else preprocess_bytes(data, config)
+    telemetry.count('kiosk_upload_bytes_saved_total', len(data) - len(result))
+    logger.info(f"Preprocessed a {len(data) / 1024:.0f} KiB document to {len(result) / 1024:.0f} KiB")
+    return result
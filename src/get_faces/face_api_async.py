@@ -0,0 +1,257 @@
+'''
+Asyncio variant of the Face API client, used to enroll a person's face thumbnails concurrently.
+
+Requests go through a shared httpx.AsyncClient, with a semaphore bounding the number of requests in
+flight and a token bucket keeping the request rate within the Face API TPS quota. The synchronous
+entry points run on one process-wide event loop thread with one client, so the passengers share its
+connections and its TPS quota instead of each opening their own.
+'''
+import os
+import time
+import atexit
+import asyncio
+import logging
+import threading
+from typing import Optional
+from urllib.parse import urlparse, urlencode
+import httpx
+from get_faces.face_api_client import face_api_settings, face_api_config, create_person_group_name, training_poll_settings, is_training_finished
+from utility.polling import async_poll_until, PollTimeoutError
+from utility import telemetry
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)-15s %(message)s")
+logger = logging.getLogger()
+# httpx logs every request at INFO; keep the kiosk log to the enrollment steps
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter: `rate` tokens per second, bursting up to `capacity`.
+    """
+    def __init__(self, rate:float, capacity:Optional[float]=None) -> None:
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class AsyncFaceApiClient:
+    """
+    Async Azure Face API client with bounded concurrency and a TPS limiter.
+    """
+    def __init__(self, endpoint:Optional[str]=None, subscription_key:Optional[str]=None, api_version:Optional[str]=None,
+                 max_concurrency:int=8, tps:float=10.0, max_retries:int=3, client:Optional[httpx.AsyncClient]=None) -> None:
+        """
+        Args:
+        - endpoint: Face API endpoint (default: FACE_ENDPOINT_URL).
+        - subscription_key: Face API key (default: FACE_API_KEY).
+        - api_version: Face API version (default: face_api_version).
+        - max_concurrency: Maximum number of requests in flight.
+        - tps: Maximum request rate, matched to the Face API transactions-per-second quota.
+        - max_retries: Retries of a throttled (429) request, honoring Retry-After.
+        - client: Optional pre-configured httpx.AsyncClient.
+        """
+        default_endpoint, default_key, default_version = face_api_settings()
+        self.base_url = f"{endpoint or default_endpoint}/face/{api_version or default_version}"
+        self.headers = {'Ocp-Apim-Subscription-Key': subscription_key or default_key}
+        self.max_retries = max_retries
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.limiter = TokenBucket(tps)
+        limits = httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
+        self.client = client or httpx.AsyncClient(headers=self.headers, limits=limits, timeout=30.0,
+                                                  event_hooks=telemetry.httpx_event_hooks('face_api'))
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def _request(self, method:str, path:str, **kwargs) -> httpx.Response:
+        async with self.semaphore:
+            for attempt in range(self.max_retries + 1):
+                await self.limiter.acquire()
+                response = await self.client.request(method, f"{self.base_url}/{path}", **kwargs)
+                if response.status_code != 429 or attempt == self.max_retries:
+                    return response
+                retry_after = float(response.headers.get('Retry-After', 1))
+                telemetry.count('kiosk_retries_total', service='face_api', reason='throttled')
+                logger.info(f"Face API throttled, retrying in {retry_after} seconds (attempt {attempt + 1}/{self.max_retries})")
+                await asyncio.sleep(retry_after)
+
+    async def _image_request(self, path:str, image_source) -> httpx.Response:
+        # Post an image given as bytes, a URL, a local file path or a session image ID
+        octet_stream = {'Content-Type': 'application/octet-stream'}
+        if isinstance(image_source, (bytes, bytearray, memoryview)):
+            return await self._request('POST', path, headers=octet_stream, content=bytes(image_source))
+        if bool(urlparse(image_source).scheme):  # If the image source is a URL
+            return await self._request('POST', path, json={"url": image_source})
+        if os.path.isfile(image_source): # If the image source is local
+            with open(image_source, 'rb') as image_file:
+                content = image_file.read()
+            return await self._request('POST', path, headers=octet_stream, content=content)
+        return await self._request('POST', path, headers=octet_stream, content=image_source)
+
+    async def create_person_group(self, person_group_id:str, person_group_name:str):
+        body = {"name": person_group_name, "recognitionModel": face_api_config()['recognitionModel']}
+        response = await self._request('PUT', f"persongroups/{person_group_id}", json=body)
+        return response.status_code, response.text
+
+    async def delete_person_group(self, person_group_id:str):
+        response = await self._request('DELETE', f"persongroups/{person_group_id}")
+        return response.status_code, response.text
+
+    async def add_person_to_group(self, person_group_id:str, person_name:str) -> str:
+        response = await self._request('POST', f"persongroups/{person_group_id}/persons", json={"name": person_name})
+        return response.json()["personId"]
+
+    async def add_face_to_person(self, person_group_id:str, person_id:str, image_source):
+        response = await self._image_request(f"persongroups/{person_group_id}/persons/{person_id}/persistedFaces", image_source)
+        response.raise_for_status()
+        return response.status_code, response.json()["persistedFaceId"]
+
+    async def add_faces_to_person(self, person_group_id:str, person_id:str, image_sources:list) -> list:
+        """
+        Add all faces of a person concurrently, within the concurrency and TPS limits.
+
+        Returns:
+        - List of (status, persistedFaceId), in the order of image_sources
+        """
+        return await asyncio.gather(*(self.add_face_to_person(person_group_id, person_id, image_source)
+                                      for image_source in image_sources))
+
+    async def train_person_group(self, person_group_id:str):
+        response = await self._request('POST', f"persongroups/{person_group_id}/train")
+        return response.status_code, response.text
+
+    async def get_training_status(self, person_group_id:str) -> dict:
+        response = await self._request('GET', f"persongroups/{person_group_id}/training")
+        response.raise_for_status()
+        return response.json()
+
+    async def detect_faces(self, image_source):
+        params = {
+            'recognitionModel': face_api_config()['recognitionModel'],
+            'returnFaceId': 'true',
+            'returnFaceLandmarks': face_api_config()['returnFaceLandmarks']
+            }
+        response = await self._image_request(f"detect?{urlencode(params)}", image_source)
+        return response.json()
+
+    async def verify_faces(self, face_id1:str, face_id2:str):
+        response = await self._request('POST', "verify", json={"faceId1": face_id1, "faceId2": face_id2})
+        return response.json()
+
+def create_async_face_api_client() -> AsyncFaceApiClient:
+    """
+    Create an AsyncFaceApiClient with the concurrency and TPS limits of the face_api config.
+    """
+    config = face_api_config()
+    return AsyncFaceApiClient(max_concurrency=config.get('max_concurrency', 8), tps=config.get('tps', 10))
+
+_shared = {}  # 'loop' -> process-wide event loop, 'client' -> process-wide AsyncFaceApiClient
+_shared_lock = threading.Lock()
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Get the process-wide event loop, running on a daemon thread, that the synchronous entry points submit to.
+    """
+    with _shared_lock:
+        loop = _shared.get('loop')
+        if loop is None:
+            loop = _shared['loop'] = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='face-api-async', daemon=True).start()
+        return loop
+
+def run_coroutine(coroutine):
+    """
+    Run a coroutine on the process-wide event loop and wait for its result, from any thread but that loop's.
+    """
+    return asyncio.run_coroutine_threadsafe(coroutine, get_event_loop()).result()
+
+def get_async_face_api_client() -> AsyncFaceApiClient:
+    """
+    Get the process-wide AsyncFaceApiClient, used on the loop of get_event_loop and closed at exit.
+    """
+    with _shared_lock:
+        client = _shared.get('client')
+        if client is None:
+            client = _shared['client'] = create_async_face_api_client()
+            atexit.register(lambda: run_coroutine(client.aclose()))
+        return client
+
+async def build_person_model_async(person_group_id:str, image_sources:list, client:Optional[AsyncFaceApiClient]=None,
+                                   create_group:bool=True) -> str:
+    """
+    Build a person model like face_api_client.build_person_model, adding the faces concurrently.
+
+    Parameters:
+    - person_group_id: ID of the person group to be created.
+    - image_sources: Face images (bytes, URLs, local paths or session IDs).
+    - client: Optional AsyncFaceApiClient; by default one is created from the face_api config.
+    - create_group: False to add the person to an existing (pooled) person group.
+
+    Returns:
+    - person_id: The ID of the created person.
+    """
+    owns_client = client is None
+    if owns_client:
+        client = create_async_face_api_client()
+    try:
+        # Step 1: Create a person group
+        person_group_name = create_person_group_name(person_group_id)
+        if create_group:
+            logger.info('Create a person group')
+            await client.create_person_group(person_group_id, person_group_name)
+
+        # Step 2: Add person to the group
+        logger.info('Add person to the group')
+        person_id = await client.add_person_to_group(person_group_id, person_group_name)
+
+        # Step 3: Add faces to the person, concurrently
+        logger.info(f'Add {len(image_sources)} faces to the person')
+        await client.add_faces_to_person(person_group_id, person_id, image_sources)
+
+        # Step 4: Train the person group
+        logger.info('Train the person group')
+        await client.train_person_group(person_group_id)
+
+        # Wait for training to finish.
+        logger.info('Wait for training to finish')
+        try:
+            training_status = await async_poll_until(lambda: client.get_training_status(person_group_id), is_training_finished,
+                                                     name='face_api.training', **training_poll_settings())
+        except PollTimeoutError:
+            await client.delete_person_group(person_group_id)
+            raise
+        if training_status['status'] == 'failed':
+            await client.delete_person_group(person_group_id)
+            raise RuntimeError('Training the person group has failed.')
+        logger.info("Person group training complete.")
+    finally:
+        if owns_client:
+            await client.aclose()
+
+    return person_id
+
+def build_person_model_concurrent(person_group_id:str, image_sources:list, create_group:bool=True) -> str:
+    """
+    Synchronous entry point for build_person_model_async, on the process-wide event loop and client.
+    """
+    return run_coroutine(build_person_model_async(person_group_id, image_sources, client=get_async_face_api_client(),
+                                                  create_group=create_group))
@@ -1,40 +1,341 @@
 import requests
 import uuid
 import os
-import sys
 import time
-import yaml
 import logging
 import string
 import random
 import numpy as np
 from PIL import Image, ImageDraw
 import io
+from functools import lru_cache
+from typing import Optional
 from urllib.parse import urlparse, urlencode
-from dotenv import dotenv_values, load_dotenv, find_dotenv
+from requests.adapters import HTTPAdapter
+from utility.settings import get_settings
+from utility.polling import poll_until, PollTimeoutError
+from utility import telemetry
+from utility.logs import log_payload
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)-15s %(message)s")
 logger = logging.getLogger()
 
-# Load and define env parameters
-load_dotenv(find_dotenv())
-config = dotenv_values(".env")
+# Azure Face API Configuration, read from the shared settings on first use
+def face_api_settings() -> tuple:
+    """
+    Get the Face API endpoint, subscription key and API version.
+    """
+    settings = get_settings()
+    return settings.get("FACE_ENDPOINT_URL"), settings.get("FACE_API_KEY"), settings.get('face_api_version')
+
+def face_api_config() -> dict:
+    """
+    Get the face_api section of the config file.
+    """
+    return get_settings().config['face_api']
+
+def training_poll_settings() -> dict:
+    """
+    Backoff settings of the person group training wait, from the face_api config section.
+    """
+    config = face_api_config()
+    return {
+        'initial_interval': config.get('training_poll_interval', 0.25),
+        'max_interval': config.get('training_poll_max_interval', 5),
+        'timeout': config.get('training_timeout', 120),
+        }
+
+def is_training_finished(training_status:dict) -> bool:
+    return training_status['status'] in ('succeeded', 'failed')
+
+class FaceApiClient:
+    """
+    Azure Face API client owning a pooled, keep-alive requests.Session.
+
+    All calls for a passenger reuse the same TCP+TLS connections instead of opening a new
+    connection per request. The module-level functions delegate to a shared instance
+    (see get_face_api_client).
+    """
+    def __init__(self, endpoint:Optional[str]=None, subscription_key:Optional[str]=None,
+                 api_version:Optional[str]=None, pool_size:int=10, session:Optional[requests.Session]=None) -> None:
+        """
+        Args:
+        - endpoint: Face API endpoint (default: FACE_ENDPOINT_URL).
+        - subscription_key: Face API key (default: FACE_API_KEY).
+        - api_version: Face API version (default: face_api_version).
+        - pool_size: Maximum number of keep-alive connections kept per host.
+        - session: Optional pre-configured session to use instead of creating one.
+        """
+        default_endpoint, default_key, default_version = face_api_settings()
+        self.endpoint = endpoint or default_endpoint
+        self.api_version = api_version or default_version
+        self.base_url = f"{self.endpoint}/face/{self.api_version}"
+
+        # Default headers are built once and sent with every request
+        self.headers = {
+            'Ocp-Apim-Subscription-Key': subscription_key or default_key,
+            'Connection': 'keep-alive'
+            }
+
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            telemetry.instrument_session(session, 'face_api')
+        self.session = session
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _request(self, method:str, path:str, headers:Optional[dict]=None, **kwargs) -> requests.Response:
+        request_headers = self.headers if headers is None else {**self.headers, **headers}
+        return self.session.request(method, f"{self.base_url}/{path}", headers=request_headers, **kwargs)
+
+    def _image_request(self, path:str, image_source, session_body_key:Optional[str]=None) -> requests.Response:
+        # Post an image given as bytes, a URL, a local file path or a session image ID
+        if isinstance(image_source, (bytes, bytearray, memoryview)): # If the image source is in memory
+            return self._request('POST', path, headers={'Content-Type': 'application/octet-stream'}, data=bytes(image_source))
+        elif bool(urlparse(image_source).scheme):  # If the image source is a URL
+            return self._request('POST', path, json={"url": image_source})
+        elif os.path.isfile(image_source): # If the image source is local
+            with open(image_source, 'rb') as image_file:
+                return self._request('POST', path, headers={'Content-Type': 'application/octet-stream'}, data=image_file)
+        elif session_body_key: # the image source is a session ID, sent as JSON
+            return self._request('POST', path, json={session_body_key: image_source})
+        else: # the image source is a session ID, sent as the body
+            return self._request('POST', path, headers={'Content-Type': 'application/octet-stream'}, data=image_source)
+
+    def create_person_group(self, person_group_id:str, person_group_name:str):
+        """
+        Create a new Person Group.
+
+        Args:
+        - person_group_id: Unique ID for the person group.
+        - person_group_name: Name for the person group.
+
+        Returns:
+        - Status of person group creation
+        """
+        body = {"name": person_group_name, "recognitionModel": face_api_config()['recognitionModel']}
+        response = self._request('PUT', f"persongroups/{person_group_id}", json=body)
+        return response.status_code, response.text
+
+    def list_person_groups(self, start:Optional[str]=None, top:int=1000) -> list:
+        """
+        List person groups, ordered by person group ID.
+
+        Args:
+        - start: List the groups after this person group ID.
+        - top: Maximum number of groups returned (1-1000).
+
+        Returns:
+        - List of person groups (JSON)
+        """
+        params = {'top': top}
+        if start:
+            params['start'] = start
+        response = self._request('GET', "persongroups", params=params)
+        response.raise_for_status()
+        return response.json()
+
+    def list_persons(self, person_group_id:str) -> list:
+        """
+        List the persons of a person group.
+
+        Returns:
+        - List of persons (JSON)
+        """
+        response = self._request('GET', f"persongroups/{person_group_id}/persons")
+        response.raise_for_status()
+        return response.json()
+
+    def delete_person_group(self, person_group_id:str):
+        '''
+        Delete a person group
+        '''
+        response = self._request('DELETE', f"persongroups/{person_group_id}")
+
+        if response.status_code == 200:
+            logger.debug(f"Person Group {person_group_id} deleted successfully.")
+        else:
+            logger.error(f"Deleting person group {person_group_id} failed: {response.status_code}, {response.text}")
+
+    def add_person_to_group(self, person_group_id:str, person_name:str)->str:
+        """
+        Add a new person to a Person Group.
+
+        Args:
+        - person_group_id: ID of the person group.
+        - person_name: Name of the person to be added.
+
+        Returns:
+        - Person ID of the newly added person
+        """
+        response = self._request('POST', f"persongroups/{person_group_id}/persons", json={"name": person_name})
+        personID = response.json()["personId"]
+        return personID
+
+    def delete_person(self, person_group_id:str, person_id:str):
+        '''
+        Delete a person from a person group
+        '''
+        response = self._request('DELETE', f"persongroups/{person_group_id}/persons/{person_id}")
+
+        if response.status_code == 200:
+            logger.debug(f"Person {person_id} deleted successfully from person group {person_group_id}.")
+        else:
+            logger.error(f"Deleting person {person_id} from person group {person_group_id} failed: {response.status_code}, {response.text}")
+
+    def add_face_to_person(self, person_group_id:str, person_id:str, image_source:str):
+        """
+        Add a face to a person in the Person Group.
+
+        Args:
+        - person_group_id: ID of the person group.
+        - person_id: ID of the person.
+        - image_source: Image bytes, URL or path to the image, or a session image ID.
+
+        Returns:
+        - Status of adding face
+        """
+        path = f"persongroups/{person_group_id}/persons/{person_id}/persistedFaces"
+        response = self._image_request(path, image_source)
+        if isinstance(image_source, str) and os.path.isfile(image_source): # local files return the full response
+            return response.json()
+
+        persistedFaceId = response.json()["persistedFaceId"]
+
+        return response.status_code, persistedFaceId
+
+    def delete_face(self, person_group_id:str, person_id:str, persisted_face_id:str):
+        '''
+        Delete a face from a person group
+        '''
+        response = self._request('DELETE', f"persongroups/{person_group_id}/persons/{person_id}/persistedFaces/{persisted_face_id}")
 
-# Get the config file path from the .env file
-config_path = os.getenv('CONFIG_PATH')
+        if response.status_code == 200:
+            logger.debug(f"Face {persisted_face_id} deleted successfully from person {person_id} in person group {person_group_id}.")
+        else:
+            logger.error(f"Deleting face {persisted_face_id} failed: {response.status_code}, {response.text}")
 
-# Load the config file
-if config_path and os.path.exists(config_path):
-    with open(config_path) as yaml_file:
-        config_yml = yaml.safe_load(yaml_file)
-else:
-    raise FileNotFoundError(f"Config file not found at the specified path: {config_path}")
+    def train_person_group(self, person_group_id:str):
+        """
+        Train the Person Group to recognize persons and faces.
 
-# Azure Face API Configuration
-subscription_key = config.get("FACE_API_KEY")
-endpoint = config.get("FACE_ENDPOINT_URL")
-face_api_version = config.get('face_api_version')
+        Args:
+        - person_group_id: ID of the person group to be trained.
+
+        Returns:
+        - Status of the training process
+        """
+        response = self._request('POST', f"persongroups/{person_group_id}/train")
+        return response.status_code, response.text
+
+    def get_training_status(self, person_group_id:str):
+        """
+        Get the status of the person group training.
+
+        Args:
+        - person_group_id: ID of the person group.
+
+        Returns:
+        - Training status (JSON)
+        """
+        response = self._request('GET', f"persongroups/{person_group_id}/training")
+        try:
+            response.raise_for_status()
+        except requests.exceptions.HTTPError as err:
+            logger.error(f"Error in check_training_status: {err.response.text}")
+            raise
+        return response.json()
+
+    def detect_faces(self, image_source:str):
+        """
+        Detect faces from a URL, session ID, or local file.
+
+        Args:
+        - image_source: Image URL, session ID, or local file path.
+
+        Returns:
+        - Face detection result (JSON)
+        """
+        params = {
+            'recognitionModel': face_api_config()['recognitionModel'],
+            'returnFaceId': 'true',
+            'returnFaceLandmarks': face_api_config()['returnFaceLandmarks']
+            }
+        query_string = urlencode(params)
+        response = self._image_request(f"detect?{query_string}", image_source, session_body_key="data")
+        return response.json()
+
+    def identify_faces_in_person_group(self, image_source:str, person_group_id:str):
+        """
+        Identify faces in a person group.
+
+        Args:
+        - image_source: Image URL, local file path or session ID.
+        - person_group_id: ID of the person group.
+
+        Returns:
+        - Identification result (JSON)
+        """
+        # Detect face first
+        logger.info('Detecting faces')
+        detected_faces = self.detect_faces(image_source)
+
+        if not detected_faces:
+            logger.info("No faces detected.")
+            return None
+        log_payload(logger, 'Detected faces', detected_faces)
+        # Get face IDs from detected faces
+        logger.info('Get face IDs from detected faces')
+        face_ids = [face['faceId'] for face in detected_faces]
+
+        # Call identify API
+        logger.info('Call identify API to identify faces between the source id and the detected faces')
+        body = {
+            "personGroupId": person_group_id,
+            "faceIds": face_ids,
+            "maxNumOfCandidatesReturned": face_api_config()['maxNumOfCandidatesReturned'],
+            "confidenceThreshold": face_api_config()['confidenceThreshold']
+        }
+
+        response = self._request('POST', "identify", json=body)
+        return response.json()
+
+    def verify_faces(self, face_id1:str, face_id2:str):
+        """
+        Verify if two faces belong to the same person.
+
+        Args:
+        - face_id1: Face ID of the first person.
+        - face_id2: Face ID of the second person.
+
+        Returns:
+        - Verification result (JSON)
+        """
+        body = {
+            "faceId1": face_id1,
+            "faceId2": face_id2
+        }
+
+        response = self._request('POST', "verify", json=body)
+        return response.json()
+
+@lru_cache(maxsize=None)
+def get_face_api_client() -> FaceApiClient:
+    """
+    Get the shared Face API client, created on first use with the configured pool size.
+    """
+    return FaceApiClient(pool_size=face_api_config().get('pool_size', 10))
 
 def create_person_group_name(person_group_id:str, length=random.randint(12, 128))->str:
   """Generates a random string with a timestamp and person's name.
@@ -60,172 +361,49 @@ def create_person_group_name(person_group_id:str, length=random.randint(12, 128)
   person_group_name = timestamp + person_group_id + random_string
   return person_group_name
 
+# Module-level Face API functions, delegating to the shared pooled client
 def create_person_group(person_group_id:str, person_group_name:str):
-    """
-    Create a new Person Group.
-    
-    Args:
-    - person_group_id: Unique ID for the person group.
-    - person_group_name: Name for the person group.
-    
-    Returns:
-    - Status of person group creation
-    """
-    person_group_url = f"{endpoint}/face/{face_api_version}/persongroups/{person_group_id}"
-    headers = {
-        'Ocp-Apim-Subscription-Key': subscription_key
-        }
-    body = {"name": person_group_name, "recognitionModel": config_yml['face_api']['recognitionModel']}
-    
-    response = requests.put(person_group_url, headers=headers, json=body)
-    return response.status_code, response.text
+    return get_face_api_client().create_person_group(person_group_id, person_group_name)
 
 def delete_person_group(person_group_id:str):
-    '''
-    Delete a person group
-    '''
-    person_group_url = f"{endpoint}/face/{face_api_version}/persongroups/{person_group_id}"
-    headers = {
-        'Ocp-Apim-Subscription-Key': subscription_key
-        }
-    
-    response = requests.delete(person_group_url, headers=headers)
-    
-    if response.status_code == 200:
-        print(f"Person Group {person_group_id} deleted successfully.")
-    else:
-        print(f"Error: {response.status_code}, {response.text}")
+    return get_face_api_client().delete_person_group(person_group_id)
+
+def list_person_groups(start:Optional[str]=None, top:int=1000):
+    return get_face_api_client().list_person_groups(start, top)
+
+def list_persons(person_group_id:str):
+    return get_face_api_client().list_persons(person_group_id)
 
 def add_person_to_group(person_group_id:str, person_name:str)->str:
-    """
-    Add a new person to a Person Group.
-    
-    Args:
-    - person_group_id: ID of the person group.
-    - person_name: Name of the person to be added.
-    
-    Returns:
-    - Person ID of the newly added person
-    """
-    add_person_url = f"{endpoint}/face/{face_api_version}/persongroups/{person_group_id}/persons"
-    headers = {
-        'Ocp-Apim-Subscription-Key': subscription_key
-        }
-    body = {"name": person_name}
-    
-    response = requests.post(add_person_url, headers=headers, json=body)
-    personID = response.json()["personId"]
-    return personID
+    return get_face_api_client().add_person_to_group(person_group_id, person_name)
 
 def delete_person(person_group_id:str, person_id:str):
-    '''
-    Delete a person from a person group
-    '''
-    url = f"{endpoint}/face/{face_api_version}/persongroups/{person_group_id}/persons/{person_id}"
-    headers = {
-        'Ocp-Apim-Subscription-Key': subscription_key
-        }
-    
-    response = requests.delete(url, headers=headers)
-    
-    if response.status_code == 200:
-        print(f"Person {person_id} deleted successfully from person group {person_group_id}.")
-    else:
-        print(f"Error: {response.status_code}, {response.text}")
+    return get_face_api_client().delete_person(person_group_id, person_id)
 
 def add_face_to_person(person_group_id:str, person_id:str, image_source:str):
-    """
-    Add a face to a person in the Person Group.
-    
-    Args:
-    - person_group_id: ID of the person group.
-    - person_id: ID of the person.
-    - image_source: URL or path to the image.
-    - image_type: Specify 'url', 'session', or 'local' (default is 'url').
-    
-    Returns:
-    - Status of adding face
-    """
-    face_url = f"{endpoint}/face/{face_api_version}/persongroups/{person_group_id}/persons/{person_id}/persistedFaces"
-    headers = {
-        'Ocp-Apim-Subscription-Key': subscription_key,
-        'Content-Type': 'application/octet-stream'
-        }
-    
-    if bool(urlparse(image_source).scheme):  # If the image source is a URL
-        body = {"url": image_source}
-        response = requests.post(face_url, headers=headers, json=body)
-    elif os.path.isfile(image_source): # If the image source is local
-        with open(image_source, 'rb') as image_file:
-            response = requests.post(face_url, headers=headers, data=image_file)
-            return response.json()
-    else: # the image source is a session ID
-        response = requests.post(face_url, headers=headers, data=image_source)
-    
-    persistedFaceId = response.json()["persistedFaceId"]
-    
-    return response.status_code, persistedFaceId
+    return get_face_api_client().add_face_to_person(person_group_id, person_id, image_source)
 
 def delete_face(person_group_id:str, person_id:str, persisted_face_id:str):
-    '''
-    Delete a face from a person group
-    '''
-    url = f"{endpoint}/face/{face_api_version}/persongroups/{person_group_id}/persons/{person_id}/persistedFaces/{persisted_face_id}"
-    headers = {
-        'Ocp-Apim-Subscription-Key': subscription_key,
-        'Content-Type': 'application/octet-stream'
-        }
-    
-    response = requests.delete(url, headers=headers)
-    
-    if response.status_code == 200:
-        print(f"Face {persisted_face_id} deleted successfully from person {person_id} in person group {person_group_id}.")
-    else:
-        print(f"Error: {response.status_code}, {response.text}")
+    return get_face_api_client().delete_face(person_group_id, person_id, persisted_face_id)
 
 def train_person_group(person_group_id:str):
-    """
-    Train the Person Group to recognize persons and faces.
-    
-    Args:
-    - person_group_id: ID of the person group to be trained.
-    
-    Returns:
-    - Status of the training process
-    """
-    train_url = f"{endpoint}/face/{face_api_version}/persongroups/{person_group_id}/train"
-    headers = {
-        'Ocp-Apim-Subscription-Key': subscription_key,
-        'Content-Type': 'application/octet-stream'
-        }
-    response = requests.post(train_url, headers=headers)
-    return response.status_code, response.text
+    return get_face_api_client().train_person_group(person_group_id)
 
 def get_training_status(person_group_id:str):
-    """
-    Get the status of the person group training.
-    
-    Args:
-    - person_group_id: ID of the person group.
-    
-    Returns:
-    - Training status (JSON)
-    """
-    status_url = f"{endpoint}/face/{face_api_version}/persongroups/{person_group_id}/training"
-    headers = {
-        'Ocp-Apim-Subscription-Key': subscription_key,
-        'Content-Type': 'application/octet-stream'
-        }
-    while True:
-        response = requests.get(status_url, headers=headers)
-        try:
-            response.raise_for_status()
-        except requests.exceptions.HTTPError as err:
-            print(f"Error in check_training_status: {err.response.text}")
-            raise
-        return response.json()
+    return get_face_api_client().get_training_status(person_group_id)
 
-def build_person_model(person_group_id:str, image_sources:list):
+def detect_faces(image_source:str):
+    return get_face_api_client().detect_faces(image_source)
+
+# Function to detect and identify faces in a person group
+def identify_faces_in_person_group(image_source:str, person_group_id:str):
+    return get_face_api_client().identify_faces_in_person_group(image_source, person_group_id)
+
+# Function to verify if two faces belong to the same person
+def verify_faces(face_id1:str, face_id2:str):
+    return get_face_api_client().verify_faces(face_id1, face_id2)
+
+def build_person_model(person_group_id:str, image_sources:list, create_group:bool=True):
     """
     This function builds a person model in Azure Face API by:
     1. Creating a person group.
@@ -238,25 +416,31 @@ def build_person_model(person_group_id:str, image_sources:list):
     - endpoint: Azure Face API endpoint.
     - person_group_id: ID of the person group to be created.
     - person_name: Name of the person to be added to the group.
+    - create_group: False to add the person to an existing (pooled) person group.
 
     Returns:
     - person_id: The ID of the created person.
+
+    Raises:
+    - PollTimeoutError: Training did not finish within the training timeout (the person group is deleted).
+    - RuntimeError: Training failed (the person group is deleted).
     """
     # Step 1: Create a person group
-    logger.info('Create a person group')
     person_group_name = create_person_group_name(person_group_id)
-    create_person_group(person_group_id, person_group_name)
+    if create_group:
+        logger.info('Create a person group')
+        create_person_group(person_group_id, person_group_name)
 
     # Step 2: Add person to the group
     logger.info('Add person to the group')
     person_id = add_person_to_group(person_group_id, person_group_name)
-    print(f"Person {person_group_name} added with Person ID: {person_id}")
+    logger.debug(f"Person {person_group_name} added with Person ID: {person_id}")
 
     # Step 3: Add faces to the person
     logger.info('Add faces to the person')
     for images in image_sources:
         face_id = add_face_to_person(person_group_id, person_id, images)
-        print(f"Face added with Face ID: {face_id}")
+        logger.debug(f"Face added with Face ID: {face_id}")
 
     # Step 4: Train the person group
     logger.info('Train the person group')
@@ -264,128 +448,21 @@ def build_person_model(person_group_id:str, image_sources:list):
 
     # Wait for training to finish.
     logger.info('Wait for training to finish')
-    while (True):
-        training_status = get_training_status(person_group_id)
-        print("Training status: {}.".format(training_status['status']))
-        if (training_status['status'] == 'succeeded'):
-            print(f"Training person group {person_group_id}...")
-            print("Person group training complete.")
-            break
-        elif (training_status['status'] == 'failed'):
-            delete_person_group(person_group_id=person_group_id)
-            sys.exit('Training the person group has failed.')
-        time.sleep(5)
+    try:
+        training_status = poll_until(lambda: get_training_status(person_group_id), is_training_finished,
+                                     name='face_api.training', **training_poll_settings())
+    except PollTimeoutError:
+        delete_person_group(person_group_id=person_group_id)
+        raise
+    logger.debug("Training status: %s.", training_status['status'])
+    if (training_status['status'] == 'succeeded'):
+        logger.debug("Person group training complete.")
+    elif (training_status['status'] == 'failed'):
+        delete_person_group(person_group_id=person_group_id)
+        raise RuntimeError('Training the person group has failed.')
     
     return person_id
 
-def detect_faces(image_source:str):
-    """
-    Detect faces from a URL, session ID, or local file.
-    
-    Args:
-    - image_source: Image URL, session ID, or local file path.
-    - image_type: Specify 'url', 'session', or 'local' (default is 'url').
-    
-    Returns:
-    - Face detection result (JSON)
-    """
-    params = {
-        'recognitionModel': config_yml['face_api']['recognitionModel'],
-        'returnFaceId': 'true',
-        'returnFaceLandmarks': config_yml['face_api']['returnFaceLandmarks']
-        }
-    query_string = urlencode(params)
-    face_url = f"{endpoint}/face/{face_api_version}/detect?{query_string}"
-    
-    if bool(urlparse(image_source).scheme):  # If the image source is a URL
-        headers = {
-                'Ocp-Apim-Subscription-Key': subscription_key,
-                'Content-Type': 'application/json'
-                }
-        body = {"url": image_source}
-        response = requests.post(face_url, headers=headers, json=body)
-    elif os.path.isfile(image_source): # If the image source is local
-        with open(image_source, 'rb') as image_file:
-            headers = {
-                    'Ocp-Apim-Subscription-Key': subscription_key,
-                    'Content-Type': 'application/octet-stream'
-                    }
-            response = requests.post(face_url, headers=headers, data=image_file)
-    else: # the image source is a session ID
-        headers = {
-                'Ocp-Apim-Subscription-Key': subscription_key,
-                'Content-Type': 'application/json'
-                }
-        body = {"data": image_source}
-        response = requests.post(face_url, headers=headers, json=body)
-    return response.json()
-
-# Function to detect and identify faces in a person group
-def identify_faces_in_person_group(image_source:str, person_group_id:str):
-    """
-    Identify faces in a person group.
-    
-    Args:
-    - image_source: Image URL or local file path.
-    - image_type: Specify 'url', 'local', or 'session'.
-    - person_group_id: ID of the person group.
-    
-    Returns:
-    - Identification result (JSON)
-    """
-    # Detect face first
-    logger.info('Detecting faces')
-    detected_faces = detect_faces(image_source)
-    
-    if not detected_faces:
-        print("No faces detected.")
-        return None
-    logger.info(f'detected_faces: {detected_faces}')
-    # Get face IDs from detected faces
-    logger.info('Get face IDs from detected faces')
-    face_ids = [face['faceId'] for face in detected_faces]
-    
-    # Call identify API
-    logger.info('Call identify API to identify faces between the source id and the detected faces')
-    identify_url = f"{endpoint}/face/{face_api_version}/identify"
-    headers = {
-        'Ocp-Apim-Subscription-Key': subscription_key
-        }
-    body = {
-        "personGroupId": person_group_id,
-        "faceIds": face_ids,
-        "maxNumOfCandidatesReturned": config_yml['face_api']['maxNumOfCandidatesReturned'],
-        "confidenceThreshold": config_yml['face_api']['confidenceThreshold']
-    }
-    
-    response = requests.post(identify_url, headers=headers, json=body)
-    return response.json()
-
-# Function to verify if two faces belong to the same person
-def verify_faces(face_id1:str, face_id2:str):
-    """
-    Verify if two faces belong to the same person.
-    
-    Args:
-    - face_id1: Face ID of the first person.
-    - face_id2: Face ID of the second person.
-    
-    Returns:
-    - Verification result (JSON)
-    """
-    verify_url = f"{endpoint}/face/{face_api_version}/verify"
-    headers = {
-        'Ocp-Apim-Subscription-Key': subscription_key,
-        'Content-Type': 'application/octet-stream'
-        }
-    body = {
-        "faceId1": face_id1,
-        "faceId2": face_id2
-    }
-    
-    response = requests.post(verify_url, headers=headers, json=body)
-    return response.json()
-
 # Function to draw a red rectangle around detected face
 def draw_rectangle_around_face(image_source:str, image_type='url', faces=None, session_id=None):
     """
@@ -2,26 +2,56 @@
 import os
 import uuid
 import json
+import asyncio
+import threading
 import logging
-from dotenv import dotenv_values, load_dotenv, find_dotenv
 from urllib.parse import urlparse
 from typing import Optional
+from io import BytesIO
+from PIL import Image, ImageFilter, ImageStat
 from azure.storage.blob import BlobServiceClient
 import utility.upload_files_to_blob as upload
 import get_faces.video_indexer_client as indexer
 import get_faces.face_api_client as faceAPI
+import get_faces.face_api_async as faceAPI_async
+from get_faces.person_group_manager import get_person_group_manager
+from utility.settings import get_settings
+from utility.polling import PollCancelledError
+from utility.pipeline import StageCancelled
+from utility.logs import log_payload
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)-15s %(message)s")
 logger = logging.getLogger()
 
-# Load and define env parameters
-load_dotenv(find_dotenv())
-config = dotenv_values(".env")
+# Video Indexer operations of get_video_insights, in order
+VIDEO_INDEXER_STEPS = ('video_indexer.upload_video', 'video_indexer.index_video',
+                       'video_indexer.get_video_insights', 'video_indexer.get_face_images')
 
-def get_video_insights(file_path:str, local_dir:Optional[str]):
+def _check_cancelled(cancel_event:Optional[threading.Event], step:int) -> None:
+    # Stop before a Video Indexer operation once the check-in no longer needs the thumbnails
+    if cancel_event is not None and cancel_event.is_set():
+        raise StageCancelled(VIDEO_INDEXER_STEPS[step:])
+
+def get_video_insights(file_path:str, local_dir:Optional[str]=None, session_id:Optional[str]=None,
+                       cancel_event:Optional[threading.Event]=None):
+    '''
+    Index the video and get its face thumbnails, emotions and sentiments.
+
+    The thumbnails are returned as JPEG bytes, as downloaded from Video Indexer, and can be passed
+    to the Face API as they are. They are only written to disk when video_indexer.persist_thumbnails
+    is set, in a per-session subdirectory of local_dir.
+
+    :param file_path: Video URL or local file path
+    :param local_dir: Directory to persist the thumbnails in
+    :param session_id: Subdirectory name of this check-in (default: a new uuid)
+    :param cancel_event: Optional event that stops the indexing between (and while polling) Video Indexer
+                         operations; raises StageCancelled with the operations not performed
+    :return: thumbnails (list of JPEG bytes), emotions, sentiments
+    '''
     logger.info('loading parameters for video indexer')
     # load parameters for video indexer
+    config = get_settings()
     arm_access_token = config.get("arm_access_token")
     AccountName = config.get('AccountName')
     ResourceGroup = config.get('ResourceGroup')
@@ -47,10 +77,16 @@ def get_video_insights(file_path:str, local_dir:Optional[str]):
 
     logger.info('upload and index the video and get insights')
     # Upload the video   
+    _check_cancelled(cancel_event, 0)
     video_id = vi_client.upload_video(file_path)  
     # Index the uploaded video
-    vi_client.index_video(video_id) 
+    _check_cancelled(cancel_event, 1)
+    try:
+        vi_client.index_video(video_id, cancel_event=cancel_event) 
+    except PollCancelledError:
+        raise StageCancelled(VIDEO_INDEXER_STEPS[2:])
     # Get video insights and store them in a variable
+    _check_cancelled(cancel_event, 2)
     insights = vi_client.get_video_insights(video_id)  
     
     ####### This snippet will upload insights to blob storage. Comment out if it's not needed. ##########
@@ -71,32 +107,35 @@ def get_video_insights(file_path:str, local_dir:Optional[str]):
 
     # Retrieve face thumbnails
     logger.info('Retrieve face thumbnails')
-    thumbnails = vi_client.get_face_images(insights, video_id)  
+    video_indexer_config = get_settings().config.get('video_indexer') or {}
+    _check_cancelled(cancel_event, 3)
+    thumbnails = vi_client.get_face_images(insights, video_id, decode=False,
+                                           max_workers=video_indexer_config.get('thumbnail_workers', 8),
+                                           retries=video_indexer_config.get('thumbnail_retries', 2))
 
     ####### This snippet will upload thumbnails to blob storage. Comment out if it's not needed. ##########
     '''
     # Create unique file names for each image
-    file_names = [f"image_{i}.png" for i in range(len(thumbnails))]
+    file_names = [f"image_{i}.jpg" for i in range(len(thumbnails))]
     # Upload face thumbnails to blob storage
     thumbnail_container_name = config.get('thumbnail_container_name')
     uploaded_image_urls = upload.upload_images_list(blob_service_client=blob_service_client_thumbnail, 
                                              container_name=thumbnail_container_name, 
-                                             images=thumbnails, 
+                                             images=[Image.open(BytesIO(thumbnail)) for thumbnail in thumbnails], 
                                              file_names=file_names)
     # Print the uploaded image URLs
     print(f"Uploaded images URLs: {uploaded_image_urls}")
     '''
     ###########################################################
 
-    ####### This snippet will save thumbnails locally. Comment out if it's not needed. ##########
-    # '''
-    # save images locally
-    logger.info('save thumbnails locally')
-    upload.save_thumbnails_locally(local_dir, thumbnails)
-    # retrive files
-    file_list = upload.get_files_from_directory(local_dir)
-    # '''
-    ###########################################################
+    # Optionally keep a copy of the thumbnails on disk, namespaced per check-in
+    if video_indexer_config.get('persist_thumbnails', False):
+        if local_dir:
+            logger.info('save thumbnails locally')
+            upload.save_thumbnail_bytes_locally(local_dir, thumbnails, session_id or str(uuid.uuid4()))
+        else:
+            logger.warning('persist_thumbnails is set but no local thumbnails directory is configured')
+
     logger.info('get emotion and sentiment data')
     # Get emotions from the video insights
     emotions = vi_client.get_emotions_from_insights(insights)  
@@ -104,54 +143,175 @@ def get_video_insights(file_path:str, local_dir:Optional[str]):
     # Get sentiments from the video insights
     sentiments = vi_client.get_sentiments_from_insights(insights)  
 
-    return file_list, emotions, sentiments
+    return thumbnails, emotions, sentiments
+
+def build_person_model(file_list:list, owner:Optional[str]=None):
+    """
+    Lease a person group from the pool and add the faces of the video thumbnails to one person in it.
 
-def build_person_model(file_list:list):
+    Args:
+    - file_list: Face thumbnails extracted from the video.
+    - owner: Lease owner, to pass to release_person_model (default: a new ID).
+
+    Returns:
+    - The person group ID.
+    """
     logger.info('load parameters for Face API')
     # load parameters for Face API
+    config = get_settings()
     endpoint = config.get("FACE_ENDPOINT_URL")
     subscription_key = config.get("FACE_API_KEY")
     face_api_version = config.get('face_api_version')
 
-    # Create a unique person group ID
-    logger.info('Create a unique person group ID')
-    person_group_id = str(uuid.uuid4())
+    # Lease an empty person group from the pool
+    logger.info('Lease a person group from the pool')
+    manager = get_person_group_manager()
+    owner = owner or str(uuid.uuid4())
+    person_group_id = manager.acquire(owner=owner)
 
     # build person model based on the images extracted from the video
     logger.info('build person model based on the images extracted from the video')
-    faceAPI.build_person_model(person_group_id=person_group_id, image_sources=file_list)
+    try:
+        # add the faces concurrently if async enrollment is enabled in config.yaml
+        if faceAPI.face_api_config().get('async_enrollment', False):
+            faceAPI_async.build_person_model_concurrent(person_group_id=person_group_id, image_sources=file_list, create_group=False)
+        else:
+            faceAPI.build_person_model(person_group_id=person_group_id, image_sources=file_list, create_group=False)
+    except BaseException:
+        manager.release(person_group_id, owner)
+        raise
 
     return person_group_id
 
+def release_person_model(person_group_id:str, owner:str):
+    # clear the person group and return it to the pool, unless the lease of owner expired and it was reclaimed
+    get_person_group_manager().release(person_group_id, owner)
+
 def indentify_faces(image_source:str, person_group_id:str):
     # identify a face from an ID with images extracted from the video  
     results = faceAPI.identify_faces_in_person_group(image_source, person_group_id)
-    logger.info(f'face_results: {results}')
+    log_payload(logger, 'Face results', results)
 
     for match in results:
         face_id = match['faceId']
         for candidate in match['candidates']:
             confidence = candidate['confidence']
-            print(f"The Identity match for face ID {face_id} has a confidence of {confidence:.4f}")
+            logger.info("The Identity match for face ID %s has a confidence of %.4f", face_id, confidence)
 
     return results
 
+# Smallest face side (in pixels) the Face API detects reliably; smaller thumbnails are ranked down
+MIN_FACE_SIZE = 36
+
+def thumbnail_quality(image_source) -> float:
+    """
+    Score a face thumbnail for recognition: edge variance (sharpness), scaled down for small images.
+    Sources that can't be opened locally (URLs, session IDs) score 0.
+    """
+    try:
+        image_file = BytesIO(image_source) if isinstance(image_source, (bytes, bytearray, memoryview)) else image_source
+        with Image.open(image_file) as image:
+            gray = image.convert('L')
+    except (OSError, ValueError):
+        return 0.0
+    width, height = gray.size
+    gray.thumbnail((128, 128))  # measure sharpness on a common scale
+    sharpness = ImageStat.Stat(gray.filter(ImageFilter.FIND_EDGES)).var[0]
+    return sharpness * min(1.0, min(width, height) / MIN_FACE_SIZE)
+
+def rank_thumbnails(image_sources:list, max_thumbnails:int) -> list:
+    """
+    Get the max_thumbnails best face thumbnails, best first.
+    """
+    return sorted(image_sources, key=thumbnail_quality, reverse=True)[:max_thumbnails]
+
+def _largest_face(detected_faces) -> Optional[dict]:
+    if not isinstance(detected_faces, list) or not detected_faces:
+        return None
+    return max(detected_faces, key=lambda face: face['faceRectangle']['width'] * face['faceRectangle']['height'])
+
+async def _verify_identity_async(image_source, thumbnails:list, client) -> Optional[list]:
+    # Round trip 1: detect the ID face and the thumbnail faces concurrently
+    detections = await asyncio.gather(client.detect_faces(image_source),
+                                      *(client.detect_faces(thumbnail) for thumbnail in thumbnails),
+                                      return_exceptions=True)
+    if isinstance(detections[0], Exception):
+        raise detections[0]
+    id_face = _largest_face(detections[0])
+    if id_face is None:
+        logger.info("No faces detected.")
+        return None
+    thumbnail_faces = [face for face in map(_largest_face, detections[1:]) if face is not None]
+
+    # Round trip 2: verify the ID face against each thumbnail face concurrently
+    verifications = await asyncio.gather(*(client.verify_faces(id_face['faceId'], face['faceId']) for face in thumbnail_faces),
+                                         return_exceptions=True)
+    config = faceAPI.face_api_config()
+    candidates = [{'faceId': face['faceId'], 'isIdentical': result.get('isIdentical'), 'confidence': result['confidence']}
+                  for face, result in zip(thumbnail_faces, verifications)
+                  if isinstance(result, dict) and 'confidence' in result and result['confidence'] >= config['confidenceThreshold']]
+    candidates.sort(key=lambda candidate: candidate['confidence'], reverse=True)
+    return [{'faceId': id_face['faceId'], 'candidates': candidates[:config['maxNumOfCandidatesReturned']]}]
+
+def verify_identity(image_source:str, file_list:list, max_thumbnails:Optional[int]=None):
+    """
+    Verify mode: match the ID face against the video thumbnails without a person group.
+
+    Detects the ID face and the best-ranked thumbnails in parallel, then runs the 1:1 verify calls
+    in parallel, so the check takes two round trips instead of a person group build and training.
+
+    Args:
+    - image_source: ID image (URL, local file path or session ID).
+    - file_list: Face thumbnails extracted from the video.
+    - max_thumbnails: Thumbnails to verify against (default: face_api.verify_thumbnails).
+
+    Returns:
+    - face_results in the shape returned by indentify_faces: [{'faceId': ..., 'candidates': [{'confidence': ...}, ...]}],
+      with one candidate per thumbnail verified above the confidence threshold, or None if no face is detected on the ID
+    """
+    if max_thumbnails is None:
+        max_thumbnails = faceAPI.face_api_config().get('verify_thumbnails', 5)
+    thumbnails = rank_thumbnails(file_list, max_thumbnails)
+    logger.info(f'verify the ID face against {len(thumbnails)} of {len(file_list)} thumbnails')
+
+    results = faceAPI_async.run_coroutine(_verify_identity_async(image_source, thumbnails, faceAPI_async.get_async_face_api_client()))
+    log_payload(logger, 'Face results', results)
+
+    for match in results or []:
+        for candidate in match['candidates']:
+            logger.info("The Identity match for face ID %s has a confidence of %.4f", match['faceId'], candidate['confidence'])
+
+    return results
+
+def identification_mode() -> str:
+    """
+    Face identification mode from the face_api config: 'identify' (person group build, train and
+    identify, the default) or the opt-in 'verify' (1:1 verify against thumbnails).
+    """
+    return faceAPI.face_api_config().get('identification_mode', 'identify')
+
 # Run the main function
 if __name__ == "__main__":
+    config = get_settings()
     video_file_path = config.get('LocalVideoPath')
     local_dir = config.get('local_thumbnails_dir_path')
 
-    # get video insights
-    file_list, emotions, sentiments = get_video_insights(video_file_path, local_dir)
-
-    # build person model based on the images extracted from the video
-    person_group_id = build_person_model(file_list)
+    # get video insights, with the face thumbnails in memory
+    thumbnails, emotions, sentiments = get_video_insights(video_file_path, local_dir)
 
     # get id image source file
     id_source_file = config.get("image_id")
-    
-    # identify faces between the id image and person Model
-    indentify_faces(id_source_file, person_group_id) 
 
-    # delete the person_group
-    faceAPI.delete_person_group(person_group_id)
+    if identification_mode() == 'verify':
+        # verify the id image against the best thumbnails
+        verify_identity(id_source_file, thumbnails)
+    else:
+        # build person model based on the images extracted from the video
+        owner = str(uuid.uuid4())
+        person_group_id = build_person_model(thumbnails, owner)
+
+        # identify faces between the id image and person Model
+        indentify_faces(id_source_file, person_group_id) 
+
+        # return the person_group to the pool
+        release_person_model(person_group_id, owner)
@@ -0,0 +1,415 @@
+'''
+Person group lifecycle manager.
+
+Instead of creating a person group per passenger, the kiosk leases groups from a bounded pool of
+person groups it owns. A released group is cleared of its persons and reused by the next passenger.
+Ownership and lease expiry are kept in a local SQLite store, and a background sweeper reclaims expired
+leases and deletes orphaned groups: groups of this kiosk instance that the store doesn't know about and,
+optionally, the per-passenger uuid groups left behind by earlier versions.
+
+Kiosk hosts share the Face resource but each has its own store, so a group is only ever an orphan to the
+instance that created it: group IDs are <prefix>-<instance id>-<uuid>, where the instance id is generated
+once per store (or set with person_groups.instance_id), and the sweep only considers the IDs of its own
+instance. The legacy uuid groups carry no owner at all: sweep_legacy_groups deletes every uuid-named
+group of the Face resource, so only enable it on a resource no other application or kiosk version uses.
+'''
+import os
+import re
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Optional
+import requests
+from utility.settings import get_settings
+from get_faces.face_api_client import FaceApiClient, get_face_api_client
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)-15s %(message)s")
+logger = logging.getLogger()
+
+FREE = 'free'
+LEASED = 'leased'
+
+# Person group IDs created by face_identification_main before groups were pooled
+LEGACY_GROUP_ID = re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$')
+
+# Repository root, for store paths relative to it
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+class PersonGroupStore:
+    '''
+    SQLite record of the pooled person groups: state, owner and lease expiry
+    '''
+    def __init__(self, path:str=':memory:') -> None:
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self.connection.execute('''CREATE TABLE IF NOT EXISTS person_groups (
+                                   group_id TEXT PRIMARY KEY,
+                                   state TEXT NOT NULL,
+                                   owner TEXT,
+                                   created_at REAL NOT NULL,
+                                   leased_at REAL,
+                                   expires_at REAL)''')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+
+    def _execute(self, sql:str, params:tuple=()) -> list:
+        with self._lock:
+            return self.connection.execute(sql, params).fetchall()
+
+    def _update(self, sql:str, params:tuple=()) -> int:
+        with self._lock:
+            return self.connection.execute(sql, params).rowcount
+
+    def instance_id(self) -> str:
+        '''
+        ID of the kiosk instance owning the store's groups, generated on first use and kept in the store
+        '''
+        # INSERT OR IGNORE: processes sharing the store agree on the first ID written
+        self._execute('INSERT OR IGNORE INTO meta VALUES (?, ?)', ('instance_id', uuid.uuid4().hex[:12]))
+        return self._execute('SELECT value FROM meta WHERE key = ?', ('instance_id',))[0][0]
+
+    def add(self, group_id:str, owner:Optional[str]=None, ttl:Optional[float]=None) -> None:
+        '''
+        Record a group, leased to owner if given, free otherwise
+        '''
+        now = time.time()
+        if owner is None:
+            self._execute('INSERT INTO person_groups VALUES (?, ?, NULL, ?, NULL, NULL)', (group_id, FREE, now))
+        else:
+            self._execute('INSERT INTO person_groups VALUES (?, ?, ?, ?, ?, ?)', (group_id, LEASED, owner, now, now, now + ttl))
+
+    def claim_free(self, owner:str, ttl:float) -> Optional[str]:
+        '''
+        Lease a free group to owner
+
+        :return: The leased group ID, or None if no group is free
+        '''
+        now = time.time()
+        with self._lock:
+            # BEGIN IMMEDIATE keeps the claim atomic across kiosk processes sharing the store
+            self.connection.execute('BEGIN IMMEDIATE')
+            try:
+                row = self.connection.execute('SELECT group_id FROM person_groups WHERE state = ? ORDER BY leased_at LIMIT 1', (FREE,)).fetchone()
+                if row is not None:
+                    self.connection.execute('UPDATE person_groups SET state = ?, owner = ?, leased_at = ?, expires_at = ? WHERE group_id = ?',
+                                            (LEASED, owner, now, now + ttl, row[0]))
+                self.connection.execute('COMMIT')
+            except BaseException:
+                self.connection.execute('ROLLBACK')
+                raise
+        return row[0] if row is not None else None
+
+    def begin_release(self, group_id:str, owner:str, expired_before:Optional[float]=None) -> bool:
+        '''
+        Stop the lease of owner from expiring while the group is cleared, so the sweeper leaves it alone
+
+        :param expired_before: Only if the lease expired before this time (the sweeper's reclaim)
+        :return: False if the group is no longer leased to owner (or, with expired_before, not expired)
+        '''
+        sql = 'UPDATE person_groups SET expires_at = NULL WHERE group_id = ? AND owner = ? AND state = ?'
+        params = (group_id, owner, LEASED)
+        if expired_before is not None:
+            sql += ' AND expires_at < ?'
+            params += (expired_before,)
+        return self._update(sql, params) == 1
+
+    def expire(self, group_id:str, owner:str) -> None:
+        '''
+        Expire the lease of owner now, so the sweeper reclaims the group
+        '''
+        self._execute('UPDATE person_groups SET expires_at = ? WHERE group_id = ? AND owner = ? AND state = ?',
+                      (time.time(), group_id, owner, LEASED))
+
+    def release(self, group_id:str, owner:str) -> None:
+        self._execute('UPDATE person_groups SET state = ?, owner = NULL, expires_at = NULL WHERE group_id = ? AND owner = ?',
+                      (FREE, group_id, owner))
+
+    def remove(self, group_id:str, owner:Optional[str]=None) -> None:
+        if owner is None:
+            self._execute('DELETE FROM person_groups WHERE group_id = ?', (group_id,))
+        else:
+            self._execute('DELETE FROM person_groups WHERE group_id = ? AND owner = ?', (group_id, owner))
+
+    def get(self, group_id:str) -> Optional[dict]:
+        rows = self._execute('SELECT group_id, state, owner, created_at, leased_at, expires_at FROM person_groups WHERE group_id = ?', (group_id,))
+        if not rows:
+            return None
+        return dict(zip(('group_id', 'state', 'owner', 'created_at', 'leased_at', 'expires_at'), rows[0]))
+
+    def expired(self, now:Optional[float]=None) -> list:
+        '''
+        (group ID, owner) of the leased groups whose lease has expired
+        '''
+        now = time.time() if now is None else now
+        return [tuple(row) for row in self._execute('SELECT group_id, owner FROM person_groups WHERE state = ? AND expires_at < ?', (LEASED, now))]
+
+    def group_ids(self) -> set:
+        return {row[0] for row in self._execute('SELECT group_id FROM person_groups')}
+
+    def count(self, state:Optional[str]=None) -> int:
+        if state is None:
+            return self._execute('SELECT COUNT(*) FROM person_groups')[0][0]
+        return self._execute('SELECT COUNT(*) FROM person_groups WHERE state = ?', (state,))[0][0]
+
+    def close(self) -> None:
+        with self._lock:
+            self.connection.close()
+
+class PersonGroupManager:
+    '''
+    Leases person groups from a bounded pool and garbage-collects the groups nobody owns
+    '''
+    def __init__(self, client:Optional[FaceApiClient]=None, store:Optional[PersonGroupStore]=None, pool_size:int=4,
+                 prefix:str='kiosk', lease_ttl:float=300.0, acquire_timeout:float=60.0, sweep_interval:float=600.0,
+                 sweep_legacy_groups:bool=False, instance_id:Optional[str]=None) -> None:
+        '''
+        :param client: Face API client (default: the shared pooled client)
+        :param store: Group store (default: in-memory)
+        :param pool_size: Maximum number of person groups in the pool
+        :param prefix: Person group ID prefix of the kiosk groups
+        :param lease_ttl: Seconds after which a leased group is reclaimed
+        :param acquire_timeout: Seconds to wait for a free group when the pool is exhausted
+        :param sweep_interval: Seconds between background sweeps, 0 to disable the sweeper
+        :param sweep_legacy_groups: Also delete uuid-named person groups unknown to the store, whoever created them
+        :param instance_id: ID of this kiosk instance in its group IDs (default: the store's); groups with
+                            this instance's prefix unknown to the store are orphans
+        '''
+        self._client = client
+        self.store = store or PersonGroupStore()
+        self.pool_size = pool_size
+        self.prefix = prefix
+        self.lease_ttl = lease_ttl
+        self.acquire_timeout = acquire_timeout
+        self.sweep_interval = sweep_interval
+        self.sweep_legacy_groups = sweep_legacy_groups
+        self.instance_id = instance_id or self.store.instance_id()
+        self.group_prefix = f"{prefix}-{self.instance_id}-"
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._sweeper = None
+
+    @property
+    def client(self) -> FaceApiClient:
+        if self._client is None:
+            self._client = get_face_api_client()
+        return self._client
+
+    def _new_group_id(self) -> str:
+        # Person group IDs: lowercase letters, digits, '-' and '_', up to 64 characters
+        return f"{self.group_prefix}{uuid.uuid4().hex}"[:64]
+
+    def acquire(self, owner:str) -> str:
+        '''
+        Lease an empty person group, creating one while the pool is below its size
+
+        :param owner: Lease owner (e.g. a passenger check-in ID)
+        :return: Person group ID
+        :raises TimeoutError: If no group becomes free within acquire_timeout
+        '''
+        deadline = time.monotonic() + self.acquire_timeout
+        reclaimed = False
+        while True:
+            with self._condition:
+                group_id = self.store.claim_free(owner, self.lease_ttl)
+                if group_id is not None:
+                    logger.info(f'Leased person group {group_id} to {owner}')
+                    return group_id
+                create = self.store.count() < self.pool_size
+                if create:
+                    # Reserve the group in the store before creating it, so the sweeper never sees it as an orphan
+                    group_id = self._new_group_id()
+                    self.store.add(group_id, owner, self.lease_ttl)
+                elif reclaimed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"No person group became free within {self.acquire_timeout} seconds (pool size {self.pool_size})")
+                    self._condition.wait(remaining)
+                    continue
+
+            if create:
+                return self._create(group_id, owner)
+            # The pool is exhausted: reclaim expired leases once before waiting
+            self.reclaim_expired()
+            reclaimed = True
+
+    def _create(self, group_id:str, owner:str) -> str:
+        try:
+            status, text = self.client.create_person_group(group_id, group_id)
+        except BaseException:
+            self._forget(group_id)
+            raise
+        if status != 200:
+            self._forget(group_id)
+            raise RuntimeError(f"Creating person group {group_id} failed: {status}, {text}")
+        logger.info(f'Created person group {group_id} for {owner}')
+        return group_id
+
+    def _forget(self, group_id:str) -> None:
+        with self._condition:
+            self.store.remove(group_id)
+            self._condition.notify()
+
+    def _clear(self, group_id:str) -> bool:
+        '''
+        Delete the persons of a group
+
+        :return: False if the group no longer exists
+        '''
+        try:
+            persons = self.client.list_persons(group_id)
+        except requests.HTTPError as error:
+            if error.response is not None and error.response.status_code == 404:
+                return False
+            raise
+        for person in persons:
+            self.client.delete_person(group_id, person['personId'])
+        return True
+
+    def release(self, group_id:str, owner:str, expired_before:Optional[float]=None) -> bool:
+        '''
+        Clear a group leased to owner and return it to the pool. A no-op once the lease is no longer
+        owner's: after the sweeper reclaimed it, the group may be leased to another passenger.
+
+        :param expired_before: Only if the lease expired before this time (see reclaim_expired)
+        :return: False if the group was not released
+        '''
+        if not self.store.begin_release(group_id, owner, expired_before):
+            if expired_before is None:
+                logger.warning(f'Person group {group_id} is no longer leased to {owner}, not releasing it')
+            return False
+        try:
+            exists = self._clear(group_id)
+        except Exception as error:
+            # Leave the group leased, expired: the sweeper retries
+            logger.error(f'Clearing person group {group_id} failed: {error}')
+            self.store.expire(group_id, owner)
+            return False
+        with self._condition:
+            if exists:
+                self.store.release(group_id, owner)
+            else:
+                self.store.remove(group_id, owner)
+            self._condition.notify()
+        logger.info(f'Released person group {group_id}')
+        return True
+
+    @contextmanager
+    def lease(self, owner:str):
+        '''
+        Lease a person group for the duration of a with block
+        '''
+        group_id = self.acquire(owner)
+        try:
+            yield group_id
+        finally:
+            self.release(group_id, owner)
+
+    def reclaim_expired(self) -> int:
+        '''
+        Release the groups whose lease has expired
+
+        :return: Number of groups reclaimed
+        '''
+        now = time.time()
+        reclaimed = 0
+        for group_id, owner in self.store.expired(now):
+            logger.info(f'Reclaiming person group {group_id} (lease expired)')
+            # Only while still expired: the owner may be releasing it at the same time
+            reclaimed += self.release(group_id, owner, expired_before=now)
+        return reclaimed
+
+    def _list_all_person_groups(self) -> list:
+        groups, start = [], None
+        while True:
+            page = self.client.list_person_groups(start=start, top=1000)
+            groups.extend(page)
+            if len(page) < 1000:
+                return groups
+            start = page[-1]['personGroupId']
+
+    def find_orphans(self) -> list:
+        '''
+        IDs of the person groups of this kiosk instance that the store doesn't know about; groups of
+        other instances are never orphans here, as their leases are in other stores
+        '''
+        known = self.store.group_ids()
+        orphans = []
+        for group in self._list_all_person_groups():
+            group_id = group['personGroupId']
+            if group_id in known:
+                continue
+            if group_id.startswith(self.group_prefix) or (self.sweep_legacy_groups and LEGACY_GROUP_ID.match(group_id)):
+                orphans.append(group_id)
+        return orphans
+
+    def sweep(self) -> dict:
+        '''
+        Reclaim expired leases and delete orphaned person groups in bulk
+
+        :return: Number of groups reclaimed and deleted
+        '''
+        reclaimed = self.reclaim_expired()
+        orphans = self.find_orphans()
+        if orphans:
+            with ThreadPoolExecutor(max_workers=min(len(orphans), 8)) as executor:
+                list(executor.map(self.client.delete_person_group, orphans))
+        logger.info(f'Person group sweep: {reclaimed} reclaimed, {len(orphans)} orphans deleted')
+        return {'reclaimed': reclaimed, 'deleted': len(orphans)}
+
+    def _sweep_loop(self) -> None:
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception as error:
+                logger.error(f'Person group sweep failed: {error}')
+
+    def start_sweeper(self) -> None:
+        if self.sweep_interval and self._sweeper is None:
+            self._stop.clear()
+            self._sweeper = threading.Thread(target=self._sweep_loop, name='person-group-sweeper', daemon=True)
+            self._sweeper.start()
+
+    def stop_sweeper(self) -> None:
+        self._stop.set()
+        if self._sweeper is not None:
+            self._sweeper.join()
+            self._sweeper = None
+
+    def shutdown(self, delete_groups:bool=False) -> None:
+        '''
+        Stop the sweeper; optionally delete every pooled group
+        '''
+        self.stop_sweeper()
+        if delete_groups:
+            for group_id in self.store.group_ids():
+                self.client.delete_person_group(group_id)
+                self.store.remove(group_id)
+
+@lru_cache(maxsize=None)
+def get_person_group_manager() -> PersonGroupManager:
+    '''
+    Get the process-wide person group manager, configured from the person_groups config section,
+    with its background sweeper started
+    '''
+    config = get_settings().config.get('person_groups') or {}
+    store_path = config.get('store_path', 'data/person_groups.sqlite')
+    if store_path != ':memory:' and not os.path.isabs(store_path):
+        store_path = os.path.join(ROOT_DIR, store_path)
+    manager = PersonGroupManager(store=PersonGroupStore(store_path),
+                                 pool_size=config.get('pool_size', 4),
+                                 prefix=config.get('prefix', 'kiosk'),
+                                 lease_ttl=config.get('lease_ttl', 300),
+                                 acquire_timeout=config.get('acquire_timeout', 60),
+                                 sweep_interval=config.get('sweep_interval', 600),
+                                 sweep_legacy_groups=config.get('sweep_legacy_groups', False),
+                                 instance_id=config.get('instance_id'))
+    manager.start_sweeper()
+    return manager
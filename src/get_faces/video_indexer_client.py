@@ -1,14 +1,24 @@
 import os
-import requests
 import time
-from dotenv import load_dotenv, find_dotenv, dotenv_values
+import logging
+import threading
+import requests
 from typing import Optional
 from tabulate import tabulate
 from PIL import Image
 from io import BytesIO
 from urllib.parse import urlparse
 from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from azure.identity import DefaultAzureCredential
+from utility.settings import get_settings
+from utility.polling import poll_until, retry_after_seconds, PollTimeoutError
+from utility import telemetry
+from utility.logs import log_payload
+
+# Setup logging
+logger = logging.getLogger()
 
 @dataclass
 class Consts:
@@ -33,7 +43,7 @@ def get_arm_access_token(consts:Consts) -> str:
         return token.token
 
 def get_account_access_token(consts, arm_access_token, permission_type='Contributor', scope='Account',
-                                   video_id=None):
+                                   video_id=None, session=None):
     '''
     Get an access token for the Video Indexer account
     
@@ -42,6 +52,7 @@ def get_account_access_token(consts, arm_access_token, permission_type='Contribu
     :param permission_type: Permission type for the access token
     :param scope: Scope for the access token
     :param video_id: Video ID for the access token, if scope is Video. Otherwise, not required
+    :param session: Optional requests.Session to send the request with
     :return: Access token for the Video Indexer account
     '''
 
@@ -61,7 +72,7 @@ def get_account_access_token(consts, arm_access_token, permission_type='Contribu
     if video_id is not None:
         params['videoId'] = video_id
 
-    response = requests.post(url, json=params, headers=headers)
+    response = (session or requests).post(url, json=params, headers=headers)
     
     # check if the response is valid
     response.raise_for_status()
@@ -87,14 +98,28 @@ def save_images_locally(local_directory: str, images: list) -> None:
     for idx, img in enumerate(images):
         file_path = os.path.join(local_directory, f'thumbnail_{idx}.png')
         img.save(file_path)
-        print(f"Image saved at {file_path}")
+        logger.debug(f"Image saved at {file_path}")
+
+# Status codes of a thumbnail download worth retrying
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
 
 class VideoIndexerClient:
-    def __init__(self) -> None:
+    def __init__(self, pool_size:int=8, session:Optional[requests.Session]=None) -> None:
+        '''
+        :param pool_size: Keep-alive connections kept for the Video Indexer calls and concurrent thumbnail downloads
+        :param session: Optional pre-configured requests.Session
+        '''
         self.arm_access_token = ''
         self.vi_access_token = ''
         self.account = None
         self.consts = None
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            telemetry.instrument_session(session, 'video_indexer')
+        self.session = session
 
     def get_access_token(self, consts:Consts) -> None:
         '''
@@ -103,13 +128,12 @@ class VideoIndexerClient:
         '''
         self.consts = consts
         # Get access tokens
-        load_dotenv(find_dotenv())
-        arm_access_token = os.environ.get("arm_access_token")
+        arm_access_token = get_settings().get("arm_access_token")
         if arm_access_token is None:
             self.arm_access_token = get_arm_access_token(self.consts)
         else:
             self.arm_access_token = arm_access_token
-        self.vi_access_token = get_account_access_token(self.consts, self.arm_access_token)
+        self.vi_access_token = get_account_access_token(self.consts, self.arm_access_token, session=self.session)
 
     def get_account_initialized(self) -> None:
         '''
@@ -127,12 +151,12 @@ class VideoIndexerClient:
               f'{self.consts.ResourceGroup}/providers/Microsoft.VideoIndexer/accounts/{self.consts.AccountName}' + \
               f'?api-version={self.consts.ApiVersion}'
 
-        response = requests.get(url, headers=headers)
+        response = self.session.get(url, headers=headers)
 
         response.raise_for_status()
 
         self.account = response.json()
-        print(f'[Account Details] Id:{self.account["properties"]["accountId"]}, Location: {self.account["location"]}')
+        logger.info('[Account Details] Id:%s, Location: %s', self.account["properties"]["accountId"], self.account["location"])
 
     # Upload video
     def upload_video(self, file_path:str, excluded_ai:Optional[list[str]]=None, video_name:Optional[str]=None):
@@ -162,7 +186,7 @@ class VideoIndexerClient:
             }
             if len(excluded_ai) > 0:
                 params['excludedAI'] = ','.join(excluded_ai)
-            response = requests.post(url, params=params)
+            response = self.session.post(url, params=params)
         else:  # Local file
             if video_name is None:
                 video_name = get_file_name_no_extension(file_path)
@@ -175,26 +199,28 @@ class VideoIndexerClient:
             if len(excluded_ai) > 0:
                 params['excludedAI'] = ','.join(excluded_ai)
             
-            print('Uploading a local file using multipart/form-data post request..')
+            logger.info('Uploading a local file using multipart/form-data post request..')
 
             files = {'file': open(file_path, 'rb')}        
-            response = requests.post(url, params=params, files=files)
+            response = self.session.post(url, params=params, files=files)
 
         response.raise_for_status()
 
         video_id = response.json().get('id')
-        print(f'Video ID {video_id} was uploaded successfully')
+        logger.info('Video ID %s was uploaded successfully', video_id)
 
         return video_id
     
-    def index_video(self, video_id:str, language:str='English', timeout_sec:Optional[int]=None) -> None:
+    def index_video(self, video_id:str, language:str='English', timeout_sec:Optional[int]=None,
+                    cancel_event:Optional[threading.Event]=None) -> None:
         '''
-        Calls getVideoIndex API in 10 second intervals until the indexing state is 'processed'
-        Prints video index when the index is complete, otherwise throws exception.
+        Polls getVideoIndex API with backoff (2 to 10 seconds) until the indexing state is 'processed'
+        Logs a summary of the video index when the index is complete, otherwise throws exception.
 
         :param video_id: The video ID to wait for
         :param language: The language to translate video insights
         :param timeout_sec: The timeout in seconds
+        :param cancel_event: Optional event that stops waiting (raises PollCancelledError) when set
         '''
         self.get_account_initialized() # if account is not initialized, get it
 
@@ -206,39 +232,39 @@ class VideoIndexerClient:
             'language': language
         }
 
-        print(f'Checking if video {video_id} has finished indexing...')
-        processing = True
-        start_time = time.time()
-        while processing:
-            response = requests.get(url, params=params)
-
-            response.raise_for_status()
-
-            video_result = response.json()
-            video_state = video_result.get('state')
-
-            if video_state == 'Processed':
-                processing = False
-                print(f'The video index has completed. Here is the full JSON of the index for video ID {video_id}: \n{video_result}')
-                break
-            elif video_state == 'Failed':
-                processing = False
-                print(f"The video index failed for video ID {video_id}.")
-                break
-
-            print(f'The video index state is {video_state}')
-
-            if timeout_sec is not None and time.time() - start_time > timeout_sec:
-                print(f'Timeout of {timeout_sec} seconds reached. Exiting...')
-                break
-
-            time.sleep(10) # wait 10 seconds before checking again
+        logger.info('Checking if video %s has finished indexing...', video_id)
+
+        def check_index():
+            response = self.session.get(url, params=params)
+            if response.status_code != 429: # throttled polls are retried after Retry-After
+                response.raise_for_status()
+                logger.info('The video index state is %s', response.json().get("state"))
+            else:
+                telemetry.count('kiosk_retries_total', service='video_indexer', reason='throttled')
+            return response
+
+        def is_indexed(response) -> bool:
+            return response.status_code != 429 and response.json().get('state') in ('Processed', 'Failed')
+
+        try:
+            response = poll_until(check_index, is_indexed, name='video_indexer.index_video', initial_interval=2, max_interval=10,
+                                  timeout=timeout_sec, retry_after=retry_after_seconds, cancel_event=cancel_event)
+        except PollTimeoutError:
+            logger.warning('Timeout of %s seconds reached. Exiting...', timeout_sec)
+            return
+
+        video_result = response.json()
+        if video_result.get('state') == 'Processed':
+            logger.info('The video index has completed for video ID %s', video_id)
+            log_payload(logger, f'Video index of {video_id}', video_result)
+        else:
+            logger.error('The video index failed for video ID %s.', video_id)
 
     # Get video insights
     def get_video_insights(self, video_id:str) -> dict:
         '''
         Gets the video index. Calls the index API
-        Prints the video metadata, otherwise throws an exception
+        Logs a summary of the video metadata, otherwise throws an exception
 
         :param video_id: The video ID
         '''
@@ -251,12 +277,12 @@ class VideoIndexerClient:
             'accessToken': self.vi_access_token
         }
 
-        response = requests.get(url, params=params)
+        response = self.session.get(url, params=params)
 
         response.raise_for_status()
 
         insights = response.json()
-        print(f'Here are the search results: \n{insights}')
+        log_payload(logger, f'Video insights of {video_id}', insights)
         return insights
     
     def get_video_thumbnail(self, video_id:str, thumbnail_id:str) -> None:
@@ -275,36 +301,68 @@ class VideoIndexerClient:
             'accessToken': self.vi_access_token
         }
 
-        response = requests.get(url, params=params)
+        response = self.session.get(url, params=params)
 
         return response
 
+    def download_thumbnail(self, video_id:str, thumbnail_id:str, retries:int=2) -> bytes:
+        '''
+        Download a thumbnail, retrying connection errors, throttling and server errors
+
+        :param video_id: The video ID
+        :param thumbnail_id: The thumbnail ID
+        :param retries: Retries after the first attempt
+        :return: JPEG-encoded thumbnail
+        '''
+        for attempt in range(retries + 1):
+            try:
+                response = self.get_video_thumbnail(video_id, thumbnail_id)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == retries:
+                    raise
+                telemetry.count('kiosk_retries_total', service='video_indexer', reason='connection')
+                time.sleep(0.5 * 2 ** attempt)
+                continue
+            if response.status_code not in RETRY_STATUS_CODES or attempt == retries:
+                response.raise_for_status()
+                return response.content
+            retry_after = retry_after_seconds(response)
+            telemetry.count('kiosk_retries_total', service='video_indexer', reason='throttled' if response.status_code == 429 else 'server_error')
+            time.sleep(retry_after if retry_after is not None else 0.5 * 2 ** attempt)
+
     # Get face thumbnails from insights
-    def get_face_images(self, insights:dict, video_id:str) -> list:
+    def get_face_images(self, insights:dict, video_id:str, decode:bool=True, max_workers:int=8, retries:int=2) -> list:
         """
         Retrieve face images from the video insights.
 
+        Thumbnails are downloaded concurrently over the client's keep-alive session and returned
+        in the order of the insights.
+
         :param insights: Dictionary containing video insights.
         :param video_id: ID of the video.
-        :return: List of PIL Image objects containing the thumbnails.
+        :param decode: False to return the JPEG bytes instead of decoding them, for callers that
+                       forward the thumbnails to Face API as they are.
+        :param max_workers: Maximum concurrent downloads.
+        :param retries: Retries per thumbnail.
+        :return: List of PIL Image objects (or JPEG bytes) containing the thumbnails.
         """
-        images = []
-
         # Iterate through face thumbnails
-        for each_thumb in insights['videos'][0]['insights']['faces'][0]['thumbnails']:
-            if 'fileName' in each_thumb and 'id' in each_thumb:
-                thumb_id = each_thumb['id']
-                response = self.get_video_thumbnail(video_id, thumb_id)
-                img_code = response.content  # Extract JPEG-encoded image content
-                img_stream = BytesIO(img_code)
-                img = Image.open(img_stream)
-                images.append(img)
-
-        return images
+        thumb_ids = [each_thumb['id'] for each_thumb in insights['videos'][0]['insights']['faces'][0]['thumbnails']
+                     if 'fileName' in each_thumb and 'id' in each_thumb]
+        if not thumb_ids:
+            return []
+
+        self.get_account_initialized() # initialize the account once, before the workers start
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(thumb_ids)))) as executor:
+            thumbnails = list(executor.map(lambda thumb_id: self.download_thumbnail(video_id, thumb_id, retries), thumb_ids))
+
+        if not decode:
+            return thumbnails
+        return [Image.open(BytesIO(img_code)) for img_code in thumbnails]  # Decode the JPEG-encoded image content
     
     def get_emotions_from_insights(self, insights:dict) -> None:
         """
-        Extract emotions from video insights and print them.
+        Extract emotions from video insights and log them at debug level.
 
         :param insights: Dictionary containing video insights.
         """
@@ -312,7 +370,7 @@ class VideoIndexerClient:
         table_data = []
 
         no_of_emotions = len(insights['videos'][0]['insights']['emotions'])
-        print(f'{no_of_emotions} types of emotions captured in the video')
+        logger.debug(f'{no_of_emotions} types of emotions captured in the video')
 
         for emotion_data in insights['videos'][0]['insights']['emotions']:
             emotion_type = emotion_data['type']
@@ -324,15 +382,16 @@ class VideoIndexerClient:
             # Append data to table for printing
             table_data.append([emotion_type, confidence_score])
 
-        # Print table
-        print(tabulate(table_data, headers=["Emotion Type", "Confidence Score"], tablefmt="pretty"))
+        # Log table, formatted only when it is logged
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Emotions:\n%s", tabulate(table_data, headers=["Emotion Type", "Confidence Score"], tablefmt="pretty"))
     
         # return emotions_data
 
     # Get total sentiments and their duration ratios
     def get_sentiments_from_insights(self, insights:dict) -> dict:
         """
-        Extract sentiments from video insights and print them in a tabular format.
+        Extract sentiments from video insights and log them at debug level.
 
         :param insights: Dictionary containing video insights.
         :return: Dictionary with sentiment keys.
@@ -341,7 +400,7 @@ class VideoIndexerClient:
         table_data = []
 
         no_of_sentiments = len(insights['summarizedInsights']['sentiments'])
-        print(f'{no_of_sentiments} types of sentiments captured in the video')
+        logger.debug(f'{no_of_sentiments} types of sentiments captured in the video')
 
         for sentiment_data in insights['summarizedInsights']['sentiments']:
             sentiment_key = sentiment_data['sentimentKey']
@@ -356,13 +415,12 @@ class VideoIndexerClient:
         # print(tabulate(table_data, headers=["Sentiment"], tablefmt="pretty"))
         # Print dictionary in list format
     
-        return print(f"\nSentiments List: {list(sentiments_data.keys())}")
+        logger.debug(f"Sentiments List: {list(sentiments_data.keys())}")
+        return None
 
 if __name__ == "__main__":
     # Load and define env parameters
-    load_dotenv(find_dotenv())
-
-    config = dotenv_values(".env")
+    config = get_settings()
 
     arm_access_token = config.get("arm_access_token")
 
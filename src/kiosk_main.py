@@ -1,36 +1,39 @@
-import os
 import time
+import uuid
+import threading
 import pandas as pd
 import logging
-import yaml
-from dotenv import find_dotenv, load_dotenv
-from get_custom_text.analyze_custom_doc_main import main as analyze_custom
+from collections import Counter
+from typing import Optional
+from get_custom_text.analyze_custom_doc_main import main as analyze_custom, resolve_model_id
 from get_ID.analyzeID_prebuilt import analyze_identity_documents as analyze_id
+from get_documents.analyze_combined_documents import analyze_combined_documents as analyze_combined
 from get_faces.face_identification_main import get_video_insights as insights
 from get_faces.face_identification_main import build_person_model as personModel
 from get_faces.face_identification_main import indentify_faces as identify_faces
-from validation.validation import validate_all, get_validation_messages
+from get_faces.face_identification_main import verify_identity, identification_mode, release_person_model, VIDEO_INDEXER_STEPS
+from get_faces.face_api_client import face_api_config
+from validation.validation import validate_all, get_validation_messages, prepare_manifest, documents_match_manifest
+from validation.manifest_index import ManifestIndex
+from utility.settings import get_settings
+from utility.pipeline import Pipeline, PipelineResult, StageCancelled
+from utility import telemetry
+from utility.logs import log_payload, configure_logging
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)-15s %(message)s")
 logger = logging.getLogger()
 
-# Load environment variables
-load_dotenv(find_dotenv())
+# Stages that make the Video Indexer and Face API calls, cancelled once the documents rule out boarding
+FACE_STAGES = ('video', 'faces')
 
-# Get the config file path from the .env file
-config_path = os.getenv('CONFIG_PATH')
-
-# Load the config file
-if config_path and os.path.exists(config_path):
-    with open(config_path) as yaml_file:
-        config_yml = yaml.safe_load(yaml_file)
-else:
-    raise FileNotFoundError(f"Config file not found at the specified path: {config_path}")
+# Remote calls not made because the documents already failed, over all check-ins
+_avoided_calls = Counter()
+_avoided_calls_lock = threading.Lock()
 
 def load_manifest_file():
     try:
-        manifest_path = config_yml['manifest_file']['file_path']
+        manifest_path = get_settings().config['manifest_file']['file_path']
         if not manifest_path:
             raise FileNotFoundError("Manifest file path is missing in the config.")
         manifest_df = pd.read_csv(manifest_path)
@@ -41,6 +44,8 @@ def load_manifest_file():
         timestamp = time.strftime("%Y%m%d_%H%M%S")
         new_filename = f"{manifest_path.split('.')[0]}_{timestamp}.csv"
         manifest_df.to_csv(new_filename, index=False)
+        # Parse the DoB column once so validation compares dates instead of re-parsing strings
+        prepare_manifest(manifest_df)
     except FileNotFoundError as e:
         logger.error(f"Manifest file not found: {str(e)}")
         raise
@@ -54,7 +59,7 @@ def get_id(id_file_path):
         if not id_file_path:
             raise FileNotFoundError("ID document file path is not provided.")
         id_data = analyze_id(id_file_path)
-        print(id_data)  # Display the dictionary with the captured values and confidence scores
+        log_payload(logger, 'ID document', id_data)  # The captured values and confidence scores
     except FileNotFoundError as e:
         logger.error(f"ID document file not found: {str(e)}")
         raise
@@ -66,13 +71,14 @@ def get_id(id_file_path):
 
 def get_boarding_pass(boarding_pass_file_path):
     try:
-        model_id = config_yml['doc_intelligence']['custom_models']['boarding_pass_1']
-        training_folder_path = os.getenv('training_folder_path')
+        settings = get_settings()
+        model_id = settings.config['doc_intelligence']['custom_models']['boarding_pass_1']
+        training_folder_path = settings.get('training_folder_path')
 
         if not boarding_pass_file_path:
             raise FileNotFoundError("Boarding pass file path is not provided.")
         bp_info = analyze_custom(boarding_pass_file_path, model_id, training_folder_path)
-        print(bp_info)  # Display the dictionary with the captured values and confidence scores
+        log_payload(logger, 'Boarding pass', bp_info)  # The captured values and confidence scores
     except FileNotFoundError as e:
         logger.error(f"Boarding pass file not found: {str(e)}")
         raise
@@ -81,28 +87,66 @@ def get_boarding_pass(boarding_pass_file_path):
         raise
     return bp_info
 
-def identify_faces_from_video(video_file_path, id_source_file):
+def get_documents(document_file_path):
+    try:
+        settings = get_settings()
+        model_id = settings.config['doc_intelligence']['custom_models']['boarding_pass_1']
+
+        if not document_file_path:
+            raise FileNotFoundError("Document file path is not provided.")
+        model_id = resolve_model_id(model_id, settings.get('training_folder_path'))
+        id_data, bp_info, id_image = analyze_combined(document_file_path, model_id)
+        log_payload(logger, 'ID document', id_data)
+        log_payload(logger, 'Boarding pass', bp_info)
+    except FileNotFoundError as e:
+        logger.error(f"Document file not found: {str(e)}")
+        raise
+    except Exception as e:
+        logger.error(f"Error analyzing the combined document: {str(e)}")
+        raise
+    return id_data, bp_info, id_image
+
+def get_video_thumbnails(video_file_path, cancel_event:Optional[threading.Event]=None):
     try:
-        local_dir = os.getenv('local_thumbnails_dir_path')
+        local_dir = get_settings().get('local_thumbnails_dir_path')
 
         if not video_file_path:
             raise FileNotFoundError("Video file path is missing.")
-        if not local_dir:
-            raise FileNotFoundError("Local thumbnails directory path is missing in environment variables.")
 
-        # Get video insights
-        image_list, emotions, sentiments = insights(video_file_path, local_dir)
-
-        # Build person model based on the images extracted from the video
-        person_group_id = personModel(image_list)
+        # Get video insights; the face thumbnails stay in memory (local_dir is only used to persist them)
+        image_list, emotions, sentiments = insights(video_file_path, local_dir, cancel_event=cancel_event)
+    except StageCancelled:
+        logger.info("Video indexing cancelled")
+        raise
+    except FileNotFoundError as e:
+        logger.error(f"File not found during video indexing: {str(e)}")
+        raise
+    except Exception as e:
+        logger.error(f"Error during video indexing: {str(e)}")
+        raise
+    return image_list
 
+def identify_faces_in_thumbnails(image_list, id_source_file):
+    try:
         # Get ID image source file
         # id_source_file = os.getenv("file_path_to_id")
         if not id_source_file:
             raise FileNotFoundError("ID source file is not found in environment variables.")
 
-        # Identify faces between the ID image and person model
-        face_results = identify_faces(id_source_file, person_group_id)
+        if identification_mode() == 'verify':
+            # Verify the ID face against the best thumbnails, without a person model
+            face_results = verify_identity(id_source_file, image_list)
+        else:
+            # Build person model based on the images extracted from the video
+            owner = str(uuid.uuid4())
+            person_group_id = personModel(image_list, owner)
+
+            try:
+                # Identify faces between the ID image and person model
+                face_results = identify_faces(id_source_file, person_group_id)
+            finally:
+                # Return the person group to the pool, unless its lease expired and it was reclaimed
+                release_person_model(person_group_id, owner)
     except FileNotFoundError as e:
         logger.error(f"File not found during face verification: {str(e)}")
         raise
@@ -111,31 +155,154 @@ def identify_faces_from_video(video_file_path, id_source_file):
         raise
     return face_results
 
-def main(id_file_path, boarding_pass_file_path, video_file_path):
-    try:
-        # Load the manifest file
-        logger.error("Load the manifest file")
-        manifest_file = load_manifest_file()
+def identify_faces_from_video(video_file_path, id_source_file):
+    image_list = get_video_thumbnails(video_file_path)
+    return identify_faces_in_thumbnails(image_list, id_source_file)
+
+def load_manifest_and_index():
+    manifest_file = load_manifest_file()
+    # Index the manifest once so validation looks passengers up instead of scanning every row
+    return manifest_file, ManifestIndex(manifest_file)
+
+def validate_passenger(manifest, id_data, boarding_pass_data, face_results):
+    manifest_file, manifest_index = manifest
+    return validate_all(id_data, boarding_pass_data, face_results, manifest_file, manifest_index)
+
+def check_documents(manifest, id_data, boarding_pass_data):
+    manifest_file, manifest_index = manifest
+    return documents_match_manifest(id_data, boarding_pass_data, manifest_file, manifest_index)
+
+def validation_plan_config() -> dict:
+    '''
+    validation_plan section of the config:
+    - early_exit: cancel the video and face stages when the documents fail (default True)
+    - start_video: 'overlap' to index the video while the documents are checked (default),
+      'after_documents' to only start it once they pass
+    '''
+    return get_settings().config.get('validation_plan') or {}
+
+def face_api_calls(thumbnail_count:Optional[int]=None) -> Counter:
+    '''
+    Face API requests made by identify_faces_in_thumbnails in the configured mode
+
+    :param thumbnail_count: Thumbnails extracted from the video, if known (the identify mode adds one face per thumbnail)
+    '''
+    if identification_mode() == 'verify':
+        verified = face_api_config().get('verify_thumbnails', 5)
+        if thumbnail_count is not None:
+            verified = min(verified, thumbnail_count)
+        return Counter({'face_api.detect': 1 + verified, 'face_api.verify': verified})
+    calls = Counter({'face_api.add_person_to_group': 1, 'face_api.train_person_group': 1,
+                     'face_api.get_training_status': 1, 'face_api.detect': 1, 'face_api.identify': 1})
+    if thumbnail_count:
+        calls['face_api.add_face_to_person'] = thumbnail_count
+    return calls
 
-        # Get the ID documents
-        logger.error("Extract the ID documents")
-        id_data = get_id(id_file_path)
+def count_avoided_calls(pipeline:Pipeline, result:PipelineResult) -> Counter:
+    '''
+    Remote calls the cancelled video and face stages did not make
+    '''
+    avoided = Counter()
+    video = result.timings.get('video')
+    if video is not None and video.status == 'skipped':
+        avoided.update(VIDEO_INDEXER_STEPS)
+    elif 'video' in pipeline.cancelled:
+        avoided.update(pipeline.cancelled['video'].skipped)
+    faces = result.timings.get('faces')
+    if faces is not None and faces.status == 'skipped':
+        image_list = result.results.get('video')
+        avoided.update(face_api_calls(len(image_list) if image_list is not None else None))
+    return avoided
 
-        # Get the boarding pass info
-        logger.error("Extract the boarding pass info")
-        boarding_pass_data = get_boarding_pass(boarding_pass_file_path)
+def get_avoided_call_metrics() -> dict:
+    '''
+    Remote calls avoided by the early exit since start-up, by operation
+    '''
+    with _avoided_calls_lock:
+        return dict(_avoided_calls)
 
-        # Verify faces
-        logger.error("Identify faces")
-        face_results = identify_faces_from_video(video_file_path, id_file_path)
-        # face_results = [{'faceId': '8344e744-601c-4f4e-905b-aaf21c3f16b0', 'candidates': [{'personId': 'eac60023-b565-449f-be9d-af25a2524185', 'confidence': 0.95612}]}]
+def run_pipeline(id_file_path, boarding_pass_file_path, video_file_path, max_workers=None, on_stage=None) -> PipelineResult:
+    """
+    Run the check-in stages as a dependency graph: the manifest, ID, boarding pass and video
+    stages start together, face identification starts as soon as the video thumbnails are ready
+    (the ID image is an input file), and validation runs once everything is in.
 
-        # Perform validation
-        logger.error("Perform validation")
-        passenger_info = validate_all(id_data, boarding_pass_data, face_results, manifest_file)
+    The cheap document checks (name, DoB and boarding pass against the manifest) run as soon as
+    the documents are analyzed. A passenger whose documents match no manifest row cannot board
+    whatever the face results are, so the video and face stages are then cancelled: a stage that
+    has not started is skipped and video indexing stops at its next Video Indexer call. Validation
+    still runs, without face results, so the passenger gets the same message. With the early exit
+    on (validation_plan.early_exit), face identification also waits for the document checks.
+
+    Without a boarding pass file, id_file_path is one document holding the ID and the boarding pass:
+    a 'combined' stage analyzes both from it (see analyze_combined_documents) and the id and
+    boarding_pass stages pick their part of its result. Face identification then reads the ID face
+    from the JPEG of the first ID page the combined stage renders, as the Face API reads no PDF or TIFF.
+
+    :param max_workers: Stages run concurrently (1 runs them in sequence)
+    :param on_stage: Optional callback called with (stage name, status) as the stages start and end
+    :return: PipelineResult with each stage's result and timing
+    """
+    plan = validation_plan_config()
+    early_exit = plan.get('early_exit', True)
+    video_depends_on = ('documents',) if plan.get('start_video', 'overlap') == 'after_documents' else ()
+
+    pipeline = Pipeline(max_workers=max_workers, on_stage=on_stage)
+
+    def documents_stage(manifest, id_data, boarding_pass_data):
+        documents_ok = check_documents(manifest, id_data, boarding_pass_data)
+        if not documents_ok and early_exit:
+            logger.info("Documents do not match the manifest, cancelling the video and face stages")
+            pipeline.cancel(*FACE_STAGES)
+        return documents_ok
+
+    pipeline.add('manifest', load_manifest_and_index)
+    if boarding_pass_file_path is None:
+        pipeline.add('combined', lambda: get_documents(id_file_path))
+        pipeline.add('id', lambda documents: documents[0], depends_on=('combined',))
+        pipeline.add('boarding_pass', lambda documents: documents[1], depends_on=('combined',))
+    else:
+        pipeline.add('id', lambda: get_id(id_file_path))
+        pipeline.add('boarding_pass', lambda: get_boarding_pass(boarding_pass_file_path))
+    pipeline.add('documents', documents_stage, depends_on=('manifest', 'id', 'boarding_pass'))
+    pipeline.add('video', lambda *_: get_video_thumbnails(video_file_path, pipeline.cancel_events['video']),
+                 depends_on=video_depends_on)
+    # With the early exit on, face identification also waits for the document checks so that a
+    # failing passenger never reaches the Face API; otherwise it only needs the thumbnails
+    faces_depends_on = ('video', 'documents') if early_exit else ('video',)
+    if boarding_pass_file_path is None:
+        pipeline.add('faces', lambda image_list, documents, *_: identify_faces_in_thumbnails(image_list, documents[2]),
+                     depends_on=('video', 'combined') + faces_depends_on[1:])
+    else:
+        pipeline.add('faces', lambda image_list, *_: identify_faces_in_thumbnails(image_list, id_file_path),
+                     depends_on=faces_depends_on)
+    pipeline.add('validation', validate_passenger, depends_on=('manifest', 'id', 'boarding_pass', 'faces'))
+    # face_results = [{'faceId': '8344e744-601c-4f4e-905b-aaf21c3f16b0', 'candidates': [{'personId': 'eac60023-b565-449f-be9d-af25a2524185', 'confidence': 0.95612}]}]
+    with telemetry.span('kiosk.checkin'):
+        result = pipeline.run()
+
+    avoided = count_avoided_calls(pipeline, result)
+    if avoided:
+        with _avoided_calls_lock:
+            _avoided_calls.update(avoided)
+        for operation, calls in avoided.items():
+            telemetry.count('kiosk_avoided_calls_total', calls, operation=operation)
+        logger.info(f"Early exit avoided {sum(avoided.values())} remote calls: {dict(avoided)}")
+    return result
+
+def main(id_file_path, boarding_pass_file_path, video_file_path, on_stage=None):
+    try:
+        # Load the manifest, extract the ID documents and the boarding pass info, identify faces
+        # and perform validation, overlapping the independent stages
+        logger.info("Run the check-in pipeline")
+        result = run_pipeline(id_file_path, boarding_pass_file_path, video_file_path, on_stage=on_stage)
+        # The report formats every stage: only build it when it is logged
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Check-in stage latency:\n%s", result.report())
+        passenger_info = result.results['validation']
 
         # Get the validation message
-        logger.error("Generate validation message")
+        logger.info("Generate validation message")
         validation_message = get_validation_messages(passenger_info)
         # print(validation_message)
         return validation_message
@@ -145,6 +312,7 @@ def main(id_file_path, boarding_pass_file_path, video_file_path):
 
 
 if __name__ == "__main__":
+    configure_logging()
     try:
         main(id_file_path, boarding_pass_file_path, video_file_path)
     except Exception as e:
@@ -0,0 +1,84 @@
+'''
+Shared Document Intelligence clients.
+
+A DocumentIntelligenceClient owns its transport and connection pool, so creating one per passenger
+opens new TCP+TLS connections for every analysis. The clients are created on first use, one per
+endpoint and key, and shared by the ID and boarding pass analyses across calls and threads (the SDK
+clients are thread-safe), as are the administration clients that build and list the custom models.
+Their pooled requests.Session keeps doc_intelligence.pool_size connections alive per host.
+close_document_intelligence_clients closes them; it is also registered to run at exit.
+'''
+import atexit
+import logging
+import threading
+from typing import Optional
+import requests
+from requests.adapters import HTTPAdapter
+from azure.core.credentials import AzureKeyCredential
+from azure.core.pipeline.transport import RequestsTransport
+from azure.ai.documentintelligence import DocumentIntelligenceClient, DocumentIntelligenceAdministrationClient
+from utility.settings import get_settings
+from utility import telemetry
+
+# Setup logging
+logger = logging.getLogger()
+
+_clients = {}  # (client class, endpoint, key) -> client
+_clients_lock = threading.Lock()
+
+def create_document_intelligence_client(endpoint:str, key:str, pool_size:int=10, client_class=DocumentIntelligenceClient):
+    '''
+    Create a client over a pooled, keep-alive requests.Session
+
+    :param endpoint: Document Intelligence endpoint
+    :param key: Document Intelligence API key
+    :param pool_size: Keep-alive connections kept per host
+    :param client_class: DocumentIntelligenceClient or DocumentIntelligenceAdministrationClient
+    '''
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    # session_owner: the client's close() also closes the session
+    transport = RequestsTransport(session=session, session_owner=True)
+    return client_class(endpoint=endpoint, credential=AzureKeyCredential(key), transport=transport,
+                        **telemetry.azure_sdk_kwargs('document_intelligence'))
+
+def _shared_client(client_class, endpoint:Optional[str], key:Optional[str]):
+    settings = get_settings()
+    endpoint = endpoint or settings.get("DOCUMENTINTELLIGENCE_ENDPOINT")
+    key = key or settings.get("DOCUMENTINTELLIGENCE_API_KEY")
+    with _clients_lock:
+        client = _clients.get((client_class, endpoint, key))
+        if client is None:
+            pool_size = (settings.config.get('doc_intelligence') or {}).get('pool_size', 10)
+            client = _clients[(client_class, endpoint, key)] = create_document_intelligence_client(endpoint, key, pool_size, client_class)
+            logger.info(f"Created the {client_class.__name__} of {endpoint}")
+        return client
+
+def get_document_intelligence_client(endpoint:Optional[str]=None, key:Optional[str]=None) -> DocumentIntelligenceClient:
+    '''
+    Get the shared client of an endpoint, creating it on first use
+
+    :param endpoint: Document Intelligence endpoint (default: DOCUMENTINTELLIGENCE_ENDPOINT)
+    :param key: Document Intelligence API key (default: DOCUMENTINTELLIGENCE_API_KEY)
+    '''
+    return _shared_client(DocumentIntelligenceClient, endpoint, key)
+
+def get_document_intelligence_administration_client(endpoint:Optional[str]=None, key:Optional[str]=None) -> DocumentIntelligenceAdministrationClient:
+    '''
+    Get the shared administration client (model builds and listings) of an endpoint, creating it on first use
+    '''
+    return _shared_client(DocumentIntelligenceAdministrationClient, endpoint, key)
+
+def close_document_intelligence_clients() -> None:
+    '''
+    Close the shared clients and their connections; the next get_document_intelligence_client creates a new one
+    '''
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
+
+atexit.register(close_document_intelligence_clients)
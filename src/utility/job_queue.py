@@ -0,0 +1,195 @@
+'''
+Bounded background job queue for check-ins.
+
+Check-ins run on a fixed pool of worker threads so a slow video index only holds one worker, and at
+most max_queued check-ins wait for a worker: beyond that submit() raises QueueFullError and the caller
+tells the passenger to retry instead of piling up work the kiosk cannot finish. Each Job records the
+status of the check-in stages as they start and end, and callers wait for updates to stream progress.
+'''
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Optional
+from utility.settings import get_settings
+
+# Setup logging
+logger = logging.getLogger()
+
+class QueueFullError(Exception):
+    def __init__(self, pending:int) -> None:
+        super().__init__(f"The job queue is full ({pending} check-ins in progress)")
+        self.pending = pending
+
+class Job:
+    '''
+    One queued check-in: status ('queued', 'running', 'done' or 'failed'), per-stage progress,
+    and the result or error once finished
+    '''
+    def __init__(self, target:Callable[['Job'], Any]) -> None:
+        self.id = str(uuid.uuid4())
+        self.target = target
+        self.status = 'queued'
+        self.stages = {}  # stage name -> latest stage status, in start order
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.version = 0  # bumped on every change, see wait_for_update
+        self._changed = threading.Condition()
+
+    @property
+    def done(self) -> bool:
+        return self.status in ('done', 'failed')
+
+    def _update(self, **changes) -> None:
+        with self._changed:
+            for name, value in changes.items():
+                setattr(self, name, value)
+            self.version += 1
+            self._changed.notify_all()
+
+    def update_stage(self, name:str, status:str) -> None:
+        '''
+        Record a stage status; pass as the on_stage callback of the check-in pipeline
+        '''
+        with self._changed:
+            self.stages[name] = status
+            self.version += 1
+            self._changed.notify_all()
+
+    def wait_for_update(self, version:int, timeout:Optional[float]=None) -> int:
+        '''
+        Wait until the job changed after the given version, or finished
+
+        :param version: Version the caller has seen
+        :param timeout: Seconds to wait at most
+        :return: The current version
+        '''
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != version or self.done, timeout)
+            return self.version
+
+    def wait(self, timeout:Optional[float]=None) -> bool:
+        '''
+        Wait until the job finished
+
+        :return: True if the job finished within the timeout
+        '''
+        with self._changed:
+            return self._changed.wait_for(lambda: self.done, timeout)
+
+    def as_dict(self) -> dict:
+        with self._changed:
+            return {
+                'id': self.id,
+                'status': self.status,
+                'version': self.version,
+                'stages': dict(self.stages),
+                'result': self.result,
+                'error': None if self.error is None else str(self.error),
+                'submitted': self.submitted,
+                'started': self.started,
+                'finished': self.finished,
+                }
+
+class JobQueue:
+    def __init__(self, workers:int=2, max_queued:int=8, keep_finished:int=100) -> None:
+        '''
+        :param workers: Check-ins run concurrently
+        :param max_queued: Check-ins waiting for a worker before submit() rejects new ones
+        :param keep_finished: Finished jobs kept for lookup by id
+        '''
+        self.workers = workers
+        self.max_queued = max_queued
+        self.keep_finished = keep_finished
+        self.jobs = OrderedDict()  # job id -> Job, in submission order
+        self.pending = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='kiosk-job')
+
+    def submit(self, target:Callable[[Job], Any]) -> Job:
+        '''
+        Queue a job
+
+        :param target: Function called with the Job on a worker thread; its return value is the job result
+        :return: The queued Job
+        :raises QueueFullError: If workers + max_queued jobs are already queued or running
+        '''
+        job = Job(target)
+        with self._lock:
+            self._check_admission()
+            self.pending += 1
+            self.jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, job)
+        return job
+
+    def _check_admission(self) -> None:
+        # Called with the lock held
+        if self.pending >= self.workers + self.max_queued:
+            self.rejected += 1
+            raise QueueFullError(self.pending)
+
+    def check_admission(self) -> None:
+        '''
+        Reject early, before preparing a job's inputs, when the queue is full
+
+        :raises QueueFullError: If submit() would reject a job now
+        '''
+        with self._lock:
+            self._check_admission()
+
+    def _run(self, job:Job) -> None:
+        job._update(status='running', started=time.time())
+        try:
+            result = job.target(job)
+            job._update(status='done', result=result, finished=time.time())
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {e}")
+            job._update(status='failed', error=e, finished=time.time())
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+    def _prune(self) -> None:
+        # Drop the oldest finished jobs beyond keep_finished; called with the lock held
+        finished = [job_id for job_id, job in self.jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self.jobs[job_id]
+
+    def get(self, job_id:str) -> Optional[Job]:
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            statuses = [job.status for job in self.jobs.values()]
+            return {
+                'workers': self.workers,
+                'max_queued': self.max_queued,
+                'queued': statuses.count('queued'),
+                'running': statuses.count('running'),
+                'done': statuses.count('done'),
+                'failed': statuses.count('failed'),
+                'rejected': self.rejected,
+                }
+
+    def shutdown(self, wait:bool=True) -> None:
+        self._executor.shutdown(wait=wait)
+
+@lru_cache(maxsize=None)
+def get_job_queue() -> JobQueue:
+    '''
+    Get the process-wide check-in queue, configured from the app config section
+    (workers, max_queued, keep_finished)
+    '''
+    config = get_settings().config.get('app') or {}
+    return JobQueue(workers=config.get('workers', 2),
+                    max_queued=config.get('max_queued', 8),
+                    keep_finished=config.get('keep_finished', 100))
@@ -0,0 +1,131 @@
+'''
+Logging helpers for the check-in hot path.
+
+- log_payload logs an API payload (video index, insights, detected faces, analyzed documents) as a
+  size-capped summary built with reprlib, only if the level is enabled and, at debug level, only for a
+  sample of the calls, so a multi-hundred-KB JSON is never formatted in full on the request path.
+- configure_logging moves the root handlers behind a QueueHandler: records are put on an in-memory queue
+  and a QueueListener thread writes them, so a slow log sink does not hold up the check-in.
+
+Both are configured from the logging config section:
+
+    logging:
+      level: INFO
+      queue: true                 # write the log records from a background thread
+      payload_max_chars: 1000     # longest payload summary
+      payload_sample_rate: 0.1    # share of the debug payloads logged
+'''
+import atexit
+import queue
+import random
+import logging
+import reprlib
+import threading
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+from utility.settings import get_settings
+
+# Format of the kiosk log lines, as set by the modules' logging.basicConfig calls
+LOG_FORMAT = "%(asctime)-15s %(message)s"
+
+_listener = None
+_listener_lock = threading.Lock()
+_sampler = random.Random()
+
+# Bounded repr: nested containers and long strings are cut off while the repr is built
+_payload_repr = reprlib.Repr()
+_payload_repr.maxlevel = 4
+_payload_repr.maxdict = 10
+_payload_repr.maxlist = 10
+_payload_repr.maxtuple = 10
+_payload_repr.maxstring = 80
+_payload_repr.maxother = 80
+
+@lru_cache(maxsize=None)
+def logging_config() -> dict:
+    '''
+    Get the logging section of the config file
+    '''
+    return get_settings().config.get('logging') or {}
+
+def summarize_payload(payload, max_chars:int=1000) -> str:
+    '''
+    Size-capped summary of a payload: its type and size, then a repr cut off at every level
+
+    :param payload: JSON-like payload (dict, list, str, ...)
+    :param max_chars: Longest summary returned
+    '''
+    if isinstance(payload, dict):
+        prefix = f"dict({len(payload)} keys) "
+    elif isinstance(payload, (list, tuple)):
+        prefix = f"{type(payload).__name__}({len(payload)} items) "
+    elif isinstance(payload, (str, bytes)):
+        prefix = f"{type(payload).__name__}({len(payload)} chars) "
+    else:
+        prefix = ''
+    summary = prefix + _payload_repr.repr(payload)
+    return summary if len(summary) <= max_chars else summary[:max_chars - 3] + '...'
+
+class PayloadSummary:
+    '''
+    Log argument summarizing a payload when, and only if, the record is formatted
+    '''
+    __slots__ = ('payload', 'max_chars')
+
+    def __init__(self, payload, max_chars:int=1000) -> None:
+        self.payload = payload
+        self.max_chars = max_chars
+
+    def __str__(self) -> str:
+        return summarize_payload(self.payload, self.max_chars)
+
+def log_payload(logger:logging.Logger, label:str, payload, level:int=logging.DEBUG) -> None:
+    '''
+    Log a payload summary, lazily: nothing is formatted if the level is disabled or the call is not sampled
+
+    :param logger: Logger to log with
+    :param label: What the payload is, e.g. 'Video insights'
+    :param payload: Payload to summarize (see summarize_payload)
+    :param level: Log level; debug payloads are sampled at logging.payload_sample_rate
+    '''
+    if not logger.isEnabledFor(level):
+        return
+    config = logging_config()
+    if level <= logging.DEBUG and _sampler.random() >= config.get('payload_sample_rate', 1.0):
+        return
+    logger.log(level, "%s: %s", label, PayloadSummary(payload, config.get('payload_max_chars', 1000)))
+
+def configure_logging(level:Optional[str]=None, use_queue:Optional[bool]=None) -> Optional[QueueListener]:
+    '''
+    Set the root log level and, with logging.queue, write the log records from a background thread:
+    the root handlers (or a stream handler with LOG_FORMAT if there are none) move to a QueueListener
+    and the root logger gets a QueueHandler. Calling it again only updates the level.
+
+    :param level: Root log level (default: logging.level, INFO)
+    :param use_queue: Write the records from a background thread (default: logging.queue, true)
+    :return: The QueueListener, None if the records are written on the logging thread
+    '''
+    global _listener
+    config = logging_config()
+    root = logging.getLogger()
+    root.setLevel(level or config.get('level', 'INFO'))
+    if not (config.get('queue', True) if use_queue is None else use_queue):
+        return _listener
+
+    with _listener_lock:
+        if _listener is None:
+            handlers = list(root.handlers)
+            if not handlers:
+                handler = logging.StreamHandler()
+                handler.setFormatter(logging.Formatter(LOG_FORMAT))
+                handlers = [handler]
+            for handler in handlers:
+                root.removeHandler(handler)
+            log_queue = queue.SimpleQueue()
+            root.addHandler(QueueHandler(log_queue))
+            _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+            _listener.start()
+            # Write the queued records before the interpreter exits
+            atexit.register(_listener.stop)
+    return _listener
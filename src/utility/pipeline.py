@@ -0,0 +1,206 @@
+'''
+Small dependency-graph executor for the kiosk check-in stages.
+
+Stages are functions with named dependencies. Each stage starts on a thread pool as soon as all of its
+dependencies have finished and receives their results as positional arguments, so independent remote
+calls (ID analysis, boarding pass analysis, video indexing) overlap and the end-to-end time approaches
+the longest branch instead of the sum. Per-stage start/end times are recorded for reporting.
+
+A stage can be cancelled while the pipeline runs: a stage that has not started is skipped, and a running
+stage is asked to stop through its cancel event and raises StageCancelled at its next checkpoint. Either
+way its result is None and the stages depending on it still run. When a stage fails, run cancels every
+other stage and raises at once: the running stages stop at their next checkpoint in the background.
+
+An optional on_stage callback is called with (stage name, status) when a stage starts ('running') and
+when it ends (see StageTiming.status), from the thread running it, to report progress while the
+pipeline runs. Each stage is also a 'kiosk.stage' telemetry span (utility/telemetry.py).
+'''
+import time
+import logging
+import threading
+import contextvars
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Optional
+from tabulate import tabulate
+from utility import telemetry
+
+# Setup logging
+logger = logging.getLogger()
+
+class StageCancelled(Exception):
+    '''
+    Raised by a running stage that stopped because it was cancelled
+
+    :param skipped: Names of the remote operations the stage did not perform
+    :param stage: Name of the stage (set by the pipeline if not given)
+    '''
+    def __init__(self, skipped:tuple=(), stage:Optional[str]=None) -> None:
+        super().__init__(f"Stage {stage or ''} was cancelled")
+        self.stage = stage
+        self.skipped = tuple(skipped)
+
+@dataclass
+class Stage:
+    name: str
+    func: Callable[..., Any]
+    depends_on: tuple = ()
+
+@dataclass
+class StageTiming:
+    name: str
+    start: float     # seconds after the pipeline started
+    end: float
+    status: str      # 'done', 'failed', 'cancelled' (stopped while running) or 'skipped' (never started)
+
+    @property
+    def seconds(self) -> float:
+        return self.end - self.start
+
+@dataclass
+class PipelineResult:
+    results: dict = field(default_factory=dict)
+    timings: dict = field(default_factory=dict)
+    elapsed: float = 0.0
+
+    def report(self) -> str:
+        '''
+        Per-stage and end-to-end latency table
+        '''
+        rows = [[timing.name, f"{timing.start:.2f}", f"{timing.end:.2f}", f"{timing.seconds:.2f}", timing.status]
+                for timing in sorted(self.timings.values(), key=lambda timing: timing.start)]
+        rows.append(['end-to-end', '0.00', f"{self.elapsed:.2f}", f"{self.elapsed:.2f}", ''])
+        return tabulate(rows, headers=['Stage', 'Start (s)', 'End (s)', 'Latency (s)', 'Status'], tablefmt='pretty')
+
+class Pipeline:
+    def __init__(self, max_workers:Optional[int]=None, on_stage:Optional[Callable[[str, str], None]]=None) -> None:
+        '''
+        :param max_workers: Stages run concurrently (default: one per stage; 1 runs the stages in sequence)
+        :param on_stage: Optional callback called with (stage name, status) when a stage starts and ends
+        '''
+        self.max_workers = max_workers
+        self.on_stage = on_stage
+        self.stages = {}
+        self.cancel_events = {}
+        self.cancelled = {}  # stage name -> StageCancelled of a stage stopped while running
+
+    def add(self, name:str, func:Callable[..., Any], depends_on:tuple=()) -> 'Pipeline':
+        '''
+        Add a stage
+
+        :param name: Stage name, used as the key of its result
+        :param func: Function called with the results of depends_on, in order
+        :param depends_on: Names of the stages whose results the stage needs
+        '''
+        if name in self.stages:
+            raise ValueError(f"Duplicate stage {name}")
+        missing = [dependency for dependency in depends_on if dependency not in self.stages]
+        if missing:
+            raise ValueError(f"Stage {name} depends on unknown stages {missing}; add the stages in dependency order")
+        self.stages[name] = Stage(name, func, tuple(depends_on))
+        self.cancel_events[name] = threading.Event()
+        return self
+
+    def cancel(self, *names:str) -> None:
+        '''
+        Cancel stages: stages that have not started are skipped, running stages see their cancel event set
+        '''
+        for name in names:
+            self.cancel_events[name].set()
+
+    def is_cancelled(self, name:str) -> bool:
+        return self.cancel_events[name].is_set()
+
+    def check_cancelled(self, name:str, skipped:tuple=()) -> None:
+        '''
+        Checkpoint for a running stage: raise StageCancelled if the stage was cancelled
+        '''
+        if self.is_cancelled(name):
+            raise StageCancelled(skipped, name)
+
+    def _notify(self, name:str, status:str) -> None:
+        if self.on_stage is None:
+            return
+        try:
+            self.on_stage(name, status)
+        except Exception as e:
+            # Progress reporting never fails the check-in
+            logger.error(f"Stage progress callback failed for {name}: {e}")
+
+    def _ready(self, results:dict, started:set) -> list:
+        # A cancelled stage is skipped without waiting for its dependencies
+        return [stage for name, stage in self.stages.items()
+                if name not in started and (self.is_cancelled(name) or all(dependency in results for dependency in stage.depends_on))]
+
+    def run(self) -> PipelineResult:
+        '''
+        Run every stage once its dependencies are done
+
+        :return: PipelineResult with the result and timing of every stage
+        :raises: The exception of the first failed stage, as soon as it fails; the other stages are
+                 cancelled and the running ones are not waited for
+        '''
+        result = PipelineResult()
+        start = time.perf_counter()
+        started, futures, error = set(), {}, None
+
+        def timed(stage:Stage, args:list):
+            stage_start = time.perf_counter() - start
+            status = 'failed'
+            with telemetry.span('kiosk.stage', stage=stage.name) as span:
+                try:
+                    if self.is_cancelled(stage.name): # cancelled while queued for a worker
+                        status = 'skipped'
+                        return None
+                    self._notify(stage.name, 'running')
+                    value = stage.func(*args)
+                    status = 'done'
+                    return value
+                except StageCancelled as cancelled:
+                    status = 'cancelled'
+                    cancelled.stage = stage.name
+                    self.cancelled[stage.name] = cancelled
+                    return None
+                finally:
+                    span.set_status(status)
+                    result.timings[stage.name] = StageTiming(stage.name, stage_start, time.perf_counter() - start, status)
+                    self._notify(stage.name, status)
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers or max(1, len(self.stages)), thread_name_prefix='kiosk-stage')
+        try:
+            while error is None:
+                ready = self._ready(result.results, started)
+                while ready:
+                    for stage in ready:
+                        started.add(stage.name)
+                        if self.is_cancelled(stage.name):
+                            # Never started: the result is None and dependents may run right away
+                            now = time.perf_counter() - start
+                            result.timings[stage.name] = StageTiming(stage.name, now, now, 'skipped')
+                            result.results[stage.name] = None
+                            self._notify(stage.name, 'skipped')
+                            continue
+                        args = [result.results[dependency] for dependency in stage.depends_on]
+                        # Each stage runs in a copy of the caller's context, so its span nests in the caller's span
+                        futures[executor.submit(contextvars.copy_context().run, timed, stage, args)] = stage.name
+                    ready = self._ready(result.results, started)
+                if not futures:
+                    break
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = futures.pop(future)
+                    try:
+                        result.results[name] = future.result()
+                    except Exception as stage_error:
+                        logger.error(f"Stage {name} failed: {stage_error}")
+                        error = error or stage_error
+            if error is not None:
+                # Stop the other stages at their next checkpoint instead of waiting them out
+                self.cancel(*(name for name in self.stages if name not in result.results))
+        finally:
+            executor.shutdown(wait=error is None, cancel_futures=True)
+        result.elapsed = time.perf_counter() - start
+
+        if error is not None:
+            raise error
+        return result
@@ -0,0 +1,198 @@
+'''
+Adaptive polling for long-running Azure operations (person-group training, video indexing, Custom Vision training).
+
+Polls start at a short interval and back off exponentially up to a cap, stop at an optional deadline and
+never come back sooner than a server Retry-After hint. Every wait is recorded as PollMetrics, with the time
+spent in each status check and in each sleep, so the wall time spent waiting can be inspected.
+'''
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Optional
+from utility import telemetry
+
+# Setup logging
+logger = logging.getLogger()
+
+# Most recent waits, newest last
+POLL_HISTORY_SIZE = 100
+_poll_history = deque(maxlen=POLL_HISTORY_SIZE)
+_poll_history_lock = threading.Lock()
+
+@dataclass
+class PollMetrics:
+    name: str
+    timeout: Optional[float] = None
+    poll_seconds: list = field(default_factory=list)   # duration of each status check
+    sleep_seconds: list = field(default_factory=list)  # sleep after each unfinished check
+    elapsed: float = 0.0
+    completed: bool = False
+
+    @property
+    def polls(self) -> int:
+        return len(self.poll_seconds)
+
+    @property
+    def waited(self) -> float:
+        return sum(self.sleep_seconds)
+
+    def as_dict(self) -> dict:
+        return {
+            'name': self.name,
+            'polls': self.polls,
+            'completed': self.completed,
+            'elapsed': self.elapsed,
+            'waited': self.waited,
+            'poll_seconds': list(self.poll_seconds),
+            'sleep_seconds': list(self.sleep_seconds),
+            }
+
+class PollCancelledError(Exception):
+    def __init__(self, metrics:PollMetrics) -> None:
+        super().__init__(f"{metrics.name} was cancelled after {metrics.polls} polls")
+        self.metrics = metrics
+
+class PollTimeoutError(TimeoutError):
+    def __init__(self, metrics:PollMetrics) -> None:
+        super().__init__(f"{metrics.name} did not complete within {metrics.timeout} seconds ({metrics.polls} polls)")
+        self.metrics = metrics
+
+def get_poll_metrics(name:Optional[str]=None) -> list:
+    '''
+    Get the metrics of the most recent waits
+
+    :param name: Only return waits with this name
+    :return: List of PollMetrics, oldest first
+    '''
+    with _poll_history_lock:
+        return [metrics for metrics in _poll_history if name is None or metrics.name == name]
+
+def _record(metrics:PollMetrics) -> None:
+    with _poll_history_lock:
+        _poll_history.append(metrics)
+    telemetry.count('kiosk_polls_total', metrics.polls, operation=metrics.name)
+    telemetry.observe('kiosk_poll_seconds', metrics.elapsed, operation=metrics.name)
+    logger.info(f"{metrics.name}: {'completed' if metrics.completed else 'stopped'} after {metrics.polls} polls, "
+                f"{metrics.elapsed:.2f}s elapsed, {metrics.waited:.2f}s sleeping")
+
+def retry_after_seconds(response) -> Optional[float]:
+    '''
+    Get the Retry-After hint of an HTTP response in seconds
+
+    :param response: Response with a headers mapping (requests, httpx)
+    :return: Seconds to wait, or None if the response has no valid Retry-After header
+    '''
+    value = response.headers.get('Retry-After') if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+class Backoff:
+    '''
+    Exponential backoff schedule with an optional deadline
+    '''
+    def __init__(self, initial_interval:float=0.25, max_interval:float=10.0, factor:float=2.0, timeout:Optional[float]=None) -> None:
+        self.interval = initial_interval
+        self.max_interval = max_interval
+        self.factor = factor
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+
+    def remaining(self) -> Optional[float]:
+        return None if self.deadline is None else self.deadline - time.monotonic()
+
+    def expired(self) -> bool:
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def next_delay(self, retry_after:Optional[float]=None) -> float:
+        '''
+        Seconds to sleep before the next poll: the current interval, raised to the Retry-After hint
+        and clipped to the deadline
+        '''
+        delay = max(self.interval, retry_after or 0.0)
+        self.interval = min(self.interval * self.factor, self.max_interval)
+        remaining = self.remaining()
+        if remaining is not None:
+            delay = min(delay, max(remaining, 0.0))
+        return delay
+
+def poll_until(check:Callable[[], Any], is_done:Callable[[Any], bool], name:str='poll',
+               initial_interval:float=0.25, max_interval:float=10.0, factor:float=2.0, timeout:Optional[float]=None,
+               retry_after:Optional[Callable[[Any], Optional[float]]]=None, cancel_event:Optional[threading.Event]=None) -> Any:
+    '''
+    Call check() until is_done(value) is true, backing off between polls
+
+    :param check: Function returning the current status
+    :param is_done: Function telling whether a status is final
+    :param name: Name of the wait in the poll metrics
+    :param initial_interval: Seconds to wait after the first unfinished poll
+    :param max_interval: Maximum seconds between polls
+    :param factor: Backoff multiplier
+    :param timeout: Seconds after which to give up, None to wait forever
+    :param retry_after: Optional function returning the server's Retry-After seconds for a status
+    :param cancel_event: Optional event that stops the wait when set
+    :return: The final status
+    :raises PollTimeoutError: If the status is not final before the timeout
+    :raises PollCancelledError: If cancel_event is set before the status is final
+    '''
+    metrics = PollMetrics(name, timeout)
+    backoff = Backoff(initial_interval, max_interval, factor, timeout)
+    start = time.monotonic()
+    try:
+        while True:
+            poll_start = time.monotonic()
+            value = check()
+            metrics.poll_seconds.append(time.monotonic() - poll_start)
+            if is_done(value):
+                metrics.completed = True
+                return value
+            if backoff.expired():
+                raise PollTimeoutError(metrics)
+            delay = backoff.next_delay(retry_after(value) if retry_after else None)
+            if cancel_event is None:
+                time.sleep(delay)
+            elif cancel_event.wait(delay):
+                raise PollCancelledError(metrics)
+            metrics.sleep_seconds.append(delay)
+    finally:
+        metrics.elapsed = time.monotonic() - start
+        _record(metrics)
+
+async def async_poll_until(check:Callable[[], Awaitable[Any]], is_done:Callable[[Any], bool], name:str='poll',
+                           initial_interval:float=0.25, max_interval:float=10.0, factor:float=2.0, timeout:Optional[float]=None,
+                           retry_after:Optional[Callable[[Any], Optional[float]]]=None) -> Any:
+    '''
+    Asyncio variant of poll_until, for a coroutine check()
+    '''
+    metrics = PollMetrics(name, timeout)
+    backoff = Backoff(initial_interval, max_interval, factor, timeout)
+    start = time.monotonic()
+    try:
+        while True:
+            poll_start = time.monotonic()
+            value = await check()
+            metrics.poll_seconds.append(time.monotonic() - poll_start)
+            if is_done(value):
+                metrics.completed = True
+                return value
+            if backoff.expired():
+                raise PollTimeoutError(metrics)
+            delay = backoff.next_delay(retry_after(value) if retry_after else None)
+            await asyncio.sleep(delay)
+            metrics.sleep_seconds.append(delay)
+    finally:
+        metrics.elapsed = time.monotonic() - start
+        _record(metrics)
@@ -0,0 +1,200 @@
+'''
+Content-addressed cache of remote analysis results.
+
+A passenger retrying at the kiosk sends the same document bytes again; the result of a model for given
+bytes does not change, so it is cached under the SHA-256 of the bytes and the model id (content_key).
+Entries expire after a TTL and the least recently used entries are evicted beyond max_entries. The
+cache lives in memory and, optionally, in a local SQLite store that survives restarts and is shared by
+the kiosk processes on a machine; a store hit is copied back into memory.
+
+Cached results may hold personal data: keep the TTL short, and only configure a store on a disk the
+kiosk owns.
+'''
+import os
+import copy
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Callable, Optional
+from utility import telemetry
+
+# Setup logging
+logger = logging.getLogger()
+
+def content_key(data:bytes, model_id:str) -> str:
+    '''
+    Cache key of the result of model_id for a document: SHA-256 of the model id and the document bytes
+    '''
+    digest = hashlib.sha256(model_id.encode())
+    digest.update(b'\0')
+    digest.update(data)
+    return digest.hexdigest()
+
+def _encode(value) -> Any:
+    # json.dumps default: the analysis results hold dates (DateOfBirth, DateOfExpiration)
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, date):
+        return {'__date__': value.isoformat()}
+    raise TypeError(f"Cannot cache a {type(value).__name__}")
+
+def _decode(value:dict) -> Any:
+    if '__datetime__' in value:
+        return datetime.fromisoformat(value['__datetime__'])
+    if '__date__' in value:
+        return date.fromisoformat(value['__date__'])
+    return value
+
+class ResultStore:
+    '''
+    SQLite store of cached results, as JSON, with their expiry and last use
+    '''
+    def __init__(self, path:str=':memory:', max_entries:int=1024) -> None:
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self.connection.execute('''CREATE TABLE IF NOT EXISTS results (
+                                   key TEXT PRIMARY KEY,
+                                   value TEXT NOT NULL,
+                                   expires_at REAL NOT NULL,
+                                   used_at REAL NOT NULL)''')
+
+    def _execute(self, sql:str, params:tuple=()) -> list:
+        with self._lock:
+            return self.connection.execute(sql, params).fetchall()
+
+    def get(self, key:str, now:Optional[float]=None) -> tuple:
+        '''
+        :return: (value, expires_at), or (None, None) if the key is missing or expired
+        '''
+        now = time.time() if now is None else now
+        rows = self._execute('SELECT value, expires_at FROM results WHERE key = ?', (key,))
+        if not rows:
+            return None, None
+        value, expires_at = rows[0]
+        if expires_at <= now:
+            self._execute('DELETE FROM results WHERE key = ?', (key,))
+            return None, None
+        self._execute('UPDATE results SET used_at = ? WHERE key = ?', (now, key))
+        return json.loads(value, object_hook=_decode), expires_at
+
+    def put(self, key:str, value, expires_at:float) -> None:
+        now = time.time()
+        self._execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)', (key, json.dumps(value, default=_encode), expires_at, now))
+        # Drop the expired entries, then the least recently used beyond max_entries
+        self._execute('DELETE FROM results WHERE expires_at <= ?', (now,))
+        self._execute('DELETE FROM results WHERE key NOT IN (SELECT key FROM results ORDER BY used_at DESC LIMIT ?)', (self.max_entries,))
+
+    def count(self) -> int:
+        return self._execute('SELECT COUNT(*) FROM results')[0][0]
+
+    def clear(self) -> None:
+        self._execute('DELETE FROM results')
+
+    def close(self) -> None:
+        with self._lock:
+            self.connection.close()
+
+class ResultCache:
+    def __init__(self, name:str, max_entries:int=256, ttl:float=900.0, store:Optional[ResultStore]=None) -> None:
+        '''
+        :param name: Cache name, the label of its telemetry counters
+        :param max_entries: Entries kept in memory, least recently used evicted first
+        :param ttl: Seconds an entry stays valid
+        :param store: Optional SQLite store behind the memory cache
+        '''
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.store = store
+        self.entries = OrderedDict()  # key -> (expires_at, value), least recently used first
+        self.counters = {'hits': 0, 'store_hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0}
+        self._lock = threading.Lock()
+
+    def _count(self, name:str) -> None:
+        # Called with the lock held
+        self.counters[name] += 1
+
+    def get(self, key:str) -> Optional[Any]:
+        '''
+        Get a copy of the cached value of key
+
+        :return: The value, or None on a miss
+        '''
+        now = time.time()
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self.entries[key]
+                self._count('expired')
+                entry = None
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self._count('hits')
+                telemetry.count('kiosk_cache_requests_total', cache=self.name, result='hit')
+                return copy.deepcopy(entry[1])
+
+        value, expires_at = self.store.get(key, now) if self.store is not None else (None, None)
+        with self._lock:
+            if value is None:
+                self._count('misses')
+                telemetry.count('kiosk_cache_requests_total', cache=self.name, result='miss')
+                return None
+            self._count('store_hits')
+            self._insert(key, value, expires_at)
+        telemetry.count('kiosk_cache_requests_total', cache=self.name, result='store_hit')
+        return copy.deepcopy(value)
+
+    def put(self, key:str, value) -> None:
+        expires_at = time.time() + self.ttl
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._insert(key, value, expires_at)
+        if self.store is not None:
+            try:
+                self.store.put(key, value, expires_at)
+            except (sqlite3.Error, TypeError) as e:
+                # The memory cache still has the entry
+                logger.error(f"Could not store the {self.name} cache entry: {e}")
+
+    def _insert(self, key:str, value, expires_at:float) -> None:
+        # Called with the lock held
+        self.entries[key] = (expires_at, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self._count('evictions')
+
+    def get_or_compute(self, key:str, compute:Callable[[], Any]) -> Any:
+        '''
+        Get the cached value of key, or compute, cache and return it; errors of compute are not cached
+        '''
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self.entries.clear()
+        if self.store is not None:
+            self.store.clear()
+
+    def stats(self) -> dict:
+        '''
+        Hit/miss counters since start-up, the memory entries and the hit rate (memory and store hits)
+        '''
+        with self._lock:
+            stats = dict(self.counters, entries=len(self.entries))
+        lookups = stats['hits'] + stats['store_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['hits'] + stats['store_hits']) / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,130 @@
+'''
+Shared, lazily loaded settings for the kiosk modules.
+
+Nothing is read at import time: the .env file is loaded and the config.yaml parsed on first use,
+once per process, and every module shares the same Settings object through get_settings().
+'''
+import os
+import threading
+from functools import lru_cache
+from typing import Optional
+import yaml
+from dotenv import find_dotenv, load_dotenv
+
+# Default config file when CONFIG_PATH is not set: config.yaml at the repository root
+DEFAULT_CONFIG_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'config.yaml'))
+
+# Address of the local emulator when emulator.url is not set in the config
+DEFAULT_EMULATOR_URL = 'http://127.0.0.1:8900'
+
+# Storage account of the emulator's Blob Storage endpoints, with the Azurite development key
+EMULATOR_STORAGE_ACCOUNT = 'devstoreaccount1'
+EMULATOR_STORAGE_KEY = 'Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw=='
+
+def emulator_settings(url:str) -> dict:
+    '''
+    Endpoints and placeholder credentials of every Azure service pointed at the local emulator
+    (benchmarks/stubs/emulator.py) listening at url
+    '''
+    url = url.rstrip('/')
+    blob_url = f'{url}/{EMULATOR_STORAGE_ACCOUNT}'
+    return {
+        'FACE_ENDPOINT_URL': url,
+        'FACE_API_KEY': 'emulator',
+        'face_api_version': 'v1.0',
+        'DOCUMENTINTELLIGENCE_ENDPOINT': url,
+        'DOCUMENTINTELLIGENCE_API_KEY': 'emulator',
+        'AzureResourceManager': url,
+        'arm_access_token': 'emulator',
+        'VI_ApiEndpoint': url,
+        'VI_ApiVersion': '2024-01-01',
+        'AccountName': 'emulator',
+        'ResourceGroup': 'emulator',
+        'SubscriptionId': '00000000-0000-0000-0000-000000000000',
+        'VISION_TRAINING_ENDPOINT': url,
+        'VISION_TRAINING_KEY': 'emulator',
+        'VISION_PREDICTION_KEY': 'emulator',
+        'BLOB_ACCOUNT_URL': blob_url,
+        'BLOB_SAS_TOKEN': None,
+        'AZURE_STORAGE_CONNECTION_STRING': f'DefaultEndpointsProtocol=http;AccountName={EMULATOR_STORAGE_ACCOUNT};'
+                                           f'AccountKey={EMULATOR_STORAGE_KEY};BlobEndpoint={blob_url};',
+    }
+
+class Settings:
+    def __init__(self, config_path:Optional[str]=None) -> None:
+        self._config_path = config_path
+        self._config = None
+        self._overrides = None
+        self._env_loaded = False
+        self._lock = threading.RLock()
+
+    def _load_env(self) -> None:
+        if self._env_loaded:
+            return
+        with self._lock:
+            if not self._env_loaded:
+                load_dotenv(find_dotenv())
+                self._env_loaded = True
+
+    @property
+    def env(self) -> os._Environ:
+        '''
+        Environment variables, with the .env file loaded on first access
+        '''
+        self._load_env()
+        return os.environ
+
+    def get(self, key:str, default:Optional[str]=None) -> Optional[str]:
+        '''
+        Get an environment variable (from the environment or the .env file), or its emulator
+        value when the emulator section of the config is enabled
+
+        :param key: Variable name
+        :param default: Value returned when the variable is not set
+        :return: Variable value
+        '''
+        overrides = self.overrides
+        if key in overrides:
+            return overrides[key]
+        return self.env.get(key, default)
+
+    @property
+    def overrides(self) -> dict:
+        '''
+        Settings replaced by the emulator's (see emulator_settings) when emulator.enabled is set in the config
+        '''
+        if self._overrides is None:
+            try:
+                emulator = self.config.get('emulator') or {}
+            except FileNotFoundError:
+                emulator = {}
+            self._overrides = emulator_settings(emulator.get('url') or DEFAULT_EMULATOR_URL) if emulator.get('enabled') else {}
+        return self._overrides
+
+    @property
+    def config_path(self) -> str:
+        if self._config_path is None:
+            self._config_path = self.env.get('CONFIG_PATH') or DEFAULT_CONFIG_PATH
+        return self._config_path
+
+    @property
+    def config(self) -> dict:
+        '''
+        The parsed config.yaml, loaded on first access
+        '''
+        if self._config is None:
+            with self._lock:
+                if self._config is None:
+                    config_path = self.config_path
+                    if not config_path or not os.path.exists(config_path):
+                        raise FileNotFoundError(f"Config file not found at the specified path: {config_path}")
+                    with open(config_path) as yaml_file:
+                        self._config = yaml.safe_load(yaml_file)
+        return self._config
+
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    '''
+    Get the process-wide Settings object
+    '''
+    return Settings()
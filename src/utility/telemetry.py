@@ -0,0 +1,374 @@
+'''
+Tracing and metrics of the check-in.
+
+Spans time the check-in, each of its stages and every outbound HTTP call (Face API, Video Indexer,
+Document Intelligence, Custom Vision, Blob Storage); counters track requests, throttled (429) responses
+and retries; histograms track latencies. Telemetry is off by default: span() then returns a shared no-op
+span and the clients install no HTTP hooks, so the check-in pays a function call per stage and nothing
+per request. Enable it in the telemetry config section:
+
+    telemetry:
+      enabled: true
+      exporter: prometheus     # or opentelemetry
+      metrics_port: 9464       # optional standalone /metrics endpoint
+
+The metrics are kept in process and rendered in the Prometheus text format by render_prometheus (served
+on /metrics by the kiosk API and on metrics_port). With the opentelemetry exporter, spans and metrics are
+also sent to the OpenTelemetry tracer and meter of the process, whose SDK and exporters the deployment
+configures (e.g. with opentelemetry-instrument).
+'''
+import time
+import logging
+import threading
+import weakref
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from utility.settings import get_settings
+
+# Setup logging
+logger = logging.getLogger()
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+METRIC_HELP = {
+    'kiosk_span_seconds': 'Duration of the check-in spans (check-in, stages)',
+    'kiosk_http_request_seconds': 'Duration of the outbound HTTP requests, by service',
+    'kiosk_http_requests_total': 'Outbound HTTP requests, by service and status code',
+    'kiosk_http_throttled_total': 'Outbound HTTP requests throttled with a 429, by service',
+    'kiosk_retries_total': 'Requests retried by the kiosk or the Azure SDK, by service and reason',
+    'kiosk_polls_total': 'Status polls of long-running operations, by operation',
+    'kiosk_poll_seconds': 'Duration of the waits for long-running operations, by operation',
+    'kiosk_avoided_calls_total': 'Remote calls not made because the documents already failed, by operation',
+    'kiosk_cache_requests_total': 'Result cache lookups, by cache and result (hit, store_hit, miss)',
+    'kiosk_upload_bytes_saved_total': 'Document upload bytes saved by the client-side preprocessing',
+    'kiosk_barcode_decodes_total': 'Boarding pass barcode reads, by result (decoded, fallback to the custom model)',
+}
+
+class MetricsRegistry:
+    '''
+    Thread-safe in-process counters and histograms, keyed by metric name and label values
+    '''
+    def __init__(self, buckets:tuple=LATENCY_BUCKETS, meter=None) -> None:
+        '''
+        :param buckets: Upper bounds of the histogram buckets
+        :param meter: Optional OpenTelemetry meter the metrics are also recorded on
+        '''
+        self.buckets = tuple(buckets)
+        self.counters = {}    # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> [bucket counts, sum, count]
+        self.meter = meter
+        self._instruments = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name:str, amount:float=1, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+        if self.meter is not None:
+            self._instrument(name, 'counter').add(amount, labels)
+
+    def observe(self, name:str, value:float, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+        if self.meter is not None:
+            self._instrument(name, 'histogram').record(value, labels)
+
+    def _instrument(self, name:str, kind:str):
+        with self._lock:
+            instrument = self._instruments.get(name)
+            if instrument is None:
+                create = self.meter.create_counter if kind == 'counter' else self.meter.create_histogram
+                instrument = self._instruments[name] = create(name, description=METRIC_HELP.get(name, ''))
+            return instrument
+
+    def snapshot(self) -> dict:
+        '''
+        Current values: {'counters': {name: {labels: value}}, 'histograms': {name: {labels: {'count', 'sum', 'buckets'}}}}
+        with labels as tuples of (label, value) pairs
+        '''
+        with self._lock:
+            counters, histograms = {}, {}
+            for (name, labels), value in self.counters.items():
+                counters.setdefault(name, {})[labels] = value
+            for (name, labels), (bucket_counts, total, count) in self.histograms.items():
+                histograms.setdefault(name, {})[labels] = {'count': count, 'sum': total, 'buckets': list(bucket_counts)}
+            return {'counters': counters, 'histograms': histograms}
+
+    def render_prometheus(self) -> str:
+        '''
+        Metrics in the Prometheus text exposition format
+        '''
+        snapshot = self.snapshot()
+        lines = []
+        for name, series in sorted(snapshot['counters'].items()):
+            lines += [f"# HELP {name} {METRIC_HELP.get(name, name)}", f"# TYPE {name} counter"]
+            lines += [f"{name}{_format_labels(labels)} {value:g}" for labels, value in sorted(series.items())]
+        for name, series in sorted(snapshot['histograms'].items()):
+            lines += [f"# HELP {name} {METRIC_HELP.get(name, name)}", f"# TYPE {name} histogram"]
+            for labels, histogram in sorted(series.items()):
+                for bound, bucket_count in zip(self.buckets, histogram['buckets']):
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', f'{bound:g}'),))} {bucket_count}")
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {histogram['count']}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {histogram['sum']:.6f}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+        return '\n'.join(lines) + '\n' if lines else ''
+
+def _format_labels(labels:tuple) -> str:
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{label}="{value}"' for (label, _), value in zip(labels, escaped)) + '}'
+
+class _NoopSpan:
+    '''
+    Span of disabled telemetry; one shared instance
+    '''
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        return None
+
+    def set_attribute(self, name:str, value) -> None:
+        pass
+
+    def set_status(self, status:str) -> None:
+        pass
+
+_NOOP_SPAN = _NoopSpan()
+
+class Span:
+    '''
+    Timed span, recorded in kiosk_span_seconds with its attributes and status as labels. The status is
+    'ok', or 'error' if the block raised, unless set with set_status.
+    '''
+    def __init__(self, telemetry:'Telemetry', name:str, attributes:dict) -> None:
+        self.telemetry = telemetry
+        self.name = name
+        self.attributes = attributes
+        self.status = None
+        self._otel_span = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        if self.telemetry.tracer is not None:
+            self._otel_context = self.telemetry.tracer.start_as_current_span(self.name, attributes=self.attributes)
+            self._otel_span = self._otel_context.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        seconds = time.perf_counter() - self._start
+        status = self.status or ('error' if exc_type is not None else 'ok')
+        if self._otel_span is not None:
+            self._otel_span.set_attribute('kiosk.status', status)
+            self._otel_context.__exit__(exc_type, exc_value, traceback)
+        self.telemetry.metrics.observe('kiosk_span_seconds', seconds, span=self.name, status=status, **self.attributes)
+
+    def set_attribute(self, name:str, value) -> None:
+        if self._otel_span is not None:
+            self._otel_span.set_attribute(name, value)
+
+    def set_status(self, status:str) -> None:
+        self.status = status
+
+class Telemetry:
+    def __init__(self, enabled:bool=True, tracer=None, meter=None) -> None:
+        '''
+        :param enabled: Record spans and metrics; a disabled Telemetry does nothing
+        :param tracer: Optional OpenTelemetry tracer the spans are also started on
+        :param meter: Optional OpenTelemetry meter the metrics are also recorded on
+        '''
+        self.enabled = enabled
+        self.tracer = tracer
+        self.metrics = MetricsRegistry(meter=meter)
+
+    def span(self, name:str, **attributes):
+        '''
+        Context manager timing a block; attributes become labels of kiosk_span_seconds, so keep them low-cardinality
+        '''
+        return Span(self, name, attributes) if self.enabled else _NOOP_SPAN
+
+    def count(self, name:str, amount:float=1, **labels) -> None:
+        if self.enabled:
+            self.metrics.inc(name, amount, **labels)
+
+    def observe(self, name:str, value:float, **labels) -> None:
+        if self.enabled:
+            self.metrics.observe(name, value, **labels)
+
+    def record_http(self, service:str, method:str, status_code, seconds:float) -> None:
+        '''
+        Record one outbound HTTP request (status_code 'error' when no response came back)
+        '''
+        if not self.enabled:
+            return
+        status = str(status_code)
+        self.metrics.observe('kiosk_http_request_seconds', seconds, service=service, method=method)
+        self.metrics.inc('kiosk_http_requests_total', service=service, method=method, status_code=status)
+        if status == '429':
+            self.metrics.inc('kiosk_http_throttled_total', service=service)
+        if self.tracer is not None:
+            # The request is over: a span with its actual start and end times
+            end = time.time_ns()
+            otel_span = self.tracer.start_span(f"{service} {method}", start_time=end - int(seconds * 1e9),
+                                               attributes={'kiosk.service': service, 'http.request.method': method,
+                                                           'http.response.status_code': status})
+            otel_span.end(end_time=end)
+
+    def render_prometheus(self) -> str:
+        return self.metrics.render_prometheus()
+
+def opentelemetry_providers() -> tuple:
+    '''
+    Get the OpenTelemetry tracer and meter of the process
+
+    :raises ImportError: If opentelemetry-api is not installed
+    '''
+    from opentelemetry import metrics, trace
+    return trace.get_tracer('kiosk'), metrics.get_meter('kiosk')
+
+@lru_cache(maxsize=None)
+def get_telemetry() -> Telemetry:
+    '''
+    Get the process-wide telemetry, configured from the telemetry config section
+    (enabled, exporter, metrics_port); disabled if the section is missing
+    '''
+    config = get_settings().config.get('telemetry') or {}
+    if not config.get('enabled', False):
+        return Telemetry(enabled=False)
+    tracer = meter = None
+    if config.get('exporter', 'prometheus') == 'opentelemetry':
+        try:
+            tracer, meter = opentelemetry_providers()
+        except ImportError:
+            logger.warning("telemetry.exporter is opentelemetry but opentelemetry-api is not installed; keeping in-process metrics only")
+    telemetry = Telemetry(enabled=True, tracer=tracer, meter=meter)
+    if config.get('metrics_port'):
+        start_metrics_server(telemetry, config['metrics_port'], config.get('metrics_host', '0.0.0.0'))
+    return telemetry
+
+# Function to open a span on the process-wide telemetry
+def span(name:str, **attributes):
+    return get_telemetry().span(name, **attributes)
+
+# Function to increment a counter of the process-wide telemetry
+def count(name:str, amount:float=1, **labels) -> None:
+    get_telemetry().count(name, amount, **labels)
+
+# Function to record a histogram value on the process-wide telemetry
+def observe(name:str, value:float, **labels) -> None:
+    get_telemetry().observe(name, value, **labels)
+
+def render_prometheus() -> Optional[str]:
+    '''
+    Metrics of the process-wide telemetry in the Prometheus text format, None if telemetry is disabled
+    '''
+    telemetry = get_telemetry()
+    return telemetry.render_prometheus() if telemetry.enabled else None
+
+def instrument_session(session, service:str):
+    '''
+    Record every request of a requests.Session; does nothing if telemetry is disabled
+
+    :param session: requests.Session
+    :param service: Service label of the requests
+    :return: The session
+    '''
+    telemetry = get_telemetry()
+    if telemetry.enabled:
+        def on_response(response, *args, **kwargs):
+            telemetry.record_http(service, response.request.method, response.status_code, response.elapsed.total_seconds())
+        session.hooks['response'].append(on_response)
+    return session
+
+def httpx_event_hooks(service:str) -> dict:
+    '''
+    event_hooks of an httpx.AsyncClient recording every request; empty if telemetry is disabled
+    '''
+    telemetry = get_telemetry()
+    if not telemetry.enabled:
+        return {}
+    started = weakref.WeakKeyDictionary()  # request -> start time
+
+    async def on_request(request) -> None:
+        started[request] = time.perf_counter()
+
+    async def on_response(response) -> None:
+        start = started.pop(response.request, None)
+        if start is not None:
+            telemetry.record_http(service, response.request.method, response.status_code, time.perf_counter() - start)
+    return {'request': [on_request], 'response': [on_response]}
+
+def azure_sdk_kwargs(service:str) -> dict:
+    '''
+    Keyword arguments of an Azure SDK client (azure-core pipeline) recording every request attempt,
+    retries of the SDK included; empty if telemetry is disabled
+    '''
+    telemetry = get_telemetry()
+    if not telemetry.enabled:
+        return {}
+
+    def on_request(pipeline_request) -> None:
+        # The SDK retries with the same pipeline context: a start time already there means a retry
+        context = pipeline_request.context
+        if 'kiosk_request_start' in context:
+            telemetry.count('kiosk_retries_total', service=service, reason='sdk')
+        context['kiosk_request_start'] = time.perf_counter()
+
+    def on_response(pipeline_response) -> None:
+        start = pipeline_response.context.get('kiosk_request_start')
+        if start is not None:
+            telemetry.record_http(service, pipeline_response.http_request.method,
+                                  pipeline_response.http_response.status_code, time.perf_counter() - start)
+    return {'raw_request_hook': on_request, 'raw_response_hook': on_response}
+
+def instrument_msrest_client(client, service:str):
+    '''
+    Record every request of an msrest service client (Custom Vision); does nothing if telemetry is disabled
+
+    :return: The client
+    '''
+    telemetry = get_telemetry()
+    hooks = getattr(getattr(client, 'config', None), 'hooks', None)
+    if telemetry.enabled and hooks is not None:
+        # msrest passes its configuration hooks to requests as response hooks
+        def on_response(response, *args, **kwargs):
+            telemetry.record_http(service, response.request.method, response.status_code, response.elapsed.total_seconds())
+        hooks.append(on_response)
+    return client
+
+def start_metrics_server(telemetry:Telemetry, port:int, host:str='0.0.0.0') -> ThreadingHTTPServer:
+    '''
+    Serve the metrics on http://host:port/metrics from a daemon thread
+    '''
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = telemetry.render_prometheus().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args) -> None:
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='kiosk-metrics', daemon=True).start()
+    logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+    return server
@@ -1,13 +1,18 @@
 # Import libraries
 import os
+import logging
 import requests
-from dotenv import dotenv_values, load_dotenv, find_dotenv
 from typing import Optional, List
 from PIL import Image
 from io import BytesIO
 from urllib.parse import urlparse
 from azure.storage.blob import BlobServiceClient, BlobClient, ContainerClient
 import json
+from utility.settings import get_settings
+from utility import telemetry
+
+# Setup logging
+logger = logging.getLogger()
 
 def upload_files_from_local(directory, connection_string, container_name):
     """
@@ -23,7 +28,7 @@ def upload_files_from_local(directory, connection_string, container_name):
     """
     try:
         # Create a BlobServiceClient
-        blob_service_client = BlobServiceClient.from_connection_string(connection_string)
+        blob_service_client = BlobServiceClient.from_connection_string(connection_string, **telemetry.azure_sdk_kwargs('blob_storage'))
         
         # Get the container client
         container_client = blob_service_client.get_container_client(container_name)
@@ -79,7 +84,7 @@ def upload_images_list(images, container_name, connection_string):
         None
     """
     # Initialize the BlobServiceClient
-    blob_service_client = BlobServiceClient.from_connection_string(connection_string)
+    blob_service_client = BlobServiceClient.from_connection_string(connection_string, **telemetry.azure_sdk_kwargs('blob_storage'))
     
     # Create a BlobClient for each image
     for idx, image in enumerate(images):
@@ -118,7 +123,7 @@ def upload_files(file_data_list, file_names, container_name, connection_string):
         None
     """
     # Initialize the BlobServiceClient
-    blob_service_client = BlobServiceClient.from_connection_string(connection_string)
+    blob_service_client = BlobServiceClient.from_connection_string(connection_string, **telemetry.azure_sdk_kwargs('blob_storage'))
     
     # Loop through the file data and file names
     for file_data, file_name in zip(file_data_list, file_names):
@@ -286,11 +291,32 @@ def save_thumbnails_locally(local_directory: str, images: list) -> None:
         img.save(file_path)
         print(f"Image saved at {file_path}")
 
+def save_thumbnail_bytes_locally(local_directory: str, thumbnails: list, session_id: str) -> list:
+    """
+    Save encoded thumbnails as they are (no re-encode), in a per-session subdirectory so
+    concurrent check-ins don't overwrite each other's files.
+
+    :param local_directory: Directory where the session directories are created.
+    :param thumbnails: List of JPEG-encoded thumbnails (bytes).
+    :param session_id: Name of the session subdirectory.
+    :return: List of the saved file paths.
+    """
+    session_directory = os.path.join(local_directory, session_id)
+    os.makedirs(session_directory, exist_ok=True)
+
+    file_paths = []
+    for idx, thumbnail in enumerate(thumbnails):
+        file_path = os.path.join(session_directory, f'thumbnail_{idx}.jpg')
+        with open(file_path, 'wb') as thumbnail_file:
+            thumbnail_file.write(thumbnail)
+        file_paths.append(file_path)
+    logger.info(f"{len(file_paths)} thumbnails saved in {session_directory}")
+    return file_paths
+
 # Example usage
 if __name__ == "__main__":
     # Load and define environment variables
-    load_dotenv(find_dotenv())
-    config = dotenv_values(".env")
+    config = get_settings()
     # Azure Blob Storage configuration
     blob_service_client = BlobServiceClient(account_url=config.get('BLOB_ACCOUNT_URL'), credential=config.get('BLOB_SAS_TOKEN'))
     container_name = config.get('BLOB_CONTAINER_NAME')
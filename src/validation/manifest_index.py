@@ -0,0 +1,113 @@
+import logging
+from collections import defaultdict
+from typing import Optional
+import pandas as pd
+
+logger = logging.getLogger()
+
+# Manifest columns used to build the lookup keys
+FLIGHT_COLUMN = 'Flight No.'
+FIRST_NAME_COLUMN = 'First Name'
+LAST_NAME_COLUMN = 'Last Name'
+TICKET_COLUMN = 'Ticket No.'
+
+# Function to normalize a free-text value the same way the validators compare it
+def normalize_value(value) -> str:
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return ''
+    return str(value).strip().upper()
+
+# Function to normalize a first name (first word only, as in validate_name)
+def normalize_first_name(value) -> str:
+    words = normalize_value(value).split()
+    return words[0] if words else ''
+
+# Function to normalize a last name (last word only, as in validate_name)
+def normalize_last_name(value) -> str:
+    words = normalize_value(value).split()
+    return words[-1] if words else ''
+
+def passenger_key(flight_no, last_name, first_name) -> tuple:
+    """
+    Build the normalized (flight number, last name, first name) lookup key.
+    """
+    return (normalize_value(flight_no), normalize_last_name(last_name), normalize_first_name(first_name))
+
+class ManifestIndex:
+    """
+    In-memory index over the flight manifest, built once when the manifest is loaded.
+
+    Maps the normalized (flight number, last name, first name) key and the ticket number
+    to the manifest row labels, so a passenger lookup is O(1) instead of a scan of every row.
+    """
+    def __init__(self, manifest_df: pd.DataFrame) -> None:
+        self.manifest_df = manifest_df
+        self.by_passenger = defaultdict(list)
+        self.by_ticket = defaultdict(list)
+
+        # Column-wise zip is much cheaper than iterrows for building the index
+        tickets = manifest_df[TICKET_COLUMN] if TICKET_COLUMN in manifest_df.columns else [None] * len(manifest_df)
+        for index, flight_no, last_name, first_name, ticket_no in zip(manifest_df.index,
+                                                                      manifest_df[FLIGHT_COLUMN],
+                                                                      manifest_df[LAST_NAME_COLUMN],
+                                                                      manifest_df[FIRST_NAME_COLUMN],
+                                                                      tickets):
+            self.by_passenger[passenger_key(flight_no, last_name, first_name)].append(index)
+            ticket_key = normalize_value(ticket_no)
+            if ticket_key:
+                self.by_ticket[ticket_key].append(index)
+
+        logger.info(f"Manifest index built: {len(manifest_df)} rows, {len(self.by_passenger)} passenger keys, {len(self.by_ticket)} tickets")
+
+    def __len__(self) -> int:
+        return len(self.manifest_df)
+
+    def lookup(self, flight_no, last_name, first_name) -> list:
+        """
+        Get the manifest row labels for a passenger.
+
+        :param flight_no: Flight number
+        :param last_name: Passenger last name
+        :param first_name: Passenger first name
+        :return: List of matching row labels (empty when the passenger is not on the manifest)
+        """
+        return list(self.by_passenger.get(passenger_key(flight_no, last_name, first_name), []))
+
+    def lookup_ticket(self, ticket_no) -> list:
+        """
+        Get the manifest row labels for a ticket number.
+
+        :param ticket_no: Ticket number
+        :return: List of matching row labels
+        """
+        return list(self.by_ticket.get(normalize_value(ticket_no), []))
+
+    def candidates(self, id_data: Optional[list], bp_data: Optional[list]) -> list:
+        """
+        Get the candidate manifest rows for the extracted ID and boarding pass data.
+
+        A row can only pass name and boarding pass validation when its flight number and
+        names equal the boarding pass values, so the boarding pass key is the primary lookup.
+        The ID names (on the boarding pass flight) and the ticket number, when present, add
+        further candidates so mismatches are still recorded against the passenger's row.
+
+        :param id_data: ID document data from analyze_identity_documents
+        :param bp_data: Boarding pass data from the custom model
+        :return: Ordered list of unique row labels
+        """
+        bp_fields = bp_data[0].get('fields', {}) if bp_data else {}
+        id_info = id_data[0] if id_data else {}
+
+        flight_no = bp_fields.get('Flight_No', {}).get('value')
+        labels = self.lookup(flight_no,
+                             bp_fields.get('Last Name', {}).get('value'),
+                             bp_fields.get('First Name', {}).get('value'))
+        labels += self.lookup(flight_no,
+                              id_info.get('LastName', {}).get('value'),
+                              id_info.get('FirstName', {}).get('value'))
+        ticket_no = bp_fields.get('Ticket_No', {}).get('value')
+        if ticket_no:
+            labels += self.lookup_ticket(ticket_no)
+
+        # Drop duplicates, keeping the lookup order
+        return list(dict.fromkeys(labels))
@@ -1,41 +1,25 @@
-import os
 import pandas as pd
 import logging
-import yaml
 from dateutil import parser
-from datetime import date
+from datetime import date, datetime
+from functools import lru_cache
 from typing import Optional
-from dotenv import find_dotenv, load_dotenv
 from get_custom_text.analyze_custom_doc_main import main as analyze_custom
 from get_ID.analyzeID_prebuilt import analyze_identity_documents as analyze_id
 from get_faces.face_identification_main import get_video_insights as insights
 from get_faces.face_identification_main import build_person_model as personModel
 from get_faces.face_identification_main import indentify_faces as identify_faces
+from validation.manifest_index import ManifestIndex
+from utility.settings import get_settings
+from utility.logs import log_payload
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)-15s %(message)s")
 logger = logging.getLogger()
 
-# Load environment variables
-load_dotenv(find_dotenv())
-
-# Get the config file path from the .env file
-config_path = os.getenv('CONFIG_PATH')
-
-# Load the config file
-if config_path and os.path.exists(config_path):
-    with open(config_path) as yaml_file:
-        config_yml = yaml.safe_load(yaml_file)
-else:
-    raise FileNotFoundError(f"Config file not found at the specified path: {config_path}")
-
-# Load flight manifest table
-manifest_path = config_yml['manifest_file']['file_path']
-manifest_df = pd.read_csv(manifest_path)
-
 # Function to perform 3-Way Person Name Validation for a single row
 def validate_name(id_data: list, bp_data: list, manifest_row: pd.Series) -> bool:
-    logger.info("Name Validation")
+    logger.debug("Name Validation")
 
     # Extract first word for first name and last word for last name from the ID
     id_info = id_data[0]
@@ -54,45 +38,100 @@ def validate_name(id_data: list, bp_data: list, manifest_row: pd.Series) -> bool
     # Validate first and last names
     if manifest_first_name == id_first_name and manifest_last_name == id_last_name:
         if manifest_first_name == bp_first_name and manifest_last_name == bp_last_name:
-            logger.info(f"Name Matched: ID({id_first_name} {id_last_name}), BP({bp_first_name} {bp_last_name}), Manifest ({manifest_first_name} {manifest_last_name})")
+            logger.debug("Name Matched: ID(%s %s), BP(%s %s), Manifest (%s %s)", id_first_name, id_last_name,
+                         bp_first_name, bp_last_name, manifest_first_name, manifest_last_name)
             return True  # All names match
 
-    logger.info(f"Name mismatch: ID({id_first_name} {id_last_name}), BP({bp_first_name} {bp_last_name}), Manifest ({manifest_first_name} {manifest_last_name}) did not match.")
+    logger.debug("Name mismatch: ID(%s %s), BP(%s %s), Manifest (%s %s) did not match.", id_first_name, id_last_name,
+                 bp_first_name, bp_last_name, manifest_first_name, manifest_last_name)
     return False
 
+# Column holding the manifest Date of Birth parsed once at load time
+PARSED_DOB_COLUMN = 'DateOfBirthParsed'
+
+@lru_cache(maxsize=4096)
+def _parse_dob_string(value: str) -> Optional[date]:
+    # Strict fast path for the M/D/YYYY manifest format
+    parts = value.split('/')
+    if len(parts) == 3 and len(parts[2]) == 4 and all(part.isdigit() for part in parts):
+        try:
+            return date(int(parts[2]), int(parts[0]), int(parts[1]))
+        except ValueError:
+            pass
+    # Fall back to the fuzzy parser only when the fast path misses
+    try:
+        return parser.parse(value).date()
+    except (ValueError, OverflowError):
+        return None
+
+# Function to parse a Date of Birth value into a date
+def parse_dob(value) -> Optional[date]:
+    """
+    Parse a Date of Birth into a date. Strings are parsed once and cached.
+
+    :param value: date/datetime object or date string
+    :return: date, or None if the value could not be parsed
+    """
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if value is None or pd.isna(value):
+        return None
+    return _parse_dob_string(str(value).strip())
+
+def parse_date_column(values: pd.Series) -> pd.Series:
+    """
+    Parse a column of dates of birth into normalized timestamps.
+
+    The manifest M/D/YYYY format (and date objects) are parsed vectorized; only the values
+    that miss that format fall back to parse_dob, once per distinct string.
+
+    :param values: Series of date strings or date objects
+    :return: datetime64 Series, NaT where the value could not be parsed
+    """
+    parsed = pd.to_datetime(values, format='%m/%d/%Y', errors='coerce')
+    misses = parsed.isna() & values.notna()
+    if misses.any():
+        fallback = {value: parse_dob(value) for value in values[misses].unique()}
+        parsed[misses] = pd.to_datetime(values[misses].map(fallback))
+    return parsed.dt.normalize()
+
+# Function to prepare a loaded manifest for validation
+def prepare_manifest(manifest_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Parse the manifest Date of Birth column once so DoB validation is a date comparison.
+
+    :param manifest_df: Flight manifest table, updated in place
+    :return: The manifest table with the PARSED_DOB_COLUMN column
+    """
+    manifest_df[PARSED_DOB_COLUMN] = parse_date_column(manifest_df['Date of Birth']).dt.date
+    return manifest_df
+
 # Function to perform DoB Validation
 def validate_dob(id_data: list, manifest_row: pd.Series) -> bool:
-    logger.info("DoB Validation")
+    logger.debug("DoB Validation")
     try:
         # Extract Date of Birth from the ID
         id_info = id_data[0]
-        id_dob = id_info.get('DateOfBirth', {}).get('value', None)
-
-        if isinstance(id_dob, date):
-            id_dob_standardized = id_dob.strftime('%Y-%m-%d')
-        else:
-            try:
-                id_dob_standardized = parser.parse(id_dob).strftime('%Y-%m-%d')
-            except Exception as e:
-                logger.error(f"Error parsing ID DoB: {str(e)}")
-                return False
-
-        # Standardize manifest DOB
-        manifest_dob = manifest_row['Date of Birth']
-        if isinstance(manifest_dob, date):
-            manifest_dob_standardized = manifest_dob.strftime('%Y-%m-%d')
-        else:
-            try:
-                manifest_dob_standardized = parser.parse(manifest_dob).strftime('%Y-%m-%d')
-            except Exception as e:
-                logger.error(f"Error parsing manifest DoB: {str(e)}")
-                return False
-
-        if id_dob_standardized == manifest_dob_standardized:
-            logger.info(f"DoB Matched. id_dob({id_dob_standardized}), manifest_dob({manifest_dob_standardized})")
+        id_dob = parse_dob(id_info.get('DateOfBirth', {}).get('value', None))
+        if id_dob is None:
+            logger.error("Error parsing ID DoB")
+            return False
+
+        # Use the manifest DoB parsed at load time, parse it here only for unprepared manifests
+        manifest_dob = manifest_row.get(PARSED_DOB_COLUMN)
+        if manifest_dob is None or pd.isna(manifest_dob):
+            manifest_dob = parse_dob(manifest_row['Date of Birth'])
+        if manifest_dob is None:
+            logger.error("Error parsing manifest DoB")
+            return False
+
+        if id_dob == manifest_dob:
+            logger.debug("DoB Matched. id_dob(%s), manifest_dob(%s)", id_dob, manifest_dob)
             return True
 
-        logger.info(f"DoB Mismatch: ID({id_dob_standardized}), Manifest({manifest_dob_standardized}) did not match.")
+        logger.debug("DoB Mismatch: ID(%s), Manifest(%s) did not match.", id_dob, manifest_dob)
         return False
 
     except Exception as e:
@@ -102,7 +141,7 @@ def validate_dob(id_data: list, manifest_row: pd.Series) -> bool:
 
 # Function to perform Boarding Pass Validation
 def validate_boarding_pass(bp_data: list, manifest_row: pd.Series) -> bool:
-    logger.info("Boarding Pass Validation")
+    logger.debug("Boarding Pass Validation")
     columns_to_check = {
         'Flight_No': 'Flight No.',
         'Seat': 'Seat',
@@ -118,9 +157,9 @@ def validate_boarding_pass(bp_data: list, manifest_row: pd.Series) -> bool:
         manifest_value = str(manifest_row[manifest_column]).strip().upper()
 
         if bp_value != manifest_value:
-            logger.info("Boarding Pass not Matched. bp_value:{bp_value}, manifest_value:{manifest_value}")
+            logger.debug("Boarding Pass not Matched. bp_value:%s, manifest_value:%s", bp_value, manifest_value)
             return False
-    logger.info("Boarding Pass Matched")
+    logger.debug("Boarding Pass Matched")
     return True
 
 # Function to perform Person Identity Validation
@@ -163,18 +202,29 @@ def update_manifest_table(manifest_df, index, validation_results):
     manifest_df.at[index, 'ValidationStatus'] = passed_validations >= 4
 
 # Main function for validation
-def validate_all(id_data, boarding_pass_data, face_results, manifest_df):
+def validate_all(id_data, boarding_pass_data, face_results, manifest_df, manifest_index:Optional[ManifestIndex]=None):
     logger.info("Starting validation process...")
     passenger_info = {}  # Initialize passenger_info as a dictionary
 
-    # Iterate over each passenger in the manifest and perform validations
-    for index, passenger in manifest_df.iterrows():
+    # Build the manifest index if the caller did not load one with the manifest
+    if manifest_index is None or manifest_index.manifest_df is not manifest_df:
+        manifest_index = ManifestIndex(manifest_df)
+
+    # Face and luggage validation do not depend on the manifest row, so run them once
+    person_validation = validate_person_identity(face_results)
+    luggage_validation = validate_luggage()
+
+    # Only validate the manifest rows that can belong to this passenger
+    candidate_rows = manifest_index.candidates(id_data, boarding_pass_data)
+    logger.info("%d candidate manifest row(s) for the passenger", len(candidate_rows))
+    for index in candidate_rows:
+        passenger = manifest_df.loc[index]
         validation_results = {
             "NameValidation": validate_name(id_data, boarding_pass_data, passenger),
             "DoBValidation": validate_dob(id_data, passenger),
             "BoardingPassValidation": validate_boarding_pass(boarding_pass_data, passenger),
-            "PersonValidation": validate_person_identity(face_results),
-            "LuggageValidation": validate_luggage()
+            "PersonValidation": person_validation,
+            "LuggageValidation": luggage_validation
         }
 
         # Update the manifest table with the validation results
@@ -201,8 +251,8 @@ def validate_all(id_data, boarding_pass_data, face_results, manifest_df):
                     "LuggageValidation": manifest_df.at[index, 'LuggageValidation'], 
                     "ValidationStatus": manifest_df.at[index, 'ValidationStatus']
                 }
-                logger.info(f"Validation successful for row {index}. Returning passenger info.")
-                print(passenger_info)
+                logger.info("Validation successful for row %s. Returning passenger info.", index)
+                log_payload(logger, 'Passenger info', passenger_info)
                 return passenger_info
         except Exception as e:
             logger.error(f"Error during validation: {str(e)}")
@@ -211,6 +261,171 @@ def validate_all(id_data, boarding_pass_data, face_results, manifest_df):
     logger.info("No valid rows found.")
     return None
 
+# Function to run the document checks of validate_all ahead of face identification
+def documents_match_manifest(id_data, boarding_pass_data, manifest_df, manifest_index:Optional[ManifestIndex]=None) -> bool:
+    """
+    Check the ID and boarding pass against the manifest without the face results.
+
+    validate_all needs 4 of its 5 checks to pass and luggage validation never does, so a passenger can
+    only board when the name, DoB and boarding pass checks all pass on the same manifest row. When no
+    row passes all three, the outcome is decided and the face results cannot change it.
+
+    :param id_data: Fields extracted from the ID document
+    :param boarding_pass_data: Fields extracted from the boarding pass
+    :param manifest_df: Flight manifest table (not updated)
+    :param manifest_index: Index of manifest_df, built if not given
+    :return: True if some manifest row passes the name, DoB and boarding pass checks
+    """
+    if manifest_index is None or manifest_index.manifest_df is not manifest_df:
+        manifest_index = ManifestIndex(manifest_df)
+
+    for index in manifest_index.candidates(id_data, boarding_pass_data):
+        passenger = manifest_df.loc[index]
+        try:
+            if (validate_name(id_data, boarding_pass_data, passenger)
+                    and validate_dob(id_data, passenger)
+                    and validate_boarding_pass(boarding_pass_data, passenger)):
+                return True
+        except Exception as e:
+            # Leave malformed documents to validate_all, which reports them with the face results
+            logger.error(f"Error during document validation: {str(e)}")
+            return True
+    logger.info("Documents do not match any manifest row.")
+    return False
+
+# Columns of the extracted records DataFrame used for batch validation
+BATCH_RECORD_COLUMNS = ['IdFirstName', 'IdLastName', 'IdDateOfBirth', 'BpFirstName', 'BpLastName',
+                        'Flight_No', 'Seat', 'Origin', 'Destination', 'PersonValidation']
+VALIDATION_COLUMNS = ['NameValidation', 'DoBValidation', 'BoardingPassValidation', 'PersonValidation', 'LuggageValidation']
+
+# Column-wise equivalents of the normalization used by the row validators
+def _normalize_column(values: pd.Series) -> pd.Series:
+    return values.fillna('').astype(str).str.strip().str.upper()
+
+def _first_word(values: pd.Series) -> pd.Series:
+    return _normalize_column(values).str.split().str[0].fillna('')
+
+def _last_word(values: pd.Series) -> pd.Series:
+    return _normalize_column(values).str.split().str[-1].fillna('')
+
+def build_batch_records(passengers: list) -> pd.DataFrame:
+    """
+    Build the extracted records DataFrame for validate_batch.
+
+    :param passengers: List of (id_data, boarding_pass_data, face_results) tuples, in the shapes
+                       returned by the ID, boarding pass and face identification steps
+    :return: DataFrame with one row per passenger and the BATCH_RECORD_COLUMNS columns
+    """
+    records = []
+    for id_data, bp_data, face_results in passengers:
+        id_info = id_data[0] if id_data else {}
+        bp_fields = bp_data[0].get('fields', {}) if bp_data else {}
+        records.append({
+            'IdFirstName': id_info.get('FirstName', {}).get('value'),
+            'IdLastName': id_info.get('LastName', {}).get('value'),
+            'IdDateOfBirth': id_info.get('DateOfBirth', {}).get('value'),
+            'BpFirstName': bp_fields.get('First Name', {}).get('value'),
+            'BpLastName': bp_fields.get('Last Name', {}).get('value'),
+            'Flight_No': bp_fields.get('Flight_No', {}).get('value'),
+            'Seat': bp_fields.get('Seat', {}).get('value'),
+            'Origin': bp_fields.get('Origin', {}).get('value'),
+            'Destination': bp_fields.get('Destination', {}).get('value'),
+            'PersonValidation': validate_person_identity(face_results)
+        })
+    return pd.DataFrame(records, columns=BATCH_RECORD_COLUMNS)
+
+# Batch function for validating a whole departure batch against the manifest
+def validate_batch(records_df: pd.DataFrame, manifest_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Reconcile a batch of extracted ID/boarding pass records against the manifest.
+
+    Performs the name, DoB and boarding pass comparisons column-wise on a merge of the records
+    and the manifest on the normalized (flight number, last name, first name) key, and writes the
+    validation columns of every manifest row on the batch's flights in one assignment. Manifest
+    rows on those flights without a matching record are marked as not validated.
+
+    :param records_df: Extracted records with the BATCH_RECORD_COLUMNS columns (see build_batch_records)
+    :param manifest_df: Flight manifest table, updated in place
+    :return: records_df with the matched manifest row label, validation columns and ValidationStatus
+    """
+    logger.info(f"Starting batch validation of {len(records_df)} records...")
+
+    # Use the DoB parsed at load time when the manifest was prepared
+    if PARSED_DOB_COLUMN in manifest_df.columns:
+        manifest_dob = pd.to_datetime(manifest_df[PARSED_DOB_COLUMN])
+    else:
+        manifest_dob = parse_date_column(manifest_df['Date of Birth'])
+
+    # Normalize the manifest columns once for the whole table
+    manifest_norm = pd.DataFrame({
+        'ManifestRow': manifest_df.index,
+        'FlightKey': _normalize_column(manifest_df['Flight No.']).to_numpy(),
+        'LastKey': _last_word(manifest_df['Last Name']).to_numpy(),
+        'FirstKey': _first_word(manifest_df['First Name']).to_numpy(),
+        'ManifestFirstName': _normalize_column(manifest_df['First Name']).to_numpy(),
+        'ManifestLastName': _normalize_column(manifest_df['Last Name']).to_numpy(),
+        'ManifestSeat': _normalize_column(manifest_df['Seat']).to_numpy(),
+        'ManifestFrom': _normalize_column(manifest_df['From']).to_numpy(),
+        'ManifestTo': _normalize_column(manifest_df['To']).to_numpy(),
+        'ManifestDoB': manifest_dob.to_numpy()
+    })
+
+    # Normalize the extracted records; the boarding pass names form the merge key
+    records_norm = pd.DataFrame({
+        'RecordRow': records_df.index,
+        'FlightKey': _normalize_column(records_df['Flight_No']).to_numpy(),
+        'LastKey': _last_word(records_df['BpLastName']).to_numpy(),
+        'FirstKey': _first_word(records_df['BpFirstName']).to_numpy(),
+        'IdFirstKey': _first_word(records_df['IdFirstName']).to_numpy(),
+        'IdLastKey': _last_word(records_df['IdLastName']).to_numpy(),
+        'BpFirstName': _normalize_column(records_df['BpFirstName']).to_numpy(),
+        'BpLastName': _normalize_column(records_df['BpLastName']).to_numpy(),
+        'BpSeat': _normalize_column(records_df['Seat']).to_numpy(),
+        'BpOrigin': _normalize_column(records_df['Origin']).to_numpy(),
+        'BpDestination': _normalize_column(records_df['Destination']).to_numpy(),
+        'IdDoB': parse_date_column(records_df['IdDateOfBirth']).to_numpy(),
+        'PersonValidation': records_df['PersonValidation'].astype('boolean').fillna(False).astype(bool).to_numpy()
+    })
+
+    merged = records_norm.merge(manifest_norm, on=['FlightKey', 'LastKey', 'FirstKey'], how='left', indicator=True)
+    matched = merged['_merge'] == 'both'
+
+    # Same rules as validate_name, validate_dob and validate_boarding_pass, one column at a time
+    merged['NameValidation'] = matched & (merged['IdFirstKey'] == merged['FirstKey']) & (merged['IdLastKey'] == merged['LastKey'])
+    merged['DoBValidation'] = matched & merged['IdDoB'].notna() & (merged['IdDoB'] == merged['ManifestDoB'])
+    merged['BoardingPassValidation'] = (matched
+                                        & (merged['BpSeat'] == merged['ManifestSeat'])
+                                        & (merged['BpOrigin'] == merged['ManifestFrom'])
+                                        & (merged['BpDestination'] == merged['ManifestTo'])
+                                        & (merged['BpFirstName'] == merged['ManifestFirstName'])
+                                        & (merged['BpLastName'] == merged['ManifestLastName']))
+    merged['LuggageValidation'] = validate_luggage()
+    passed = merged[VALIDATION_COLUMNS].sum(axis=1)
+    merged['ValidationStatus'] = passed >= 4
+    merged['_passed'] = passed
+
+    # A name can appear on several rows of a flight; keep the best pairing per record and per manifest row
+    merged = merged.sort_values('_passed', ascending=False, kind='stable')
+    record_results = merged.drop_duplicates('RecordRow').set_index('RecordRow')
+    row_results = merged[merged['_merge'] == 'both'].drop_duplicates('ManifestRow').set_index('ManifestRow')
+
+    # Write the validation columns for every manifest row of the batch's flights in one pass
+    result_columns = VALIDATION_COLUMNS + ['ValidationStatus']
+    for column in result_columns:
+        if column not in manifest_df.columns:
+            manifest_df[column] = False
+    flight_rows = manifest_norm.loc[manifest_norm['FlightKey'].isin(records_norm['FlightKey']), 'ManifestRow']
+    updates = pd.DataFrame(False, index=pd.Index(flight_rows), columns=result_columns)
+    updates.loc[row_results.index, result_columns] = row_results[result_columns].to_numpy()
+    manifest_df.loc[updates.index, result_columns] = updates.to_numpy()
+
+    results_df = records_df.copy()
+    results_df['ManifestRow'] = record_results['ManifestRow'].reindex(records_df.index).to_numpy()
+    for column in result_columns:
+        results_df[column] = record_results[column].reindex(records_df.index).to_numpy()
+    logger.info(f"Batch validation complete: {int(results_df['ValidationStatus'].sum())} of {len(results_df)} records validated.")
+    return results_df
+
 def get_validation_messages(passenger_info, environment="console"):
     # Set the newline character based on the environment
     newline = "\n" if environment == "console" else "<br>"
@@ -287,33 +502,35 @@ if __name__ == "__main__":
         logging.basicConfig(level=logging.INFO, format="%(asctime)-15s %(message)s")
         logger = logging.getLogger()
 
-        # Load the flight manifest table
+        # Load the settings and the flight manifest table
+        settings = get_settings()
+        config_yml = settings.config
         manifest_path = config_yml['manifest_file']['file_path']
-        manifest_df = pd.read_csv(manifest_path)
+        manifest_df = prepare_manifest(pd.read_csv(manifest_path))
 
         # get ID data
-        path_to_id_document = os.getenv("file_path_to_id")
+        path_to_id_document = settings.get("file_path_to_id")
         if not path_to_id_document:
             raise FileNotFoundError("ID document file path is not found in environment variables.")
         id_data = analyze_id(path_to_id_document)
 
         # get boarding data
         model_id = config_yml['doc_intelligence']['custom_models']['boarding_pass_1']
-        training_folder_path = os.getenv('training_folder_path')
-        path_to_custom_document = os.getenv("file_path_boarding_pass")
+        training_folder_path = settings.get('training_folder_path')
+        path_to_custom_document = settings.get("file_path_boarding_pass")
         if not path_to_custom_document:
             raise FileNotFoundError("Boarding pass file path is not found in environment variables.")
         bp_info = analyze_custom(path_to_custom_document, model_id, training_folder_path)
 
         # get video faces
         video_file_path = config_yml['video_indexer']['video_path']
-        local_dir = os.getenv('local_thumbnails_dir_path')
+        local_dir = settings.get('local_thumbnails_dir_path')
         # Get video insights
         image_list = insights(video_file_path, local_dir)
         # Build person model based on the images extracted from the video
         person_group_id = personModel(image_list)
         # Get ID image source file
-        id_source_file = os.getenv("file_path_to_id")
+        id_source_file = settings.get("file_path_to_id")
         if not id_source_file:
             raise FileNotFoundError("ID source file is not found in environment variables.")
         # Identify faces between the ID image and person model
@@ -0,0 +1,32 @@
+# import libraries
+from functools import lru_cache
+from azure.cognitiveservices.vision.customvision.training import CustomVisionTrainingClient
+from azure.cognitiveservices.vision.customvision.prediction import CustomVisionPredictionClient
+from msrest.authentication import ApiKeyCredentials
+from utility.settings import get_settings
+from utility import telemetry
+
+# The Custom Vision clients are created on first use and shared by the luggage modules
+
+@lru_cache(maxsize=None)
+def get_trainer() -> CustomVisionTrainingClient:
+    '''
+    Instantiate and authenticate the training client
+    '''
+    settings = get_settings()
+    credentials = ApiKeyCredentials(in_headers={"Training-key": settings.get("VISION_TRAINING_KEY")})
+    trainer = CustomVisionTrainingClient(settings.get("VISION_TRAINING_ENDPOINT"), credentials)
+    return telemetry.instrument_msrest_client(trainer, 'custom_vision')
+
+@lru_cache(maxsize=None)
+def get_predictor() -> CustomVisionPredictionClient:
+    '''
+    Instantiate and authenticate the prediction client
+    '''
+    settings = get_settings()
+    prediction_credentials = ApiKeyCredentials(in_headers={"Prediction-key": settings.get("VISION_PREDICTION_KEY")})
+    predictor = CustomVisionPredictionClient(settings.get("VISION_TRAINING_ENDPOINT"), prediction_credentials)
+    return telemetry.instrument_msrest_client(predictor, 'custom_vision')
+
+def get_prediction_resource_id() -> str:
+    return get_settings().get("VISION_PREDICTION_RESOURCE_ID")
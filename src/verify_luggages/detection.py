@@ -1,34 +1,8 @@
 # import libraries
-from azure.cognitiveservices.vision.customvision.training import CustomVisionTrainingClient
-from azure.cognitiveservices.vision.customvision.prediction import CustomVisionPredictionClient
-from azure.cognitiveservices.vision.customvision.training.models import ImageFileCreateBatch, ImageFileCreateEntry, Region
 from azure.cognitiveservices.vision.customvision.prediction.models import CustomVisionErrorException
-from msrest.authentication import ApiKeyCredentials
-import os, time, uuid, yaml
-from dotenv import dotenv_values, load_dotenv, find_dotenv
-
-# Get the absolute path of the root directory (where config.yaml is located)
-root_dir = os.path.abspath(os.path.join(os.getcwd(), '..'))
-# Use it to construct the path to config.yaml
-config_path = os.path.join(root_dir, 'config.yaml')
-# Load the config file
-with open(config_path) as yaml_file:
-    config = yaml.safe_load(yaml_file)
-
-# Load and define env parameters
-load_dotenv(find_dotenv())
-
-# get credentials
-ENDPOINT = config.get("VISION_TRAINING_ENDPOINT")
-training_key = config.get("VISION_TRAINING_KEY")
-prediction_key = config.get("VISION_PREDICTION_KEY")
-prediction_resource_id = config.get("VISION_PREDICTION_RESOURCE_ID")
-
-# Instantiate and authenticate the training and prediction clients
-credentials = ApiKeyCredentials(in_headers={"Training-key": training_key})
-trainer = CustomVisionTrainingClient(ENDPOINT, credentials)
-prediction_credentials = ApiKeyCredentials(in_headers={"Prediction-key": prediction_key})
-predictor = CustomVisionPredictionClient(ENDPOINT, prediction_credentials)
+import os, time
+from utility.settings import get_settings
+from verify_luggages.custom_vision_clients import get_predictor
 
 def perform_prediction_on_folder(image_folder_path, project_id, publish_iteration_name, max_retries=3):
     # Check if the folder exists
@@ -53,7 +27,7 @@ def perform_prediction_on_folder(image_folder_path, project_id, publish_iteratio
         for attempt in range(max_retries):
             try:
                 with open(image_path, "rb") as image_contents:
-                    results = predictor.detect_image(project_id, publish_iteration_name, image_contents.read())
+                    results = get_predictor().detect_image(project_id, publish_iteration_name, image_contents.read())
 
                     # Display results where prediction probability is >= 10%
                     valid_predictions = [prediction for prediction in results.predictions if prediction.probability * 100 >= 10]
@@ -84,6 +58,7 @@ def perform_prediction_on_folder(image_folder_path, project_id, publish_iteratio
                 print(f"Failed to process {image_file_name} after {max_retries} attempts.")
 
 def main():
+    config = get_settings().config
     image_folder_path = config['custom_vision']['folder_path']
     project_id = config['custom_vision']['project_id']
     publish_iteration_name = config['custom_vision']['publish_iteration_name']
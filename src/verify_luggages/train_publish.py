@@ -1,53 +1,33 @@
 # import libraries
-from azure.cognitiveservices.vision.customvision.training import CustomVisionTrainingClient
-from azure.cognitiveservices.vision.customvision.prediction import CustomVisionPredictionClient
-from azure.cognitiveservices.vision.customvision.training.models import ImageFileCreateBatch, ImageFileCreateEntry, Region
-from msrest.authentication import ApiKeyCredentials
-import os, time, uuid, yaml
-from dotenv import dotenv_values, load_dotenv, find_dotenv
-
-# Get the absolute path of the root directory (where config.yaml is located)
-root_dir = os.path.abspath(os.path.join(os.getcwd(), '..'))
-# Use it to construct the path to config.yaml
-config_path = os.path.join(root_dir, 'config.yaml')
-# Load the config file
-with open(config_path) as yaml_file:
-    config = yaml.safe_load(yaml_file)
-
-# Load and define env parameters
-load_dotenv(find_dotenv())
-
-# get credentials
-ENDPOINT = config.get("VISION_TRAINING_ENDPOINT")
-training_key = config.get("VISION_TRAINING_KEY")
-prediction_key = config.get("VISION_PREDICTION_KEY")
-prediction_resource_id = config.get("VISION_PREDICTION_RESOURCE_ID")
-
-# Instantiate and authenticate the training and prediction clients
-credentials = ApiKeyCredentials(in_headers={"Training-key": training_key})
-trainer = CustomVisionTrainingClient(ENDPOINT, credentials)
-prediction_credentials = ApiKeyCredentials(in_headers={"Prediction-key": prediction_key})
-predictor = CustomVisionPredictionClient(ENDPOINT, prediction_credentials)
+from utility.settings import get_settings
+from utility.polling import poll_until
+from verify_luggages.custom_vision_clients import get_trainer, get_prediction_resource_id
 
 def train_publish(project_id):
     # Start the training 
-    iteration = trainer.train_project(project_id)
-    while (iteration.status != "Completed"):
-        iteration = trainer.get_iteration(project_id, iteration.id)
-        print ("Training status: " + iteration.status)
-        print ("Waiting 10 seconds...")
-        time.sleep(10)
+    iteration = get_trainer().train_project(project_id)
+
+    def check_iteration():
+        current = get_trainer().get_iteration(project_id, iteration.id)
+        print ("Training status: " + current.status)
+        return current
+
+    if iteration.status != "Completed":
+        iteration = poll_until(check_iteration, lambda current: current.status in ("Completed", "Failed"),
+                               name='custom_vision.training', initial_interval=2, max_interval=10)
+    if iteration.status == "Failed":
+        raise RuntimeError(f"Training iteration {iteration.id} of project {project_id} has failed.")
 
     # publish the model
     ## Setting the Iteration Name, this will be used when Model training is completed
     publish_iteration_name = "project1-iter1"
     # The iteration is now trained. Publish it to the project endpoint
-    trainer.publish_iteration(project_id, iteration.id, publish_iteration_name, prediction_resource_id)
+    get_trainer().publish_iteration(project_id, iteration.id, publish_iteration_name, get_prediction_resource_id())
     print ("Done!")
 
     return project_id, iteration.id, publish_iteration_name
 
 if __name__ == "__main__":
-    project_id = config['custom_vision']['project_id']
+    project_id = get_settings().config['custom_vision']['project_id']
     train_publish(project_id)
 